@@ -1,9 +1,5 @@
-import json
-
 from dotenv import dotenv_values as get_dotenv_values
 from dotenv import load_dotenv
-from sqlalchemy import URL
-from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 
 from core.core_types import RabbitMQCredentials
 
@@ -13,35 +9,18 @@ load_dotenv()
 dotenv_values: dict[str, str] = get_dotenv_values()
 "Переменные окружения .env"
 
-ASYNC_ENGINE: AsyncEngine = create_async_engine(
-    URL.create(
-        host=dotenv_values.get("DATABASE_HOST", "localhost"),
-        drivername="postgresql+asyncpg",
-        username=dotenv_values.get("DATABASE_USERNAME", "postgres"),
-        password=dotenv_values.get("DATABASE_PASSWORD", "postgres"),
-        database=dotenv_values.get("DATABASE_NAME"),
-        port=int(dotenv_values.get("DATABASE_PORT", 5432))
-    ),
-    pool_pre_ping=True,
-    json_serializer=lambda obj: json.dumps(obj, ensure_ascii=False)
-)
-"Асинхронный движок для соединения с базой данных"
-
 RMQ_HOST: str = dotenv_values.get("RMQ_HOST", "127.0.0.1")
 "Хост на котором запущен RabbitMQ"
 
-RMQ_PORT: int = int(dotenv_values.get("RMQ_PORT"))
+RMQ_PORT: int = int(dotenv_values.get("RMQ_PORT", 5672))
 "Порт на котором запущен RabbitMQ"
 
-RMQ_LOGIN: str = dotenv_values.get("RMQ_LOGIN")
+RMQ_LOGIN: str = dotenv_values.get("RMQ_LOGIN", "guest")
 "Логин пользователя RabbitMQ"
 
-RMQ_PASSWORD: str = dotenv_values.get("RMQ_PASSWORD")
+RMQ_PASSWORD: str = dotenv_values.get("RMQ_PASSWORD", "guest")
 "Пароль пользователя RabbitMQ"
 
-BOT_ASYNC_SESSIONMAKER = async_sessionmaker(ASYNC_ENGINE, expire_on_commit=False)
-"Специализированная для сервиса OUTBOX асинхронная фабрика сессий БД. При вызове создает сессию"
-
 RABBIT_MQ_CREDINTAILS: RabbitMQCredentials = RabbitMQCredentials(
     host=RMQ_HOST,
     port=RMQ_PORT,
@@ -56,3 +35,11 @@ FASTAPI_DATABASE_QUERIES_QUEUE_NAME = "database_queries"
 BOT_TOKEN: str = dotenv_values.get("BOT_TOKEN")
 "Токен телеграм бота для отправки информации о запросах админу"
 
+BOT_METRICS_HOST: str = dotenv_values.get("BOT_METRICS_HOST", "127.0.0.1")
+"Адрес HTTP-сервера метрик бота (длительности этапов трассы `trace_stage_duration_seconds`)"
+
+BOT_METRICS_PORT: int = int(dotenv_values.get("BOT_METRICS_PORT", 9102))
+"Порт HTTP-сервера метрик бота. 0 - сервер не запускается"
+
+BOT_PREFETCH_COUNT: int = int(dotenv_values.get("BOT_PREFETCH_COUNT", 10))
+"Максимум сообщений, которые бот обрабатывает одновременно (prefetch). Остальные ждут в очереди RabbitMQ"
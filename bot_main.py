@@ -1,57 +1,125 @@
+"""
+Телеграм бот, отправляющий админам уведомления о запросах админки из очереди RabbitMQ.
+
+aiogram и aio_pika импортируются фабриками `create_bot` и `create_rmq_manager` при старте `main`,
+а не при импорте модуля: импорт `bot_main` (тесты, проверки перед запуском контейнера) их не загружает.
+"""
 import asyncio
 import json
-import aio_pika
+import time
+
+from typing import TYPE_CHECKING
 
-from aiogram import Bot
 from loguru import logger
 
 from bot.config import (
+    BOT_METRICS_HOST,
+    BOT_METRICS_PORT,
+    BOT_PREFETCH_COUNT,
     BOT_TOKEN,
     FASTAPI_DATABASE_QUERIES_QUEUE_NAME, 
     RABBIT_MQ_CREDINTAILS
 )
 from core.core_types import RabbitMQManager
+from core.metrics import start_metrics_server
+from core.tracing import observe_stages, read_message_trace
+from core.transport import AioPikaTransport, MessageCallback
 
+if TYPE_CHECKING:
+    from aio_pika import IncomingMessage
+    from aiogram import Bot
 
-bot = Bot(BOT_TOKEN)
-"Главный объект aiogram - экземпляр телеграм бота с его токеном"
 
 admins: list[int] = [959434557]
 "Список telegram id тех кому будут отправляться уведомления"
 
-rmq_manager = RabbitMQManager(RABBIT_MQ_CREDINTAILS)
-"Объект управляющй соединением с RabbitMQ"
 
+async def create_bot() -> "Bot":
+    "Создает главный объект aiogram - экземпляр телеграм бота с его токеном"
+    from aiogram import Bot
 
-async def on_message(message: aio_pika.IncomingMessage):
-    try:
-        async with message.process():
-            body = json.loads(message.body)
-            for admin in admins:
-                try:
-                    await bot.send_message(admin, f"```json\n{body}\n```", parse_mode="MarkdownV2")
-                except Exception as e:
-                    # Ловим сетевые ошибки отправки телеграм
-                    logger.error(f"Ошибка отправки в телеграм: {e}")
-    except asyncio.CancelledError:
-        # Фоновые таски могут быть отменены при shutdown loop
-        logger.warning("Callback on_message был отменён")
-    except Exception as e:
-        # Любые другие ошибки при обработке сообщения
-        logger.error(f"Ошибка при обработке RMQ сообщения: {e}")
-
-
-async def main():
+    return Bot(BOT_TOKEN)
+
+
+async def create_rmq_manager() -> RabbitMQManager:
+    "Создает менеджер RabbitMQ с prefetch `BOT_PREFETCH_COUNT` и открывает постоянное соединение"
+    rmq_manager = RabbitMQManager(
+        RABBIT_MQ_CREDINTAILS,
+        AioPikaTransport(RABBIT_MQ_CREDINTAILS, prefetch_count=BOT_PREFETCH_COUNT)
+    )
     await rmq_manager.connect()
+    return rmq_manager
+
+
+def create_message_handler(bot: "Bot") -> MessageCallback:
+    """
+    Создает обработчик сообщений очереди, отправляющий уведомления через `bot`.
+
+    Args:
+        bot (Bot): Телеграм бот
+
+    Returns:
+        MessageCallback: Обработчик `on_message`.
+    """
+    async def on_message(message: "IncomingMessage"):
+        """
+        Отправляет админам уведомление о сообщении из очереди.
+        Если сообщение трассируется (`core.tracing`), записывает длительности этапов очереди, отправки
+        в Telegram и всего пути от запроса админки до уведомления.
+        """
+        trace_id, stages = read_message_trace(message.headers)
+        if trace_id is not None:
+            stages["consumed"] = time.time()
+            observe_stages(stages, "consumed")
+        try:
+            async with message.process():
+                body = json.loads(message.body)
+                for admin in admins:
+                    try:
+                        await bot.send_message(admin, f"```json\n{body}\n```", parse_mode="MarkdownV2")
+                    except Exception as e:
+                        # Ловим сетевые ошибки отправки телеграм
+                        logger.error(f"Ошибка отправки в телеграм: {e}")
+                if trace_id is not None:
+                    stages["delivered"] = time.time()
+                    durations: dict[str, float] = observe_stages(stages, "delivered")
+                    logger.bind(trace_id=trace_id).info(f"Трасса {trace_id} доставлена: {durations}")
+        except asyncio.CancelledError:
+            # Фоновые таски могут быть отменены при shutdown loop
+            logger.warning("Callback on_message был отменён")
+        except Exception as e:
+            # Любые другие ошибки при обработке сообщения
+            logger.error(f"Ошибка при обработке RMQ сообщения: {e}")
+
+    return on_message
+
+
+async def main(bot: "Bot | None" = None, rmq_manager: RabbitMQManager | None = None):
+    """
+    Запускает HTTP-сервер метрик (если задан порт) и обработку очереди уведомлений.
+
+    Args:
+        bot (Bot | None): Телеграм бот. По умолчанию создается `create_bot`
+        rmq_manager (RabbitMQManager | None): Подключенный менеджер брокера. По умолчанию создается
+            `create_rmq_manager` (в тестах - с `core.transport.InMemoryTransport`)
+    """
+    metrics_server: asyncio.Server | None = None
+    if BOT_METRICS_PORT:
+        metrics_server = await start_metrics_server(BOT_METRICS_HOST, BOT_METRICS_PORT)
+    bot = bot or await create_bot()
+    rmq_manager = rmq_manager or await create_rmq_manager()
     await rmq_manager.register_callback_on_queue(
         queue_name=FASTAPI_DATABASE_QUERIES_QUEUE_NAME,
-        callback=on_message
+        callback=create_message_handler(bot)
     )
 
     try:
         await asyncio.Event().wait()  # держим loop открытым
     finally:
         await rmq_manager.close()
+        await bot.session.close()
+        if metrics_server is not None:
+            metrics_server.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,223 @@
+import time
+
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any, Generic, TypeVar
+
+
+_catalog_version: int = 0
+"Версия каталога текущего процесса. Увеличивается при каждом изменении категорий, компаний или карточек"
+
+_catalog_listeners: list[Callable[[], None]] = []
+"Функции, вызываемые при каждом изменении версии каталога (например, планировщик окон действия карточек)"
+
+
+def get_catalog_version() -> int:
+    """
+    Возвращает текущую версию каталога.
+
+    Returns:
+        int: Номер версии каталога в текущем процессе.
+    """
+    return _catalog_version
+
+
+def bump_catalog_version() -> int:
+    """
+    Увеличивает версию каталога, делая недействительными все закешированные данные каталога.
+    Вызывается DML-функциями `core.database_utils` после успешного коммита.
+
+    Returns:
+        int: Новый номер версии каталога.
+    """
+    global _catalog_version
+    _catalog_version += 1
+    for listener in _catalog_listeners:
+        listener()
+    return _catalog_version
+
+
+def add_catalog_listener(listener: Callable[[], None]) -> None:
+    """
+    Подписывает функцию на изменения версии каталога текущего процесса.
+
+    Args:
+        listener (Callable[[], None]): Синхронная функция без аргументов, не должна блокировать
+    """
+    _catalog_listeners.append(listener)
+
+
+def remove_catalog_listener(listener: Callable[[], None]) -> None:
+    "Отписывает функцию от изменений версии каталога, если она подписана"
+    if listener in _catalog_listeners:
+        _catalog_listeners.remove(listener)
+
+
+class CatalogCache:
+    """
+    LRU-кеш результатов запросов к каталогу.
+
+    Запись действительна, пока не изменилась версия каталога и не истек `ttl`.
+    Версия каталога локальна для процесса, поэтому `ttl` ограничивает время, в течение которого
+    другие воркеры могут отдавать устаревшие данные после изменения в админке.
+
+    Args:
+        max_entries (int): Максимальное количество записей в кеше
+        ttl (float): Время жизни записи в секундах
+    """
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: OrderedDict[Hashable, tuple[int, float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Any | None:
+        """
+        Возвращает закешированное значение.
+
+        Args:
+            key (Hashable): Ключ записи
+
+        Returns:
+            Any | None: Значение или `None`, если записи нет или она устарела.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        version, expires_at, value = entry
+        if version != get_catalog_version() or expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, version: int | None = None) -> None:
+        """
+        Сохраняет значение в кеш, вытесняя самые давно использованные записи.
+
+        Args:
+            key (Hashable): Ключ записи
+            value (Any): Значение
+            version (int | None): Версия каталога, для которой получено значение. Если с тех пор каталог
+                изменился, значение не сохраняется. `None` - значение соответствует текущей версии
+        """
+        current_version: int = get_catalog_version()
+        if version is not None and version != current_version:
+            return
+        self.entries[key] = (current_version, time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        "Очищает кеш"
+        self.entries.clear()
+
+
+class FragmentCache:
+    """
+    LRU-кеш отрендеренных HTML-фрагментов каталога, ограниченный суммарным размером в байтах.
+
+    Фрагменты ключуются идентификатором сущности и действительны только для версии каталога,
+    в которой они сохранены. DML-функции `core.database_utils` увеличивают версию (`bump_catalog_version`),
+    после чего кеш очищается при первой записи - устаревшие фрагменты не занимают память.
+
+    Args:
+        max_bytes (int): Максимальный суммарный размер фрагментов в байтах
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[Hashable, bytes] = OrderedDict()
+        self.size: int = 0
+        "Суммарный размер фрагментов в байтах"
+        self.version: int = get_catalog_version()
+        "Версия каталога, для которой сохранены фрагменты"
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, key: Hashable) -> bytes | None:
+        """
+        Возвращает фрагмент.
+
+        Args:
+            key (Hashable): Ключ фрагмента
+
+        Returns:
+            bytes | None: Фрагмент или `None`, если его нет или каталог изменился.
+        """
+        value: bytes | None = self.entries.get(key) if self.version == get_catalog_version() else None
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: bytes) -> None:
+        """
+        Сохраняет фрагмент, вытесняя самые давно использованные, пока размер не станет меньше `max_bytes`.
+        Фрагмент больше `max_bytes` не сохраняется.
+
+        Args:
+            key (Hashable): Ключ фрагмента
+            value (bytes): Фрагмент
+        """
+        if self.version != get_catalog_version():
+            self.clear()
+            self.version = get_catalog_version()
+        if len(value) > self.max_bytes:
+            return
+        previous: bytes | None = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self.entries[key] = value
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def clear(self) -> None:
+        "Очищает кеш"
+        self.entries.clear()
+        self.size = 0
+
+
+CacheType = TypeVar("CacheType", CatalogCache, FragmentCache)
+"Тип кеша пространства имен"
+
+
+class CacheNamespaces(Generic[CacheType]):
+    """
+    Отдельный экземпляр кеша на каждое пространство имен (арендатора). У каждого экземпляра свой лимит
+    записей или байтов, поэтому записи нагруженного арендатора вытесняют только его собственные записи.
+    Память ограничена лимитом экземпляра, умноженным на количество арендаторов.
+
+    Args:
+        factory (Callable[[], CacheType]): Создает кеш для нового пространства имен
+    """
+    def __init__(self, factory: Callable[[], CacheType]):
+        self.factory = factory
+        self.caches: dict[Hashable, CacheType] = {}
+
+    def namespace(self, key: Hashable) -> CacheType:
+        """
+        Возвращает кеш пространства имен, создавая его при первом обращении.
+
+        Args:
+            key (Hashable): Пространство имен (идентификатор арендатора)
+
+        Returns:
+            CacheType: Кеш пространства имен.
+        """
+        cache: CacheType | None = self.caches.get(key)
+        if cache is None:
+            cache = self.caches[key] = self.factory()
+        return cache
+
+    def clear(self) -> None:
+        "Очищает кеши всех пространств имен"
+        for cache in self.caches.values():
+            cache.clear()
+
+
+SEARCH_CACHE: CacheNamespaces[CatalogCache] = CacheNamespaces(lambda: CatalogCache(max_entries=1024, ttl=30))
+"Кеш результатов полнотекстового поиска карточек, отдельный для каждого арендатора"
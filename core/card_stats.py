@@ -0,0 +1,158 @@
+"""
+Просмотры и переходы по карточкам, накопленные в памяти воркера.
+
+Открытие карточки и переход по ее ссылке - самые частые клиентские события, и строка в бд на каждое
+из них нагрузила бы основную бд сильнее, чем сам каталог. Поэтому `CardStatsAggregator` считает события
+в словаре по интервалу времени, арендатору и карточке, а раз в `interval` записывает накопленное
+одним upsert на интервал (`core.database_utils.upsert_card_stats_stmt`).
+
+Память ограничена: в словаре не больше `max_keys` счетчиков. Когда занята половина, запись начинается
+раньше `interval`, а события новых карточек сверх предела отбрасываются и учитываются в метрике
+`card_stats_events_dropped_total`. События теряются только при аварийном завершении воркера:
+при остановке приложения накопленное записывается, а при ошибке записи возвращается в счетчики.
+"""
+import asyncio
+import time
+
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from .database_utils.card_stats import upsert_card_stats_stmt
+from .metrics import CARD_STATS_EVENTS_DROPPED
+
+
+VIEW: int = 0
+"Индекс просмотров в счетчиках карточки"
+
+CLICK: int = 1
+"Индекс переходов в счетчиках карточки"
+
+EVENT_KINDS: tuple[str, ...] = ("view", "click")
+"Названия событий по индексам счетчиков (метка `kind` метрики отброшенных событий)"
+
+
+class CardStatsAggregator:
+    """
+    Накопитель просмотров и переходов по карточкам с фоновой записью в `card_stats`.
+
+    Args:
+        session_maker (async_sessionmaker): Фабрика сессий основной бд
+        bucket_seconds (int): Длина интервала, по которому агрегируются события, секунды
+        interval (float): Пауза между записями, секунды
+        max_keys (int): Предел количества счетчиков (интервал, арендатор, карточка) в памяти
+    """
+    def __init__(
+        self,
+        session_maker: async_sessionmaker,
+        bucket_seconds: int = 60,
+        interval: float = 5.0,
+        max_keys: int = 100_000
+    ):
+        self.session_maker = session_maker
+        self.bucket_seconds = bucket_seconds
+        self.interval = interval
+        self.max_keys = max_keys
+        self.counts: dict[tuple[int, int, int], list[int]] = {}
+        """Счетчики с прошлой записи. Ключ - (номер интервала, `tenant_id`, `card_id`),
+        значение - [просмотры, переходы]. Номер интервала - время от эпохи, деленное на `bucket_seconds`"""
+        self.dropped: int = 0
+        "Отброшенные события за время работы"
+        self.wakeup: asyncio.Event | None = None
+        "Сигнал фоновой задаче записать счетчики, не дожидаясь `interval`. Создается в `start`"
+        self.task: asyncio.Task | None = None
+
+    def add(self, kind: int, tenant_id: int, card_id: int) -> None:
+        """
+        Учитывает событие карточки. Не обращается к бд.
+
+        Args:
+            kind (int): `VIEW` или `CLICK`
+            tenant_id (int): Идентификатор арендатора
+            card_id (int): Идентификатор карточки
+        """
+        key: tuple[int, int, int] = (int(time.time()) // self.bucket_seconds, tenant_id, card_id)
+        counters: list[int] | None = self.counts.get(key)
+        if counters is None:
+            if len(self.counts) >= self.max_keys:
+                self.dropped += 1
+                CARD_STATS_EVENTS_DROPPED.inc(EVENT_KINDS[kind])
+                return
+            if len(self.counts) >= self.max_keys // 2 and self.wakeup is not None:
+                self.wakeup.set()
+            counters = self.counts[key] = [0, 0]
+        counters[kind] += 1
+
+    def view(self, tenant_id: int, card_id: int) -> None:
+        "Учитывает открытие карточки"
+        self.add(VIEW, tenant_id, card_id)
+
+    def click(self, tenant_id: int, card_id: int) -> None:
+        "Учитывает переход по ссылке карточки"
+        self.add(CLICK, tenant_id, card_id)
+
+    async def flush(self) -> int:
+        """
+        Записывает накопленные счетчики: одно выражение на интервал, все интервалы в одной транзакции.
+
+        Returns:
+            int: Количество записанных событий. 0 - событий не было или запись не удалась.
+        """
+        if self.wakeup is not None:
+            self.wakeup.clear()
+        if not self.counts:
+            return 0
+        counts, self.counts = self.counts, {}
+        buckets: dict[int, tuple[list[int], list[int], list[int], list[int]]] = defaultdict(lambda: ([], [], [], []))
+        for (bucket, tenant_id, card_id), (views, clicks) in sorted(counts.items()):
+            tenant_ids, card_ids, bucket_views, bucket_clicks = buckets[bucket]
+            tenant_ids.append(tenant_id)
+            card_ids.append(card_id)
+            bucket_views.append(views)
+            bucket_clicks.append(clicks)
+        try:
+            async with self.session_maker() as session:
+                async with session.begin():
+                    for bucket, arrays in buckets.items():
+                        await session.execute(upsert_card_stats_stmt(
+                            datetime.fromtimestamp(bucket * self.bucket_seconds, timezone.utc), *arrays
+                        ))
+        except Exception as exc:
+            logger.error(f"Ошибка записи просмотров и переходов по карточкам: {exc}")
+            # События попадут в следующую запись. Предел max_keys может быть временно превышен
+            for key, (views, clicks) in counts.items():
+                counters: list[int] = self.counts.setdefault(key, [0, 0])
+                counters[VIEW] += views
+                counters[CLICK] += clicks
+            return 0
+        return sum(views + clicks for views, clicks in counts.values())
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            if not await self.flush() and self.counts:
+                # Запись не удалась: повтор не раньше чем через interval, даже если счетчики переполнены
+                await asyncio.sleep(self.interval)
+
+    def start(self) -> asyncio.Task:
+        "Запускает периодическую запись счетчиков в фоновой задаче"
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self.run())
+        return self.task
+
+    async def stop(self) -> None:
+        "Останавливает фоновую задачу и записывает накопленные счетчики"
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        self.wakeup = None
+        await self.flush()
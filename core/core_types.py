@@ -1,13 +1,13 @@
-import asyncio
 import json
-import aio_pika
 
 from dataclasses import dataclass
 from enum import Enum
 from typing import Any, Callable
-import aiormq
+
 from loguru import logger
 
+from .transport import AioPikaTransport, MessageTransport
+
 
 @dataclass
 class RabbitMQCredentials:
@@ -49,108 +49,58 @@ class RabbitMQManager:
 
     Args:
         credintails (RabbitMQCredentails): Авторизационные данные
+        transport (MessageTransport | None): Транспорт сообщений (`core.transport`).
+            По умолчанию `AioPikaTransport` с `credintails`, в тестах и бенчмарках - `InMemoryTransport`
     """
-    def __init__(self, credintails):
+    def __init__(self, credintails, transport: MessageTransport | None = None):
         self.credintails = credintails
-        self.connection: aio_pika.RobustConnection | None = None
-        self.channel: aio_pika.Channel | None = None
+        self.transport: MessageTransport = transport or AioPikaTransport(credintails)
 
     async def send_message_to_queue(
         self,
         queue_name: str,
         message: str | dict | list | Any,
-        durable: bool = True  # Дополнительные параметры
+        durable: bool = True,  # Дополнительные параметры
+        headers: dict[str, Any] | None = None
     ) -> bool:
         """
         Отправляет сообщение в RabbitMQ очередь
+        Args:
+            headers (dict[str, Any] | None): Заголовки сообщения (например, трасса `core.tracing`)
         Returns:
-            bool: True если сообщение отправлено успешно
+            bool: True если сообщение отправлено и брокер подтвердил публикацию
         """
-        connection = None
         try:
-            # Подключение
-            async with await aio_pika.connect_robust(
-                    host=self.credintails.host,
-                    port=self.credintails.port,
-                    login=self.credintails.login,
-                    password=self.credintails.password,
-                    loop=asyncio.get_event_loop()
-                ) as connection, await connection.channel() as channel:
-                # Объявление очереди (опционально, но рекомендуется)
-                await channel.declare_queue(queue_name, durable=durable)
-
-                # Отправка сообщения
-                await channel.default_exchange.publish(
-                    aio_pika.Message(
-                        body=json.dumps(message).encode(),
-                        delivery_mode=aio_pika.DeliveryMode.PERSISTENT if durable else None
-                    ),
-                    routing_key=queue_name
-                )
-
-                logger.info(f"Message sent to queue '{queue_name}'")
-                return True
-
+            await self.transport.publish(queue_name, json.dumps(message).encode(), headers=headers, durable=durable)
+            logger.info(f"Message sent to queue '{queue_name}'")
+            return True
         except Exception as e:
             logger.error(f"Failed to send message to '{queue_name}': {e}")
             return False
 
-        finally:
-            if connection:
-                await connection.close()
-
-    async def register_callback_on_queue(
-        self,
-        queue_name: str,
-        callback: Callable,
-        durable: bool = True  # Дополнительные параметры
-) -> aio_pika.queue.ConsumerTag:
-        connection = None
-        try:
-            async with await aio_pika.connect_robust(
-                    host=self.credintails.host,
-                    port=self.credintails.port,
-                    login=self.credintails.login,
-                    password=self.credintails.password,
-                    loop=asyncio.get_event_loop()
-                ) as connection, await connection.channel() as channel:
-                # Объявление очереди (опционально, но рекомендуется)
-                queue = await channel.declare_queue(queue_name, durable=durable)
-                logger.info(f"Callback {callback.__name__} зарегестрирован на очередь {queue_name}")
-                return await queue.consume(callback)
-        except Exception as e:
-            logger.error(e)
-            if connection:
-                await connection.close()
-
     async def connect(self):
-        self.connection = await aio_pika.connect_robust(
-            host=self.credintails.host,
-            port=self.credintails.port,
-            login=self.credintails.login,
-            password=self.credintails.password
-        )
-        self.channel = await self.connection.channel()
+        await self.transport.connect()
         return self
 
+    async def open_channel(self) -> "RabbitMQManager":
+        """
+        Возвращает менеджер, публикующий через отдельный канал того же соединения
+        (`MessageTransport.open_channel`). Закрытие такого менеджера закрывает только его канал.
+        """
+        return RabbitMQManager(self.credintails, await self.transport.open_channel())
+
     async def register_callback_on_queue(
         self,
         queue_name: str,
         callback: Callable,
         durable: bool = True
-    ) -> aio_pika.queue.ConsumerTag:
-        if not self.channel:
-            raise RuntimeError("Не подключён канал")
-
-        queue = await self.channel.declare_queue(queue_name, durable=durable)
+    ) -> str:
+        consumer_tag: str = await self.transport.consume(queue_name, callback, durable=durable)
         logger.info(f"Callback {callback.__name__} зарегистрирован на очередь {queue_name}")
-        return await queue.consume(callback)
+        return consumer_tag
 
     async def close(self):
-        if self.channel and not self.channel.is_closed:
-            await self.channel.close()
-        if self.connection and not self.connection.is_closed:
-            await self.connection.close()
+        await self.transport.close()
 
     async def drop_queue(
         self,
@@ -159,13 +109,7 @@ class RabbitMQManager:
         if_empty: bool = True
     ):
         try:
-            if self.channel:
-                queue = await self.channel.declare_queue(queue_name, passive=True)
-                await queue.delete(
-                    if_unused=if_unused,
-                    if_empty=if_empty
-                )
-        except aiormq.exceptions.ChannelNotFoundEntity as exc:
-            logger.error(exc)
+            await self.transport.delete_queue(queue_name, if_unused=if_unused, if_empty=if_empty)
         except Exception as exc:
-            logger.error(exc)
\ No newline at end of file
+            # В том числе aiormq.exceptions.ChannelNotFoundEntity, если очереди нет
+            logger.error(exc)
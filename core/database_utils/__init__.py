@@ -1,3 +1,4 @@
+from .. import db_metrics  # noqa: F401 - регистрирует обработчик ошибок бд для метрик функций
 from .dml import (
     get_all_rows_from_table,
     get_full_row_for_admin_by_id,
@@ -7,15 +8,47 @@ from .dml import (
 )
 
 from .specific_select import (
+    build_categories_select,
+    build_cards_in_category_select,
+    build_card_info_select,
+    build_cards_search_select,
     get_all_categories,
     get_all_cards_in_category_with_short_description,
-    get_card_info_by_card_id
+    get_card_info_by_card_id,
+    search_cards
+)
+
+from .fast_select import (
+    CATEGORIES_SELECT,
+    CARDS_IN_CATEGORY_SELECT,
+    CARD_INFO_SELECT,
+    CARD_LINK_SELECT,
+    get_all_categories_fast,
+    get_all_cards_in_category_fast,
+    get_card_info_fast,
+    get_card_link_fast
 )
 
 from .outbox  import (
     insert_into_outbox,
+    record_select_in_outbox,
     get_last_pending_messages_from_outbox,
-    set_status_of_outbox_row
+    get_pending_outbox_queues,
+    get_pending_messages_from_outbox_queue,
+    get_outbox_backlog,
+    set_status_of_outbox_row,
+    set_status_of_outbox_rows
+)
+
+from .promocodes import (
+    claim_promo_code,
+    load_promo_codes,
+    count_available_promo_codes
+)
+
+from .card_stats import (
+    upsert_card_stats_stmt,
+    get_card_stats_report
 )
 
 
@@ -25,10 +58,33 @@ __all__ = [
     "update_row_by_id",
     "create_row",
     "delete_row",
+    "build_categories_select",
+    "build_cards_in_category_select",
+    "build_card_info_select",
+    "build_cards_search_select",
     "get_all_categories",
     "get_all_cards_in_category_with_short_description",
     "get_card_info_by_card_id",
+    "search_cards",
+    "CATEGORIES_SELECT",
+    "CARDS_IN_CATEGORY_SELECT",
+    "CARD_INFO_SELECT",
+    "CARD_LINK_SELECT",
+    "get_all_categories_fast",
+    "get_all_cards_in_category_fast",
+    "get_card_info_fast",
+    "get_card_link_fast",
     "insert_into_outbox",
+    "record_select_in_outbox",
     "get_last_pending_messages_from_outbox",
-    "set_status_of_outbox_row"
+    "get_pending_outbox_queues",
+    "get_pending_messages_from_outbox_queue",
+    "get_outbox_backlog",
+    "set_status_of_outbox_row",
+    "set_status_of_outbox_rows",
+    "claim_promo_code",
+    "load_promo_codes",
+    "count_available_promo_codes",
+    "upsert_card_stats_stmt",
+    "get_card_stats_report"
 ]
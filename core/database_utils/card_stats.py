@@ -0,0 +1,118 @@
+"""
+Просмотры и переходы по карточкам (`card_stats`).
+
+Воркер не пишет строку на каждое событие: события накапливаются в памяти (`core.card_stats`),
+а накопленное за интервал записывается одним выражением `INSERT ... SELECT FROM unnest(...) ON CONFLICT DO UPDATE`.
+Строки интервала передаются четырьмя массивами, поэтому размер выражения и число его параметров
+не зависят от количества карточек.
+"""
+from datetime import datetime
+from typing import Any
+
+from loguru import logger
+from sqlalchemy import BigInteger, Insert, bindparam, cast, func, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import (
+    SQLAlchemyError,
+    OperationalError
+)
+
+from ..metrics import instrument_db_helper
+from ..models import CardStatsTable
+
+
+def upsert_card_stats_stmt(
+    bucket: datetime,
+    tenant_ids: list[int],
+    card_ids: list[int],
+    views: list[int],
+    clicks: list[int]
+) -> Insert:
+    """
+    Выражение, прибавляющее к счетчикам интервала `bucket` просмотры и переходы карточек.
+    Элементы массивов с одинаковым индексом относятся к одной карточке, пары (`tenant_id`, `card_id`)
+    не повторяются. Одновременные upsert разных воркеров блокируют строки в порядке ключа,
+    если массивы отсортированы по (`tenant_id`, `card_id`).
+
+    Returns:
+        Insert: Выражение `INSERT ... ON CONFLICT DO UPDATE` с массивами в параметрах.
+    """
+    rows = func.unnest(
+        bindparam("tenant_ids", tenant_ids, type_=ARRAY(BigInteger)),
+        bindparam("card_ids", card_ids, type_=ARRAY(BigInteger)),
+        bindparam("views", views, type_=ARRAY(BigInteger)),
+        bindparam("clicks", clicks, type_=ARRAY(BigInteger))
+    ).table_valued("tenant_id", "card_id", "views", "clicks").render_derived(name="rows")
+    stmt = insert(CardStatsTable).from_select(
+        ["bucket", "tenant_id", "card_id", "views", "clicks"],
+        select(
+            literal(bucket, CardStatsTable.bucket.type), rows.c.tenant_id, rows.c.card_id, rows.c.views, rows.c.clicks
+        )
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[CardStatsTable.bucket, CardStatsTable.tenant_id, CardStatsTable.card_id],
+        set_={
+            "views": CardStatsTable.views + stmt.excluded.views,
+            "clicks": CardStatsTable.clicks + stmt.excluded.clicks
+        }
+    )
+
+
+@instrument_db_helper
+async def get_card_stats_report(
+    session: AsyncSession,
+    since: datetime,
+    until: datetime,
+    tenant_id: int | None = None,
+    limit: int = 100
+) -> list[dict[str, Any]]:
+    """
+    Отчет по карточкам за период: просмотры, переходы и их отношение, по убыванию просмотров.
+
+    Args:
+        session (AsyncSession): Асинхронная сессия SQLAlchemy без открытой транзакции.
+        since (datetime): Начало периода. Учитываются интервалы, начавшиеся не раньше него.
+        until (datetime): Конец периода (не включается).
+        tenant_id (int | None): Идентификатор арендатора или `None` - все арендаторы.
+        limit (int): Максимальное количество карточек.
+
+    Returns:
+        list[dict[str, Any]]: Словари с ключами `tenant_id`, `card_id`, `views`, `clicks` и `ctr`
+            или пустой список при ошибке.
+    """
+    # sum(bigint) в Postgres - numeric, приведение возвращает целые числа вместо Decimal
+    views = cast(func.sum(CardStatsTable.views), BigInteger).label("views")
+    clicks = cast(func.sum(CardStatsTable.clicks), BigInteger).label("clicks")
+    stmt = select(CardStatsTable.tenant_id, CardStatsTable.card_id, views, clicks).where(
+        CardStatsTable.bucket >= since, CardStatsTable.bucket < until
+    )
+    if tenant_id is not None:
+        stmt = stmt.where(CardStatsTable.tenant_id == tenant_id)
+    stmt = stmt.group_by(CardStatsTable.tenant_id, CardStatsTable.card_id).order_by(
+        views.desc(), clicks.desc(), CardStatsTable.tenant_id, CardStatsTable.card_id
+    ).limit(limit)
+    try:
+        async with session.begin():
+            rows = (await session.execute(stmt)).all()
+        return [
+            {
+                "tenant_id": row.tenant_id,
+                "card_id": row.card_id,
+                "views": row.views,
+                "clicks": row.clicks,
+                "ctr": round(row.clicks / row.views, 4) if row.views else None
+            }
+            for row in rows
+        ]
+    except OperationalError as exc:
+        logger.error(f"Ошибка подключения к БД: {exc}")
+        return []
+
+    except SQLAlchemyError as exc:
+        logger.error(f"Ошибка SQLAlchemy при выполнении запроса: {exc}")
+        return []
+
+    except Exception as exc:
+        logger.error(f"Неожиданная ошибка при построении отчета по карточкам: {exc}")
+        return []
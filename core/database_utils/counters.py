@@ -0,0 +1,143 @@
+"""
+Счетчики карточек категорий и компаний (`cards_count`).
+
+Счетчики считают карточки, действующие в момент `card_validity_state.processed_until` - момент, до которого
+планировщик окон действия (`core.validity`) уже обработал границы. DML-функции изменяют счетчики в той же
+транзакции, что и карточку: при создании, удалении, переносе в другую категорию или компанию и изменении окна
+действия. Строка состояния при этом блокируется на чтение, а планировщик блокирует ее на запись, поэтому
+изменение карточки и обработка границы ее окна не пересчитывают ее дважды.
+
+Строки счетчиков блокируются в порядке идентификаторов, поэтому одновременные переносы карточек между
+одними и теми же категориями не приводят к взаимной блокировке. Полный пересчет после массовой загрузки
+или при расхождениях - `core.read_models.recompute_card_counts`.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import Row, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import BaseTable, CardsTable, CardValidityStateTable, CategoriesTable, CompaniesTable
+
+
+CARD_COUNTERS: dict[str, type[BaseTable]] = {
+    CardsTable.category_id.name: CategoriesTable,
+    CardsTable.company_id.name: CompaniesTable,
+}
+"Ключ - столбец карточки, значение - таблица, в которой считаются карточки"
+
+CARD_COUNTED_COLUMNS: tuple[str, ...] = (*CARD_COUNTERS, CardsTable.valid_from.name, CardsTable.valid_to.name)
+"Столбцы карточки, от которых зависят счетчики"
+
+
+def changes_card_counters(table: type[BaseTable], data: dict) -> bool:
+    "Затрагивает ли изменение строки `table` с данными `data` счетчики карточек"
+    return table is CardsTable and any(name in data for name in CARD_COUNTED_COLUMNS)
+
+
+async def lock_validity_state(session: AsyncSession, for_update: bool = False) -> datetime:
+    """
+    Блокирует строку состояния планировщика окон действия и возвращает `processed_until`.
+    Если строки нет, создает ее с текущим временем.
+
+    Args:
+        session (AsyncSession): Асинхронная сессия SQLAlchemy внутри транзакции
+        for_update (bool): Блокировка на запись (планировщик). По умолчанию на чтение (DML-функции)
+
+    Returns:
+        datetime: Момент, в который действуют карточки, учтенные в счетчиках.
+    """
+    stmt = select(CardValidityStateTable.processed_until).where(CardValidityStateTable.id == 1)
+    while True:
+        processed_until: datetime | None = await session.scalar(stmt.with_for_update(read=not for_update))
+        if processed_until is not None:
+            return processed_until
+        await session.execute(
+            insert(CardValidityStateTable).values(id=1, processed_until=func.now()).on_conflict_do_nothing()
+        )
+
+
+def is_active(card: Row, moment: datetime) -> bool:
+    "Действует ли карточка (строка с `valid_from`, `valid_to`) в момент `moment`"
+    return (card.valid_from is None or card.valid_from <= moment) and (card.valid_to is None or card.valid_to > moment)
+
+
+async def select_card_references(session: AsyncSession, table: type[BaseTable], row_id: int) -> Row | None:
+    """
+    Выбирает категорию, компанию и окно действия карточки с блокировкой строки до конца транзакции.
+
+    Args:
+        session (AsyncSession): Асинхронная сессия SQLAlchemy внутри транзакции
+        table (type[BaseTable]): Таблица изменяемой строки
+        row_id (int): Идентификатор строки
+
+    Returns:
+        Row | None: Строка с полями `CARD_COUNTED_COLUMNS` или `None`, если `table` не карточки или карточки нет.
+    """
+    if table is not CardsTable:
+        return None
+    result = await session.execute(
+        select(*(CardsTable.__table__.c[name] for name in CARD_COUNTED_COLUMNS))
+        .where(CardsTable.id == row_id).with_for_update()
+    )
+    return result.first()
+
+
+async def apply_counter_deltas(session: AsyncSession, deltas: dict[type[BaseTable], dict[int, int]]) -> None:
+    """
+    Изменяет счетчики карточек на заданные величины в порядке идентификаторов строк.
+
+    Args:
+        session (AsyncSession): Асинхронная сессия SQLAlchemy внутри транзакции
+        deltas (dict[type[BaseTable], dict[int, int]]): Таблица - идентификатор строки - изменение счетчика
+    """
+    for counted in CARD_COUNTERS.values():
+        for row_id, delta in sorted(deltas.get(counted, {}).items()):
+            if delta:
+                await session.execute(
+                    update(counted).values(cards_count=counted.cards_count + delta).where(counted.id == row_id)
+                )
+
+
+def count_transition(
+    deltas: dict[type[BaseTable], dict[int, int]],
+    old: Row | None,
+    new: Row | None,
+    old_moment: datetime,
+    new_moment: datetime
+) -> None:
+    """
+    Добавляет в `deltas` изменение счетчиков при переходе карточки из состояния `old` в состояние `new`.
+
+    Args:
+        deltas (dict[type[BaseTable], dict[int, int]]): Накапливаемые изменения счетчиков
+        old (Row | None): Карточка до изменения. `None` - карточки не было
+        new (Row | None): Карточка после изменения. `None` - карточка удалена
+        old_moment (datetime): Момент, в который учтено состояние `old`
+        new_moment (datetime): Момент, в который учитывается состояние `new`
+    """
+    for name, counted in CARD_COUNTERS.items():
+        table_deltas: dict[int, int] = deltas.setdefault(counted, defaultdict(int))
+        if old is not None and is_active(old, old_moment):
+            table_deltas[getattr(old, name)] -= 1
+        if new is not None and is_active(new, new_moment):
+            table_deltas[getattr(new, name)] += 1
+
+
+async def adjust_card_counters(session: AsyncSession, old: Row | None, new: Row | None) -> None:
+    """
+    Переносит карточку в счетчиках из категории и компании `old` в категорию и компанию `new`.
+    Учитываются только карточки, действующие в момент `processed_until`.
+
+    Args:
+        session (AsyncSession): Асинхронная сессия SQLAlchemy внутри транзакции изменения карточки
+        old (Row | None): Карточка до изменения (`select_card_references`). `None` - карточка создана
+        new (Row | None): Карточка после изменения. `None` - карточка удалена
+    """
+    if old is None and new is None:
+        return
+    moment: datetime = await lock_validity_state(session)
+    deltas: dict[type[BaseTable], dict[int, int]] = {}
+    count_transition(deltas, old, new, moment, moment)
+    await apply_counter_deltas(session, deltas)
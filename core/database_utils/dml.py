@@ -2,7 +2,7 @@ import asyncpg
 
 from loguru import logger
 from typing import Any
-from sqlalchemy import insert, select, update, delete
+from sqlalchemy import Row, insert, select, update, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import Insert, Select, Update, Delete
 from sqlalchemy.exc import (
@@ -12,10 +12,14 @@ from sqlalchemy.exc import (
     DBAPIError
 )
 
-from ..models import BaseTable
-from .outbox import insert_into_outbox
+from ..cache import bump_catalog_version
+from ..metrics import instrument_db_helper
+from ..models import BaseTable, get_editable_columns
+from .counters import adjust_card_counters, changes_card_counters, select_card_references
+from .outbox import insert_into_outbox, jsonable_fields
 
 
+@instrument_db_helper
 async def get_all_rows_from_table(
     table: BaseTable,
     session: AsyncSession,
@@ -25,7 +29,7 @@ async def get_all_rows_from_table(
     Извлекает все строки из указанной таблицы базы данных.
 
     Функция:
-    - Определяет все столбцы таблицы через её модель (`table.__table__.columns`);
+    - Определяет столбцы таблицы без генерируемых бд (`get_editable_columns(table)`);
     - Выполняет асинхронный запрос к базе данных для получения всех записей;
     - Логирует ошибки и возвращает пустой список при исключениях.
 
@@ -39,13 +43,13 @@ async def get_all_rows_from_table(
     """
     try:
         async with session.begin():
-            stmt: Select = select(*table.__table__.columns)
+            stmt: Select = select(*get_editable_columns(table))
             result = await session.execute(stmt)
             await insert_into_outbox(
                 payload={
                     "action": "select",
                     "entity": table.__tablename__,
-                    "fields": [column.name for column in table.__table__.columns]
+                    "fields": [column.name for column in get_editable_columns(table)]
                 },
                 queue=queue_name,
                 session=session
@@ -68,6 +72,7 @@ async def get_all_rows_from_table(
         return []
 
 
+@instrument_db_helper
 async def get_full_row_for_admin_by_id(
     row_id: int,
     table: BaseTable,
@@ -78,7 +83,7 @@ async def get_full_row_for_admin_by_id(
     Извлекает полную информацию о конкретной записи из таблицы по её ID для редактирования в админ-панели.
 
     Функция:
-    - Определяет все столбцы таблицы через её модель (`table.__table__.columns`);
+    - Определяет столбцы таблицы без генерируемых бд (`get_editable_columns(table)`);
     - Выполняет асинхронный запрос к базе данных для получения записи с указанным `row_id`;
     - Возвращает словарь с ключами = именам столбцов и значениями = содержимому ячеек;
     - Логирует ошибки и возвращает пустой словарь при исключениях или если запись не найдена.
@@ -95,7 +100,7 @@ async def get_full_row_for_admin_by_id(
     try:
         async with session.begin():
             stmt: Select = select(
-                    *table.__table__.columns
+                    *get_editable_columns(table)
                 ).where(table.id == row_id
             )
             result = await session.execute(stmt)
@@ -103,7 +108,7 @@ async def get_full_row_for_admin_by_id(
                 payload={
                     "action": "select",
                     "entity": table.__tablename__,
-                    "fields": [column.name for column in table.__table__.columns],
+                    "fields": [column.name for column in get_editable_columns(table)],
                     "filters": [
                         {"column": "id", "operator": "=", "value": row_id}
                     ]
@@ -129,6 +134,7 @@ async def get_full_row_for_admin_by_id(
         return {}
 
 
+@instrument_db_helper
 async def update_row_by_id(
     row_id: int,
     table: BaseTable,
@@ -142,6 +148,7 @@ async def update_row_by_id(
     Функция:
     - Формирует асинхронный SQL-запрос на обновление значений столбцов;
     - Выполняет обновление записи с указанным `row_id`;
+    - При переносе карточки в другую категорию или компанию изменяет их счетчики карточек;
     - Коммитит изменения в базу данных;
     - Логирует ошибки и возвращает текст ошибки при неудаче.
 
@@ -156,13 +163,19 @@ async def update_row_by_id(
     """
     try:
         async with session.begin():
+            old: Row | None = None
+            "Категория и компания карточки до изменения, если изменение затрагивает счетчики карточек"
+            if changes_card_counters(table, data):
+                old = await select_card_references(session, table, row_id)
             stmt: Update = update(table).values(**data).where(table.id == row_id)
             await session.execute(stmt)
+            if old is not None:
+                await adjust_card_counters(session, old, await select_card_references(session, table, row_id))
             await insert_into_outbox(
                 payload={
                     "action": "update",
                     "entity": table.__tablename__,
-                    "fields": dict(**data),
+                    "fields": jsonable_fields(data),
                     "filters": [
                         {"column": "id", "operator": "=", "value": row_id}
                     ]
@@ -171,6 +184,7 @@ async def update_row_by_id(
                 session=session
             )
             await session.commit()
+            bump_catalog_version()
             return True
     except IntegrityError as exc:
         await session.rollback()
@@ -193,6 +207,7 @@ async def update_row_by_id(
         return str(exc)
 
 
+@instrument_db_helper
 async def create_row(
     table: BaseTable,
     data: dict[str, Any],
@@ -206,6 +221,7 @@ async def create_row(
     - Формирует объект таблицы с переданными значениями столбцов;
     - Добавляет объект в сессию и коммитит изменения в базу данных;
     - Обновляет объект, чтобы получить его ID после вставки;
+    - Для карточки увеличивает счетчики карточек ее категории и компании;
     - Логирует ошибки и возвращает текст ошибки при неудаче.
 
     Args:
@@ -221,16 +237,18 @@ async def create_row(
             stmt: Insert = insert(table).values(**data).returning(table.id)
             res: int = await session.scalar(stmt)
             data["id"] = res
+            await adjust_card_counters(session, None, await select_card_references(session, table, res))
             await insert_into_outbox(
                 payload={
                     "action": "insert",
                     "entity": table.__tablename__,
-                    "fields": dict(**data)
+                    "fields": jsonable_fields(data)
                 },
                 queue=queue_name,
                 session=session
             )
             await session.commit()
+            bump_catalog_version()
             return res
     except (IntegrityError, asyncpg.exceptions.UniqueViolationError) as exc:
         logger.warning(f"Нарушение целостности данных: {exc}")
@@ -253,6 +271,7 @@ async def create_row(
         return False
 
 
+@instrument_db_helper
 async def delete_row(
     row_id: int,
     table: BaseTable,
@@ -264,6 +283,7 @@ async def delete_row(
 
     Функция:
     - Формирует запрос на удаление записи с заданным row_id;
+    - Для карточки уменьшает счетчики карточек ее категории и компании;
     - Выполняет запрос и коммитит изменения в базу данных;
     - Логирует ошибки и возвращает текст ошибки при неудаче.
 
@@ -277,8 +297,10 @@ async def delete_row(
     """
     try:
         async with session.begin():
+            old: Row | None = await select_card_references(session, table, row_id)
             stmt: Delete = delete(table).where(table.id == row_id)
             await session.execute(stmt)
+            await adjust_card_counters(session, old, None)
             await insert_into_outbox(
                 payload={
                     "action": "delete",
@@ -291,6 +313,7 @@ async def delete_row(
                 session=session
             )
             await session.commit()
+            bump_catalog_version()
             return True
     except (IntegrityError, asyncpg.exceptions.UniqueViolationError) as exc:
         logger.error(f"Нарушение целостности данных: {exc}")
@@ -0,0 +1,257 @@
+"""
+Быстрый путь для горячих запросов каталога клиентской части.
+
+Запросы строятся один раз при импорте модуля, а значения передаются через явные `bindparam`.
+Ключ кеша готового выражения SQLAlchemy вычисляет один раз и затем берет скомпилированный SQL из кеша,
+поэтому на каждом вызове не строится новый `select()` и не обходится дерево выражения
+(`lambda_stmt` с аргументами из замыкания, напротив, копирует выражение на каждом вызове).
+asyncpg, в свою очередь, держит подготовленные выражения в кеше соединения пула.
+
+Сами запросы описаны один раз в `specific_select` (`build_*_select`): построители вызываются
+с `bindparam` вместо значений.
+
+Результат возвращается в виде `Row` без преобразования в `dict`: шаблоны Jinja обращаются
+к полям через атрибуты (`card.main_label`), которые `Row` поддерживает напрямую.
+"""
+from loguru import logger
+from sqlalchemy import Row, bindparam, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+from sqlalchemy.exc import (
+    SQLAlchemyError,
+    OperationalError
+)
+
+from ..metrics import instrument_db_helper
+from ..models import (
+    DEFAULT_TENANT_ID,
+    CardsTable,
+    active_card_condition
+)
+from .outbox import record_select_in_outbox
+from .specific_select import (
+    build_categories_select,
+    build_cards_in_category_select,
+    build_card_info_select
+)
+
+
+CATEGORIES_SELECT: Select = build_categories_select(bindparam("tenant_id"))
+"Запрос непустых категорий арендатора. Параметры: `tenant_id`"
+
+CARDS_IN_CATEGORY_SELECT: Select = build_cards_in_category_select(bindparam("category_id"), bindparam("tenant_id"))
+"Запрос действующих карточек категории из read model `card_summaries`. Параметры: `category_id`, `tenant_id`"
+
+CARD_INFO_SELECT: Select = build_card_info_select(bindparam("card_id"), bindparam("tenant_id"))
+"Запрос полей действующей карточки для модального окна. Параметры: `card_id`, `tenant_id`"
+
+CARD_LINK_SELECT: Select = select(CardsTable.call_to_action_link).where(
+    CardsTable.tenant_id == bindparam("tenant_id"),
+    CardsTable.id == bindparam("card_id"),
+    active_card_condition(CardsTable.valid_from, CardsTable.valid_to, func.now())
+)
+"Запрос ссылки кнопки (`call_to_action_link`) действующей карточки. Параметры: `card_id`, `tenant_id`"
+
+
+@instrument_db_helper
+async def get_all_categories_fast(
+    session: AsyncSession,
+    queue_name: str,
+    outbox_session: AsyncSession | None = None,
+    tenant_id: int = DEFAULT_TENANT_ID
+) -> list[Row]:
+    """
+    Быстрый вариант `get_all_categories`: готовый запрос и строки без преобразования в словари.
+
+    Args:
+        session (AsyncSession): Асинхронная сессия SQLAlchemy для работы с базой данных.
+        queue_name (str): Имя очереди, в которую будет отправлено сообщение о запросе.
+        outbox_session (AsyncSession | None): Сессия основной бд для записи в outbox,
+            если `session` открыта на реплике. По умолчанию запись идет через `session`.
+        tenant_id (int): Идентификатор арендатора (`web.dependencies.resolve_tenant`).
+
+    Returns:
+        list[Row]: Строки непустых категорий с полями `id`, `name`, `cards_count`. Пустой список при ошибке.
+    """
+    try:
+        async with session.begin():
+            result = await session.execute(CATEGORIES_SELECT, {"tenant_id": tenant_id})
+            await record_select_in_outbox(
+                payload={
+                    "action": "select",
+                    "entity": "categories",
+                    "fields": ["id", "name", "cards_count"],
+                    "filters": [
+                        {"column": "tenant_id", "operator": "=", "value": tenant_id},
+                        {"column": "cards_count", "operator": ">", "value": 0}
+                    ]
+                },
+                queue_name=queue_name,
+                session=session,
+                outbox_session=outbox_session
+            )
+            return result.all()
+    except OperationalError as exc:
+        logger.error(f"Ошибка подключения к БД: {exc}")
+        return []
+
+    except SQLAlchemyError as exc:
+        logger.error(f"Ошибка SQLAlchemy при выполнении запроса: {exc}")
+        return []
+
+    except Exception as exc:
+        logger.error(f"Неожиданная ошибка при получении категорий: {exc}")
+        return []
+
+
+@instrument_db_helper
+async def get_all_cards_in_category_fast(
+    category_id: int,
+    session: AsyncSession,
+    queue_name: str,
+    outbox_session: AsyncSession | None = None,
+    tenant_id: int = DEFAULT_TENANT_ID
+) -> list[Row]:
+    """
+    Быстрый вариант `get_all_cards_in_category_with_short_description`.
+
+    Args:
+        category_id (int): Идентификатор категории (`categories.id`).
+        session (AsyncSession): Асинхронная сессия SQLAlchemy для работы с базой данных.
+        queue_name (str): Имя очереди, в которую будет отправлено сообщение о запросе.
+        outbox_session (AsyncSession | None): Сессия основной бд для записи в outbox,
+            если `session` открыта на реплике. По умолчанию запись идет через `session`.
+        tenant_id (int): Идентификатор арендатора (`web.dependencies.resolve_tenant`).
+
+    Returns:
+        list[Row]: Строки с полями `id`, `main_label`, `description_under_label`,
+            `company_name`, `company_short_description`. Пустой список при ошибке.
+    """
+    try:
+        async with session.begin():
+            result = await session.execute(
+                CARDS_IN_CATEGORY_SELECT, {"category_id": category_id, "tenant_id": tenant_id}
+            )
+            await record_select_in_outbox(
+                payload={
+                    "action": "select",
+                    "entity": "cards",
+                    "filters": [
+                        {"column": "tenant_id", "operator": "=", "value": tenant_id},
+                        {"column": "category_id", "operator": "=", "value": category_id}
+                    ],
+                    "fields": ["id", "main_label", "description_under_label", "image"],
+                    "joined_entities": {
+                        "companies": ["name", "short_description", "logo"]
+                    }
+                },
+                queue_name=queue_name,
+                session=session,
+                outbox_session=outbox_session
+            )
+            return result.all()
+    except OperationalError as exc:
+        logger.error(f"Ошибка подключения к БД: {exc}")
+        return []
+
+    except SQLAlchemyError as exc:
+        logger.error(f"Ошибка SQLAlchemy при выполнении запроса: {exc}")
+        return []
+
+    except Exception as exc:
+        logger.error(f"Неожиданная ошибка при получении карточек: {exc}")
+        return []
+
+
+@instrument_db_helper
+async def get_card_info_fast(
+    card_id: int,
+    session: AsyncSession,
+    queue_name: str,
+    outbox_session: AsyncSession | None = None,
+    tenant_id: int = DEFAULT_TENANT_ID
+) -> Row | None:
+    """
+    Быстрый вариант `get_card_info_by_card_id`.
+
+    Args:
+        card_id (int): Идентификатор карточки (`cards.id`).
+        session (AsyncSession): Асинхронная сессия SQLAlchemy для работы с базой данных.
+        queue_name (str): Имя очереди, в которую будет отправлено сообщение о запросе.
+        outbox_session (AsyncSession | None): Сессия основной бд для записи в outbox,
+            если `session` открыта на реплике. По умолчанию запись идет через `session`.
+        tenant_id (int): Идентификатор арендатора (`web.dependencies.resolve_tenant`).
+
+    Returns:
+        Row | None: Строка с полями карточки для модального окна.
+        `None`, если карточка не найдена или произошла ошибка.
+    """
+    try:
+        async with session.begin():
+            result = await session.execute(CARD_INFO_SELECT, {"card_id": card_id, "tenant_id": tenant_id})
+            await record_select_in_outbox(
+                payload={
+                    "action": "select",
+                    "entity": "cards",
+                    "filters": [
+                        {"column": "tenant_id", "operator": "=", "value": tenant_id},
+                        {"column": "id", "operator": "=", "value": card_id}
+                    ],
+                    "fields": [
+                        "main_label", "description_under_label", "obtain_method_description",
+                        "validity_period", "about_partner", "promocode", "call_to_action_link",
+                        "call_to_action_btn_label", "image"
+                    ]
+                },
+                queue_name=queue_name,
+                session=session,
+                outbox_session=outbox_session
+            )
+            return result.first()
+    except OperationalError as exc:
+        logger.error(f"Ошибка подключения к БД: {exc}")
+        return None
+
+    except SQLAlchemyError as exc:
+        logger.error(f"Ошибка SQLAlchemy при выполнении запроса: {exc}")
+        return None
+
+    except Exception as exc:
+        logger.error(f"Неожиданная ошибка при получении карточки: {exc}")
+        return None
+
+
+@instrument_db_helper
+async def get_card_link_fast(
+    card_id: int,
+    session: AsyncSession,
+    tenant_id: int = DEFAULT_TENANT_ID
+) -> str | None:
+    """
+    Возвращает ссылку кнопки действующей карточки для перехода по ней.
+    Переход - частое событие, поэтому запрос читает один столбец и не записывает сообщение в outbox:
+    переходы учитываются в памяти воркера (`core.card_stats`).
+
+    Args:
+        card_id (int): Идентификатор карточки (`cards.id`).
+        session (AsyncSession): Асинхронная сессия SQLAlchemy для работы с базой данных.
+        tenant_id (int): Идентификатор арендатора (`web.dependencies.resolve_tenant`).
+
+    Returns:
+        str | None: Ссылка карточки. `None`, если карточка не найдена, не действует, у нее нет ссылки
+            или произошла ошибка.
+    """
+    try:
+        async with session.begin():
+            return await session.scalar(CARD_LINK_SELECT, {"card_id": card_id, "tenant_id": tenant_id})
+    except OperationalError as exc:
+        logger.error(f"Ошибка подключения к БД: {exc}")
+        return None
+
+    except SQLAlchemyError as exc:
+        logger.error(f"Ошибка SQLAlchemy при выполнении запроса: {exc}")
+        return None
+
+    except Exception as exc:
+        logger.error(f"Неожиданная ошибка при получении ссылки карточки: {exc}")
+        return None
@@ -1,9 +1,11 @@
 import asyncpg
 
 from datetime import datetime
+from typing import Any
 
 from loguru import logger
-from sqlalchemy import insert, select, update
+from sqlalchemy import BigInteger, any_, bindparam, func, insert, literal, select, text, update
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import Insert, Select, Update
 from sqlalchemy.exc import (
@@ -14,9 +16,42 @@ from sqlalchemy.exc import (
 )
 
 from ..core_types import OutBoxStatuses
-from ..models import OutboxTable
+from ..metrics import OUTBOX_ROWS_INSERTED, instrument_db_helper
+from ..models import OUTBOX_PENDING_CONDITION, OutboxTable
+from ..tracing import stamp_payload
 
 
+PENDING_QUEUES_SQL: str = f"""
+WITH RECURSIVE queues(queue) AS (
+    (SELECT queue FROM {OutboxTable.__table__.fullname} WHERE {OUTBOX_PENDING_CONDITION} ORDER BY queue LIMIT 1)
+    UNION ALL
+    SELECT (
+        SELECT outbox.queue FROM {OutboxTable.__table__.fullname} AS outbox
+        WHERE {OUTBOX_PENDING_CONDITION} AND outbox.queue > queues.queue ORDER BY outbox.queue LIMIT 1
+    )
+    FROM queues WHERE queues.queue IS NOT NULL
+)
+SELECT queue FROM queues WHERE queue IS NOT NULL
+"""
+"""Очереди с ожидающими сообщениями. Рекурсивный запрос переходит по индексу `ix_outbox_pending_queue_created_at`
+от очереди к следующей, поэтому читает по одной записи индекса на очередь, а не все ожидающие сообщения"""
+
+
+def jsonable_fields(data: dict[str, Any]) -> dict[str, Any]:
+    """
+    Копирует значения столбцов для поля `fields` payload outbox, приводя даты к строкам ISO 8601
+    (payload хранится в JSON).
+
+    Args:
+        data (dict[str, Any]): Ключ - имя столбца, значение - значение столбца
+
+    Returns:
+        dict[str, Any]: Значения, которые можно сериализовать в JSON.
+    """
+    return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in data.items()}
+
+
+@instrument_db_helper
 async def insert_into_outbox(
     payload: dict,
     queue: str,
@@ -24,7 +59,8 @@ async def insert_into_outbox(
     status: OutBoxStatuses = OutBoxStatuses.PENDING
 ) -> bool:
     """
-    Добавляет запись в outbox с данными payload
+    Добавляет запись в outbox с данными payload.
+    Внутри трассируемого запроса админки в payload добавляется трасса (`core.tracing.stamp_payload`)
     Args:
         payload (dict): передаваемые данные между сервисами
         queue (str): Имя очереди в которое будет отправлено сообщение
@@ -33,8 +69,10 @@ async def insert_into_outbox(
     """
     try:
         payload["executed_at"] = datetime.now().isoformat()
+        stamp_payload(payload)
         stmt: Insert = insert(OutboxTable).values(payload=payload, queue=queue, status=status)
         await session.execute(stmt)
+        OUTBOX_ROWS_INSERTED.inc(str(payload.get("entity")), str(payload.get("action")))
         logger.debug("Запись в outbox успешна!")
         return True
     except (IntegrityError, asyncpg.exceptions.UniqueViolationError) as exc:
@@ -58,6 +96,35 @@ async def insert_into_outbox(
         return False
 
 
+@instrument_db_helper
+async def record_select_in_outbox(
+    payload: dict[str, Any],
+    queue_name: str,
+    session: AsyncSession,
+    outbox_session: AsyncSession | None
+) -> bool:
+    """
+    Записывает в outbox сообщение о выполненном запросе на чтение.
+
+    Если передана `outbox_session`, запись выполняется в ее собственной транзакции
+    (чтение при этом может идти через реплику, а запись - только в основную бд).
+
+    Args:
+        payload (dict[str, Any]): Данные сообщения
+        queue_name (str): Имя очереди, в которую будет отправлено сообщение
+        session (AsyncSession): Сессия, через которую выполнялось чтение (с открытой транзакцией)
+        outbox_session (AsyncSession | None): Сессия основной бд для записи в outbox
+
+    Returns:
+        bool: Результат `insert_into_outbox`.
+    """
+    if outbox_session is None:
+        return await insert_into_outbox(payload=payload, queue=queue_name, session=session)
+    async with outbox_session.begin():
+        return await insert_into_outbox(payload=payload, queue=queue_name, session=outbox_session)
+
+
+@instrument_db_helper
 async def get_last_pending_messages_from_outbox(
     session: AsyncSession
 ) -> list[OutboxTable]:
@@ -92,6 +159,113 @@ async def get_last_pending_messages_from_outbox(
         return []
 
 
+@instrument_db_helper
+async def get_pending_outbox_queues(session: AsyncSession) -> list[str]:
+    """
+    Возвращает очереди, в которые есть ожидающие отправки сообщения outbox (`PENDING_QUEUES_SQL`).
+
+    Args:
+        session (AsyncSession): Асинхронная сессия SQLAlchemy для работы с базой данных
+
+    Returns:
+        list[str]: Имена очередей по алфавиту или пустой список при ошибке.
+    """
+    try:
+        return list(await session.scalars(text(PENDING_QUEUES_SQL)))
+    except OperationalError as exc:
+        logger.error(f"Ошибка подключения к БД: {exc}")
+        return []
+
+    except SQLAlchemyError as exc:
+        logger.error(f"Ошибка SQLAlchemy при выполнении запроса: {exc}")
+        return []
+
+    except Exception as exc:
+        logger.error(f"Неожиданная ошибка при получении очередей outbox: {exc}")
+        return []
+
+
+@instrument_db_helper
+async def get_pending_messages_from_outbox_queue(
+    session: AsyncSession,
+    queue: str,
+    limit: int
+) -> list[OutboxTable]:
+    """
+    Извлекает из `outbox` не больше `limit` самых ранних ожидающих сообщений очереди `queue`
+    по индексу `ix_outbox_pending_queue_created_at`.
+
+    Args:
+        session (AsyncSession): Асинхронная сессия SQLAlchemy для работы с базой данных
+        queue (str): Имя очереди
+        limit (int): Размер пачки
+
+    Returns:
+        list[OutboxTable]: Сообщения в порядке создания или пустой список при ошибке.
+    """
+    try:
+        stmt: Select = select(OutboxTable
+                       ).where(text(OUTBOX_PENDING_CONDITION), OutboxTable.queue == queue
+                       ).order_by(OutboxTable.created_at, OutboxTable.id
+                       ).limit(limit)
+        return list(await session.scalars(stmt))
+    except OperationalError as exc:
+        logger.error(f"Ошибка подключения к БД: {exc}")
+        return []
+
+    except SQLAlchemyError as exc:
+        logger.error(f"Ошибка SQLAlchemy при выполнении запроса: {exc}")
+        return []
+
+    except Exception as exc:
+        logger.error(f"Неожиданная ошибка при получении сообщений очереди {queue}: {exc}")
+        return []
+
+
+@instrument_db_helper
+async def get_outbox_backlog(
+    session: AsyncSession,
+    count_limit: int
+) -> tuple[int, datetime | None]:
+    """
+    Возвращает размер очереди `outbox`, ожидающей отправки, и дату самого старого ожидающего сообщения.
+
+    Оба запроса идут по частичному индексу `ix_outbox_pending_created_at`: количество считается
+    не дальше `count_limit` строк, а самое старое сообщение - первая запись индекса.
+    Поэтому запросы дешевые при любом размере таблицы и их можно выполнять на каждом цикле.
+
+    Args:
+        session (AsyncSession): Асинхронная сессия SQLAlchemy для работы с базой данных
+        count_limit (int): Верхняя граница подсчета. Если ожидающих больше, возвращается `count_limit`
+
+    Returns:
+        tuple[int, datetime | None]: Количество ожидающих сообщений и дата самого старого из них
+        (`None`, если ожидающих нет). `(0, None)` при ошибке.
+    """
+    try:
+        pending = select(literal(1)).select_from(OutboxTable
+                  ).where(text(OUTBOX_PENDING_CONDITION)
+                  ).limit(count_limit
+                  ).subquery()
+        pending_count: int = await session.scalar(select(func.count()).select_from(pending))
+        oldest_created_at: datetime | None = await session.scalar(
+            select(func.min(OutboxTable.created_at)).where(text(OUTBOX_PENDING_CONDITION))
+        )
+        return pending_count, oldest_created_at
+    except OperationalError as exc:
+        logger.error(f"Ошибка подключения к БД: {exc}")
+        return 0, None
+
+    except SQLAlchemyError as exc:
+        logger.error(f"Ошибка SQLAlchemy при выполнении запроса: {exc}")
+        return 0, None
+
+    except Exception as exc:
+        logger.error(f"Неожиданная ошибка при получении размера очереди outbox: {exc}")
+        return 0, None
+
+
+@instrument_db_helper
 async def set_status_of_outbox_row(
     row_id: int,
     status: OutBoxStatuses,
@@ -135,3 +309,45 @@ async def set_status_of_outbox_row(
         logger.error(f"Неожиданная ошибка при обновлении {row_id}: {exc}")
         return False
 
+
+@instrument_db_helper
+async def set_status_of_outbox_rows(
+    row_ids: list[int],
+    status: OutBoxStatuses,
+    session: AsyncSession
+) -> bool:
+    """
+    Присваивает записям из `outbox` новый статус одним запросом и фиксирует транзакцию.
+
+    Args:
+        row_ids (list[int]): Идентификаторы записей
+        status (OutboxStatuses): Значение из перечисления `OutboxStatuses`
+        session (AsyncSession): Асинхронная сессия SQLAlchemy для работы с базой данных
+
+    Returns:
+        bool: `True` если ошибок при обновлении не возникло, иначе `False`.
+    """
+    if not row_ids:
+        return True
+    try:
+        stmt: Update = update(OutboxTable
+                    ).values(status=status
+                    ).where(OutboxTable.id == any_(bindparam("row_ids", row_ids, type_=ARRAY(BigInteger)))
+        )
+        await session.execute(stmt)
+        await session.commit()
+        return True
+    except OperationalError as exc:
+        await session.rollback()
+        logger.error(f"Ошибка подключения к БД при обновлении {len(row_ids)} записей: {exc}")
+        return False
+
+    except SQLAlchemyError as exc:
+        await session.rollback()
+        logger.error(f"Ошибка SQLAlchemy при обновлении {len(row_ids)} записей: {exc}")
+        return False
+
+    except Exception as exc:
+        await session.rollback()
+        logger.error(f"Неожиданная ошибка при обновлении {len(row_ids)} записей: {exc}")
+        return False
@@ -0,0 +1,220 @@
+"""
+Пулы одноразовых промокодов карточек (`promo_codes`).
+
+Пул загружается через COPY во временную таблицу и одну вставку `INSERT ... SELECT ... ON CONFLICT DO NOTHING`,
+поэтому сотни тысяч промокодов загружаются за одно выражение, а повторная загрузка того же файла
+не создает дубликатов.
+
+Промокод выдается одним выражением `UPDATE ... WHERE id = (SELECT ... FOR UPDATE SKIP LOCKED)`:
+одновременные запросы не ждут друг друга на одной строке, а пропускают строки, заблокированные другими
+транзакциями, и забирают следующие. Невыданные промокоды находятся по частичному индексу
+`ix_promo_codes_unused`, а уникальный индекс `(card_id, issued_to)` не дает выдать посетителю два промокода,
+даже если его запросы пришли одновременно.
+
+События outbox о выдаче не пишутся на каждый промокод, а накапливаются в процессе
+и записываются одной строкой за интервал (`core.promo_events.PromoIssueEvents`).
+"""
+from loguru import logger
+from sqlalchemy import Row, column, func, lambda_stmt, literal, select, table, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import StatementLambdaElement, TableClause
+from sqlalchemy.exc import (
+    SQLAlchemyError,
+    OperationalError,
+    IntegrityError,
+    DBAPIError
+)
+
+from ..metrics import instrument_db_helper
+from ..models import DEFAULT_TENANT_ID, CardsTable, PromoCodesTable, active_card_condition
+from .outbox import insert_into_outbox
+
+
+PROMO_CODES_LOAD_TABLE: TableClause = table("promo_codes_load", column("code"), schema="pg_temp")
+"""Временная таблица загрузки пула. Схема `pg_temp` указана явно, чтобы `schema_translate_map`
+арендатора не переводил ее в схему каталога"""
+
+
+def claim_promo_code_lambda_stmt(card_id: int, visitor_id: str) -> StatementLambdaElement:
+    """
+    Кешируемое выражение выдачи первого свободного промокода карточки посетителю.
+    Заблокированные другими транзакциями строки пропускаются (`SKIP LOCKED`), поэтому одновременные
+    выдачи одной карточки не выстраиваются в очередь за одной строкой. Сортировка `(issued_at, id)`
+    совпадает с ключом частичного индекса `ix_promo_codes_unused` - см. комментарий в `PromoCodesTable`.
+
+    Args:
+        card_id (int): Идентификатор карточки (`cards.id`), передается как параметр запроса.
+        visitor_id (str): Идентификатор посетителя, передается как параметр запроса.
+
+    Returns:
+        StatementLambdaElement: Лямбда-выражение `UPDATE ... RETURNING code`.
+    """
+    return lambda_stmt(
+        lambda: update(PromoCodesTable).values(issued_to=visitor_id, issued_at=func.now()).where(
+            PromoCodesTable.id == select(PromoCodesTable.id).where(
+                PromoCodesTable.card_id == card_id, PromoCodesTable.issued_at.is_(None)
+            ).order_by(
+                PromoCodesTable.issued_at, PromoCodesTable.id
+            ).limit(1).with_for_update(skip_locked=True).scalar_subquery()
+        ).returning(PromoCodesTable.code)
+    )
+
+
+def visitor_promo_code_lambda_stmt(
+    card_id: int,
+    visitor_id: str,
+    tenant_id: int = DEFAULT_TENANT_ID
+) -> StatementLambdaElement:
+    """
+    Кешируемый запрос действующей карточки арендатора и промокода, уже выданного посетителю
+    (`NULL`, если не выдан). Нет строки - карточки нет, она другого арендатора или не действует.
+    """
+    return lambda_stmt(
+        lambda: select(
+            CardsTable.id,
+            select(PromoCodesTable.code).where(
+                PromoCodesTable.card_id == card_id, PromoCodesTable.issued_to == visitor_id
+            ).scalar_subquery().label("code")
+        ).where(
+            CardsTable.tenant_id == tenant_id,
+            CardsTable.id == card_id,
+            active_card_condition(CardsTable.valid_from, CardsTable.valid_to, func.now())
+        )
+    )
+
+
+@instrument_db_helper
+async def claim_promo_code(
+    card_id: int,
+    visitor_id: str,
+    session: AsyncSession,
+    tenant_id: int = DEFAULT_TENANT_ID
+) -> tuple[str, bool] | None:
+    """
+    Выдает посетителю одноразовый промокод карточки. Повторный запрос того же посетителя
+    возвращает уже выданный ему промокод.
+
+    Args:
+        card_id (int): Идентификатор карточки (`cards.id`).
+        visitor_id (str): Идентификатор посетителя (cookie `visitor_id`).
+        session (AsyncSession): Асинхронная сессия SQLAlchemy с основной бд без открытой транзакции.
+        tenant_id (int): Идентификатор арендатора (`web.dependencies.resolve_tenant`).
+
+    Returns:
+        tuple[str, bool] | None: Промокод и признак того, что он выдан этим вызовом (`False` - выдан раньше).
+            `None`, если карточка не действует, пул исчерпан или произошла ошибка.
+    """
+    try:
+        try:
+            async with session.begin():
+                card: Row | None = (await session.execute(
+                    visitor_promo_code_lambda_stmt(card_id, visitor_id, tenant_id)
+                )).first()
+                if card is None:
+                    return None
+                if card.code is not None:
+                    return card.code, False
+                code: str | None = await session.scalar(claim_promo_code_lambda_stmt(card_id, visitor_id))
+                return None if code is None else (code, True)
+        except IntegrityError:
+            # Одновременный запрос того же посетителя уже получил промокод
+            async with session.begin():
+                code = await session.scalar(
+                    select(PromoCodesTable.code).where(
+                        PromoCodesTable.card_id == card_id, PromoCodesTable.issued_to == visitor_id
+                    )
+                )
+                return None if code is None else (code, False)
+    except OperationalError as exc:
+        logger.error(f"Ошибка подключения к БД: {exc}")
+        return None
+
+    except DBAPIError as exc:
+        logger.error(f"Ошибка драйвера БД при выдаче промокода: {exc}")
+        return None
+
+    except SQLAlchemyError as exc:
+        logger.error(f"Ошибка SQLAlchemy при выполнении запроса: {exc}")
+        return None
+
+    except Exception as exc:
+        logger.error(f"Неожиданная ошибка при выдаче промокода: {exc}")
+        return None
+
+
+@instrument_db_helper
+async def load_promo_codes(
+    card_id: int,
+    codes: list[str],
+    session: AsyncSession,
+    queue_name: str
+) -> int | None:
+    """
+    Загружает промокоды в пул карточки через COPY. Промокоды, уже находящиеся в пуле, пропускаются.
+
+    Args:
+        card_id (int): Идентификатор карточки (`cards.id`).
+        codes (list[str]): Промокоды в порядке выдачи.
+        session (AsyncSession): Асинхронная сессия SQLAlchemy с основной бд без открытой транзакции.
+        queue_name (str): Имя очереди, в которую будет отправлено сообщение о загрузке.
+
+    Returns:
+        int | None: Количество добавленных промокодов или `None` при ошибке (например, карточки нет).
+    """
+    try:
+        async with session.begin():
+            await session.execute(text(
+                f"CREATE TEMP TABLE {PROMO_CODES_LOAD_TABLE.name} (code text NOT NULL) ON COMMIT DROP"
+            ))
+            raw_connection = await (await session.connection()).get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(
+                PROMO_CODES_LOAD_TABLE.name,
+                records=[(code,) for code in codes],
+                columns=["code"],
+                schema_name=PROMO_CODES_LOAD_TABLE.schema
+            )
+            result = await session.execute(
+                insert(PromoCodesTable).from_select(
+                    ["card_id", "code"],
+                    select(literal(card_id, PromoCodesTable.card_id.type), PROMO_CODES_LOAD_TABLE.c.code)
+                ).on_conflict_do_nothing()
+            )
+            await insert_into_outbox(
+                payload={
+                    "action": "insert",
+                    "entity": PromoCodesTable.__tablename__,
+                    "fields": {"card_id": card_id, "count": result.rowcount}
+                },
+                queue=queue_name,
+                session=session
+            )
+            return result.rowcount
+    except IntegrityError as exc:
+        logger.warning(f"Пул промокодов не загружен: {exc}")
+        return None
+
+    except OperationalError as exc:
+        logger.error(f"Ошибка подключения к БД: {exc}")
+        return None
+
+    except SQLAlchemyError as exc:
+        logger.error(f"Ошибка SQLAlchemy при выполнении запроса: {exc}")
+        return None
+
+    except Exception as exc:
+        logger.error(f"Неожиданная ошибка при загрузке промокодов: {exc}")
+        return None
+
+
+@instrument_db_helper
+async def count_available_promo_codes(card_id: int, session: AsyncSession) -> int:
+    "Количество невыданных промокодов карточки. Считается по частичному индексу `ix_promo_codes_unused`"
+    try:
+        async with session.begin():
+            return await session.scalar(
+                select(func.count()).where(PromoCodesTable.card_id == card_id, PromoCodesTable.issued_at.is_(None))
+            )
+    except Exception as exc:
+        logger.error(f"Ошибка при подсчете промокодов: {exc}")
+        return 0
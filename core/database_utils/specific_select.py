@@ -1,6 +1,6 @@
 from loguru import logger
 from typing import Any
-from sqlalchemy import select
+from sqlalchemy import RowMapping, any_, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import Select
 from sqlalchemy.exc import (
@@ -8,20 +8,160 @@ from sqlalchemy.exc import (
     OperationalError
 )
 
+from ..cache import SEARCH_CACHE, CatalogCache, get_catalog_version
+from ..metrics import instrument_db_helper
 from ..models import (
+    DEFAULT_TENANT_ID,
+    CardSummariesTable,
     CategoriesTable,
     CompaniesTable,
-    CardsTable
+    CardsTable,
+    active_card_condition
 )
-from .outbox import insert_into_outbox
+from .outbox import record_select_in_outbox
 
 
+SEARCH_RESULTS_LIMIT: int = 50
+"Максимальное количество карточек в результатах поиска"
+
+
+def build_categories_select(tenant_id: int = DEFAULT_TENANT_ID) -> Select:
+    """
+    Формирует запрос на получение непустых категорий арендатора (`id`, `name`, `cards_count`).
+    Количество карточек берется из счетчика `cards_count`, без группировки карточек.
+
+    Args:
+        tenant_id (int): Идентификатор арендатора.
+
+    Returns:
+        Select: Запрос SQLAlchemy к таблице категорий.
+    """
+    return select(CategoriesTable.id, CategoriesTable.name, CategoriesTable.cards_count
+        ).where(CategoriesTable.tenant_id == tenant_id, CategoriesTable.cards_count > 0
+    )
+
+
+def build_cards_in_category_select(category_id: int, tenant_id: int = DEFAULT_TENANT_ID) -> Select:
+    """
+    Формирует запрос на получение действующих карточек категории с краткой информацией о компании.
+
+    Args:
+        category_id (int): Идентификатор категории (`categories.id`).
+        tenant_id (int): Идентификатор арендатора.
+
+    Returns:
+        Select: Запрос SQLAlchemy к read model `card_summaries`, упорядоченный по идентификатору карточки.
+    """
+    return select(
+            CardSummariesTable.card_id.label("id"),
+            CardSummariesTable.main_label,
+            CardSummariesTable.description_under_label,
+            CardSummariesTable.company_name,
+            CardSummariesTable.company_short_description,
+            CardSummariesTable.image,
+            CardSummariesTable.company_logo
+        ).where(
+            CardSummariesTable.tenant_id == tenant_id,
+            CardSummariesTable.category_id == category_id,
+            active_card_condition(CardSummariesTable.valid_from, CardSummariesTable.valid_to, func.now())
+        ).order_by(CardSummariesTable.card_id
+    )
+
+
+def build_card_info_select(card_id: int, tenant_id: int = DEFAULT_TENANT_ID) -> Select:
+    """
+    Формирует запрос на получение полей действующей карточки арендатора для модального окна.
+
+    Args:
+        card_id (int): Идентификатор карточки (`cards.id`).
+        tenant_id (int): Идентификатор арендатора.
+
+    Returns:
+        Select: Запрос SQLAlchemy к таблице карточек.
+    """
+    return select(
+            CardsTable.main_label,
+            CardsTable.description_under_label,
+            CardsTable.obtain_method_description,
+            CardsTable.validity_period,
+            CardsTable.about_partner,
+            CardsTable.promocode,
+            CardsTable.call_to_action_link,
+            CardsTable.call_to_action_btn_label,
+            CardsTable.image
+        ).where(
+            CardsTable.tenant_id == tenant_id,
+            CardsTable.id == card_id,
+            active_card_condition(CardsTable.valid_from, CardsTable.valid_to, func.now())
+        )
+
+
+def build_cards_search_select(query: str, limit: int, tenant_id: int = DEFAULT_TENANT_ID) -> Select:
+    """
+    Формирует запрос полнотекстового поиска действующих карточек арендатора с ранжированием.
+
+    Карточка подходит, если запрос совпал с `cards.search_vector` или с `companies.search_vector`
+    ее компании. Идентификаторы подходящих компаний вычисляются один раз (InitPlan), поэтому
+    обе ветки условия выполняются по индексам `cards` (GIN по `search_vector` и btree по `company_id`)
+    и объединяются через BitmapOr без полного просмотра таблицы.
+    Релевантность вычисляется для всех подходящих карточек, поэтому в результат попадают `limit`
+    карточек с наибольшим рангом. Для частых слов это дороже, но повторные запросы отдаются из `SEARCH_CACHE`.
+
+    Args:
+        query (str): Поисковый запрос в синтаксисе `websearch_to_tsquery`
+        limit (int): Максимальное количество карточек
+        tenant_id (int): Идентификатор арендатора
+
+    Returns:
+        Select: Запрос SQLAlchemy с полями карточки, компании и рангом (`rank`).
+    """
+    ts_query = func.websearch_to_tsquery("russian", query)
+    matched_companies = func.array(
+        select(CompaniesTable.id).where(
+            CompaniesTable.tenant_id == tenant_id, CompaniesTable.search_vector.op("@@")(ts_query)
+        ).scalar_subquery()
+    )
+    candidates = select(
+            CardsTable.id,
+            CardsTable.company_id,
+            CardsTable.main_label,
+            CardsTable.description_under_label,
+            CardsTable.image,
+            CardsTable.search_vector
+        ).where(
+            CardsTable.tenant_id == tenant_id,
+            or_(
+                CardsTable.search_vector.op("@@")(ts_query),
+                CardsTable.company_id == any_(matched_companies)
+            ),
+            active_card_condition(CardsTable.valid_from, CardsTable.valid_to, func.now())
+        ).subquery("candidates")
+    rank = (func.ts_rank(candidates.c.search_vector, ts_query)
+            + func.ts_rank(CompaniesTable.search_vector, ts_query))
+
+    return select(
+            candidates.c.id,
+            candidates.c.main_label,
+            candidates.c.description_under_label,
+            CompaniesTable.name.label("company_name"),
+            CompaniesTable.short_description.label("company_short_description"),
+            candidates.c.image,
+            CompaniesTable.logo.label("company_logo"),
+            rank.label("rank")
+        ).join(CompaniesTable, CompaniesTable.id == candidates.c.company_id
+        ).order_by(rank.desc(), candidates.c.id
+        ).limit(limit)
+
+
+@instrument_db_helper
 async def get_all_categories(
     session: AsyncSession,
-    queue_name: str
+    queue_name: str,
+    outbox_session: AsyncSession | None = None,
+    tenant_id: int = DEFAULT_TENANT_ID
 ) -> list[dict[str, Any]]:
     """
-    Извлекает все категории из базы данных и возвращает их в виде списка словарей.
+    Извлекает непустые категории из базы данных и возвращает их в виде списка словарей.
 
     Функция:
     - Выполняет асинхронный SQL-запрос к таблице категорий;
@@ -30,22 +170,31 @@ async def get_all_categories(
 
     Args:
         session (AsyncSession): Асинхронная сессия SQLAlchemy для работы с базой данных.
+        queue_name (str): Имя очереди, в которую будет отправлено сообщение о запросе.
+        outbox_session (AsyncSession | None): Сессия основной бд для записи в outbox,
+            если `session` открыта на реплике. По умолчанию запись идет через `session`.
+        tenant_id (int): Идентификатор арендатора (`web.dependencies.resolve_tenant`).
 
     Returns:
-        list(dict[str, Any]): Список словарей с ключами (`id`, `name`), значения — данные категорий.
+        list(dict[str, Any]): Список словарей с ключами (`id`, `name`, `cards_count`), значения — данные категорий.
     """
     try:
         async with session.begin():
-            stmt: Select = select(CategoriesTable.id, CategoriesTable.name)
+            stmt: Select = build_categories_select(tenant_id)
             result = await session.execute(stmt)
-            await insert_into_outbox(
+            await record_select_in_outbox(
                 payload={
                     "action": "select",
                     "entity": "categories",
-                    "fields": ["id", "name"]
+                    "fields": ["id", "name", "cards_count"],
+                    "filters": [
+                        {"column": "tenant_id", "operator": "=", "value": tenant_id},
+                        {"column": "cards_count", "operator": ">", "value": 0}
+                    ]
                 },
-                queue=queue_name,
-                session=session
+                queue_name=queue_name,
+                session=session,
+                outbox_session=outbox_session
             )
             return [dict(res) for res in result.mappings()]
     except OperationalError as exc:
@@ -65,10 +214,13 @@ async def get_all_categories(
         return []
 
 
+@instrument_db_helper
 async def get_all_cards_in_category_with_short_description(
     category_id: int,
     session: AsyncSession,
-    queue_name: str
+    queue_name: str,
+    outbox_session: AsyncSession | None = None,
+    tenant_id: int = DEFAULT_TENANT_ID
 ) -> list[dict[str, Any]]:
     """
     Извлекает карточки, относящиеся к указанной категории, с данными для отображения в списке.
@@ -82,6 +234,10 @@ async def get_all_cards_in_category_with_short_description(
     Args:
         category_id (int): Идентификатор категории (`categories.id`).
         session (AsyncSession): Асинхронная сессия SQLAlchemy для работы с базой данных.
+        queue_name (str): Имя очереди, в которую будет отправлено сообщение о запросе.
+        outbox_session (AsyncSession | None): Сессия основной бд для записи в outbox,
+            если `session` открыта на реплике. По умолчанию запись идет через `session`.
+        tenant_id (int): Идентификатор арендатора (`web.dependencies.resolve_tenant`).
 
     Returns:
         list(dict[str, Any]): Список словарей, где каждый словарь содержит:
@@ -90,30 +246,24 @@ async def get_all_cards_in_category_with_short_description(
     """
     try:
         async with session.begin():
-            stmt: Select = select(
-                    CardsTable.id,
-                    CardsTable.main_label,
-                    CardsTable.description_under_label,
-                    CompaniesTable.name.label("company_name"),
-                    CompaniesTable.short_description.label("company_short_description")
-                ).where(CardsTable.category_id == category_id
-                ).join(CompaniesTable, CompaniesTable.id == CardsTable.company_id
-            )
+            stmt: Select = build_cards_in_category_select(category_id, tenant_id)
             result = await session.execute(stmt)
-            await insert_into_outbox(
+            await record_select_in_outbox(
                 payload={
                     "action": "select",
                     "entity": "cards",
                     "filters": [
+                        {"column": "tenant_id", "operator": "=", "value": tenant_id},
                         {"column": "category_id", "operator": "=", "value": category_id}
                     ],
-                    "fields": ["id", "main_label", "description_under_label"],
+                    "fields": ["id", "main_label", "description_under_label", "image"],
                     "joined_entities": {
-                        "companies": ["name", "short_description"]
+                        "companies": ["name", "short_description", "logo"]
                     }
                 },
-                queue=queue_name,
-                session=session
+                queue_name=queue_name,
+                session=session,
+                outbox_session=outbox_session
             )
             return [dict(res) for res in result.mappings()]
     except OperationalError as exc:
@@ -133,10 +283,13 @@ async def get_all_cards_in_category_with_short_description(
         return []
 
 
+@instrument_db_helper
 async def get_card_info_by_card_id(
     card_id: int,
     session: AsyncSession,
-    queue_name: str
+    queue_name: str,
+    outbox_session: AsyncSession | None = None,
+    tenant_id: int = DEFAULT_TENANT_ID
 ) -> dict[str, Any]:
     """
     Извлекает полную информацию о карточке по её идентификатору.
@@ -149,6 +302,10 @@ async def get_card_info_by_card_id(
     Args:
         card_id (int): Идентификатор карточки (`cards.id`).
         session (AsyncSession): Асинхронная сессия SQLAlchemy для работы с базой данных.
+        queue_name (str): Имя очереди, в которую будет отправлено сообщение о запросе.
+        outbox_session (AsyncSession | None): Сессия основной бд для записи в outbox,
+            если `session` открыта на реплике. По умолчанию запись идет через `session`.
+        tenant_id (int): Идентификатор арендатора (`web.dependencies.resolve_tenant`).
 
     Returns:
         dict(str, Any): Словарь с полями карточки:
@@ -164,33 +321,25 @@ async def get_card_info_by_card_id(
     """
     try:
         async with session.begin():
-            stmt: Select = select(
-                    CardsTable.main_label,
-                    CardsTable.description_under_label,
-                    CardsTable.obtain_method_description,
-                    CardsTable.validity_period,
-                    CardsTable.about_partner,
-                    CardsTable.promocode,
-                    CardsTable.call_to_action_link,
-                    CardsTable.call_to_action_btn_label
-                ).where(CardsTable.id == card_id
-            )
+            stmt: Select = build_card_info_select(card_id, tenant_id)
             result = await session.execute(stmt)
-            await insert_into_outbox(
+            await record_select_in_outbox(
                 payload={
                     "action": "select",
                     "entity": "cards",
                     "filters": [
+                        {"column": "tenant_id", "operator": "=", "value": tenant_id},
                         {"column": "id", "operator": "=", "value": card_id}
                     ],
                     "fields": [
                         "main_label", "description_under_label", "obtain_method_description",
                         "validity_period", "about_partner", "promocode", "call_to_action_link",
-                        "call_to_action_btn_label"
+                        "call_to_action_btn_label", "image"
                     ]
                 },
-                queue=queue_name,
-                session=session
+                queue_name=queue_name,
+                session=session,
+                outbox_session=outbox_session
             )
             return dict(result.mappings().first())
     except OperationalError as exc:
@@ -209,3 +358,91 @@ async def get_card_info_by_card_id(
         logger.error(f"Неожиданная ошибка при получении сообщений: {exc}")
         return {}
 
+
+
+@instrument_db_helper
+async def search_cards(
+    query: str,
+    session: AsyncSession,
+    queue_name: str,
+    limit: int = SEARCH_RESULTS_LIMIT,
+    outbox_session: AsyncSession | None = None,
+    tenant_id: int = DEFAULT_TENANT_ID
+) -> list[dict[str, Any]]:
+    """
+    Выполняет полнотекстовый поиск карточек по заголовку, описанию, тексту о партнере и названию компании.
+
+    Функция:
+    - Нормализует запрос и ищет результат в кеше арендатора `SEARCH_CACHE`, который сбрасывается вместе с каталогом;
+    - При промахе выполняет ранжированный поиск по `search_vector` (русская конфигурация);
+    - Записывает сообщение о запросе в outbox только если запрос действительно выполнялся в бд;
+    - Логирует ошибки и возвращает пустой список при исключениях.
+
+    Args:
+        query (str): Поисковый запрос посетителя.
+        session (AsyncSession): Асинхронная сессия SQLAlchemy для работы с базой данных.
+        queue_name (str): Имя очереди, в которую будет отправлено сообщение о запросе.
+        limit (int): Максимальное количество карточек, по умолчанию `SEARCH_RESULTS_LIMIT`.
+        outbox_session (AsyncSession | None): Сессия основной бд для записи в outbox,
+            если `session` открыта на реплике. По умолчанию запись идет через `session`.
+        tenant_id (int): Идентификатор арендатора (`web.dependencies.resolve_tenant`).
+
+    Returns:
+        list(dict[str, Any]): Список словарей в порядке убывания релевантности, где каждый словарь содержит:
+            - `id`, `main_label`, `description_under_label` карточки;
+            - `company_name`, `company_short_description` компании;
+            - `rank` релевантность.
+    """
+    normalized_query: str = " ".join(query.split()).lower()
+    "Запрос без лишних пробелов в нижнем регистре - ключ кеша"
+    if not normalized_query:
+        return []
+
+    cache: CatalogCache = SEARCH_CACHE.namespace(tenant_id)
+    "Кеш поиска арендатора: частые запросы одного арендатора не вытесняют результаты другого"
+    cached: tuple[RowMapping, ...] | None = cache.get((normalized_query, limit))
+    if cached is not None:
+        # В кеше неизменяемые строки, вызывающий получает свои словари и не может испортить кеш
+        return [dict(card) for card in cached]
+
+    version: int = get_catalog_version()
+    "Версия каталога до запроса: результат, полученный во время изменения каталога, не кешируется"
+    try:
+        async with session.begin():
+            stmt: Select = build_cards_search_select(normalized_query, limit, tenant_id)
+            result = await session.execute(stmt)
+            await record_select_in_outbox(
+                payload={
+                    "action": "select",
+                    "entity": "cards",
+                    "filters": [
+                        {"column": "tenant_id", "operator": "=", "value": tenant_id},
+                        {"column": "search_vector", "operator": "@@", "value": normalized_query}
+                    ],
+                    "fields": ["id", "main_label", "description_under_label", "image"],
+                    "joined_entities": {
+                        "companies": ["name", "short_description", "logo"]
+                    }
+                },
+                queue_name=queue_name,
+                session=session,
+                outbox_session=outbox_session
+            )
+            cards: tuple[RowMapping, ...] = tuple(result.mappings())
+        cache.set((normalized_query, limit), cards, version=version)
+        return [dict(card) for card in cards]
+    except OperationalError as exc:
+        logger.error(f"Ошибка подключения к БД: {exc}")
+        return []
+
+    except SQLAlchemyError as exc:
+        logger.error(f"Ошибка SQLAlchemy при выполнении запроса: {exc}")
+        return []
+
+    except AttributeError as exc:
+        logger.error(f"Неверный объект сессии или таблицы: {exc}")
+        return []
+
+    except Exception as exc:
+        logger.error(f"Неожиданная ошибка при поиске карточек: {exc}")
+        return []
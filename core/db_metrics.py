@@ -0,0 +1,50 @@
+"""
+Метрики бд, которым нужен SQLAlchemy: ожидание соединения пула, занятые соединения
+и ошибки бд внутри функций `core.database_utils` (событие движка `handle_error`).
+
+Модуль импортируется `core.database_utils`, поэтому обработчик ошибок зарегистрирован в каждом процессе,
+который работает с бд.
+"""
+import time
+
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, ExceptionContext
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from .metrics import DB_POOL_CHECKOUT_WAIT, DB_POOL_IN_USE, REGISTRY, current_db_helper
+
+
+@event.listens_for(Engine, "handle_error")
+def mark_db_helper_failed(context: ExceptionContext) -> None:
+    "Помечает текущий вызов функции `core.database_utils` как завершившийся ошибкой бд"
+    call = current_db_helper.get()
+    if call is not None:
+        call.failed = True
+
+
+class MeteredAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, записывающий время ожидания соединения в `DB_POOL_CHECKOUT_WAIT`.
+    Метка `pool` берется из `pool_logging_name` движка, который сохраняется при пересоздании пула.
+    """
+    def _do_get(self) -> Any:
+        started: float = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started, self.logging_name or "default")
+
+
+def watch_engine_pool(engine: AsyncEngine, pool_name: str) -> None:
+    """
+    Публикует количество занятых соединений пула движка в `DB_POOL_IN_USE`.
+    Значение снимается в момент выдачи метрик, поэтому на запросы к бд не влияет.
+
+    Args:
+        engine (AsyncEngine): Асинхронный движок базы данных
+        pool_name (str): Значение метки `pool`
+    """
+    REGISTRY.add_collector(lambda: DB_POOL_IN_USE.set(engine.pool.checkedout(), pool_name))
@@ -0,0 +1,207 @@
+"""
+Изображения каталога: баннеры карточек (`cards.image`) и логотипы компаний (`companies.logo`).
+
+Оригинал сохраняется на диск под именем по хешу содержимого (`originals/<sha256>.<ext>`), в строке каталога
+хранится только это имя - ключ изображения. Одинаковые файлы получают один ключ и сохраняются один раз,
+а файл с ключом никогда не меняется, поэтому раздается с `Cache-Control: immutable` (`web.assets.MediaFiles`).
+
+Рядом с оригиналом создаются уменьшенные копии `THUMBNAIL_SIZES` в форматах WebP и JPEG
+(`thumbnails/<sha256>.<размер>.<формат>`). Декодирование и сжатие изображений занимают десятки миллисекунд
+процессорного времени, поэтому выполняются в `ProcessPoolExecutor`, а цикл событий только ждет результат.
+Pillow импортируется в процессах пула и не загружается в процессе веб-воркера.
+"""
+import asyncio
+import hashlib
+import multiprocessing
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from loguru import logger
+
+
+IMAGE_SIGNATURES: dict[bytes, str] = {
+    b"\xff\xd8\xff": "jpg",
+    b"\x89PNG\r\n\x1a\n": "png",
+    b"GIF87a": "gif",
+    b"GIF89a": "gif",
+}
+"Начало файла поддерживаемых форматов. Ключ - сигнатура, значение - расширение оригинала. WebP проверяется отдельно"
+
+THUMBNAIL_SIZES: dict[str, tuple[int, int]] = {
+    "card": (480, 270),
+    "modal": (960, 540),
+    "logo": (128, 128),
+}
+"Уменьшенные копии. Ключ - имя размера, значение - максимальные ширина и высота (пропорции сохраняются)"
+
+THUMBNAIL_FORMATS: dict[str, dict] = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "jpg": {"format": "JPEG", "quality": 85, "optimize": True, "progressive": True},
+}
+"Форматы уменьшенных копий. Ключ - расширение, значение - параметры `Image.save`. JPEG - для браузеров без WebP"
+
+MAX_IMAGE_PIXELS: int = 40_000_000
+"Максимальное количество пикселей оригинала. Больше - отказ, чтобы сжатый файл не раскрывался в гигабайты памяти"
+
+DIGEST_LENGTH: int = 32
+"Длина хеша содержимого в ключе изображения"
+
+
+class InvalidImageError(ValueError):
+    "Загруженный файл не является изображением поддерживаемого формата или слишком велик"
+
+
+def detect_extension(content: bytes) -> str | None:
+    """
+    Определяет формат изображения по сигнатуре без декодирования.
+
+    Args:
+        content (bytes): Содержимое файла
+
+    Returns:
+        str | None: Расширение оригинала или `None`, если формат не поддерживается.
+    """
+    if content[:4] == b"RIFF" and content[8:12] == b"WEBP":
+        return "webp"
+    for signature, extension in IMAGE_SIGNATURES.items():
+        if content.startswith(signature):
+            return extension
+    return None
+
+
+def image_key(content: bytes) -> str:
+    """
+    Ключ изображения: хеш содержимого и расширение, например `3f2a...9c.png`.
+
+    Raises:
+        InvalidImageError: Формат файла не поддерживается.
+    """
+    extension: str | None = detect_extension(content)
+    if extension is None:
+        raise InvalidImageError("Поддерживаются изображения JPEG, PNG, GIF и WebP")
+    return f"{hashlib.sha256(content).hexdigest()[:DIGEST_LENGTH]}.{extension}"
+
+
+def original_path(key: str) -> str:
+    "Путь оригинала относительно каталога изображений"
+    return f"originals/{key}"
+
+
+def thumbnail_path(key: str, size: str, extension: str = "webp") -> str:
+    "Путь уменьшенной копии относительно каталога изображений, например `thumbnails/3f2a...9c.card.webp`"
+    return f"thumbnails/{key.partition('.')[0]}.{size}.{extension}"
+
+
+def write_atomically(path: Path, content: bytes) -> None:
+    "Записывает файл через временный файл и переименование: читатели не видят недописанный файл"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary: Path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    temporary.write_bytes(content)
+    os.replace(temporary, path)
+
+
+def process_image(content: bytes, media_dir: str, key: str, sizes: tuple[str, ...]) -> list[str]:
+    """
+    Сохраняет оригинал и создает уменьшенные копии. Выполняется в процессе пула `ImageStore`.
+
+    Args:
+        content (bytes): Содержимое оригинала
+        media_dir (str): Каталог изображений
+        key (str): Ключ изображения (`image_key`)
+        sizes (tuple[str, ...]): Имена размеров из `THUMBNAIL_SIZES`
+
+    Returns:
+        list[str]: Пути созданных уменьшенных копий относительно `media_dir`.
+
+    Raises:
+        InvalidImageError: Файл не декодируется или слишком велик.
+    """
+    import io
+
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    try:
+        with Image.open(io.BytesIO(content)) as opened:
+            if opened.width * opened.height > MAX_IMAGE_PIXELS:
+                raise InvalidImageError(f"Изображение больше {MAX_IMAGE_PIXELS} пикселей")
+            image = ImageOps.exif_transpose(opened).convert("RGB")
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as exc:
+        raise InvalidImageError(f"Не удалось прочитать изображение: {exc}") from None
+
+    root: Path = Path(media_dir)
+    write_atomically(root / original_path(key), content)
+    paths: list[str] = []
+    for size in sizes:
+        thumbnail = image.copy()
+        thumbnail.thumbnail(THUMBNAIL_SIZES[size], Image.Resampling.LANCZOS)
+        for extension, options in THUMBNAIL_FORMATS.items():
+            buffer = io.BytesIO()
+            thumbnail.save(buffer, **options)
+            path: str = thumbnail_path(key, size, extension)
+            write_atomically(root / path, buffer.getvalue())
+            paths.append(path)
+    return paths
+
+
+class ImageStore:
+    """
+    Хранилище изображений каталога на локальном диске с пулом процессов для уменьшенных копий.
+    Пул создается при первой загрузке, поэтому воркеры без загрузок не запускают лишних процессов.
+
+    Args:
+        media_dir (Path): Каталог изображений
+        max_workers (int): Количество процессов пула
+        max_bytes (int): Максимальный размер загружаемого файла, байты
+    """
+    def __init__(self, media_dir: Path, max_workers: int = 2, max_bytes: int = 10 * 1024 * 1024):
+        self.media_dir = media_dir
+        self.max_workers = max_workers
+        self.max_bytes = max_bytes
+        self.executor: ProcessPoolExecutor | None = None
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            # spawn: дочерний процесс не наследует потоки и соединения веб-воркера
+            self.executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self.executor
+
+    def is_processed(self, key: str, sizes: tuple[str, ...]) -> bool:
+        "Оригинал и все уменьшенные копии уже сохранены"
+        return (self.media_dir / original_path(key)).is_file() and all(
+            (self.media_dir / thumbnail_path(key, size, extension)).is_file()
+            for size in sizes for extension in THUMBNAIL_FORMATS
+        )
+
+    async def save(self, content: bytes, sizes: tuple[str, ...]) -> str:
+        """
+        Сохраняет изображение и его уменьшенные копии. Уже сохраненное содержимое повторно не обрабатывается.
+
+        Args:
+            content (bytes): Содержимое загруженного файла
+            sizes (tuple[str, ...]): Имена размеров из `THUMBNAIL_SIZES`
+
+        Returns:
+            str: Ключ изображения.
+
+        Raises:
+            InvalidImageError: Файл пустой, слишком большой или не является изображением.
+        """
+        if not content or len(content) > self.max_bytes:
+            raise InvalidImageError(f"Размер изображения должен быть от 1 до {self.max_bytes} байт")
+        key: str = image_key(content)
+        if self.is_processed(key, sizes):
+            return key
+        loop = asyncio.get_running_loop()
+        paths: list[str] = await loop.run_in_executor(
+            self.get_executor(), process_image, content, str(self.media_dir), key, sizes
+        )
+        logger.info(f"Сохранено изображение {key}, уменьшенных копий: {len(paths)}")
+        return key
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,392 @@
+"""
+Метрики процесса в формате Prometheus.
+
+Значения хранятся в обычных словарях без блокировок: каждый сервис работает в одном
+потоке событийного цикла asyncio, а события SQLAlchemy выполняются в том же потоке
+(в гринлете), поэтому обновление метрики - это одна операция со словарем.
+
+Модуль не импортирует SQLAlchemy, чтобы процессы без бд (бот) не загружали ее ради метрик.
+Метрики пула соединений и обработчик ошибок движка находятся в `core.db_metrics`.
+"""
+import asyncio
+import bisect
+import functools
+import time
+
+from collections.abc import Awaitable, Callable, Iterable
+from contextvars import ContextVar
+from typing import Any, ParamSpec, TypeVar
+
+
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+"Границы корзин гистограмм по умолчанию в секундах"
+
+
+def escape_label_value(value: str) -> str:
+    "Экранирует значение метки (обратная косая черта, кавычки, перевод строки)"
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    """
+    Форматирует метки в виде `{name="value",...}`.
+
+    Args:
+        names (tuple[str, ...]): Имена меток
+        values (tuple[str, ...]): Значения меток
+        extra (str): Дополнительная уже отформатированная метка (`le="0.1"` у гистограмм)
+
+    Returns:
+        str: Строка меток или пустая строка, если меток нет.
+    """
+    pairs: list[str] = [
+        f'{name}="{escape_label_value(value)}"' for name, value in zip(names, values, strict=True)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """
+    Монотонно растущий счетчик.
+
+    Args:
+        name (str): Имя метрики
+        documentation (str): Описание метрики (`# HELP`)
+        labels (tuple[str, ...]): Имена меток
+    """
+    kind: str = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        """
+        Увеличивает счетчик.
+
+        Args:
+            *label_values (str): Значения меток в порядке `labels`
+            amount (float): Величина приращения
+        """
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def get(self, *label_values: str) -> float:
+        "Возвращает текущее значение счетчика для меток"
+        return self.values.get(label_values, 0)
+
+    def render(self) -> Iterable[str]:
+        "Возвращает строки метрики в текстовом формате Prometheus"
+        for label_values, value in self.values.items():
+            yield f"{self.name}{format_labels(self.labels, label_values)} {value}"
+
+
+class Gauge(Counter):
+    """
+    Значение, которое может как расти, так и уменьшаться.
+    """
+    kind: str = "gauge"
+
+    def set(self, value: float, *label_values: str) -> None:
+        """
+        Устанавливает значение.
+
+        Args:
+            value (float): Новое значение
+            *label_values (str): Значения меток в порядке `labels`
+        """
+        self.values[label_values] = value
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными корзинами.
+
+    Args:
+        name (str): Имя метрики
+        documentation (str): Описание метрики (`# HELP`)
+        labels (tuple[str, ...]): Имена меток
+        buckets (tuple[float, ...]): Верхние границы корзин по возрастанию
+    """
+    kind: str = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self.values: dict[tuple[str, ...], list[float]] = {}
+        """Ключ - значения меток, значение - количество наблюдений в каждой корзине
+(последняя - больше всех границ), затем сумма и общее количество"""
+
+    def observe(self, value: float, *label_values: str) -> None:
+        """
+        Добавляет наблюдение.
+
+        Args:
+            value (float): Наблюдаемое значение (для длительностей - секунды)
+            *label_values (str): Значения меток в порядке `labels`
+        """
+        counts = self.values.get(label_values)
+        if counts is None:
+            counts = self.values[label_values] = [0] * (len(self.buckets) + 3)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    def get_count(self, *label_values: str) -> int:
+        "Возвращает количество наблюдений для меток"
+        counts = self.values.get(label_values)
+        return int(counts[-1]) if counts else 0
+
+    def snapshot(self, *label_values: str) -> list[float]:
+        """
+        Возвращает копию счетчиков корзин для меток, чтобы позже посчитать квантили за интервал.
+
+        Args:
+            *label_values (str): Значения меток в порядке `labels`
+
+        Returns:
+            list[float]: Количество наблюдений в корзинах, сумма и общее количество.
+        """
+        return list(self.values.get(label_values, [0] * (len(self.buckets) + 3)))
+
+    def quantile(self, q: float, *label_values: str, since: list[float] | None = None) -> float:
+        """
+        Оценивает квантиль по корзинам (верхняя граница корзины, в которую попадает квантиль).
+
+        Args:
+            q (float): Квантиль от 0 до 1
+            *label_values (str): Значения меток в порядке `labels`
+            since (list[float] | None): Снимок `snapshot`. Если передан, квантиль считается только
+                по наблюдениям, добавленным после снимка
+
+        Returns:
+            float: Оценка квантиля. `0.0`, если наблюдений нет,
+            `inf`, если квантиль больше последней границы.
+        """
+        counts = self.snapshot(*label_values)
+        if since is not None:
+            counts = [count - previous for count, previous in zip(counts, since, strict=True)]
+        if not counts[-1]:
+            return 0.0
+        rank: float = q * counts[-1]
+        cumulative: float = 0
+        for bound, count in zip(self.buckets, counts, strict=False):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def render(self) -> Iterable[str]:
+        "Возвращает строки метрики в текстовом формате Prometheus"
+        for label_values, counts in self.values.items():
+            cumulative: float = 0
+            for bound, count in zip(self.buckets, counts, strict=False):
+                cumulative += count
+                bucket_labels: str = format_labels(self.labels, label_values, f'le="{bound}"')
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            bucket_labels = format_labels(self.labels, label_values, 'le="+Inf"')
+            yield f"{self.name}_bucket{bucket_labels} {counts[-1]}"
+            labels: str = format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {counts[-2]}"
+            yield f"{self.name}_count{labels} {counts[-1]}"
+
+
+class MetricsRegistry:
+    """
+    Набор метрик процесса и функций, обновляющих метрики-снимки перед выдачей.
+    """
+    def __init__(self):
+        self.metrics: dict[str, Counter | Histogram] = {}
+        self.collectors: list[Callable[[], None]] = []
+
+    def register(self, metric: Counter | Histogram) -> Any:
+        """
+        Регистрирует метрику.
+
+        Args:
+            metric (Counter | Histogram): Метрика
+
+        Returns:
+            Any: Та же метрика.
+        """
+        self.metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """
+        Добавляет функцию, вызываемую перед каждой выдачей метрик
+        (например, чтобы записать в `Gauge` текущее число занятых соединений пула).
+
+        Args:
+            collector (Callable[[], None]): Функция без аргументов
+        """
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        Возвращает все метрики в текстовом формате Prometheus.
+
+        Returns:
+            str: Тело ответа `/metrics`.
+        """
+        for collector in self.collectors:
+            collector()
+        lines: list[str] = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY: MetricsRegistry = MetricsRegistry()
+"Метрики текущего процесса"
+
+
+async def start_metrics_server(host: str, port: int) -> asyncio.Server:
+    """
+    Запускает минимальный HTTP-сервер, отдающий `REGISTRY` на любой GET-запрос.
+    Используется фоновыми сервисами (outbox), в которых нет FastAPI.
+
+    Args:
+        host (str): Адрес, на котором слушает сервер
+        port (int): Порт сервера
+
+    Returns:
+        asyncio.Server: Запущенный сервер. Закрывается вызовом `close()`.
+    """
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body: bytes = REGISTRY.render().encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+                b"Connection: close\r\n\r\n" + body
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+HTTP_REQUEST_DURATION: Histogram = REGISTRY.register(Histogram(
+    "http_request_duration_seconds",
+    "Длительность обработки HTTP-запроса",
+    labels=("router", "method", "route", "status")
+))
+
+DB_HELPER_DURATION: Histogram = REGISTRY.register(Histogram(
+    "db_helper_duration_seconds",
+    "Длительность вызова функции core.database_utils",
+    labels=("helper",)
+))
+
+DB_HELPER_ERRORS: Counter = REGISTRY.register(Counter(
+    "db_helper_errors_total",
+    "Вызовы функций core.database_utils, завершившиеся ошибкой бд или исключением",
+    labels=("helper",)
+))
+
+DB_SLOW_QUERIES: Counter = REGISTRY.register(Counter(
+    "db_slow_queries_total",
+    "SQL-выражения дольше порога медленных запросов (`core.slow_queries`). helper - функция core.database_utils",
+    labels=("helper",)
+))
+
+DB_POOL_CHECKOUT_WAIT: Histogram = REGISTRY.register(Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Время ожидания соединения из пула (включая открытие нового соединения)",
+    labels=("pool",)
+))
+
+DB_POOL_IN_USE: Gauge = REGISTRY.register(Gauge(
+    "db_pool_connections_in_use",
+    "Количество соединений, выданных пулом",
+    labels=("pool",)
+))
+
+OUTBOX_ROWS_INSERTED: Counter = REGISTRY.register(Counter(
+    "outbox_rows_inserted_total",
+    "Записи, добавленные в outbox",
+    labels=("entity", "action")
+))
+
+CARD_STATS_EVENTS_DROPPED: Counter = REGISTRY.register(Counter(
+    "card_stats_events_dropped_total",
+    "Просмотры и переходы по карточкам, не учтенные из-за переполнения счетчиков воркера (`core.card_stats`)",
+    labels=("kind",)
+))
+
+
+class DbHelperCall:
+    """
+    Состояние текущего вызова функции `core.database_utils`.
+
+    Args:
+        name (str): Имя функции
+    """
+    __slots__ = ("name", "failed")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.failed: bool = False
+
+
+current_db_helper: ContextVar[DbHelperCall | None] = ContextVar("current_db_helper", default=None)
+"Вызов функции `core.database_utils`, внутри которого выполняется текущий запрос к бд"
+
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+def instrument_db_helper(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+    """
+    Декоратор функций `core.database_utils`: записывает длительность вызова и ошибки.
+
+    Функции перехватывают исключения сами и возвращают пустое значение, поэтому ошибка
+    засчитывается, если во время вызова движок сообщил об ошибке бд (событие `handle_error`)
+    или исключение вышло за пределы функции.
+
+    Args:
+        func (Callable): Асинхронная функция
+
+    Returns:
+        Callable: Обернутая функция.
+    """
+    name: str = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        call = DbHelperCall(name)
+        token = current_db_helper.set(call)
+        started: float = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except BaseException:
+            call.failed = True
+            raise
+        finally:
+            DB_HELPER_DURATION.observe(time.perf_counter() - started, name)
+            if call.failed:
+                DB_HELPER_ERRORS.inc(name)
+            current_db_helper.reset(token)
+
+    return wrapper
@@ -0,0 +1,638 @@
+"""
+Версионная инициализация схемы базы данных.
+
+Миграции применяются один раз отдельным шагом (`python maintenance_main.py migrate`),
+а при старте веб-воркеров выполняется только дешевая проверка номера версии в `schema_version`.
+
+Каждая миграция содержит собственные выражения DDL в том виде, в котором схема была на ее версии,
+и не читает текущие модели: изменение `core.models` не меняет выпущенных миграций, а новые столбцы,
+индексы и триггеры добавляются только новой миграцией. Первая миграция повторяет исходную схему
+(до появления миграций) с `IF NOT EXISTS`, поэтому база, созданная исходным `metadata.create_all`,
+принимается как версия 1 и обновляется остальными миграциями. Соответствие результата миграций
+моделям проверяет `tests/test_web_main.py`.
+"""
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from loguru import logger
+from sqlalchemy import Connection, insert, select, text, update
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .models import SchemaVersionTable
+
+
+@dataclass(frozen=True)
+class Migration:
+    """
+    Шаг миграции схемы базы данных.
+
+    Args:
+        version (int): Номер версии схемы после применения шага
+        description (str): Краткое описание изменений
+        upgrade (Callable[[Connection], None]): Синхронная функция, применяющая изменения
+            (выполняется через `AsyncConnection.run_sync`)
+    """
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def execute_ddl(conn: Connection, statements: tuple[str, ...]) -> None:
+    """
+    Выполняет выражения DDL миграции по порядку.
+
+    Args:
+        conn (Connection): Синхронное соединение внутри транзакции миграции
+        statements (tuple[str, ...]): Выражения SQL
+    """
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+BASELINE_SCHEMA_DDL: tuple[str, ...] = (
+    """
+    DO $$ BEGIN
+        CREATE TYPE outboxstatuses AS ENUM ('PENDING', 'SENT', 'FAILED', 'ARCHIVED');
+    EXCEPTION WHEN duplicate_object THEN NULL;
+    END $$
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS categories (
+        id BIGSERIAL NOT NULL,
+        name VARCHAR NOT NULL,
+        PRIMARY KEY (id),
+        UNIQUE (name)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS companies (
+        id BIGSERIAL NOT NULL,
+        name VARCHAR NOT NULL,
+        short_description VARCHAR NOT NULL,
+        PRIMARY KEY (id),
+        UNIQUE (name),
+        UNIQUE (short_description)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS outbox (
+        id BIGSERIAL NOT NULL,
+        payload JSON NOT NULL,
+        queue VARCHAR NOT NULL,
+        status outboxstatuses NOT NULL,
+        created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        PRIMARY KEY (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS cards (
+        id BIGSERIAL NOT NULL,
+        category_id BIGINT NOT NULL,
+        company_id BIGINT NOT NULL,
+        main_label VARCHAR NOT NULL,
+        description_under_label VARCHAR NOT NULL,
+        obtain_method_description VARCHAR,
+        validity_period VARCHAR,
+        about_partner VARCHAR,
+        promocode VARCHAR,
+        call_to_action_link VARCHAR,
+        call_to_action_btn_label VARCHAR,
+        PRIMARY KEY (id),
+        FOREIGN KEY(category_id) REFERENCES categories (id),
+        FOREIGN KEY(company_id) REFERENCES companies (id)
+    )
+    """,
+)
+"Миграция 1: исходная схема - таблицы, которые создавал `metadata.create_all` до появления миграций"
+
+
+def _create_initial_schema(conn: Connection) -> None:
+    "Создает исходную схему или принимает уже созданную исходным `metadata.create_all`"
+    execute_ddl(conn, BASELINE_SCHEMA_DDL)
+
+
+FULL_TEXT_SEARCH_V2_DDL: tuple[str, ...] = (
+    """
+    ALTER TABLE companies ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (to_tsvector('russian', coalesce(name, ''))) STORED NOT NULL
+    """,
+    """
+    ALTER TABLE cards ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (
+        to_tsvector('russian', coalesce(main_label, '') || ' ' || coalesce(description_under_label, '')
+        || ' ' || coalesce(about_partner, ''))
+    ) STORED NOT NULL
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_companies_search_vector ON companies
+    USING gin (search_vector) WITH (fastupdate = off)
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_cards_search_vector ON cards USING gin (search_vector) WITH (fastupdate = off)",
+    "CREATE INDEX IF NOT EXISTS ix_cards_company_id ON cards (company_id)",
+)
+"Миграция 2: генерируемые столбцы `search_vector` с GIN-индексами и индекс карточек по компании"
+
+
+def _add_full_text_search(conn: Connection) -> None:
+    "Добавляет генерируемые столбцы `search_vector` и индексы для полнотекстового поиска карточек"
+    execute_ddl(conn, FULL_TEXT_SEARCH_V2_DDL)
+
+
+def _add_cards_category_index(conn: Connection) -> None:
+    "Добавляет индекс `cards.category_id` для выборки карточек категории"
+    execute_ddl(conn, ("CREATE INDEX IF NOT EXISTS ix_cards_category_id ON cards (category_id)",))
+
+
+def _add_outbox_pending_index(conn: Connection) -> None:
+    "Добавляет частичный индекс ожидающих отправки сообщений outbox"
+    execute_ddl(conn, (
+        "CREATE INDEX IF NOT EXISTS ix_outbox_pending_created_at ON outbox (created_at) WHERE status = 'PENDING'",
+    ))
+
+
+CARD_SUMMARIES_V5_DDL: tuple[str, ...] = (
+    """
+    CREATE TABLE IF NOT EXISTS card_summaries (
+        category_id BIGINT NOT NULL,
+        card_id BIGINT NOT NULL,
+        company_id BIGINT NOT NULL,
+        main_label VARCHAR NOT NULL,
+        description_under_label VARCHAR NOT NULL,
+        company_name VARCHAR NOT NULL,
+        company_short_description VARCHAR NOT NULL,
+        PRIMARY KEY (category_id, card_id),
+        FOREIGN KEY(card_id) REFERENCES cards (id) ON DELETE CASCADE
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_card_summaries_company_id ON card_summaries (company_id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_card_summaries_card_id ON card_summaries (card_id)",
+    """
+    CREATE OR REPLACE FUNCTION sync_card_summary() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO card_summaries (
+            card_id, category_id, company_id, main_label, description_under_label,
+            company_name, company_short_description
+        )
+        SELECT NEW.id, NEW.category_id, NEW.company_id, NEW.main_label, NEW.description_under_label,
+            companies.name, companies.short_description
+        FROM companies
+        WHERE companies.id = NEW.company_id
+        ON CONFLICT (card_id) DO UPDATE SET
+            category_id = EXCLUDED.category_id,
+            company_id = EXCLUDED.company_id,
+            main_label = EXCLUDED.main_label,
+            description_under_label = EXCLUDED.description_under_label,
+            company_name = EXCLUDED.company_name,
+            company_short_description = EXCLUDED.company_short_description;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION sync_company_card_summaries() RETURNS trigger AS $$
+    BEGIN
+        UPDATE card_summaries
+        SET company_name = NEW.name, company_short_description = NEW.short_description
+        WHERE company_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS card_summaries_sync_cards ON cards",
+    """
+    CREATE TRIGGER card_summaries_sync_cards
+    AFTER INSERT OR UPDATE OF category_id, company_id, main_label, description_under_label ON cards
+    FOR EACH ROW EXECUTE FUNCTION sync_card_summary()
+    """,
+    "DROP TRIGGER IF EXISTS card_summaries_sync_companies ON companies",
+    """
+    CREATE TRIGGER card_summaries_sync_companies
+    AFTER UPDATE OF name, short_description ON companies
+    FOR EACH ROW EXECUTE FUNCTION sync_company_card_summaries()
+    """,
+    """
+    INSERT INTO card_summaries (
+        card_id, category_id, company_id, main_label, description_under_label,
+        company_name, company_short_description
+    )
+    SELECT cards.id, cards.category_id, cards.company_id, cards.main_label, cards.description_under_label,
+        companies.name, companies.short_description
+    FROM cards JOIN companies ON companies.id = cards.company_id
+    ORDER BY cards.category_id, cards.id
+    ON CONFLICT DO NOTHING
+    """,
+)
+"""Миграция 5: таблица `card_summaries`, ее триггеры и заполнение в том виде, в котором они появились.
+Более поздние миграции изменяют таблицу и пересоздают триггеры своими копиями DDL"""
+
+
+def _add_card_summaries(conn: Connection) -> None:
+    "Добавляет read model `card_summaries` с поддерживающими ее триггерами и заполняет ее"
+    execute_ddl(conn, CARD_SUMMARIES_V5_DDL)
+
+
+CARD_COUNTS_V6_DDL: tuple[str, ...] = (
+    "ALTER TABLE categories ADD COLUMN IF NOT EXISTS cards_count INTEGER DEFAULT 0 NOT NULL",
+    "ALTER TABLE companies ADD COLUMN IF NOT EXISTS cards_count INTEGER DEFAULT 0 NOT NULL",
+    *(
+        f"""
+        UPDATE {table} SET cards_count = counts.cards_count
+        FROM (SELECT {column} AS id, count(*) AS cards_count FROM cards GROUP BY {column}) AS counts
+        WHERE {table}.id = counts.id AND {table}.cards_count != counts.cards_count
+        """
+        for table, column in (("categories", "category_id"), ("companies", "company_id"))
+    ),
+)
+"""Миграция 6: счетчики карточек категорий и компаний, заполненные по всем карточкам
+(до появления окон действия карточки бессрочны)"""
+
+
+def _add_card_counts(conn: Connection) -> None:
+    "Добавляет счетчики карточек `cards_count` категорий и компаний и заполняет их"
+    execute_ddl(conn, CARD_COUNTS_V6_DDL)
+
+
+CARD_VALIDITY_V7_DDL: tuple[str, ...] = (
+    "ALTER TABLE cards ADD COLUMN IF NOT EXISTS valid_from TIMESTAMP WITH TIME ZONE",
+    "ALTER TABLE cards ADD COLUMN IF NOT EXISTS valid_to TIMESTAMP WITH TIME ZONE",
+    "CREATE INDEX IF NOT EXISTS ix_cards_valid_from ON cards (valid_from)",
+    "CREATE INDEX IF NOT EXISTS ix_cards_valid_to ON cards (valid_to)",
+    "ALTER TABLE card_summaries ADD COLUMN IF NOT EXISTS valid_from TIMESTAMP WITH TIME ZONE",
+    "ALTER TABLE card_summaries ADD COLUMN IF NOT EXISTS valid_to TIMESTAMP WITH TIME ZONE",
+    """
+    CREATE OR REPLACE FUNCTION sync_card_summary() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO card_summaries (
+            card_id, category_id, company_id, main_label, description_under_label,
+            company_name, company_short_description, valid_from, valid_to
+        )
+        SELECT NEW.id, NEW.category_id, NEW.company_id, NEW.main_label, NEW.description_under_label,
+            companies.name, companies.short_description, NEW.valid_from, NEW.valid_to
+        FROM companies
+        WHERE companies.id = NEW.company_id
+        ON CONFLICT (card_id) DO UPDATE SET
+            category_id = EXCLUDED.category_id,
+            company_id = EXCLUDED.company_id,
+            main_label = EXCLUDED.main_label,
+            description_under_label = EXCLUDED.description_under_label,
+            company_name = EXCLUDED.company_name,
+            company_short_description = EXCLUDED.company_short_description,
+            valid_from = EXCLUDED.valid_from,
+            valid_to = EXCLUDED.valid_to;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS card_summaries_sync_cards ON cards",
+    """
+    CREATE TRIGGER card_summaries_sync_cards
+    AFTER INSERT OR UPDATE OF category_id, company_id, main_label, description_under_label, valid_from, valid_to
+    ON cards
+    FOR EACH ROW EXECUTE FUNCTION sync_card_summary()
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS card_validity_state (
+        id INTEGER NOT NULL,
+        processed_until TIMESTAMP WITH TIME ZONE NOT NULL,
+        PRIMARY KEY (id)
+    )
+    """,
+)
+"Миграция 7: окна действия карточек, триггер `card_summaries` с окнами и таблица состояния планировщика"
+
+
+def _add_card_validity(conn: Connection) -> None:
+    "Добавляет окна действия карточек `valid_from`/`valid_to` с индексами и состояние их планировщика"
+    execute_ddl(conn, CARD_VALIDITY_V7_DDL)
+
+
+TENANTS_V8_DDL: tuple[str, ...] = (
+    """
+    CREATE TABLE IF NOT EXISTS public.tenants (
+        id BIGSERIAL NOT NULL,
+        slug VARCHAR NOT NULL,
+        name VARCHAR NOT NULL,
+        host VARCHAR,
+        schema_name VARCHAR,
+        PRIMARY KEY (id),
+        UNIQUE (slug),
+        UNIQUE (host)
+    )
+    """,
+    "INSERT INTO public.tenants (slug, name) VALUES ('default', 'Партнерская программа') ON CONFLICT (slug) DO NOTHING",
+    *(
+        f"""
+        ALTER TABLE {table} ADD COLUMN IF NOT EXISTS tenant_id BIGINT DEFAULT 1 NOT NULL
+        REFERENCES public.tenants (id)
+        """
+        for table in ("categories", "companies", "cards")
+    ),
+    "ALTER TABLE categories DROP CONSTRAINT IF EXISTS categories_name_key",
+    "ALTER TABLE companies DROP CONSTRAINT IF EXISTS companies_name_key",
+    "ALTER TABLE companies DROP CONSTRAINT IF EXISTS companies_short_description_key",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_categories_tenant_id_name ON categories (tenant_id, name)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_companies_tenant_id_name ON companies (tenant_id, name)",
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS ux_companies_tenant_id_short_description
+    ON companies (tenant_id, short_description)
+    """,
+    "ALTER TABLE card_summaries ADD COLUMN IF NOT EXISTS tenant_id BIGINT DEFAULT 1 NOT NULL",
+    """
+    ALTER TABLE card_summaries DROP CONSTRAINT card_summaries_pkey,
+    ADD CONSTRAINT card_summaries_pkey PRIMARY KEY (tenant_id, category_id, card_id)
+    """,
+    """
+    CREATE OR REPLACE FUNCTION sync_card_summary() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO card_summaries (
+            card_id, tenant_id, category_id, company_id, main_label, description_under_label,
+            company_name, company_short_description, valid_from, valid_to
+        )
+        SELECT NEW.id, NEW.tenant_id, NEW.category_id, NEW.company_id, NEW.main_label, NEW.description_under_label,
+            companies.name, companies.short_description, NEW.valid_from, NEW.valid_to
+        FROM companies
+        WHERE companies.id = NEW.company_id
+        ON CONFLICT (card_id) DO UPDATE SET
+            tenant_id = EXCLUDED.tenant_id,
+            category_id = EXCLUDED.category_id,
+            company_id = EXCLUDED.company_id,
+            main_label = EXCLUDED.main_label,
+            description_under_label = EXCLUDED.description_under_label,
+            company_name = EXCLUDED.company_name,
+            company_short_description = EXCLUDED.company_short_description,
+            valid_from = EXCLUDED.valid_from,
+            valid_to = EXCLUDED.valid_to;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql SET search_path FROM CURRENT
+    """,
+    """
+    CREATE OR REPLACE FUNCTION sync_company_card_summaries() RETURNS trigger AS $$
+    BEGIN
+        UPDATE card_summaries
+        SET company_name = NEW.name, company_short_description = NEW.short_description
+        WHERE company_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql SET search_path FROM CURRENT
+    """,
+    "DROP TRIGGER IF EXISTS card_summaries_sync_cards ON cards",
+    """
+    CREATE TRIGGER card_summaries_sync_cards
+    AFTER INSERT OR UPDATE OF tenant_id, category_id, company_id, main_label, description_under_label,
+        valid_from, valid_to ON cards
+    FOR EACH ROW EXECUTE FUNCTION sync_card_summary()
+    """,
+)
+"""Миграция 8: таблица арендаторов с арендатором по умолчанию, `tenant_id` в таблицах каталога (существующий
+каталог принадлежит арендатору по умолчанию), уникальность названий в пределах арендатора, первичный ключ
+`card_summaries`, начинающийся с арендатора, и триггеры с арендатором"""
+
+
+def _add_tenants(conn: Connection) -> None:
+    "Добавляет арендаторов каталога"
+    execute_ddl(conn, TENANTS_V8_DDL)
+
+
+IMAGES_V9_DDL: tuple[str, ...] = (
+    "ALTER TABLE cards ADD COLUMN IF NOT EXISTS image VARCHAR",
+    "ALTER TABLE companies ADD COLUMN IF NOT EXISTS logo VARCHAR",
+    "ALTER TABLE card_summaries ADD COLUMN IF NOT EXISTS image VARCHAR",
+    "ALTER TABLE card_summaries ADD COLUMN IF NOT EXISTS company_logo VARCHAR",
+    """
+    CREATE OR REPLACE FUNCTION sync_card_summary() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO card_summaries (
+            card_id, tenant_id, category_id, company_id, main_label, description_under_label,
+            company_name, company_short_description, image, company_logo, valid_from, valid_to
+        )
+        SELECT NEW.id, NEW.tenant_id, NEW.category_id, NEW.company_id, NEW.main_label, NEW.description_under_label,
+            companies.name, companies.short_description, NEW.image, companies.logo, NEW.valid_from, NEW.valid_to
+        FROM companies
+        WHERE companies.id = NEW.company_id
+        ON CONFLICT (card_id) DO UPDATE SET
+            tenant_id = EXCLUDED.tenant_id,
+            category_id = EXCLUDED.category_id,
+            company_id = EXCLUDED.company_id,
+            main_label = EXCLUDED.main_label,
+            description_under_label = EXCLUDED.description_under_label,
+            company_name = EXCLUDED.company_name,
+            company_short_description = EXCLUDED.company_short_description,
+            image = EXCLUDED.image,
+            company_logo = EXCLUDED.company_logo,
+            valid_from = EXCLUDED.valid_from,
+            valid_to = EXCLUDED.valid_to;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql SET search_path FROM CURRENT
+    """,
+    """
+    CREATE OR REPLACE FUNCTION sync_company_card_summaries() RETURNS trigger AS $$
+    BEGIN
+        UPDATE card_summaries
+        SET company_name = NEW.name, company_short_description = NEW.short_description, company_logo = NEW.logo
+        WHERE company_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql SET search_path FROM CURRENT
+    """,
+    "DROP TRIGGER IF EXISTS card_summaries_sync_cards ON cards",
+    """
+    CREATE TRIGGER card_summaries_sync_cards
+    AFTER INSERT OR UPDATE OF tenant_id, category_id, company_id, main_label, description_under_label,
+        image, valid_from, valid_to ON cards
+    FOR EACH ROW EXECUTE FUNCTION sync_card_summary()
+    """,
+    "DROP TRIGGER IF EXISTS card_summaries_sync_companies ON companies",
+    """
+    CREATE TRIGGER card_summaries_sync_companies
+    AFTER UPDATE OF name, short_description, logo ON companies
+    FOR EACH ROW EXECUTE FUNCTION sync_company_card_summaries()
+    """,
+)
+"Миграция 9: ключи изображений карточек и логотипов компаний в таблицах каталога, в `card_summaries` и в триггерах"
+
+
+def _add_images(conn: Connection) -> None:
+    "Добавляет изображения карточек и логотипы компаний в таблицы каталога и в `card_summaries`"
+    execute_ddl(conn, IMAGES_V9_DDL)
+
+
+PROMO_CODES_V10_DDL: tuple[str, ...] = (
+    """
+    CREATE TABLE IF NOT EXISTS promo_codes (
+        id BIGSERIAL NOT NULL,
+        card_id BIGINT NOT NULL,
+        code VARCHAR NOT NULL,
+        issued_to VARCHAR,
+        issued_at TIMESTAMP WITH TIME ZONE,
+        PRIMARY KEY (id),
+        FOREIGN KEY(card_id) REFERENCES cards (id) ON DELETE CASCADE
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_promo_codes_unused ON promo_codes (card_id, issued_at, id) WHERE issued_at IS NULL",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_promo_codes_card_id_code ON promo_codes (card_id, code)",
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS ux_promo_codes_card_id_issued_to ON promo_codes (card_id, issued_to)
+    WHERE issued_to IS NOT NULL
+    """,
+)
+"Миграция 10: пулы одноразовых промокодов карточек"
+
+
+def _add_promo_codes(conn: Connection) -> None:
+    "Добавляет пулы одноразовых промокодов карточек"
+    execute_ddl(conn, PROMO_CODES_V10_DDL)
+
+
+CARD_STATS_V11_DDL: tuple[str, ...] = (
+    """
+    CREATE TABLE IF NOT EXISTS public.card_stats (
+        bucket TIMESTAMP WITH TIME ZONE NOT NULL,
+        tenant_id BIGINT NOT NULL,
+        card_id BIGINT NOT NULL,
+        views BIGINT DEFAULT 0 NOT NULL,
+        clicks BIGINT DEFAULT 0 NOT NULL,
+        PRIMARY KEY (bucket, tenant_id, card_id)
+    )
+    """,
+)
+"Миграция 11: счетчики просмотров и переходов по карточкам"
+
+
+def _add_card_stats(conn: Connection) -> None:
+    "Добавляет счетчики просмотров и переходов по карточкам"
+    execute_ddl(conn, CARD_STATS_V11_DDL)
+
+
+def _add_outbox_queue_index(conn: Connection) -> None:
+    "Добавляет частичный индекс ожидающих сообщений outbox по очереди"
+    execute_ddl(conn, (
+        """
+        CREATE INDEX IF NOT EXISTS ix_outbox_pending_queue_created_at ON public.outbox (queue, created_at, id)
+        WHERE status = 'PENDING'
+        """,
+    ))
+
+
+CARDS_TENANT_INDEXES_V13_DDL: tuple[str, ...] = (
+    "CREATE INDEX IF NOT EXISTS ix_cards_tenant_id_category_id ON {schema}.cards (tenant_id, category_id)",
+    "CREATE INDEX IF NOT EXISTS ix_cards_tenant_id_company_id ON {schema}.cards (tenant_id, company_id)",
+)
+"""Миграция 13: индексы карточек, начинающиеся с арендатора. `{schema}` - общая схема или схема арендатора
+с отдельным каталогом"""
+
+
+def _add_cards_tenant_indexes(conn: Connection) -> None:
+    "Добавляет индексы карточек по арендатору и категории, арендатору и компании в общей схеме и схемах арендаторов"
+    schemas: list[str] = [
+        "public",
+        *conn.scalars(text("SELECT schema_name FROM public.tenants WHERE schema_name IS NOT NULL ORDER BY id"))
+    ]
+    for schema in schemas:
+        execute_ddl(conn, tuple(statement.format(schema=schema) for statement in CARDS_TENANT_INDEXES_V13_DDL))
+
+
+MIGRATIONS: list[Migration] = [
+    Migration(1, "Начальная схема", _create_initial_schema),
+    Migration(2, "Полнотекстовый поиск карточек", _add_full_text_search),
+    Migration(3, "Индекс карточек по категории", _add_cards_category_index),
+    Migration(4, "Частичный индекс ожидающих сообщений outbox", _add_outbox_pending_index),
+    Migration(5, "Read model списка карточек категории", _add_card_summaries),
+    Migration(6, "Счетчики карточек категорий и компаний", _add_card_counts),
+    Migration(7, "Окна действия карточек", _add_card_validity),
+    Migration(8, "Арендаторы каталога", _add_tenants),
+    Migration(9, "Изображения карточек и логотипы компаний", _add_images),
+    Migration(10, "Пулы одноразовых промокодов", _add_promo_codes),
+    Migration(11, "Просмотры и переходы по карточкам", _add_card_stats),
+    Migration(12, "Индекс ожидающих сообщений outbox по очереди", _add_outbox_queue_index),
+    Migration(13, "Индексы карточек по арендатору", _add_cards_tenant_indexes),
+]
+"Список миграций в порядке применения"
+
+SCHEMA_VERSION: int = MIGRATIONS[-1].version
+"Версия схемы, которую ожидает текущий код"
+
+SCHEMA_VERSION_TABLE_DDL: str = """
+CREATE TABLE IF NOT EXISTS public.schema_version (
+    id INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    applied_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    PRIMARY KEY (id)
+)
+"""
+"Таблица версии схемы. Создается перед миграциями и не изменяется ими"
+
+MIGRATIONS_ADVISORY_LOCK_ID: int = 4_815_162_342
+"Ключ advisory lock, исключающий одновременное применение миграций несколькими процессами"
+
+
+async def get_schema_version(engine: AsyncEngine) -> int | None:
+    """
+    Возвращает номер примененной версии схемы.
+
+    Args:
+        engine (AsyncEngine): Асинхронный движок базы данных
+
+    Returns:
+        int | None: Номер версии или `None`, если схема еще не инициализирована.
+    """
+    try:
+        async with engine.connect() as conn:
+            return await conn.scalar(select(SchemaVersionTable.version).where(SchemaVersionTable.id == 1))
+    except ProgrammingError as exc:
+        logger.warning(f"Таблица {SchemaVersionTable.__tablename__} недоступна: {exc}")
+        return None
+
+
+async def check_schema_version(engine: AsyncEngine) -> bool:
+    """
+    Проверяет, что схема базы данных соответствует версии, которую ожидает код.
+
+    Args:
+        engine (AsyncEngine): Асинхронный движок базы данных
+
+    Returns:
+        bool: `True` если версия схемы равна `SCHEMA_VERSION`, иначе `False`.
+    """
+    version: int | None = await get_schema_version(engine)
+    if version != SCHEMA_VERSION:
+        logger.error(f"Версия схемы бд {version}, ожидается {SCHEMA_VERSION}")
+        return False
+    return True
+
+
+async def run_migrations(engine: AsyncEngine) -> int:
+    """
+    Применяет все непримененные миграции в одной транзакции под advisory lock.
+
+    Args:
+        engine (AsyncEngine): Асинхронный движок базы данных
+
+    Returns:
+        int: Номер версии схемы после применения миграций.
+    """
+    async with engine.begin() as conn:
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": MIGRATIONS_ADVISORY_LOCK_ID})
+        await conn.execute(text(SCHEMA_VERSION_TABLE_DDL))
+
+        current: int | None = await conn.scalar(
+            select(SchemaVersionTable.version).where(SchemaVersionTable.id == 1)
+        )
+        "Версия схемы до применения миграций"
+
+        for migration in MIGRATIONS:
+            if current is not None and migration.version <= current:
+                continue
+            logger.info(f"Применение миграции {migration.version}: {migration.description}")
+            await conn.run_sync(migration.upgrade)
+
+        if current is None:
+            await conn.execute(insert(SchemaVersionTable).values(id=1, version=SCHEMA_VERSION))
+        elif current < SCHEMA_VERSION:
+            await conn.execute(
+                update(SchemaVersionTable).values(version=SCHEMA_VERSION).where(SchemaVersionTable.id == 1)
+            )
+        logger.info(f"Версия схемы бд: {SCHEMA_VERSION}")
+        return SCHEMA_VERSION
@@ -1,18 +1,94 @@
 import enum
 from datetime import datetime
-
-from sqlalchemy import JSON, BigInteger, DateTime, Enum, ForeignKey, String
+from typing import Any
+
+from sqlalchemy import (
+    DDL,
+    JSON,
+    BigInteger,
+    Column,
+    Computed,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    and_,
+    event,
+    or_,
+    text,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from sqlalchemy.sql.elements import ColumnElement
 
 from .core_types import OutBoxStatuses
 
 
+CARDS_COUNTER_INFO_KEY: str = "cards_counter"
+"Ключ `Column.info` счетчиков карточек. Такие столбцы не редактируются в админ-панели"
+
+SHARED_SCHEMA: str = "public"
+"""Схема общих таблиц (арендаторы, outbox, версия схемы). Таблицы каталога объявлены без схемы
+и для арендаторов с отдельной схемой переводятся в нее через `schema_translate_map` (`core.tenants`)"""
+
+DEFAULT_TENANT_ID: int = 1
+"Идентификатор арендатора по умолчанию. Создается вместе с таблицей `tenants`, ему принадлежит существующий каталог"
+
+
 class BaseTable(DeclarativeBase, AsyncAttrs):
     """Базовый класс при наследовании от которого создается таблица в бд"""
     ...
 
 
+class TenantsTable(BaseTable):
+    """
+    Арендаторы - хост-системы, в которые встроена партнерская программа. У каждого свой каталог:
+    категории, компании и карточки со столбцом `tenant_id`. Арендатор определяется по хосту или по пути
+    запроса (`web.dependencies.resolve_tenant`).
+    """
+    __tablename__ = "tenants"
+
+    id: Mapped[int] = mapped_column(BigInteger, autoincrement=True, primary_key=True)
+    "Уникальный идентификатор PK"
+
+    slug: Mapped[str] = mapped_column(String, unique=True, nullable=False)
+    "Короткое имя арендатора в пути `/tenants/{slug}/partnerprogram/`"
+
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    "Наименование хост-системы"
+
+    host: Mapped[str | None] = mapped_column(String, unique=True, nullable=True)
+    "Хост, запросы к которому относятся к арендатору (без порта). `NULL` - только по пути"
+
+    schema_name: Mapped[str | None] = mapped_column(String, nullable=True)
+    """Отдельная схема Postgres с каталогом арендатора (`core.tenants.create_tenant_schema`).
+    `NULL` - каталог в общей схеме"""
+
+    __table_args__ = {"schema": SHARED_SCHEMA}
+
+
+event.listen(
+    TenantsTable.__table__,
+    "after_create",
+    DDL(f"INSERT INTO {SHARED_SCHEMA}.tenants (slug, name) VALUES ('default', 'Партнерская программа')")
+)
+
+
+def tenant_id_column(**kwargs: Any) -> Mapped[int]:
+    """Столбец `tenant_id` таблицы каталога.
+    Существующие строки и строки без арендатора относятся к арендатору по умолчанию"""
+    return mapped_column(
+        BigInteger,
+        ForeignKey(f"{SHARED_SCHEMA}.{TenantsTable.__tablename__}.id"),
+        nullable=False,
+        server_default=text(str(DEFAULT_TENANT_ID)),
+        **kwargs
+    )
+
+
 class CompaniesTable(BaseTable):
     "Таблица которая содержит информацию о компании, в которых проходит акции"
     __tablename__ = "companies"
@@ -20,15 +96,39 @@ class CompaniesTable(BaseTable):
     id: Mapped[int] = mapped_column(BigInteger, autoincrement=True, primary_key=True)
     "Уникальный идентификатор PK"
 
-    name: Mapped[str] = mapped_column(String, unique=True, nullable=False)
-    "Наименование компании"
+    tenant_id: Mapped[int] = tenant_id_column()
+    "Идентификатор арендатора"
 
-    short_description: Mapped[str] = mapped_column(String, unique=True, nullable=False)
-    "Краткое описание компании"
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    "Наименование компании (уникально в каталоге арендатора)"
+
+    short_description: Mapped[str] = mapped_column(String, nullable=False)
+    "Краткое описание компании (уникально в каталоге арендатора)"
+
+    logo: Mapped[str | None] = mapped_column(String, nullable=True)
+    "Ключ изображения логотипа (`core.images`). `NULL` - без логотипа"
+
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed("to_tsvector('russian', coalesce(name, ''))", persisted=True),
+        deferred=True
+    )
+    "Генерируемый столбец полнотекстового поиска по названию компании"
+
+    cards_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, server_default=text("0"), info={CARDS_COUNTER_INFO_KEY: True}
+    )
+    "Количество карточек компании. Поддерживается DML-функциями `core.database_utils`"
 
     cards: Mapped["CardsTable"] = relationship(back_populates="company")
     "Карточки компаний из cards"
 
+    __table_args__ = (
+        Index("ix_companies_search_vector", "search_vector", postgresql_using="gin", postgresql_with={"fastupdate": "off"}),
+        Index("ux_companies_tenant_id_name", "tenant_id", "name", unique=True),
+        Index("ux_companies_tenant_id_short_description", "tenant_id", "short_description", unique=True),
+    )
+
 
 class CategoriesTable(BaseTable):
     "Таблица отражающие возможные категории карточек"
@@ -37,12 +137,24 @@ class CategoriesTable(BaseTable):
     id: Mapped[int] = mapped_column(BigInteger, autoincrement=True, primary_key=True)
     "Уникальный идентификатор PK"
 
-    name: Mapped[str] = mapped_column(String, unique=True, nullable=False)
-    "Наименование категории"
+    tenant_id: Mapped[int] = tenant_id_column()
+    "Идентификатор арендатора"
+
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    "Наименование категории (уникально в каталоге арендатора)"
+
+    cards_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, server_default=text("0"), info={CARDS_COUNTER_INFO_KEY: True}
+    )
+    "Количество карточек в категории. Поддерживается DML-функциями `core.database_utils`"
 
     cards: Mapped[list["CardsTable"]] = relationship(back_populates="category")
     "Карточки, находящиеся в категории"
 
+    __table_args__ = (
+        Index("ux_categories_tenant_id_name", "tenant_id", "name", unique=True),
+    )
+
 
 class CardsTable(BaseTable):
     "Таблица, хранящая информацию о карточках с ссылкой на категорию"
@@ -51,10 +163,13 @@ class CardsTable(BaseTable):
     id: Mapped[int] = mapped_column(BigInteger, autoincrement=True, primary_key=True)
     "Уникальный идентификатор PK"
 
-    category_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("categories.id"))
+    tenant_id: Mapped[int] = tenant_id_column()
+    "Идентификатор арендатора"
+
+    category_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("categories.id"), index=True)
     "Идентификатор категории в которой находится карточки"
 
-    company_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("companies.id"))
+    company_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("companies.id"), index=True)
     "Идентификатор компании которой принадлежит карточка"
 
     main_label: Mapped[str] = mapped_column(String)
@@ -69,6 +184,12 @@ class CardsTable(BaseTable):
     validity_period: Mapped[str] = mapped_column(String, nullable=True)
     "Описание раздела 'Срок действия'"
 
+    valid_from: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True, index=True)
+    "Начало действия карточки. `NULL` - действует с момента создания"
+
+    valid_to: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True, index=True)
+    "Окончание действия карточки (не включительно). `NULL` - бессрочно"
+
     about_partner: Mapped[str] = mapped_column(String, nullable=True)
     "Описание раздела 'О партнере'"
 
@@ -81,12 +202,213 @@ class CardsTable(BaseTable):
     call_to_action_btn_label: Mapped[str] = mapped_column(String, nullable=True)
     "Надпись на кнопке с ссылкой если есть"
 
+    image: Mapped[str | None] = mapped_column(String, nullable=True)
+    "Ключ изображения баннера (`core.images`). `NULL` - без баннера"
+
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "to_tsvector('russian', coalesce(main_label, '') || ' ' || coalesce(description_under_label, '')"
+            " || ' ' || coalesce(about_partner, ''))",
+            persisted=True
+        ),
+        deferred=True
+    )
+    "Генерируемый столбец полнотекстового поиска по заголовку, описанию и тексту о партнере"
+
     category: Mapped["CategoriesTable"] = relationship(back_populates="cards")
     "Категория, в которой находится карточка"
 
     company: Mapped["CompaniesTable"] = relationship(back_populates="cards")
     "Компания, которой принадлежит карточка"
 
+    __table_args__ = (
+        Index("ix_cards_search_vector", "search_vector", postgresql_using="gin", postgresql_with={"fastupdate": "off"}),
+        # Выборки каталога фильтруют карточки по арендатору. Индексы по одному category_id и company_id
+        # остаются для проверки внешних ключей при удалении категории или компании
+        Index("ix_cards_tenant_id_category_id", "tenant_id", "category_id"),
+        Index("ix_cards_tenant_id_company_id", "tenant_id", "company_id"),
+    )
+
+
+PROMO_CODES_UNUSED_CONDITION: str = "issued_at IS NULL"
+"""Условие частичного индекса невыданных промокодов. Запрос выдачи повторяет его буквально,
+чтобы планировщик выбрал частичный индекс"""
+
+
+class PromoCodesTable(BaseTable):
+    """
+    Пул одноразовых промокодов карточки. Промокод выдается посетителю один раз
+    (`core.database_utils.claim_promo_code`), загружаются пулы через COPY (`load_promo_codes`).
+    """
+    __tablename__ = "promo_codes"
+
+    id: Mapped[int] = mapped_column(BigInteger, autoincrement=True, primary_key=True)
+    "Уникальный идентификатор PK. Промокоды выдаются в порядке загрузки"
+
+    card_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("cards.id", ondelete="CASCADE"), nullable=False)
+    "Идентификатор карточки пула"
+
+    code: Mapped[str] = mapped_column(String, nullable=False)
+    "Промокод"
+
+    issued_to: Mapped[str | None] = mapped_column(String, nullable=True)
+    "Идентификатор посетителя, получившего промокод. `NULL` - промокод не выдан"
+
+    issued_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    "Момент выдачи"
+
+    __table_args__ = (
+        Index("ux_promo_codes_card_id_code", "card_id", "code", unique=True),
+        # issued_at в ключе всегда NULL: запрос выдачи сортирует по (issued_at, id), и этот порядок дает только
+        # частичный индекс. С сортировкой по id планировщик мог выбрать обход первичного ключа с фильтром,
+        # который проходит все уже выданные промокоды
+        Index(
+            "ix_promo_codes_unused", "card_id", "issued_at", "id",
+            postgresql_where=text(PROMO_CODES_UNUSED_CONDITION)
+        ),
+        Index(
+            "ux_promo_codes_card_id_issued_to", "card_id", "issued_to", unique=True,
+            postgresql_where=text("issued_to IS NOT NULL")
+        ),
+    )
+
+
+class CardSummariesTable(BaseTable):
+    """
+    Read model списка карточек категории: ровно те столбцы, которые выводит шаблон `client/cards.html`.
+    Строки упорядочены первичным ключом `(tenant_id, category_id, card_id)`, поэтому страница категории
+    арендатора читается одним проходом по диапазону индекса без соединения с `companies`.
+
+    Таблица поддерживается триггерами `CARD_SUMMARIES_TRIGGERS_DDL` на `cards` и `companies`,
+    удаленные карточки удаляются внешним ключом с `ON DELETE CASCADE`.
+    Расхождения с исходными таблицами ищет `core.read_models.check_card_summaries`.
+    """
+    __tablename__ = "card_summaries"
+
+    tenant_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, server_default=text(str(DEFAULT_TENANT_ID)))
+    "Идентификатор арендатора карточки"
+
+    category_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    "Идентификатор категории карточки"
+
+    card_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("cards.id", ondelete="CASCADE"), primary_key=True)
+    "Идентификатор карточки"
+
+    company_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    "Идентификатор компании карточки (для обновления при изменении компании)"
+
+    main_label: Mapped[str] = mapped_column(String)
+    "Текст заголовка на карточке"
+
+    description_under_label: Mapped[str] = mapped_column(String)
+    "Описание под заголовком"
+
+    company_name: Mapped[str] = mapped_column(String)
+    "Наименование компании"
+
+    company_short_description: Mapped[str] = mapped_column(String)
+    "Краткое описание компании"
+
+    image: Mapped[str | None] = mapped_column(String, nullable=True)
+    "Ключ изображения баннера карточки"
+
+    company_logo: Mapped[str | None] = mapped_column(String, nullable=True)
+    "Ключ изображения логотипа компании"
+
+    valid_from: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    "Начало действия карточки"
+
+    valid_to: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    "Окончание действия карточки"
+
+    __table_args__ = (
+        Index("ux_card_summaries_card_id", "card_id", unique=True),
+        Index("ix_card_summaries_company_id", "company_id"),
+    )
+
+
+CARD_SUMMARY_COLUMNS: tuple[str, ...] = (
+    "card_id",
+    "tenant_id",
+    "category_id",
+    "company_id",
+    "main_label",
+    "description_under_label",
+    "company_name",
+    "company_short_description",
+    "image",
+    "company_logo",
+    "valid_from",
+    "valid_to",
+)
+"Столбцы `card_summaries` в порядке выражений триггеров"
+
+CARD_SUMMARIES_TRIGGERS_DDL: tuple[str, ...] = (
+    """
+    CREATE OR REPLACE FUNCTION sync_card_summary() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO card_summaries (
+            card_id, tenant_id, category_id, company_id, main_label, description_under_label,
+            company_name, company_short_description, image, company_logo, valid_from, valid_to
+        )
+        SELECT NEW.id, NEW.tenant_id, NEW.category_id, NEW.company_id, NEW.main_label, NEW.description_under_label,
+            companies.name, companies.short_description, NEW.image, companies.logo, NEW.valid_from, NEW.valid_to
+        FROM companies
+        WHERE companies.id = NEW.company_id
+        ON CONFLICT (card_id) DO UPDATE SET
+            tenant_id = EXCLUDED.tenant_id,
+            category_id = EXCLUDED.category_id,
+            company_id = EXCLUDED.company_id,
+            main_label = EXCLUDED.main_label,
+            description_under_label = EXCLUDED.description_under_label,
+            company_name = EXCLUDED.company_name,
+            company_short_description = EXCLUDED.company_short_description,
+            image = EXCLUDED.image,
+            company_logo = EXCLUDED.company_logo,
+            valid_from = EXCLUDED.valid_from,
+            valid_to = EXCLUDED.valid_to;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql SET search_path FROM CURRENT
+    """,
+    """
+    CREATE OR REPLACE FUNCTION sync_company_card_summaries() RETURNS trigger AS $$
+    BEGIN
+        UPDATE card_summaries
+        SET company_name = NEW.name, company_short_description = NEW.short_description, company_logo = NEW.logo
+        WHERE company_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql SET search_path FROM CURRENT
+    """,
+    "DROP TRIGGER IF EXISTS card_summaries_sync_cards ON cards",
+    """
+    CREATE TRIGGER card_summaries_sync_cards
+    AFTER INSERT OR UPDATE OF tenant_id, category_id, company_id, main_label, description_under_label,
+        image, valid_from, valid_to ON cards
+    FOR EACH ROW EXECUTE FUNCTION sync_card_summary()
+    """,
+    "DROP TRIGGER IF EXISTS card_summaries_sync_companies ON companies",
+    """
+    CREATE TRIGGER card_summaries_sync_companies
+    AFTER UPDATE OF name, short_description, logo ON companies
+    FOR EACH ROW EXECUTE FUNCTION sync_company_card_summaries()
+    """,
+)
+"""Функции и триггеры, поддерживающие `card_summaries`. Выполняются при создании таблицы (`metadata.create_all`),
+миграции пересоздают триггеры своими копиями DDL (`core.migrations`). Функции запоминают `search_path` момента
+создания, поэтому в отдельной схеме арендатора они создаются и работают с таблицами этой схемы"""
+
+for statement in CARD_SUMMARIES_TRIGGERS_DDL:
+    event.listen(CardSummariesTable.__table__, "after_create", DDL(statement))
+
+
+OUTBOX_PENDING_CONDITION: str = "status = 'PENDING'"
+"""Условие частичного индекса сообщений outbox, ожидающих отправки. Запросы, которые должны
+использовать индекс, повторяют условие буквально: с параметром вместо литерала планировщик
+не может сопоставить запрос с частичным индексом"""
+
 
 class OutboxTable(BaseTable):
     __tablename__ = "outbox"
@@ -100,12 +422,99 @@ class OutboxTable(BaseTable):
     queue: Mapped[str] = mapped_column(String)
     "Наименование очереди в которую нужно отправить сообщение"
 
-    status: Mapped[enum.Enum] = mapped_column(Enum(OutBoxStatuses))
+    status: Mapped[enum.Enum] = mapped_column(Enum(OutBoxStatuses, schema=SHARED_SCHEMA))
     "Статус сообщения. Перечисление OutBoxStatuses"
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
     "Дата создания записи"
 
+    __table_args__ = (
+        Index("ix_outbox_pending_created_at", "created_at", postgresql_where=text(OUTBOX_PENDING_CONDITION)),
+        # Процессор outbox выбирает пачки каждой очереди отдельно и находит очереди с ожидающими
+        # сообщениями обходом этого индекса (`get_pending_outbox_queues`)
+        Index(
+            "ix_outbox_pending_queue_created_at", "queue", "created_at", "id",
+            postgresql_where=text(OUTBOX_PENDING_CONDITION)
+        ),
+        {"schema": SHARED_SCHEMA},
+    )
+
+
+class CardStatsTable(BaseTable):
+    """
+    Просмотры и переходы по карточкам за интервалы времени. Строки пишут воркеры, накопив события
+    в памяти (`core.card_stats.CardStatsAggregator`), по одному upsert на интервал.
+    Таблица общая для всех арендаторов, поэтому у `card_id` нет внешнего ключа: карточка может
+    находиться в отдельной схеме арендатора.
+    """
+    __tablename__ = "card_stats"
+
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    "Начало интервала. Первый столбец ключа: отчеты выбирают диапазон интервалов, а новые строки дописываются в конец"
+
+    tenant_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    "Идентификатор арендатора карточки"
+
+    card_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    "Идентификатор карточки"
+
+    views: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default=text("0"))
+    "Открытия модального окна карточки"
+
+    clicks: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default=text("0"))
+    "Переходы по ссылке кнопки карточки"
+
+    __table_args__ = {"schema": SHARED_SCHEMA}
+
+
+class CardValidityStateTable(BaseTable):
+    """
+    Таблица с единственной строкой - состояние планировщика окон действия карточек (`core.validity`).
+    Блокировка строки упорядочивает обработку границ окон между процессами и изменение счетчиков карточек.
+    """
+    __tablename__ = "card_validity_state"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, default=1)
+    "Уникальный идентификатор PK (всегда 1)"
+
+    processed_until: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    """Момент, до которого (включительно) обработаны границы окон действия.
+    Счетчики карточек `cards_count` считают карточки, действующие в этот момент"""
+
+
+def active_card_condition(valid_from: Column, valid_to: Column, moment: Any) -> ColumnElement[bool]:
+    """
+    Условие "карточка действует в момент `moment`": `valid_from <= moment < valid_to`, `NULL` - без границы.
+
+    Args:
+        valid_from (Column): Столбец начала действия (`cards` или `card_summaries`)
+        valid_to (Column): Столбец окончания действия
+        moment (Any): Момент времени: выражение SQL (например, `func.now()`) или `datetime`
+
+    Returns:
+        ColumnElement[bool]: Условие SQLAlchemy.
+    """
+    return and_(
+        or_(valid_from.is_(None), valid_from <= moment),
+        or_(valid_to.is_(None), valid_to > moment)
+    )
+
+
+class SchemaVersionTable(BaseTable):
+    "Таблица с единственной строкой, хранящая номер примененной версии схемы бд"
+    __tablename__ = "schema_version"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, default=1)
+    "Уникальный идентификатор PK (всегда 1)"
+
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+    "Номер последней примененной миграции"
+
+    applied_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, onupdate=datetime.now)
+    "Дата применения последней миграции"
+
+    __table_args__ = {"schema": SHARED_SCHEMA}
+
 
 tables: dict[str, BaseTable] = {
     CompaniesTable.__tablename__ : CompaniesTable,
@@ -114,20 +523,43 @@ tables: dict[str, BaseTable] = {
 }
 "Словарь, который под именем таблицы __tablename__ содержит ссылку на ее класс"
 
+
+def get_editable_columns(table: BaseTable) -> list[Column]:
+    """
+    Возвращает столбцы таблицы, которые показываются и редактируются в админ-панели.
+    Генерируемые бд столбцы (например, `search_vector`) и счетчики карточек (`cards_count`) исключаются.
+
+    Args:
+        table (BaseTable): Модель SQLAlchemy, представляющая таблицу базы данных.
+
+    Returns:
+        list[Column]: Столбцы таблицы в порядке объявления.
+    """
+    return [
+        column for column in table.__table__.columns
+        if column.computed is None and not column.info.get(CARDS_COUNTER_INFO_KEY)
+    ]
+
+
 russian_field_names: dict[str, str] = {
     "id": "ИД",
     "name": "Наименование",
     CompaniesTable.short_description.name: "Описание",
+    CardsTable.tenant_id.name: "ИД Арендатора",
     CardsTable.category_id.name: "ИД Категории",
     CardsTable.company_id.name: "ИД Компании",
     CardsTable.main_label.name: "Заголовок карточки",
     CardsTable.description_under_label.name: "Описание под заголовком",
     CardsTable.obtain_method_description.name: "Метод получения",
     CardsTable.validity_period.name: "Срок действия",
+    CardsTable.valid_from.name: "Действует с",
+    CardsTable.valid_to.name: "Действует до",
     CardsTable.about_partner.name: "О партнере",
     CardsTable.promocode.name: "Промокод",
     CardsTable.call_to_action_link.name: "Ссылка в кнопке карточки",
-    CardsTable.call_to_action_btn_label.name: "Надпись на кнопке в карточке"
+    CardsTable.call_to_action_btn_label.name: "Надпись на кнопке в карточке",
+    CardsTable.image.name: "Изображение",
+    CompaniesTable.logo.name: "Логотип"
 }
 "Русские названия полей таблиц. Ключ - оригинальное название столбца. Значение - перевод на русский"
 
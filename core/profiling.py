@@ -0,0 +1,123 @@
+"""
+Профилирование отдельных запросов по требованию.
+
+`SamplingProfiler` - статистический профилировщик: фоновый поток с интервалом `interval` снимает стек
+потока цикла событий (`sys._current_frames`) и считает одинаковые стеки. Результат в формате
+folded stacks (`функция;функция;... количество`) открывается в speedscope, inferno и flamegraph.pl.
+Профилируется весь поток, поэтому в профиль попадают и параллельные запросы того же воркера.
+
+SQL-выражения профилируемого запроса и их длительность записываются обработчиками событий движка
+SQLAlchemy. Обработчики регистрируются `install_sql_timing` только при включенном профилировании.
+"""
+import sys
+import threading
+import time
+
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from types import FrameType
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .metrics import DbHelperCall, current_db_helper
+
+
+@dataclass
+class RequestProfile:
+    """
+    Данные профиля одного запроса.
+
+    Args:
+        sql (list[dict[str, Any]]): Выполненные SQL-выражения: текст, длительность и функция `core.database_utils`
+    """
+    sql: list[dict[str, Any]] = field(default_factory=list)
+
+
+current_profile: ContextVar[RequestProfile | None] = ContextVar("current_profile", default=None)
+"Профиль текущего запроса. `None`, если запрос не профилируется"
+
+SQL_STARTED_KEY: str = "profiling_sql_started"
+"Ключ `Connection.info` со стеком времени начала выражений"
+
+
+def collapse_stack(frame: FrameType | None) -> str:
+    """
+    Преобразует стек в строку folded stacks: от внешнего вызова к внутреннему через `;`.
+
+    Args:
+        frame (FrameType | None): Текущий кадр потока
+
+    Returns:
+        str: Стек вида `asyncio.base_events.run_forever;web.handlers.client_handlers.get_cards`.
+    """
+    names: list[str] = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}.{code.co_qualname}")
+        frame = frame.f_back
+    return ";".join(reversed(names)).replace(" ", "_")
+
+
+class SamplingProfiler:
+    """
+    Статистический профилировщик потока, в котором вызван `start`.
+
+    Args:
+        interval (float): Интервал между снимками стека, секунды
+    """
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        "Количество снимков каждого стека"
+        self.thread_id: int | None = None
+        self.stop_event = threading.Event()
+        self.thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self.thread_id = threading.get_ident()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.sample, name="sampling-profiler", daemon=True)
+        self.thread.start()
+
+    def sample(self) -> None:
+        while not self.stop_event.wait(self.interval):
+            frame: FrameType | None = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse_stack(frame)] += 1
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def folded(self) -> str:
+        "Профиль в формате folded stacks"
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if current_profile.get() is not None:
+        conn.info.setdefault(SQL_STARTED_KEY, []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    profile: RequestProfile | None = current_profile.get()
+    started: list[float] = conn.info.get(SQL_STARTED_KEY) or []
+    if profile is None or not started:
+        return
+    helper: DbHelperCall | None = current_db_helper.get()
+    profile.sql.append({
+        "statement": statement,
+        "duration_ms": round((time.perf_counter() - started.pop()) * 1000, 3),
+        "helper": helper.name if helper is not None else None,
+    })
+
+
+def install_sql_timing() -> None:
+    "Регистрирует обработчики событий всех движков, записывающие SQL-выражения в профиль текущего запроса"
+    if not event.contains(Engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", after_cursor_execute)
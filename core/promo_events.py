@@ -0,0 +1,104 @@
+"""
+Агрегированные события outbox о выдаче промокодов.
+
+Выдача промокода - горячий клиентский запрос, и строка outbox на каждый промокод удвоила бы записи в основную бд
+и сообщения в очереди. Поэтому `PromoIssueEvents` считает выдачи в памяти процесса по арендатору и карточке
+и раз в `interval` записывает в outbox одно событие с количествами за интервал.
+
+Счетчики процесса теряются только при аварийном завершении воркера: при остановке приложения
+накопленные выдачи записываются (`PromoIssueEvents.stop`), а при ошибке записи возвращаются в счетчики.
+"""
+import asyncio
+
+from collections import Counter
+from datetime import datetime, timezone
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from .database_utils.outbox import insert_into_outbox
+from .models import PromoCodesTable
+
+
+class PromoIssueEvents:
+    """
+    Накопитель выдач промокодов с фоновой записью агрегированных событий в outbox.
+
+    Args:
+        session_maker (async_sessionmaker): Фабрика сессий основной бд
+        queue_name (str): Имя очереди событий outbox
+        interval (float): Пауза между записями событий, секунды
+    """
+    def __init__(self, session_maker: async_sessionmaker, queue_name: str, interval: float = 5.0):
+        self.session_maker = session_maker
+        self.queue_name = queue_name
+        self.interval = interval
+        self.counts: Counter[tuple[int, int]] = Counter()
+        "Выдачи с прошлой записи. Ключ - (`tenant_id`, `card_id`), значение - количество промокодов"
+        self.since: datetime = datetime.now(timezone.utc)
+        "Начало интервала накопленных выдач"
+        self.task: asyncio.Task | None = None
+
+    def add(self, tenant_id: int, card_id: int) -> None:
+        "Учитывает выданный промокод. Не обращается к бд"
+        self.counts[(tenant_id, card_id)] += 1
+
+    async def flush(self) -> int:
+        """
+        Записывает накопленные выдачи одним событием outbox `issue`.
+
+        Returns:
+            int: Количество промокодов в записанном событии. 0 - выдач не было или запись не удалась.
+        """
+        if not self.counts:
+            return 0
+        counts, self.counts = self.counts, Counter()
+        since, until = self.since, datetime.now(timezone.utc)
+        self.since = until
+        try:
+            async with self.session_maker() as session:
+                async with session.begin():
+                    written: bool = await insert_into_outbox(
+                        payload={
+                            "action": "issue",
+                            "entity": PromoCodesTable.__tablename__,
+                            "counts": [
+                                {"tenant_id": tenant_id, "card_id": card_id, "count": count}
+                                for (tenant_id, card_id), count in sorted(counts.items())
+                            ],
+                            "since": since.isoformat(),
+                            "until": until.isoformat()
+                        },
+                        queue=self.queue_name,
+                        session=session
+                    )
+                    if not written:
+                        raise RuntimeError("Событие выдачи промокодов не записано в outbox")
+        except Exception as exc:
+            logger.error(f"Ошибка записи событий выдачи промокодов: {exc}")
+            # Выдачи попадут в следующее событие, его интервал начнется с начала неудачного
+            self.counts.update(counts)
+            self.since = since
+            return 0
+        return sum(counts.values())
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def start(self) -> asyncio.Task:
+        "Запускает периодическую запись событий в фоновой задаче"
+        self.task = asyncio.create_task(self.run())
+        return self.task
+
+    async def stop(self) -> None:
+        "Останавливает фоновую задачу и записывает накопленные выдачи"
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.flush()
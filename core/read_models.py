@@ -0,0 +1,223 @@
+"""
+Денормализованные данные каталога и их обслуживание.
+
+Read model `card_summaries` - список карточек категории для страницы `client/cards.html`.
+Таблица поддерживается триггерами (`core.models.CARD_SUMMARIES_TRIGGERS_DDL`), поэтому ее не нужно обновлять
+в DML-функциях. Здесь собраны операции обслуживания: полное перестроение (после массовой загрузки
+с отключенными триггерами) и проверка согласованности с `cards` и `companies`, которая находит
+недостающие, устаревшие и лишние строки и при необходимости исправляет их.
+
+Счетчики карточек `cards_count` категорий и компаний изменяют DML-функции (`core.database_utils.counters`),
+`recompute_card_counts` пересчитывает их целиком после массовой загрузки или при расхождениях. Счетчики
+учитывают только карточки, действующие в момент `card_validity_state.processed_until` (`core.validity`).
+"""
+from dataclasses import dataclass, field
+from typing import Any
+
+from loguru import logger
+from sqlalchemy import BigInteger, Select, Table, Update, any_, bindparam, delete, func, or_, select, text, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from .database_utils.counters import CARD_COUNTERS
+from .models import (
+    CARD_SUMMARY_COLUMNS,
+    CardSummariesTable,
+    CardsTable,
+    CardValidityStateTable,
+    CompaniesTable,
+    active_card_condition
+)
+
+
+SAMPLE_SIZE: int = 20
+"Количество идентификаторов расходящихся карточек в отчете проверки"
+
+
+def build_card_summaries_source() -> Select:
+    """
+    Формирует запрос строк `card_summaries` из исходных таблиц: соединение `cards` с `companies`.
+    Столбцы идут в порядке `CARD_SUMMARY_COLUMNS`.
+
+    Returns:
+        Select: Запрос SQLAlchemy к таблице карточек с присоединенной таблицей компаний.
+    """
+    return select(
+            CardsTable.id.label("card_id"),
+            CardsTable.tenant_id,
+            CardsTable.category_id,
+            CardsTable.company_id,
+            CardsTable.main_label,
+            CardsTable.description_under_label,
+            CompaniesTable.name.label("company_name"),
+            CompaniesTable.short_description.label("company_short_description"),
+            CardsTable.image,
+            CompaniesTable.logo.label("company_logo"),
+            CardsTable.valid_from,
+            CardsTable.valid_to
+        ).join(CompaniesTable, CompaniesTable.id == CardsTable.company_id
+    )
+
+
+def build_card_summaries_source_in_order() -> Select:
+    "`build_card_summaries_source` в порядке первичного ключа `card_summaries`"
+    return build_card_summaries_source().order_by(CardsTable.tenant_id, CardsTable.category_id, CardsTable.id)
+
+
+async def rebuild_card_summaries(conn: AsyncConnection) -> int:
+    """
+    Перестраивает `card_summaries` целиком в транзакции соединения. Строки вставляются в порядке первичного ключа:
+    карточки одной категории оказываются на соседних страницах таблицы, и страница категории читает их подряд.
+
+    Args:
+        conn (AsyncConnection): Асинхронное соединение. Транзакцию фиксирует вызывающий код
+
+    Returns:
+        int: Количество строк read model.
+    """
+    await conn.execute(text(f"TRUNCATE {CardSummariesTable.__tablename__}"))
+    result = await conn.execute(
+        insert(CardSummariesTable).from_select(CARD_SUMMARY_COLUMNS, build_card_summaries_source_in_order())
+    )
+    return result.rowcount
+
+
+@dataclass
+class CardSummariesReport:
+    """
+    Результат проверки согласованности `card_summaries`.
+
+    Args:
+        missing (int): Карточки, которых нет в read model
+        stale (int): Строки read model, поля которых отличаются от исходных таблиц
+        orphaned (int): Строки read model без исходной карточки (например, после загрузки с отключенными
+            ограничениями)
+        sample_card_ids (list[int]): Идентификаторы части расходящихся карточек
+        repaired (bool): Расхождения исправлены
+    """
+    missing: int = 0
+    stale: int = 0
+    orphaned: int = 0
+    sample_card_ids: list[int] = field(default_factory=list)
+    repaired: bool = False
+
+    @property
+    def consistent(self) -> bool:
+        return not (self.missing or self.stale or self.orphaned)
+
+
+async def check_card_summaries(conn: AsyncConnection, repair: bool = False) -> CardSummariesReport:
+    """
+    Сравнивает `card_summaries` с соединением `cards` и `companies` (FULL JOIN по идентификатору карточки).
+
+    Args:
+        conn (AsyncConnection): Асинхронное соединение. Транзакцию фиксирует вызывающий код
+        repair (bool): Исправить расхождения: удалить лишние строки и перезаписать недостающие и устаревшие
+
+    Returns:
+        CardSummariesReport: Количество расхождений каждого вида.
+    """
+    source = build_card_summaries_source().subquery("source")
+    summaries: Table = CardSummariesTable.__table__
+    card_id = source.c.card_id.label("source_card_id")
+    summary_card_id = summaries.c.card_id.label("summary_card_id")
+    rows = (await conn.execute(
+        select(card_id, summary_card_id)
+        .select_from(source.outerjoin(summaries, summaries.c.card_id == source.c.card_id, full=True))
+        .where(or_(
+            source.c.card_id.is_(None),
+            summaries.c.card_id.is_(None),
+            *(source.c[name].is_distinct_from(summaries.c[name]) for name in CARD_SUMMARY_COLUMNS)
+        ))
+    )).all()
+
+    report = CardSummariesReport()
+    for source_id, summary_id in rows:
+        if summary_id is None:
+            report.missing += 1
+        elif source_id is None:
+            report.orphaned += 1
+        else:
+            report.stale += 1
+    card_ids: list[int] = [source_id if source_id is not None else summary_id for source_id, summary_id in rows]
+    report.sample_card_ids = sorted(card_ids)[:SAMPLE_SIZE]
+
+    if report.consistent:
+        logger.info("card_summaries согласована с cards и companies")
+        return report
+    logger.warning(
+        f"Расхождения card_summaries: нет {report.missing}, устарели {report.stale}, лишние {report.orphaned}, "
+        f"карточки {report.sample_card_ids}"
+    )
+    if repair:
+        # Идентификаторы передаются одним параметром-массивом: их может быть больше лимита параметров запроса
+        ids = bindparam("card_ids", card_ids, type_=ARRAY(BigInteger))
+        await conn.execute(delete(CardSummariesTable).where(CardSummariesTable.card_id == any_(ids)))
+        await conn.execute(
+            insert(CardSummariesTable).from_select(
+                CARD_SUMMARY_COLUMNS,
+                build_card_summaries_source().where(CardsTable.id == any_(ids))
+            )
+        )
+        report.repaired = True
+        logger.info(f"Исправлено строк card_summaries: {len(card_ids)}")
+    return report
+
+
+def build_card_counts_updates(moment: Any = None) -> dict[str, Update]:
+    """
+    Формирует запросы пересчета счетчиков карточек `cards_count`: по одному `UPDATE` на таблицу.
+    Изменяются только строки с неверным значением счетчика.
+
+    Args:
+        moment (Any): Считать только карточки, действующие в этот момент (выражение SQL или `datetime`).
+            `None` - все карточки
+
+    Returns:
+        dict[str, Update]: Запросы по именам таблиц категорий и компаний.
+    """
+    updates: dict[str, Update] = {}
+    for column_name, counted in CARD_COUNTERS.items():
+        reference = CardsTable.__table__.c[column_name]
+        counts = select(reference.label("id"), func.count().label("cards_count")).group_by(reference)
+        if moment is not None:
+            counts = counts.where(active_card_condition(CardsTable.valid_from, CardsTable.valid_to, moment))
+        counts = counts.subquery("counts")
+        actual = select(
+                counted.id,
+                func.coalesce(counts.c.cards_count, 0).label("cards_count")
+            ).outerjoin(counts, counts.c.id == counted.id
+        ).subquery("actual")
+        updates[counted.__tablename__] = update(counted).values(cards_count=actual.c.cards_count).where(
+            counted.id == actual.c.id, counted.cards_count != actual.c.cards_count
+        )
+    return updates
+
+
+async def recompute_card_counts(conn: AsyncConnection) -> dict[str, int]:
+    """
+    Пересчитывает счетчики карточек `cards_count` категорий и компаний (`build_card_counts_updates`)
+    по карточкам, действующим в момент `processed_until` (строка состояния создается, если ее нет).
+    Строка состояния блокируется на чтение,
+    чтобы планировщик не сдвинул этот момент до конца транзакции.
+
+    Args:
+        conn (AsyncConnection): Асинхронное соединение. Транзакцию фиксирует вызывающий код
+
+    Returns:
+        dict[str, int]: Количество исправленных строк по именам таблиц.
+    """
+    await conn.execute(
+        insert(CardValidityStateTable).values(id=1, processed_until=func.now()).on_conflict_do_nothing()
+    )
+    processed_until = await conn.scalar(
+        select(CardValidityStateTable.processed_until).where(CardValidityStateTable.id == 1).with_for_update(read=True)
+    )
+    corrected: dict[str, int] = {}
+    for table_name, stmt in build_card_counts_updates(processed_until).items():
+        corrected[table_name] = (await conn.execute(stmt)).rowcount
+    if any(corrected.values()):
+        logger.warning(f"Исправлены счетчики карточек: {corrected}")
+    else:
+        logger.info("Счетчики карточек верны")
+    return corrected
@@ -0,0 +1,234 @@
+"""
+Журнал медленных SQL-запросов.
+
+Обработчики событий движка засекают каждое выражение. Выражения дольше порога пишутся в лог с функцией
+`core.database_utils`, из которой они вызваны, и параметрами, у которых вместо значений указан только тип.
+План `EXPLAIN (ANALYZE, BUFFERS)` снимается в фоновой задаче на отдельном соединении, а не в запросе пользователя.
+`ANALYZE` выполняет запрос повторно, поэтому он используется только для SELECT (в транзакции только для чтения),
+для остальных выражений снимается план без выполнения.
+
+Записи лога и снятие планов ограничены по частоте, один и тот же запрос объясняется не чаще `explain_interval`,
+поэтому лавина медленных запросов не нагружает базу еще сильнее.
+"""
+import asyncio
+import re
+import time
+
+from typing import Any
+
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .metrics import DB_SLOW_QUERIES, DbHelperCall, current_db_helper
+
+
+STARTED_KEY: str = "slow_query_started"
+"Ключ `Connection.info` со стеком времени начала выражений"
+
+READ_ONLY_STATEMENT: re.Pattern = re.compile(
+    r"^\s*select\b(?!.*\bfor\s+(update|no\s+key\s+update|share|key\s+share)\b)", re.I | re.S
+)
+"SELECT без блокировок строк - для него безопасно `EXPLAIN ANALYZE`"
+
+MAX_LOGGED_STATEMENT_LENGTH: int = 2000
+"Максимальная длина текста запроса в логе"
+
+
+class RateLimiter:
+    """
+    Ограничитель частоты (token bucket).
+
+    Args:
+        rate (int): Допустимое количество событий за `per` секунд
+        per (float): Период, секунды
+    """
+    def __init__(self, rate: int, per: float = 60.0):
+        self.capacity = float(rate)
+        self.per = per
+        self.tokens = float(rate)
+        self.updated_at: float = time.monotonic()
+
+    def allow(self) -> bool:
+        now: float = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.capacity / self.per)
+        self.updated_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+def describe_value(value: Any) -> str:
+    "Описание значения параметра без самого значения: тип и длина"
+    if value is None:
+        return "NULL"
+    if isinstance(value, str | bytes | list | tuple | dict):
+        return f"<{type(value).__name__}:{len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def redact_parameters(parameters: Any) -> Any:
+    """
+    Заменяет значения параметров выражения их описанием (`describe_value`).
+
+    Args:
+        parameters (Any): Параметры DBAPI: кортеж, словарь или список наборов параметров (executemany)
+
+    Returns:
+        Any: Параметры той же структуры с описаниями вместо значений.
+    """
+    if isinstance(parameters, dict):
+        return {key: describe_value(value) for key, value in parameters.items()}
+    if isinstance(parameters, list | tuple):
+        if parameters and isinstance(parameters[0], list | tuple | dict):
+            return [redact_parameters(parameters[0]), f"... {len(parameters)} наборов"]
+        return [describe_value(value) for value in parameters]
+    return describe_value(parameters)
+
+
+class SlowQueryLog:
+    """
+    Журнал медленных запросов одного движка.
+
+    Args:
+        engine (AsyncEngine): Асинхронный движок (asyncpg)
+        threshold (float): Порог длительности выражения, секунды
+        explain (bool): Снимать план медленных запросов
+        logs_per_minute (int): Максимум записей о медленных запросах в минуту. Остальные только считаются
+        explains_per_minute (int): Максимум снятых планов в минуту
+        explain_interval (float): Минимальный интервал между планами одного и того же запроса, секунды
+        explain_timeout (float): Ограничение длительности `EXPLAIN`, секунды
+    """
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        threshold: float,
+        explain: bool = True,
+        logs_per_minute: int = 60,
+        explains_per_minute: int = 6,
+        explain_interval: float = 600.0,
+        explain_timeout: float = 10.0
+    ):
+        self.engine = engine
+        self.threshold = threshold
+        self.explain = explain
+        self.log_limiter = RateLimiter(logs_per_minute)
+        self.explain_limiter = RateLimiter(explains_per_minute)
+        self.explain_interval = explain_interval
+        self.explain_timeout = explain_timeout
+        self.suppressed: int = 0
+        "Медленные запросы, не записанные в лог из-за ограничения частоты"
+        self.explained_at: dict[str, float] = {}
+        "Время последнего плана по тексту запроса"
+        self.explain_tasks: set[asyncio.Task] = set()
+        event.listen(engine.sync_engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(engine.sync_engine, "after_cursor_execute", self.after_cursor_execute)
+
+    def remove(self) -> None:
+        "Отключает журнал от движка"
+        event.remove(self.engine.sync_engine, "before_cursor_execute", self.before_cursor_execute)
+        event.remove(self.engine.sync_engine, "after_cursor_execute", self.after_cursor_execute)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault(STARTED_KEY, []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        started: list[float] = conn.info.get(STARTED_KEY) or []
+        if not started:
+            return
+        duration: float = time.perf_counter() - started.pop()
+        if duration < self.threshold:
+            return
+
+        helper: DbHelperCall | None = current_db_helper.get()
+        helper_name: str | None = helper.name if helper is not None else None
+        DB_SLOW_QUERIES.inc(helper_name or "none")
+        if not self.log_limiter.allow():
+            self.suppressed += 1
+            return
+
+        record: dict[str, Any] = {
+            "duration_ms": round(duration * 1000, 3),
+            "helper": helper_name,
+            "statement": statement[:MAX_LOGGED_STATEMENT_LENGTH],
+            "parameters": redact_parameters(parameters),
+            "suppressed": self.suppressed,
+        }
+        self.suppressed = 0
+        logger.bind(slow_query=record).warning(
+            f"Медленный запрос {record['duration_ms']} мс ({helper_name}): {record['statement']}"
+        )
+        if self.explain and not executemany and self.should_explain(statement):
+            try:
+                loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+            except RuntimeError:
+                # Синхронное использование движка вне цикла событий - план не снимается
+                return
+            task: asyncio.Task = loop.create_task(self.capture_plan(statement, tuple(parameters or ()), record))
+            self.explain_tasks.add(task)
+            task.add_done_callback(self.explain_tasks.discard)
+
+    def should_explain(self, statement: str) -> bool:
+        now: float = time.monotonic()
+        if now - self.explained_at.get(statement, -self.explain_interval) < self.explain_interval:
+            return False
+        if self.explain_tasks or not self.explain_limiter.allow():
+            return False
+        if len(self.explained_at) > 1000:
+            self.explained_at.clear()
+        self.explained_at[statement] = now
+        return True
+
+    async def capture_plan(self, statement: str, parameters: tuple, record: dict[str, Any]) -> str | None:
+        """
+        Снимает план медленного запроса на отдельном соединении и пишет его в лог.
+        Выражение выполняется напрямую через asyncpg, поэтому само не попадает в журнал.
+
+        Returns:
+            str | None: Текст плана или `None`, если его не удалось снять.
+        """
+        analyze: bool = READ_ONLY_STATEMENT.match(statement) is not None
+        explain: str = "EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN "
+        try:
+            async with self.engine.connect() as conn:
+                driver_connection = (await conn.get_raw_connection()).driver_connection
+                transaction = driver_connection.transaction(readonly=True)
+                await transaction.start()
+                try:
+                    await driver_connection.execute(
+                        f"SET LOCAL statement_timeout = {int(self.explain_timeout * 1000)}"
+                    )
+                    rows = await driver_connection.fetch(explain + statement, *parameters)
+                finally:
+                    await transaction.rollback()
+        except Exception as e:
+            logger.error(f"Не удалось снять план медленного запроса ({record['helper']}): {e}")
+            return None
+
+        plan: str = "\n".join(row[0] for row in rows)
+        logger.bind(slow_query={**record, "plan": plan}).warning(
+            f"План медленного запроса ({record['helper']}):\n{plan}"
+        )
+        return plan
+
+    async def wait_for_plans(self) -> None:
+        "Дожидается снятия начатых планов"
+        await asyncio.gather(*self.explain_tasks, return_exceptions=True)
+
+
+def watch_slow_queries(engine: AsyncEngine, threshold_ms: float, **options: Any) -> SlowQueryLog | None:
+    """
+    Подключает журнал медленных запросов к движку.
+
+    Args:
+        engine (AsyncEngine): Асинхронный движок
+        threshold_ms (float): Порог длительности выражения, миллисекунды. 0 - журнал не подключается
+        **options: Параметры `SlowQueryLog`
+
+    Returns:
+        SlowQueryLog | None: Журнал или `None`, если порог 0.
+    """
+    if not threshold_ms:
+        return None
+    return SlowQueryLog(engine, threshold_ms / 1000, **options)
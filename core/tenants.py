@@ -0,0 +1,171 @@
+"""
+Арендаторы каталога - хост-системы, в которые встроена партнерская программа.
+
+Каталог арендатора - строки таблиц каталога с его `tenant_id` в общей схеме, а у крупного арендатора
+может быть отдельная схема Postgres (`tenants.schema_name`) с теми же таблицами. Запросы к такой схеме
+выполняются через движок с `schema_translate_map` (`tenant_engine`): таблицы каталога объявлены без схемы
+и переводятся в схему арендатора, а общие таблицы (`tenants`, `outbox`) явно находятся в `SHARED_SCHEMA`.
+Поэтому запросы, их кеш компиляции и запись в outbox одинаковы для всех арендаторов.
+
+Список арендаторов небольшой и меняется редко: `TenantRegistry` держит его в памяти процесса
+и перечитывает не чаще `refresh_interval`.
+"""
+import re
+import time
+
+from dataclasses import dataclass
+
+from loguru import logger
+from sqlalchemy import Connection, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from .models import (
+    DEFAULT_TENANT_ID,
+    BaseTable,
+    CardSummariesTable,
+    CardsTable,
+    CardValidityStateTable,
+    CategoriesTable,
+    CompaniesTable,
+    PromoCodesTable,
+    TenantsTable
+)
+
+
+TENANT_TABLES: tuple[type[BaseTable], ...] = (
+    CategoriesTable,
+    CompaniesTable,
+    CardsTable,
+    CardSummariesTable,
+    CardValidityStateTable,
+    PromoCodesTable,
+)
+"Таблицы, которые создаются в отдельной схеме арендатора"
+
+SCHEMA_NAME_PATTERN: re.Pattern = re.compile(r"^[a-z_][a-z0-9_]{0,62}$")
+"Допустимое имя схемы арендатора. Имя подставляется в DDL, поэтому разрешены только простые идентификаторы"
+
+
+@dataclass(frozen=True)
+class Tenant:
+    """
+    Арендатор, определенный для запроса.
+
+    Args:
+        id (int): Идентификатор арендатора (`tenants.id`)
+        slug (str): Короткое имя в пути запроса
+        host (str | None): Хост арендатора
+        schema_name (str | None): Отдельная схема каталога или `None`
+    """
+    id: int
+    slug: str
+    host: str | None = None
+    schema_name: str | None = None
+
+
+DEFAULT_TENANT: Tenant = Tenant(id=DEFAULT_TENANT_ID, slug="default")
+"Арендатор по умолчанию: запросы без арендатора в пути и с незнакомым хостом"
+
+
+class TenantRegistry:
+    """
+    Арендаторы в памяти процесса с поиском по короткому имени и по хосту.
+
+    Args:
+        refresh_interval (float): Через сколько секунд список перечитывается из бд
+    """
+    def __init__(self, refresh_interval: float = 60.0):
+        self.refresh_interval = refresh_interval
+        self.by_slug: dict[str, Tenant] = {}
+        self.by_host: dict[str, Tenant] = {}
+        self.loaded_at: float | None = None
+        "Время последней загрузки по `time.monotonic`"
+
+    async def load(self, session: AsyncSession) -> int:
+        """
+        Перечитывает арендаторов из таблицы `tenants`.
+
+        Args:
+            session (AsyncSession): Асинхронная сессия основной бд без открытой транзакции
+
+        Returns:
+            int: Количество арендаторов.
+        """
+        async with session.begin():
+            rows = (await session.execute(
+                select(TenantsTable.id, TenantsTable.slug, TenantsTable.host, TenantsTable.schema_name)
+            )).all()
+        tenants: list[Tenant] = [Tenant(*row) for row in rows]
+        self.by_slug = {tenant.slug: tenant for tenant in tenants}
+        self.by_host = {tenant.host: tenant for tenant in tenants if tenant.host}
+        self.loaded_at = time.monotonic()
+        return len(tenants)
+
+    def is_stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.refresh_interval
+
+    def resolve(self, host: str | None, slug: str | None) -> Tenant | None:
+        """
+        Определяет арендатора запроса: по короткому имени в пути, иначе по хосту, иначе арендатор по умолчанию.
+
+        Args:
+            host (str | None): Хост запроса без порта
+            slug (str | None): Короткое имя из пути запроса
+
+        Returns:
+            Tenant | None: Арендатор или `None`, если в пути указан неизвестный арендатор.
+        """
+        if slug is not None:
+            return self.by_slug.get(slug)
+        if host is not None and host in self.by_host:
+            return self.by_host[host]
+        return self.by_slug.get(DEFAULT_TENANT.slug, DEFAULT_TENANT)
+
+
+_tenant_engines: dict[tuple[int, str], AsyncEngine] = {}
+"Движки со `schema_translate_map` по движку и схеме. Используют пул исходного движка"
+
+
+def tenant_engine(engine: AsyncEngine, tenant: Tenant) -> AsyncEngine:
+    """
+    Возвращает движок для каталога арендатора: исходный для общей схемы или его копию с переводом
+    таблиц каталога в схему арендатора. Копия создается один раз и использует пул соединений исходного движка.
+
+    Args:
+        engine (AsyncEngine): Движок основной бд или реплики
+        tenant (Tenant): Арендатор
+
+    Returns:
+        AsyncEngine: Движок для сессий каталога арендатора.
+    """
+    if tenant.schema_name is None:
+        return engine
+    key: tuple[int, str] = (id(engine), tenant.schema_name)
+    translated: AsyncEngine | None = _tenant_engines.get(key)
+    if translated is None:
+        translated = _tenant_engines[key] = engine.execution_options(
+            schema_translate_map={None: tenant.schema_name}
+        )
+    return translated
+
+
+def create_tenant_schema(conn: Connection, schema_name: str) -> None:
+    """
+    Создает отдельную схему арендатора с таблицами каталога, индексами и триггерами read model.
+    Повторный вызов ничего не меняет.
+
+    Args:
+        conn (Connection): Синхронное соединение внутри транзакции
+        schema_name (str): Имя схемы (`SCHEMA_NAME_PATTERN`)
+    """
+    if not SCHEMA_NAME_PATTERN.match(schema_name):
+        raise ValueError(f"Недопустимое имя схемы арендатора: {schema_name!r}")
+    conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema_name}"))
+    # Функции триггеров card_summaries создаются в первой схеме search_path и запоминают его
+    conn.execute(text(f"SET LOCAL search_path TO {schema_name}, public"))
+    BaseTable.metadata.create_all(
+        conn.execution_options(schema_translate_map={None: schema_name}),
+        tables=[table.__table__ for table in TENANT_TABLES]
+    )
+    conn.execute(text("SET LOCAL search_path TO DEFAULT"))
+    logger.info(f"Схема арендатора {schema_name} создана")
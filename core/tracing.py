@@ -0,0 +1,147 @@
+"""
+Сквозная трассировка изменения от HTTP-запроса админки до доставки уведомления ботом.
+
+Трасса - это идентификатор и временные метки этапов (`time.time()`, секунды):
+- `request_started` - админка начала обрабатывать запрос (`web.dependencies.start_request_trace`);
+- `outbox_inserted` - сообщение записано в outbox (`insert_into_outbox`, метки попадают в payload);
+- `published` - процессор outbox начал публикацию (метки передаются в заголовках сообщения RabbitMQ);
+- `consumed` - бот получил сообщение;
+- `delivered` - бот отправил уведомление в Telegram.
+
+Каждый сервис записывает в `TRACE_STAGE_DURATION` длительности этапов, которые он завершает.
+Метки разных сервисов сравниваются по системным часам, поэтому на разных машинах часы должны быть синхронизированы.
+"""
+import json
+import time
+import uuid
+
+from contextvars import ContextVar
+from typing import Any
+
+from .metrics import REGISTRY, Histogram
+
+
+TRACE_ID_HEADER: str = "x-trace-id"
+"Заголовок HTTP-запроса/ответа и сообщения RabbitMQ с идентификатором трассы"
+
+TRACE_STAGES_HEADER: str = "x-trace-stages"
+"Заголовок сообщения RabbitMQ с метками этапов трассы в JSON"
+
+TRACE_STAGES: tuple[tuple[str, str, str], ...] = (
+    ("request", "request_started", "outbox_inserted"),
+    ("outbox_wait", "outbox_inserted", "published"),
+    ("queue", "published", "consumed"),
+    ("telegram", "consumed", "delivered"),
+    ("end_to_end", "request_started", "delivered"),
+)
+"Этапы трассы: имя этапа, метка начала, метка конца"
+
+TRACE_STAGE_DURATION: Histogram = REGISTRY.register(Histogram(
+    "trace_stage_duration_seconds",
+    "Длительность этапов доставки изменения от запроса админки до уведомления в Telegram",
+    labels=("stage",),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+))
+
+current_trace: ContextVar[dict[str, Any] | None] = ContextVar("current_trace", default=None)
+"Трасса текущего HTTP-запроса: `{'trace_id': str, 'stages': {метка: время}}`"
+
+
+def start_trace(trace_id: str | None = None) -> dict[str, Any]:
+    """
+    Начинает трассу в текущем контексте.
+
+    Args:
+        trace_id (str | None): Идентификатор трассы из входящего запроса. По умолчанию генерируется новый
+
+    Returns:
+        dict[str, Any]: Трасса с меткой `request_started`.
+    """
+    trace: dict[str, Any] = {
+        "trace_id": trace_id or uuid.uuid4().hex,
+        "stages": {"request_started": time.time()}
+    }
+    current_trace.set(trace)
+    return trace
+
+
+def stamp_payload(payload: dict[str, Any]) -> None:
+    """
+    Добавляет в payload сообщения outbox трассу текущего запроса с меткой `outbox_inserted`.
+    Вне трассируемого запроса payload не меняется.
+
+    Args:
+        payload (dict[str, Any]): Данные сообщения outbox
+    """
+    trace: dict[str, Any] | None = current_trace.get()
+    if trace is None:
+        return
+    stages: dict[str, float] = {**trace["stages"], "outbox_inserted": time.time()}
+    payload["trace"] = {"trace_id": trace["trace_id"], "stages": stages}
+    observe_stages(stages, "outbox_inserted")
+
+
+def build_message_headers(payload: dict[str, Any], published_at: float) -> dict[str, str]:
+    """
+    Формирует заголовки сообщения RabbitMQ с трассой из payload сообщения outbox.
+
+    Args:
+        payload (dict[str, Any]): Данные сообщения outbox
+        published_at (float): Время начала публикации (`time.time()`)
+
+    Returns:
+        dict[str, str]: Заголовки сообщения. Пустой словарь, если сообщение не трассируется.
+    """
+    trace: dict[str, Any] | None = payload.get("trace")
+    if not isinstance(trace, dict):
+        return {}
+    stages: dict[str, float] = {**trace.get("stages", {}), "published": published_at}
+    observe_stages(stages, "published")
+    return {
+        TRACE_ID_HEADER: str(trace.get("trace_id")),
+        TRACE_STAGES_HEADER: json.dumps(stages)
+    }
+
+
+def read_message_trace(headers: dict[str, Any] | None) -> tuple[str | None, dict[str, float]]:
+    """
+    Читает трассу из заголовков сообщения RabbitMQ.
+
+    Args:
+        headers (dict[str, Any] | None): Заголовки входящего сообщения
+
+    Returns:
+        tuple[str | None, dict[str, float]]: Идентификатор трассы (`None`, если его нет) и метки этапов.
+    """
+    if not headers or TRACE_ID_HEADER not in headers:
+        return None, {}
+    raw_stages: Any = headers.get(TRACE_STAGES_HEADER, "{}")
+    if isinstance(raw_stages, bytes):
+        raw_stages = raw_stages.decode()
+    try:
+        stages: dict[str, float] = json.loads(raw_stages)
+    except (TypeError, ValueError):
+        stages = {}
+    trace_id: Any = headers[TRACE_ID_HEADER]
+    return trace_id.decode() if isinstance(trace_id, bytes) else str(trace_id), stages
+
+
+def observe_stages(stages: dict[str, float], end_mark: str) -> dict[str, float]:
+    """
+    Записывает в `TRACE_STAGE_DURATION` длительности этапов, которые завершаются меткой `end_mark`.
+    Ранние этапы уже записаны сервисами, которые поставили их метки.
+
+    Args:
+        stages (dict[str, float]): Метки этапов
+        end_mark (str): Только что поставленная метка
+
+    Returns:
+        dict[str, float]: Записанные длительности этапов в секундах.
+    """
+    durations: dict[str, float] = {}
+    for stage, start_mark, stage_end_mark in TRACE_STAGES:
+        if stage_end_mark != end_mark or start_mark not in stages or end_mark not in stages:
+            continue
+        durations[stage] = max(stages[end_mark] - stages[start_mark], 0.0)
+        TRACE_STAGE_DURATION.observe(durations[stage], stage)
+    return durations
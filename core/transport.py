@@ -0,0 +1,476 @@
+"""
+Транспорт сообщений для `core.core_types.RabbitMQManager`.
+
+- `AioPikaTransport` - RabbitMQ через aio_pika (используется по умолчанию);
+- `InMemoryBroker` и `InMemoryTransport` - брокер в памяти процесса на asyncio. Нужен для тестов и бенчмарков
+  процессора outbox и бота без сети: очереди, prefetch, ack/nack, подтверждения публикации,
+  искусственные задержки и сбои. Случайные сбои воспроизводимы при одинаковом `seed`.
+"""
+import asyncio
+import itertools
+import random
+
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    import aio_pika
+
+    from .core_types import RabbitMQCredentials
+
+
+MessageCallback = Callable[[Any], Awaitable[Any]]
+"Обработчик входящего сообщения (`aio_pika.IncomingMessage` или `InMemoryMessage`)"
+
+
+class PublishNotConfirmedError(Exception):
+    "Брокер не подтвердил публикацию сообщения (publisher confirm - nack)"
+
+
+class MessageTransport(ABC):
+    "Транспорт сообщений: публикация в очередь и подписка на очередь"
+
+    @abstractmethod
+    async def connect(self) -> None:
+        "Открывает постоянное соединение и канал"
+
+    @abstractmethod
+    async def close(self) -> None:
+        "Закрывает канал и соединение. Неподтвержденные сообщения возвращаются в очереди"
+
+    @abstractmethod
+    async def publish(
+        self,
+        queue_name: str,
+        body: bytes,
+        headers: dict[str, Any] | None = None,
+        durable: bool = True
+    ) -> None:
+        """
+        Публикует сообщение в очередь и дожидается подтверждения брокера.
+
+        Raises:
+            Exception: Если брокер недоступен или не подтвердил публикацию.
+        """
+
+    @abstractmethod
+    async def open_channel(self) -> "MessageTransport":
+        """
+        Открывает отдельный канал того же соединения. Публикации разных каналов не ждут
+        подтверждений друг друга, закрытие возвращенного транспорта закрывает только его канал.
+
+        Returns:
+            MessageTransport: Подключенный транспорт, публикующий через новый канал.
+        """
+
+    @abstractmethod
+    async def consume(self, queue_name: str, callback: MessageCallback, durable: bool = True) -> str:
+        """
+        Подписывает обработчик на очередь.
+
+        Returns:
+            str: Тег подписчика.
+        """
+
+    @abstractmethod
+    async def delete_queue(self, queue_name: str, if_unused: bool = True, if_empty: bool = True) -> None:
+        "Удаляет очередь"
+
+
+class AioPikaTransport(MessageTransport):
+    """
+    Транспорт RabbitMQ через aio_pika.
+
+    После `connect` сообщения публикуются через постоянный канал с подтверждениями публикации.
+    Без `connect` на каждое сообщение открывается отдельное соединение.
+    aio_pika импортируется при первом соединении, поэтому процессы с `InMemoryTransport` его не загружают.
+
+    Args:
+        credintails (RabbitMQCredentials): Авторизационные данные
+        prefetch_count (int): Максимум неподтвержденных сообщений у подписчика. 0 - без ограничения
+    """
+    def __init__(self, credintails: "RabbitMQCredentials", prefetch_count: int = 0):
+        self.credintails = credintails
+        self.prefetch_count = prefetch_count
+        self.connection: "aio_pika.abc.AbstractRobustConnection | None" = None
+        self.channel: "aio_pika.abc.AbstractChannel | None" = None
+        self.declared_queues: set[str] = set()
+        "Очереди, уже объявленные в постоянном канале"
+        self.owns_connection: bool = True
+        "Соединение открыто этим транспортом. У каналов `open_channel` - `False`"
+
+    async def open_connection(self) -> "aio_pika.abc.AbstractRobustConnection":
+        import aio_pika
+
+        return await aio_pika.connect_robust(**self.credintails.to_connection_params())
+
+    async def connect(self) -> None:
+        self.connection = await self.open_connection()
+        self.channel = await self.connection.channel(publisher_confirms=True)
+        if self.prefetch_count:
+            await self.channel.set_qos(prefetch_count=self.prefetch_count)
+        self.declared_queues = set()
+
+    async def close(self) -> None:
+        if self.channel and not self.channel.is_closed:
+            await self.channel.close()
+        if self.owns_connection and self.connection and not self.connection.is_closed:
+            await self.connection.close()
+
+    async def open_channel(self) -> "AioPikaTransport":
+        if not self.connection:
+            raise RuntimeError("Не подключено соединение")
+        transport = AioPikaTransport(self.credintails, self.prefetch_count)
+        transport.connection = self.connection
+        transport.owns_connection = False
+        transport.channel = await self.connection.channel(publisher_confirms=True)
+        if self.prefetch_count:
+            await transport.channel.set_qos(prefetch_count=self.prefetch_count)
+        return transport
+
+    async def publish(
+        self,
+        queue_name: str,
+        body: bytes,
+        headers: dict[str, Any] | None = None,
+        durable: bool = True
+    ) -> None:
+        import aio_pika
+
+        message = aio_pika.Message(
+            body=body,
+            delivery_mode=aio_pika.DeliveryMode.PERSISTENT if durable else None,
+            headers=headers
+        )
+        if self.channel is not None and not self.channel.is_closed:
+            if queue_name not in self.declared_queues:
+                await self.channel.declare_queue(queue_name, durable=durable)
+                self.declared_queues.add(queue_name)
+            await self.channel.default_exchange.publish(message, routing_key=queue_name)
+            return
+
+        async with await self.open_connection() as connection, await connection.channel() as channel:
+            await channel.declare_queue(queue_name, durable=durable)
+            await channel.default_exchange.publish(message, routing_key=queue_name)
+
+    async def consume(self, queue_name: str, callback: MessageCallback, durable: bool = True) -> str:
+        if not self.channel:
+            raise RuntimeError("Не подключён канал")
+        queue = await self.channel.declare_queue(queue_name, durable=durable)
+        return await queue.consume(callback)
+
+    async def delete_queue(self, queue_name: str, if_unused: bool = True, if_empty: bool = True) -> None:
+        if not self.channel:
+            return
+        queue = await self.channel.declare_queue(queue_name, passive=True)
+        await queue.delete(if_unused=if_unused, if_empty=if_empty)
+        self.declared_queues.discard(queue_name)
+
+
+class InMemoryMessage:
+    """
+    Сообщение брокера в памяти. Повторяет используемую часть интерфейса `aio_pika.IncomingMessage`.
+
+    Args:
+        queue (InMemoryQueue): Очередь сообщения
+        body (bytes): Тело сообщения
+        headers (dict[str, Any]): Заголовки сообщения
+    """
+    def __init__(self, queue: "InMemoryQueue", body: bytes, headers: dict[str, Any]):
+        self.queue = queue
+        self.body = body
+        self.headers = headers
+        self.delivery_tag: int = 0
+        self.redelivered: bool = False
+        "Сообщение уже доставлялось и было возвращено в очередь"
+        self.processed: bool = False
+        "Сообщение подтверждено, отклонено или возвращено в очередь при закрытии канала"
+        self.consumer: InMemoryConsumer | None = None
+
+    async def ack(self) -> None:
+        self.queue.settle(self, requeue=None)
+
+    async def nack(self, requeue: bool = True) -> None:
+        self.queue.settle(self, requeue=requeue)
+
+    async def reject(self, requeue: bool = False) -> None:
+        self.queue.settle(self, requeue=requeue)
+
+    @asynccontextmanager
+    async def process(self, requeue: bool = False) -> AsyncIterator["InMemoryMessage"]:
+        "Подтверждает сообщение после блока или отклоняет его, если в блоке возникло исключение"
+        try:
+            yield self
+        except BaseException:
+            if not self.processed:
+                await self.reject(requeue=requeue)
+            raise
+        if not self.processed:
+            await self.ack()
+
+
+class InMemoryConsumer:
+    "Подписчик очереди брокера в памяти"
+
+    def __init__(self, tag: str, transport: "InMemoryTransport", callback: MessageCallback):
+        self.tag = tag
+        self.transport = transport
+        self.callback = callback
+        self.in_flight: int = 0
+        "Доставленные, но еще не подтвержденные сообщения"
+
+    def has_capacity(self) -> bool:
+        return not self.transport.prefetch_count or self.in_flight < self.transport.prefetch_count
+
+
+class InMemoryQueue:
+    """
+    Очередь брокера в памяти. Сообщения раздаются подписчикам по кругу с учетом prefetch.
+
+    Args:
+        broker (InMemoryBroker): Брокер
+        name (str): Имя очереди
+    """
+    def __init__(self, broker: "InMemoryBroker", name: str):
+        self.broker = broker
+        self.name = name
+        self.ready: deque[InMemoryMessage] = deque()
+        "Сообщения, ожидающие доставки"
+        self.unacked: dict[int, InMemoryMessage] = {}
+        "Доставленные и еще не подтвержденные сообщения. Ключ - delivery_tag"
+        self.consumers: list[InMemoryConsumer] = []
+        self.dead_letters: list[InMemoryMessage] = []
+        "Отклоненные без возврата в очередь сообщения"
+        self.acked: int = 0
+        self.redelivered: int = 0
+        self.next_consumer: int = 0
+        self.idle = asyncio.Event()
+        "Установлено, когда в очереди нет ни ожидающих, ни неподтвержденных сообщений"
+        self.idle.set()
+
+    def put(self, message: InMemoryMessage, front: bool = False) -> None:
+        if front:
+            self.ready.appendleft(message)
+        else:
+            self.ready.append(message)
+        self.idle.clear()
+        self.dispatch()
+
+    def dispatch(self) -> None:
+        "Доставляет ожидающие сообщения подписчикам, у которых не исчерпан prefetch"
+        while self.ready and self.consumers:
+            consumer: InMemoryConsumer | None = None
+            for offset in range(len(self.consumers)):
+                candidate = self.consumers[(self.next_consumer + offset) % len(self.consumers)]
+                if candidate.has_capacity():
+                    consumer = candidate
+                    self.next_consumer = (self.next_consumer + offset + 1) % len(self.consumers)
+                    break
+            if consumer is None:
+                return
+            message: InMemoryMessage = self.ready.popleft()
+            message.delivery_tag = next(self.broker.delivery_tags)
+            message.consumer = consumer
+            consumer.in_flight += 1
+            self.unacked[message.delivery_tag] = message
+            consumer.transport.spawn(self.broker.deliver(consumer, message))
+
+    def settle(self, message: InMemoryMessage, requeue: bool | None) -> None:
+        """
+        Завершает доставку сообщения.
+
+        Args:
+            message (InMemoryMessage): Сообщение
+            requeue (bool | None): `None` - подтвердить, `True` - вернуть в очередь, `False` - отклонить
+        """
+        if message.processed or self.unacked.get(message.delivery_tag) is not message:
+            raise RuntimeError(f"Сообщение {message.delivery_tag} уже обработано или канал закрыт")
+        del self.unacked[message.delivery_tag]
+        message.processed = True
+        if message.consumer is not None:
+            message.consumer.in_flight -= 1
+        if requeue is None:
+            self.acked += 1
+        elif requeue:
+            self.requeue(message)
+        else:
+            self.dead_letters.append(message)
+        self.update_idle()
+        self.dispatch()
+
+    def requeue(self, message: InMemoryMessage) -> None:
+        "Возвращает сообщение в начало очереди. Повторная доставка - новый объект, старый больше не подтверждается"
+        message.processed = True
+        redelivery = InMemoryMessage(self, message.body, message.headers)
+        redelivery.redelivered = True
+        self.redelivered += 1
+        self.ready.appendleft(redelivery)
+
+    def update_idle(self) -> None:
+        if not self.ready and not self.unacked:
+            self.idle.set()
+        else:
+            self.idle.clear()
+
+    async def join(self) -> None:
+        "Ждет, пока все сообщения очереди будут доставлены и подтверждены"
+        await self.idle.wait()
+
+
+class InMemoryBroker:
+    """
+    Брокер сообщений в памяти процесса. Несколько `InMemoryTransport` одного брокера
+    работают как соединения разных сервисов с одним RabbitMQ.
+
+    Args:
+        publish_latency (float): Задержка подтверждения публикации, секунды
+        delivery_latency (float): Задержка доставки сообщения подписчику, секунды
+        publish_failure_rate (float): Доля публикаций, которые брокер не подтверждает
+        seed (int): Начальное значение генератора случайных сбоев
+    """
+    def __init__(
+        self,
+        publish_latency: float = 0.0,
+        delivery_latency: float = 0.0,
+        publish_failure_rate: float = 0.0,
+        seed: int = 0
+    ):
+        self.publish_latency = publish_latency
+        self.delivery_latency = delivery_latency
+        self.publish_failure_rate = publish_failure_rate
+        self.rng = random.Random(seed)
+        self.queues: dict[str, InMemoryQueue] = {}
+        self.transports: list[InMemoryTransport] = []
+        self.delivery_tags: Iterator[int] = itertools.count(1)
+        self.consumer_tags: Iterator[int] = itertools.count(1)
+        self.published: int = 0
+        "Подтвержденные публикации"
+        self.failed_publishes: int = 0
+        "Неподтвержденные публикации"
+        self.pending_publish_failures: int = 0
+
+    def declare_queue(self, queue_name: str) -> InMemoryQueue:
+        if queue_name not in self.queues:
+            self.queues[queue_name] = InMemoryQueue(self, queue_name)
+        return self.queues[queue_name]
+
+    def fail_next_publishes(self, count: int = 1) -> None:
+        "Следующие `count` публикаций не будут подтверждены"
+        self.pending_publish_failures += count
+
+    async def publish(self, queue_name: str, body: bytes, headers: dict[str, Any] | None) -> None:
+        if self.publish_latency:
+            await asyncio.sleep(self.publish_latency)
+        if self.pending_publish_failures or (
+            self.publish_failure_rate and self.rng.random() < self.publish_failure_rate
+        ):
+            self.pending_publish_failures = max(self.pending_publish_failures - 1, 0)
+            self.failed_publishes += 1
+            raise PublishNotConfirmedError(f"Публикация в очередь {queue_name} не подтверждена")
+        queue: InMemoryQueue = self.declare_queue(queue_name)
+        queue.put(InMemoryMessage(queue, body, dict(headers or {})))
+        self.published += 1
+
+    async def deliver(self, consumer: InMemoryConsumer, message: InMemoryMessage) -> None:
+        if self.delivery_latency:
+            await asyncio.sleep(self.delivery_latency)
+        try:
+            await consumer.callback(message)
+        except Exception as e:
+            # Как и в aio_pika, сообщение остается неподтвержденным до закрытия канала
+            logger.error(f"Ошибка обработчика {consumer.tag} очереди {message.queue.name}: {e}")
+
+    async def disconnect_all(self) -> None:
+        "Имитирует перезапуск брокера: закрывает все соединения, неподтвержденные сообщения возвращаются в очереди"
+        for transport in list(self.transports):
+            await transport.close()
+
+
+class InMemoryTransport(MessageTransport):
+    """
+    Соединение с брокером в памяти.
+
+    Args:
+        broker (InMemoryBroker): Брокер
+        prefetch_count (int): Максимум неподтвержденных сообщений у подписчика. 0 - без ограничения
+    """
+    def __init__(self, broker: InMemoryBroker, prefetch_count: int = 0):
+        self.broker = broker
+        self.prefetch_count = prefetch_count
+        self.consumers: dict[str, tuple[InMemoryQueue, InMemoryConsumer]] = {}
+        self.tasks: set[asyncio.Task] = set()
+        "Задачи доставки сообщений подписчикам этого соединения"
+        self.connected: bool = False
+
+    def spawn(self, coroutine: Awaitable[None]) -> None:
+        task: asyncio.Task = asyncio.ensure_future(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def connect(self) -> None:
+        self.connected = True
+        if self not in self.broker.transports:
+            self.broker.transports.append(self)
+
+    async def close(self) -> None:
+        self.connected = False
+        if self in self.broker.transports:
+            self.broker.transports.remove(self)
+        for queue, consumer in self.consumers.values():
+            queue.consumers.remove(consumer)
+            for message in sorted(
+                (message for message in queue.unacked.values() if message.consumer is consumer),
+                key=lambda message: message.delivery_tag,
+                reverse=True
+            ):
+                del queue.unacked[message.delivery_tag]
+                queue.requeue(message)
+            queue.update_idle()
+            queue.dispatch()
+        self.consumers.clear()
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def publish(
+        self,
+        queue_name: str,
+        body: bytes,
+        headers: dict[str, Any] | None = None,
+        durable: bool = True
+    ) -> None:
+        await self.broker.publish(queue_name, body, headers)
+
+    async def open_channel(self) -> "InMemoryTransport":
+        transport = InMemoryTransport(self.broker, self.prefetch_count)
+        await transport.connect()
+        return transport
+
+    async def consume(self, queue_name: str, callback: MessageCallback, durable: bool = True) -> str:
+        if not self.connected:
+            raise RuntimeError("Не подключён канал")
+        queue: InMemoryQueue = self.broker.declare_queue(queue_name)
+        consumer = InMemoryConsumer(f"in-memory-{next(self.broker.consumer_tags)}", self, callback)
+        queue.consumers.append(consumer)
+        self.consumers[consumer.tag] = (queue, consumer)
+        queue.dispatch()
+        return consumer.tag
+
+    async def delete_queue(self, queue_name: str, if_unused: bool = True, if_empty: bool = True) -> None:
+        queue: InMemoryQueue | None = self.broker.queues.get(queue_name)
+        if queue is None:
+            raise LookupError(f"Очередь {queue_name} не найдена")
+        if if_unused and queue.consumers:
+            raise RuntimeError(f"У очереди {queue_name} есть подписчики")
+        if if_empty and (queue.ready or queue.unacked):
+            raise RuntimeError(f"Очередь {queue_name} не пуста")
+        for transport in self.broker.transports:
+            for tag, (consumer_queue, _) in list(transport.consumers.items()):
+                if consumer_queue is queue:
+                    del transport.consumers[tag]
+        del self.broker.queues[queue_name]
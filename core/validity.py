@@ -0,0 +1,195 @@
+"""
+Окна действия карточек (`cards.valid_from`/`cards.valid_to`) и планировщик их границ.
+
+Клиентские запросы сами отбрасывают недействующие карточки (`active_card_condition` с `now()`), а планировщик
+обрабатывает наступившие границы окон: делает недействительными кеши каталога процесса (`bump_catalog_version`),
+записывает в outbox события `activate`/`expire` и переносит карточки в счетчиках `cards_count`.
+
+Ближайшие границы хранятся в куче (`heapq`), и задача спит ровно до ближайшей из них, а не сканирует таблицу
+по расписанию. Куча перечитывается по индексам `valid_from`/`valid_to` после каждой границы, после изменения
+каталога в этом процессе и не реже `refresh_interval` (изменения, сделанные другими процессами).
+
+Обработка границ идет под блокировкой строки `card_validity_state` и охватывает интервал
+`(processed_until, now()]`, поэтому при нескольких воркерах каждая граница обрабатывается ровно один раз,
+а границы, пропущенные пока планировщик не работал, обрабатываются при следующем запуске.
+"""
+import asyncio
+import heapq
+
+from datetime import datetime, timedelta, timezone
+
+from loguru import logger
+from sqlalchemy import func, or_, select, union, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .cache import add_catalog_listener, bump_catalog_version, remove_catalog_listener
+from .database_utils.counters import CARD_COUNTED_COLUMNS, apply_counter_deltas, count_transition, lock_validity_state
+from .database_utils.outbox import insert_into_outbox
+from .models import CardsTable, CardValidityStateTable
+
+
+VALIDITY_EVENTS_BATCH_SIZE: int = 500
+"Максимальное количество идентификаторов карточек в одном событии outbox"
+
+MIN_SLEEP: float = 0.05
+"Минимальная пауза планировщика, секунды. Сглаживает расхождение часов процесса и бд у самой границы"
+
+
+async def process_validity_boundaries(session: AsyncSession, queue_name: str) -> dict[str, int]:
+    """
+    Обрабатывает границы окон действия в интервале `(processed_until, now()]`: записывает в outbox события
+    `activate` (наступил `valid_from`) и `expire` (наступил `valid_to`), изменяет счетчики карточек
+    и сдвигает `processed_until`.
+
+    Args:
+        session (AsyncSession): Асинхронная сессия основной бд без открытой транзакции
+        queue_name (str): Имя очереди событий
+
+    Returns:
+        dict[str, int]: Количество карточек по событиям `activate` и `expire`.
+    """
+    async with session.begin():
+        since: datetime = await lock_validity_state(session, for_update=True)
+        until: datetime = await session.scalar(select(func.now()))
+        cards = (await session.execute(
+            select(CardsTable.id, *(CardsTable.__table__.c[name] for name in CARD_COUNTED_COLUMNS)).where(or_(
+                CardsTable.valid_from.between(since, until) & (CardsTable.valid_from > since),
+                CardsTable.valid_to.between(since, until) & (CardsTable.valid_to > since)
+            )).order_by(CardsTable.id)
+        )).all()
+
+        deltas: dict = {}
+        events: dict[str, list[int]] = {"activate": [], "expire": []}
+        for card in cards:
+            count_transition(deltas, card, card, since, until)
+            if card.valid_from is not None and since < card.valid_from <= until:
+                events["activate"].append(card.id)
+            if card.valid_to is not None and since < card.valid_to <= until:
+                events["expire"].append(card.id)
+        await apply_counter_deltas(session, deltas)
+
+        for action, card_ids in events.items():
+            for start in range(0, len(card_ids), VALIDITY_EVENTS_BATCH_SIZE):
+                batch: list[int] = card_ids[start:start + VALIDITY_EVENTS_BATCH_SIZE]
+                await insert_into_outbox(
+                    payload={
+                        "action": action,
+                        "entity": CardsTable.__tablename__,
+                        "filters": [{"column": "id", "operator": "in", "value": batch}],
+                        "boundary_until": until.isoformat()
+                    },
+                    queue=queue_name,
+                    session=session
+                )
+        await session.execute(
+            update(CardValidityStateTable).values(processed_until=until).where(CardValidityStateTable.id == 1)
+        )
+    return {action: len(card_ids) for action, card_ids in events.items()}
+
+
+async def select_next_boundaries(session: AsyncSession, limit: int) -> list[datetime]:
+    """
+    Выбирает ближайшие будущие границы окон действия по индексам `valid_from` и `valid_to`.
+    Одинаковые моменты (например, у карточек одной акции) выбираются один раз.
+
+    Args:
+        session (AsyncSession): Асинхронная сессия без открытой транзакции
+        limit (int): Максимальное количество границ
+
+    Returns:
+        list[datetime]: Моменты границ по возрастанию.
+    """
+    boundaries = union(*(
+        select(column.label("boundary")).distinct().where(column > func.now()).order_by(column).limit(limit)
+        for column in (CardsTable.valid_from, CardsTable.valid_to)
+    )).subquery()
+    async with session.begin():
+        result = await session.execute(select(boundaries.c.boundary).order_by(boundaries.c.boundary).limit(limit))
+        return list(result.scalars())
+
+
+class ValidityScheduler:
+    """
+    Фоновая задача, обрабатывающая границы окон действия карточек в момент их наступления.
+
+    Args:
+        session_maker (async_sessionmaker): Фабрика сессий основной бд
+        queue_name (str): Имя очереди событий outbox
+        batch_size (int): Количество ближайших границ в куче
+        refresh_interval (float): Максимальная пауза между чтениями границ, секунды
+    """
+    def __init__(
+        self,
+        session_maker: async_sessionmaker,
+        queue_name: str,
+        batch_size: int = 100,
+        refresh_interval: float = 60.0
+    ):
+        self.session_maker = session_maker
+        self.queue_name = queue_name
+        self.batch_size = batch_size
+        self.refresh_interval = refresh_interval
+        self.boundaries: list[datetime] = []
+        "Куча ближайших границ окон действия"
+        self.changed = asyncio.Event()
+        "Каталог изменен в этом процессе - границы нужно перечитать"
+        self.task: asyncio.Task | None = None
+
+    async def load_boundaries(self) -> None:
+        async with self.session_maker() as session:
+            self.boundaries = await select_next_boundaries(session, self.batch_size)
+        heapq.heapify(self.boundaries)
+
+    async def fire(self) -> dict[str, int]:
+        "Обрабатывает наступившие границы и делает недействительными кеши каталога процесса"
+        async with self.session_maker() as session:
+            processed: dict[str, int] = await process_validity_boundaries(session, self.queue_name)
+        bump_catalog_version()
+        if any(processed.values()):
+            logger.info(f"Обработаны границы окон действия карточек: {processed}")
+        return processed
+
+    def seconds_until_next(self) -> float:
+        if not self.boundaries:
+            return self.refresh_interval
+        delay: timedelta = self.boundaries[0] - datetime.now(timezone.utc)
+        return min(max(delay.total_seconds(), MIN_SLEEP), self.refresh_interval)
+
+    async def run(self) -> None:
+        "Цикл планировщика: обработать пропущенные границы, затем спать до ближайшей"
+        due: bool = True
+        "Нужно обработать границы. При запуске - границы, пропущенные пока планировщик не работал"
+        while True:
+            try:
+                if due:
+                    await self.fire()
+                    # Версия каталога увеличена самим планировщиком, повторно перечитывать границы не нужно
+                    self.changed.clear()
+                await self.load_boundaries()
+            except Exception as exc:
+                logger.error(f"Ошибка планировщика окон действия карточек: {exc}")
+            try:
+                await asyncio.wait_for(self.changed.wait(), timeout=self.seconds_until_next())
+                self.changed.clear()
+            except TimeoutError:
+                pass
+            now: datetime = datetime.now(timezone.utc)
+            due = bool(self.boundaries) and self.boundaries[0] <= now
+            while self.boundaries and self.boundaries[0] <= now:
+                heapq.heappop(self.boundaries)
+
+    def start(self) -> asyncio.Task:
+        "Запускает планировщик в фоновой задаче и подписывает его на изменения каталога процесса"
+        add_catalog_listener(self.changed.set)
+        self.task = asyncio.create_task(self.run())
+        return self.task
+
+    async def stop(self) -> None:
+        remove_catalog_listener(self.changed.set)
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
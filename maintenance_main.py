@@ -0,0 +1,88 @@
+import argparse
+import asyncio
+
+from loguru import logger
+from sqlalchemy import select
+
+from core.migrations import run_migrations
+from core.models import TenantsTable
+from core.read_models import check_card_summaries, recompute_card_counts
+from core.tenants import create_tenant_schema
+from web.config import ASSETS_DIR, ASYNC_ENGINE, STATIC_FILES, TEMPLATES, TEMPLATES_BYTECODE_CACHE_DIR
+from web.warmup import compile_templates
+
+
+async def migrate() -> None:
+    "Применяет миграции схемы бд. Запускается один раз при деплое, до старта воркеров"
+    try:
+        await run_migrations(ASYNC_ENGINE)
+    finally:
+        await ASYNC_ENGINE.dispose()
+
+
+async def compile_templates_command() -> None:
+    "Компилирует шаблоны Jinja в кеш байткода. Запускается при сборке, чтобы воркеры стартовали с готовым кешем"
+    compiled: int = compile_templates(TEMPLATES)
+    logger.info(f"Скомпилировано шаблонов: {compiled}, кеш байткода: {TEMPLATES_BYTECODE_CACHE_DIR}")
+
+
+async def build_assets_command() -> None:
+    "Собирает статические файлы: копии с хешем в имени и сжатые варианты. Запускается при сборке"
+    built: int = STATIC_FILES.load(rebuild=True)
+    logger.info(f"Собрано статических файлов: {built}, каталог сборки: {ASSETS_DIR}")
+
+
+async def check_card_summaries_command(repair: bool = False) -> None:
+    "Проверяет согласованность read model `card_summaries` с карточками и компаниями"
+    try:
+        async with ASYNC_ENGINE.begin() as conn:
+            await check_card_summaries(conn, repair=repair)
+    finally:
+        await ASYNC_ENGINE.dispose()
+
+
+async def repair_card_summaries_command() -> None:
+    "Проверяет `card_summaries` и исправляет найденные расхождения"
+    await check_card_summaries_command(repair=True)
+
+
+async def recompute_card_counts_command() -> None:
+    "Пересчитывает счетчики карточек категорий и компаний"
+    try:
+        async with ASYNC_ENGINE.begin() as conn:
+            await recompute_card_counts(conn)
+    finally:
+        await ASYNC_ENGINE.dispose()
+
+
+async def create_tenant_schemas_command() -> None:
+    "Создает отдельные схемы арендаторов, у которых в `tenants.schema_name` указана схема"
+    try:
+        async with ASYNC_ENGINE.begin() as conn:
+            schema_names = (await conn.scalars(
+                select(TenantsTable.schema_name).where(TenantsTable.schema_name.is_not(None)).distinct()
+            )).all()
+            for schema_name in schema_names:
+                await conn.run_sync(create_tenant_schema, schema_name)
+    finally:
+        await ASYNC_ENGINE.dispose()
+
+
+COMMANDS = {
+    "migrate": migrate,
+    "compile-templates": compile_templates_command,
+    "build-assets": build_assets_command,
+    "check-card-summaries": check_card_summaries_command,
+    "repair-card-summaries": repair_card_summaries_command,
+    "recompute-card-counts": recompute_card_counts_command,
+    "create-tenant-schemas": create_tenant_schemas_command,
+}
+"Служебные команды. Ключ - имя команды, значение - асинхронная функция без аргументов"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Служебные команды партнерской системы")
+    parser.add_argument("command", choices=COMMANDS.keys())
+    args = parser.parse_args()
+    logger.info(f"Запуск команды {args.command}")
+    asyncio.run(COMMANDS[args.command]())
@@ -1,47 +1,40 @@
-import json
+from typing import Any
 
 from dotenv import dotenv_values as get_dotenv_values
 from dotenv import load_dotenv
-from sqlalchemy import URL
-from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 
 from core.core_types import RabbitMQCredentials
 
+from .routes import OutboxRoute, parse_outbox_routes
+
 # Загрузка переменных окружения .env
 load_dotenv()
 
 dotenv_values: dict[str, str] = get_dotenv_values()
 "Переменные окружения .env"
 
-ASYNC_ENGINE: AsyncEngine = create_async_engine(
-    URL.create(
-        host=dotenv_values.get("DATABASE_HOST", "localhost"),
-        drivername="postgresql+asyncpg",
-        username=dotenv_values.get("DATABASE_USERNAME", "postgres"),
-        password=dotenv_values.get("DATABASE_PASSWORD", "postgres"),
-        database=dotenv_values.get("DATABASE_NAME"),
-        port=int(dotenv_values.get("DATABASE_PORT", 5432))
-    ),
-    pool_pre_ping=True,
-    json_serializer=lambda obj: json.dumps(obj, ensure_ascii=False)
-)
-"Асинхронный движок для соединения с базой данных"
+DATABASE_CONNECTION: dict[str, Any] = {
+    "host": dotenv_values.get("DATABASE_HOST", "localhost"),
+    "username": dotenv_values.get("DATABASE_USERNAME", "postgres"),
+    "password": dotenv_values.get("DATABASE_PASSWORD", "postgres"),
+    "database": dotenv_values.get("DATABASE_NAME"),
+    "port": int(dotenv_values.get("DATABASE_PORT", 5432)),
+}
+"""Параметры `sqlalchemy.URL.create` для соединения с базой данных.
+Движок создается `outbox_main.create_outbox_engine` при старте процессора, а не при импорте настроек"""
 
 RMQ_HOST: str = dotenv_values.get("RMQ_HOST", "127.0.0.1")
 "Хост на котором запущен RabbitMQ"
 
-RMQ_PORT: int = int(dotenv_values.get("RMQ_PORT"))
+RMQ_PORT: int = int(dotenv_values.get("RMQ_PORT", 5672))
 "Порт на котором запущен RabbitMQ"
 
-RMQ_LOGIN: str = dotenv_values.get("RMQ_LOGIN")
+RMQ_LOGIN: str = dotenv_values.get("RMQ_LOGIN", "guest")
 "Логин пользователя RabbitMQ"
 
-RMQ_PASSWORD: str = dotenv_values.get("RMQ_PASSWORD")
+RMQ_PASSWORD: str = dotenv_values.get("RMQ_PASSWORD", "guest")
 "Пароль пользователя RabbitMQ"
 
-OUTBOX_ASYNC_SESSIONMAKER = async_sessionmaker(ASYNC_ENGINE, expire_on_commit=False)
-"Специализированная для сервиса OUTBOX асинхронная фабрика сессий БД. При вызове создает сессию"
-
 RABBIT_MQ_CREDINTAILS: RabbitMQCredentials = RabbitMQCredentials(
     host=RMQ_HOST,
     port=RMQ_PORT,
@@ -53,3 +46,39 @@ RABBIT_MQ_CREDINTAILS: RabbitMQCredentials = RabbitMQCredentials(
 FASTAPI_DATABASE_QUERIES_QUEUE_NAME = "database_queries"
 "Имя очереди в которую надо публиковать сообщения о совершенных запросах"
 
+OUTBOX_METRICS_HOST: str = dotenv_values.get("OUTBOX_METRICS_HOST", "127.0.0.1")
+"Адрес HTTP-сервера метрик процессора outbox"
+
+OUTBOX_METRICS_PORT: int = int(dotenv_values.get("OUTBOX_METRICS_PORT", 9101))
+"Порт HTTP-сервера метрик процессора outbox. 0 - сервер не запускается"
+
+OUTBOX_STATS_LOG_INTERVAL: float = float(dotenv_values.get("OUTBOX_STATS_LOG_INTERVAL", 60))
+"Интервал между строками статистики процессора outbox в логе, секунды"
+
+OUTBOX_PENDING_COUNT_LIMIT: int = 10_000
+"Верхняя граница подсчета ожидающих сообщений outbox за один цикл"
+
+OUTBOX_POLL_INTERVAL: float = float(dotenv_values.get("OUTBOX_POLL_INTERVAL", 3))
+"Пауза между циклами процессора outbox, секунды. Раз в паузу процессор ищет новые очереди"
+
+OUTBOX_DEFAULT_ROUTE: OutboxRoute = OutboxRoute(
+    batch_size=int(dotenv_values.get("OUTBOX_DEFAULT_BATCH_SIZE", 100)),
+    concurrency=int(dotenv_values.get("OUTBOX_DEFAULT_CONCURRENCY", 1))
+)
+"Параметры публикации в очереди, для которых нет маршрута в `OUTBOX_ROUTES`"
+
+OUTBOX_ROUTES: dict[str, OutboxRoute] = parse_outbox_routes(dotenv_values.get("OUTBOX_ROUTES", "{}"))
+"""Параметры публикации по очередям (`outbox.routes.parse_outbox_routes`). Очереди маршрутов обрабатываются
+с запуска процессора, остальные - с первого ожидающего сообщения"""
+
+SLOW_QUERY_THRESHOLD_MS: float = float(dotenv_values.get("SLOW_QUERY_THRESHOLD_MS", 200))
+"Порог медленного SQL-выражения для журнала `core.slow_queries`, миллисекунды. 0 - журнал выключен"
+
+SLOW_QUERY_EXPLAIN: bool = dotenv_values.get("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+"Снимать план `EXPLAIN (ANALYZE, BUFFERS)` медленных запросов"
+
+SLOW_QUERY_LOGS_PER_MINUTE: int = int(dotenv_values.get("SLOW_QUERY_LOGS_PER_MINUTE", 60))
+"Максимум записей о медленных запросах в минуту"
+
+SLOW_QUERY_EXPLAINS_PER_MINUTE: int = int(dotenv_values.get("SLOW_QUERY_EXPLAINS_PER_MINUTE", 6))
+"Максимум снятых планов медленных запросов в минуту"
@@ -0,0 +1,102 @@
+import json
+import time
+
+from typing import Any
+
+from loguru import logger
+
+from core.metrics import REGISTRY, Counter, Gauge, Histogram
+
+
+OUTBOX_PENDING_ROWS: Gauge = REGISTRY.register(Gauge(
+    "outbox_pending_rows",
+    "Сообщения outbox, ожидающие отправки (подсчет ограничен OUTBOX_PENDING_COUNT_LIMIT)"
+))
+
+OUTBOX_OLDEST_PENDING_AGE: Gauge = REGISTRY.register(Gauge(
+    "outbox_oldest_pending_age_seconds",
+    "Возраст самого старого сообщения outbox, ожидающего отправки"
+))
+
+OUTBOX_BATCH_SIZE: Histogram = REGISTRY.register(Histogram(
+    "outbox_batch_size",
+    "Количество сообщений, выбранных из outbox за один цикл",
+    buckets=(0, 1, 5, 10, 50, 100, 500, 1000, 5000)
+))
+
+OUTBOX_PUBLISH_DURATION: Histogram = REGISTRY.register(Histogram(
+    "outbox_publish_duration_seconds",
+    "Длительность публикации сообщения outbox в RabbitMQ",
+    labels=("queue",)
+))
+
+OUTBOX_MESSAGES_PUBLISHED: Counter = REGISTRY.register(Counter(
+    "outbox_messages_published_total",
+    "Сообщения outbox, обработанные процессором. status: sent или failed",
+    labels=("queue", "status")
+))
+
+
+class RelayStatsReporter:
+    """
+    Периодически пишет в лог строку со статистикой процессора outbox за прошедший интервал.
+
+    Args:
+        interval (float): Интервал между строками статистики в секундах
+    """
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.started_at: float = time.monotonic()
+        self.published: dict[tuple[str, ...], float] = {}
+        "Значения `OUTBOX_MESSAGES_PUBLISHED` на начало интервала"
+        self.latency_snapshots: dict[str, list[float]] = {}
+        "Снимки `OUTBOX_PUBLISH_DURATION` на начало интервала. Ключ - очередь"
+        self.batch_size_snapshot: list[float] = OUTBOX_BATCH_SIZE.snapshot()
+
+    def collect(self) -> dict[str, Any]:
+        """
+        Собирает статистику за интервал с прошлого вызова и начинает новый интервал.
+
+        Returns:
+            dict[str, Any]: Размер и возраст очереди outbox, медианный размер пачки и
+            по каждой очереди: сообщений в секунду, доля неудачных отправок, p50/p99 публикации.
+        """
+        now: float = time.monotonic()
+        elapsed: float = max(now - self.started_at, 1e-9)
+        queues: dict[str, dict[str, float]] = {}
+        for queue in sorted({label_values[0] for label_values in OUTBOX_MESSAGES_PUBLISHED.values}):
+            sent: float = OUTBOX_MESSAGES_PUBLISHED.get(queue, "sent") - self.published.get((queue, "sent"), 0)
+            failed: float = OUTBOX_MESSAGES_PUBLISHED.get(queue, "failed") - self.published.get((queue, "failed"), 0)
+            since: list[float] | None = self.latency_snapshots.get(queue)
+            queues[queue] = {
+                "messages_per_second": round((sent + failed) / elapsed, 3),
+                "failure_rate": round(failed / (sent + failed), 3) if sent + failed else 0.0,
+                "publish_p50_seconds": OUTBOX_PUBLISH_DURATION.quantile(0.5, queue, since=since),
+                "publish_p99_seconds": OUTBOX_PUBLISH_DURATION.quantile(0.99, queue, since=since),
+            }
+            self.latency_snapshots[queue] = OUTBOX_PUBLISH_DURATION.snapshot(queue)
+
+        stats: dict[str, Any] = {
+            "interval_seconds": round(elapsed, 3),
+            "pending_rows": OUTBOX_PENDING_ROWS.get(),
+            "oldest_pending_age_seconds": round(OUTBOX_OLDEST_PENDING_AGE.get(), 3),
+            "batch_size_p50": OUTBOX_BATCH_SIZE.quantile(0.5, since=self.batch_size_snapshot),
+            "queues": queues,
+        }
+        self.started_at = now
+        self.published = dict(OUTBOX_MESSAGES_PUBLISHED.values)
+        self.batch_size_snapshot = OUTBOX_BATCH_SIZE.snapshot()
+        return stats
+
+    def maybe_log(self) -> dict[str, Any] | None:
+        """
+        Пишет строку статистики, если с прошлой записи прошло не меньше `interval` секунд.
+
+        Returns:
+            dict[str, Any] | None: Записанная статистика или `None`, если интервал еще не истек.
+        """
+        if time.monotonic() - self.started_at < self.interval:
+            return None
+        stats: dict[str, Any] = self.collect()
+        logger.bind(outbox_stats=stats).info(f"Статистика outbox: {json.dumps(stats, ensure_ascii=False)}")
+        return stats
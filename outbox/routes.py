@@ -0,0 +1,44 @@
+import json
+
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class OutboxRoute:
+    """
+    Параметры публикации сообщений outbox в одну очередь. У каждой очереди свой канал
+    и свой цикл процессора (`outbox_main.QueueRelay`), поэтому большая очередь не задерживает остальные.
+
+    Args:
+        batch_size (int): Сколько сообщений выбирается из outbox за один запрос
+        concurrency (int): Сколько публикаций ожидают подтверждения одновременно.
+            1 - сообщения очереди публикуются строго в порядке создания
+        poll_interval (float | None): Пауза между циклами очереди, секунды. `None` - общая пауза процессора
+    """
+    batch_size: int = 100
+    concurrency: int = 1
+    poll_interval: float | None = None
+
+
+def parse_outbox_routes(raw: str) -> dict[str, OutboxRoute]:
+    """
+    Разбирает настройку маршрутов outbox: JSON-объект, в котором ключ - имя очереди,
+    а значение - параметры `OutboxRoute`, например `{"audit": {"batch_size": 500, "concurrency": 8}}`.
+
+    Args:
+        raw (str): Строка JSON
+
+    Returns:
+        dict[str, OutboxRoute]: Маршруты по именам очередей.
+
+    Raises:
+        ValueError: Если строка не JSON-объект или параметры маршрута некорректны.
+    """
+    try:
+        routes: dict[str, OutboxRoute] = {queue: OutboxRoute(**params) for queue, params in json.loads(raw).items()}
+    except (AttributeError, TypeError, json.JSONDecodeError) as exc:
+        raise ValueError(f"Некорректные маршруты outbox {raw!r}: {exc}") from exc
+    for queue, route in routes.items():
+        if route.batch_size < 1 or route.concurrency < 1:
+            raise ValueError(f"batch_size и concurrency очереди {queue} должны быть положительными")
+    return routes
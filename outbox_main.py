@@ -1,75 +1,270 @@
 import asyncio
 import json
+import time
+
+from datetime import datetime
 
 from loguru import logger
+from sqlalchemy import URL
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
 from core.core_types import (
     OutBoxStatuses,
     RabbitMQManager
 )
 from core.database_utils import (
-    get_last_pending_messages_from_outbox,
-    set_status_of_outbox_row
+    get_outbox_backlog,
+    get_pending_messages_from_outbox_queue,
+    get_pending_outbox_queues,
+    set_status_of_outbox_rows
 )
+from core.metrics import start_metrics_server
+from core.slow_queries import watch_slow_queries
+from core.tracing import build_message_headers
 from core.models import OutboxTable
 from outbox.config import (
-    FASTAPI_DATABASE_QUERIES_QUEUE_NAME,
-    OUTBOX_ASYNC_SESSIONMAKER,
-    RABBIT_MQ_CREDINTAILS
+    DATABASE_CONNECTION,
+    OUTBOX_DEFAULT_ROUTE,
+    OUTBOX_METRICS_HOST,
+    OUTBOX_METRICS_PORT,
+    OUTBOX_PENDING_COUNT_LIMIT,
+    OUTBOX_POLL_INTERVAL,
+    OUTBOX_ROUTES,
+    OUTBOX_STATS_LOG_INTERVAL,
+    RABBIT_MQ_CREDINTAILS,
+    SLOW_QUERY_EXPLAIN,
+    SLOW_QUERY_EXPLAINS_PER_MINUTE,
+    SLOW_QUERY_LOGS_PER_MINUTE,
+    SLOW_QUERY_THRESHOLD_MS
+)
+from outbox.metrics import (
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_MESSAGES_PUBLISHED,
+    OUTBOX_OLDEST_PENDING_AGE,
+    OUTBOX_PENDING_ROWS,
+    OUTBOX_PUBLISH_DURATION,
+    RelayStatsReporter
 )
+from outbox.routes import OutboxRoute
+
+
+async def create_outbox_engine() -> AsyncEngine:
+    "Создает движок базы данных процессора outbox и подключает к нему журнал медленных запросов"
+    engine: AsyncEngine = create_async_engine(
+        URL.create(drivername="postgresql+asyncpg", **DATABASE_CONNECTION),
+        pool_pre_ping=True,
+        json_serializer=lambda obj: json.dumps(obj, ensure_ascii=False)
+    )
+    watch_slow_queries(
+        engine,
+        SLOW_QUERY_THRESHOLD_MS,
+        explain=SLOW_QUERY_EXPLAIN,
+        logs_per_minute=SLOW_QUERY_LOGS_PER_MINUTE,
+        explains_per_minute=SLOW_QUERY_EXPLAINS_PER_MINUTE
+    )
+    return engine
+
+
+async def create_rmq_manager() -> RabbitMQManager:
+    "Создает менеджер RabbitMQ и открывает постоянное соединение, через которое публикуются сообщения"
+    rmq_manager = RabbitMQManager(RABBIT_MQ_CREDINTAILS)
+    await rmq_manager.connect()
+    return rmq_manager
+
+
+async def update_backlog_metrics(session: AsyncSession) -> None:
+    """
+    Обновляет метрики размера и возраста очереди outbox.
 
+    Args:
+        session (AsyncSession): Асинхронная сессия SQLAlchemy для работы с базой данных
+    """
+    pending_count, oldest_created_at = await get_outbox_backlog(session, OUTBOX_PENDING_COUNT_LIMIT)
+    OUTBOX_PENDING_ROWS.set(pending_count)
+    OUTBOX_OLDEST_PENDING_AGE.set(
+        (datetime.now() - oldest_created_at).total_seconds() if oldest_created_at is not None else 0
+    )
+
+
+class QueueRelay:
+    """
+    Публикует ожидающие сообщения outbox одной очереди через собственный канал брокера.
 
-rmq_manager = RabbitMQManager(RABBIT_MQ_CREDINTAILS)
-"Объект управляющй соединением с RabbitMQ"
+    Цикл выбирает сообщения пачками по `route.batch_size` в порядке создания, пока очередь не опустеет,
+    публикует не больше `route.concurrency` сообщений одновременно и одним запросом отмечает
+    отправленные как `SENT`, а неподтвержденные - как `FAILED`.
+
+    Args:
+        queue (str): Имя очереди, совпадает со столбцом `outbox.queue`
+        route (OutboxRoute): Параметры публикации
+        manager (RabbitMQManager): Менеджер с отдельным каналом очереди (`RabbitMQManager.open_channel`)
+        session_maker (async_sessionmaker): Фабрика сессий базы данных
+    """
+    def __init__(self, queue: str, route: OutboxRoute, manager: RabbitMQManager, session_maker: async_sessionmaker):
+        self.queue = queue
+        self.route = route
+        self.manager = manager
+        self.session_maker = session_maker
+        self.semaphore: asyncio.Semaphore = asyncio.Semaphore(route.concurrency)
+
+    async def publish(self, message: OutboxTable) -> bool:
+        "Публикует сообщение, когда освобождается одно из `route.concurrency` мест"
+        async with self.semaphore:
+            started: float = time.perf_counter()
+            status: bool = await self.manager.send_message_to_queue(
+                queue_name=self.queue,
+                message=json.dumps(message.payload, ensure_ascii=False),
+                headers=build_message_headers(message.payload, time.time())
+            )
+            OUTBOX_PUBLISH_DURATION.observe(time.perf_counter() - started, self.queue)
+            OUTBOX_MESSAGES_PUBLISHED.inc(self.queue, "sent" if status else "failed")
+            return status
+
+    async def drain(self, session: AsyncSession) -> int:
+        """
+        Публикует ожидающие сообщения очереди пачками, пока не будет выбрана неполная пачка.
+
+        Returns:
+            int: Количество обработанных сообщений (отправленных и неудачных).
+        """
+        processed: int = 0
+        while True:
+            batch: list[OutboxTable] = await get_pending_messages_from_outbox_queue(
+                session, self.queue, self.route.batch_size
+            )
+            OUTBOX_BATCH_SIZE.observe(len(batch))
+            if not batch:
+                return processed
+            statuses: list[bool] = await asyncio.gather(*(self.publish(message) for message in batch))
+            # Идентификаторы читаются до фиксации: после нее объекты сессии устаревают
+            sent: list[int] = [message.id for message, status in zip(batch, statuses) if status]
+            failed: list[int] = [message.id for message, status in zip(batch, statuses) if not status]
+            updated: bool = (
+                await set_status_of_outbox_rows(sent, OutBoxStatuses.SENT, session)
+                and await set_status_of_outbox_rows(failed, OutBoxStatuses.FAILED, session)
+            )
+            processed += len(batch)
+            # Если статусы не записаны, пачка будет выбрана снова в следующем цикле, а не сразу
+            if not updated or len(batch) < self.route.batch_size:
+                return processed
+
+    async def run(self, poll_interval: float, iterations: int | None = None) -> None:
+        """
+        Повторяет `drain` с паузой `route.poll_interval` (или `poll_interval`).
+
+        Args:
+            poll_interval (float): Пауза процессора, если у маршрута нет своей
+            iterations (int | None): Число циклов (для тестов и бенчмарков). `None` - без ограничения
+        """
+        interval: float = self.route.poll_interval if self.route.poll_interval is not None else poll_interval
+        async with self.session_maker() as session:
+            i: int = 0
+            while True:
+                await self.drain(session)
+                # Завершает транзакцию чтения, чтобы сессия не удерживала снимок бд во время паузы
+                await session.commit()
+                if isinstance(iterations, int):
+                    i += 1
+                    if i >= iterations:
+                        return
+                await asyncio.sleep(interval)
 
 
 async def run_outbox_table_polling(
-    queue_name: str,
-    iterations: int | None = None
+    manager: RabbitMQManager,
+    session_maker: async_sessionmaker,
+    routes: dict[str, OutboxRoute] | None = None,
+    default_route: OutboxRoute = OutboxRoute(),
+    iterations: int | None = None,
+    poll_interval: float = 3
 ):
     """
     Запускает переодический просмотр таблицы outbox на наличие новых сообщений
 
     Функция:
-    - Каждые 3 секунды извлекает записи из таблицы `outbox` с статусом `PENDING`;
-    - Отправляет сообщение в брокер сообщений;
-    - Если запись успешно отправлена то помечает запись как `SENT` иначе `FAILED`.
+    - Каждые `poll_interval` секунд находит очереди с ожидающими сообщениями и запускает для каждой новой
+      очереди `QueueRelay` с отдельным каналом брокера и параметрами из `routes` (или `default_route`);
+    - Каждая очередь публикуется в свою очередь брокера (столбец `outbox.queue`) независимо от других,
+      поэтому большая очередь не задерживает сообщения остальных;
+    - Передает трассу изменения в заголовках и помечает записи как `SENT` или `FAILED`;
+    - Перезапускает цикл очереди, если он завершился с ошибкой;
+    - Обновляет метрики `outbox.metrics` и раз в `OUTBOX_STATS_LOG_INTERVAL` секунд пишет в лог статистику.
 
     Args:
-        queue_name (str): Имя прослушиваемой очереди
-        credintails (outbox.config.RabbitMQCredentails): авториазционные данные для rmq
-        iterations (int | None): Число запросов в базу данных(Для тестирования, по умолчанию None)
+        manager (RabbitMQManager): Подключенный менеджер брокера, каналы очередей открываются на его соединении
+            (в тестах и бенчмарках - с `core.transport.InMemoryTransport`)
+        session_maker (async_sessionmaker): Фабрика сессий базы данных
+        routes (dict[str, OutboxRoute] | None): Параметры публикации по очередям
+        default_route (OutboxRoute): Параметры очередей без маршрута
+        iterations (int | None): Число циклов каждой очереди (для тестов и бенчмарков, по умолчанию None).
+            Очереди находятся один раз, процессор завершается после их циклов
+        poll_interval (float): Пауза между поисками очередей и циклами очередей без своей паузы, секунды
     """
     logger.info("Работа outbox процессора начата!")
-    async with OUTBOX_ASYNC_SESSIONMAKER() as session:
-        i: int = 0
-        while True:
-            last_msgs: list[OutboxTable] = await get_last_pending_messages_from_outbox(session)
-            "Сообщения со статусом `PENDING` в порядке возрастания по дате"
-
-            for message in last_msgs:
-                status = await rmq_manager.send_message_to_queue(
-                    queue_name=queue_name,
-                    message=json.dumps(message.payload, ensure_ascii=False)
-                )
-                if status:
-                    await set_status_of_outbox_row(message.id, OutBoxStatuses.SENT, session)
-                else:
-                    await set_status_of_outbox_row(message.id, OutBoxStatuses.FAILED, session)
-
-            if isinstance(iterations, int):
-                i += 1
-                if i >= iterations:
+    routes = routes or {}
+    stats_reporter = RelayStatsReporter(OUTBOX_STATS_LOG_INTERVAL)
+    relays: dict[str, tuple[QueueRelay, asyncio.Task]] = {}
+    "Циклы очередей. Ключ - имя очереди"
+    try:
+        async with session_maker() as session:
+            while True:
+                await update_backlog_metrics(session)
+                queues: set[str] = {*routes, *await get_pending_outbox_queues(session)}
+                # Фиксирует транзакцию чтения, чтобы длинная сессия не удерживала снимок бд
+                await session.commit()
+                for queue in sorted(queues):
+                    running: tuple[QueueRelay, asyncio.Task] | None = relays.get(queue)
+                    if running is not None and not running[1].done():
+                        continue
+                    if running is not None:
+                        if not running[1].cancelled() and running[1].exception() is not None:
+                            logger.error(f"Цикл очереди {queue} завершился с ошибкой: {running[1].exception()}")
+                        await running[0].manager.close()
+                    relay = QueueRelay(
+                        queue, routes.get(queue, default_route), await manager.open_channel(), session_maker
+                    )
+                    relays[queue] = (relay, asyncio.create_task(relay.run(poll_interval, iterations)))
+
+                if isinstance(iterations, int):
+                    await asyncio.gather(*(task for _, task in relays.values()))
+                    stats_reporter.maybe_log()
                     break
-            await asyncio.sleep(3)
+                stats_reporter.maybe_log()
+                await asyncio.sleep(poll_interval)
+    finally:
+        for _, task in relays.values():
+            task.cancel()
+        await asyncio.gather(*(task for _, task in relays.values()), return_exceptions=True)
+        for relay, _ in relays.values():
+            await relay.manager.close()
 
 
-if __name__ == "__main__":
+async def main():
+    """Запускает HTTP-сервер метрик (если задан порт) и процессор outbox.
+    Сообщения публикуются через одно постоянное соединение с RabbitMQ, у каждой очереди в нем свой канал"""
+    metrics_server: asyncio.Server | None = None
+    if OUTBOX_METRICS_PORT:
+        metrics_server = await start_metrics_server(OUTBOX_METRICS_HOST, OUTBOX_METRICS_PORT)
+        logger.info(f"Метрики outbox доступны на http://{OUTBOX_METRICS_HOST}:{OUTBOX_METRICS_PORT}/metrics")
+    engine: AsyncEngine = await create_outbox_engine()
+    rmq_manager: RabbitMQManager = await create_rmq_manager()
     try:
-        asyncio.run(
-            run_outbox_table_polling(
-                queue_name=FASTAPI_DATABASE_QUERIES_QUEUE_NAME,
-            )
+        await run_outbox_table_polling(
+            manager=rmq_manager,
+            session_maker=async_sessionmaker(engine, expire_on_commit=False),
+            routes=OUTBOX_ROUTES,
+            default_route=OUTBOX_DEFAULT_ROUTE,
+            poll_interval=OUTBOX_POLL_INTERVAL
         )
+    finally:
+        await rmq_manager.close()
+        await engine.dispose()
+        if metrics_server is not None:
+            metrics_server.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("Работа outbox процессора завершена!")
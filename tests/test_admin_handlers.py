@@ -3,12 +3,13 @@ import pytest
 from httpx import ASGITransport, AsyncClient
 from hypothesis import given, settings
 from hypothesis import strategies as st
-from sqlalchemy import delete
+from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from factories import category_factory, my_hypothesis_settings, queue_factory, engine, test_async_session_maker
 from core.database_utils import create_row, get_full_row_for_admin_by_id
-from core.models import CategoriesTable, BaseTable
+from core.models import CategoriesTable, BaseTable, OutboxTable
+from core.tracing import TRACE_STAGE_DURATION
 from web.dependencies import async_session_generator
 from web_main import app as fastapi_app
 
@@ -212,3 +213,36 @@ async def test_save_row_post_hanlder(
     assert updated_row == new_category
 
 
+
+
+@pytest.mark.asyncio
+@given(
+    category=category_factory(),
+    new_category=category_factory(),
+    queue_name=queue_factory()
+)
+@settings(**my_hypothesis_settings)
+async def test_save_row_traces_change(
+    ac: AsyncClient,
+    session: AsyncSession,
+    category: dict[str, str | int],
+    new_category: dict[str, str | int],
+    queue_name: str
+):
+    row_id = await create_row(CategoriesTable, category, session, queue_name)
+    traced_before: int = TRACE_STAGE_DURATION.get_count("request")
+
+    response = await ac.post(
+        "/save_row",
+        json={"tablename": CategoriesTable.__tablename__, "id": row_id, "data": new_category},
+        headers={"X-Trace-Id": "test-trace"}
+    )
+
+    successful_code: int = 200
+    assert response.status_code == successful_code
+    async with session.begin():
+        payload = await session.scalar(select(OutboxTable.payload).order_by(OutboxTable.id.desc()).limit(1))
+    assert payload["action"] == "update"
+    assert payload["trace"]["trace_id"] == "test-trace"
+    assert payload["trace"]["stages"]["request_started"] <= payload["trace"]["stages"]["outbox_inserted"]
+    assert TRACE_STAGE_DURATION.get_count("request") == traced_before + 1
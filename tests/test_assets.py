@@ -0,0 +1,85 @@
+import gzip
+import json
+
+from pathlib import Path
+
+import pytest
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from factories import engine, replica_engine, test_async_replica_session_maker, test_async_session_maker
+from core.models import BaseTable
+from web.assets import IMMUTABLE_CACHE_CONTROL, MANIFEST_NAME, build_assets
+from web.config import STATIC_FILES
+from web.dependencies import async_replica_session_generator, async_session_generator
+from web_main import app as fastapi_app
+
+
+@pytest.fixture(scope="function")
+async def ac():
+    async with engine.begin() as conn:
+        await conn.run_sync(BaseTable().metadata.drop_all)
+        await conn.run_sync(BaseTable().metadata.create_all)
+
+    async with test_async_session_maker() as session, test_async_replica_session_maker() as replica_session:
+        fastapi_app.dependency_overrides[async_session_generator] = lambda: session
+        fastapi_app.dependency_overrides[async_replica_session_generator] = lambda: replica_session
+        transport = ASGITransport(app=fastapi_app)
+        async with AsyncClient(transport=transport, base_url="http://localhost:8000/Ufanet_autum_practice") as ac:
+            yield ac
+
+    fastapi_app.dependency_overrides.pop(async_session_generator, None)
+    fastapi_app.dependency_overrides.pop(async_replica_session_generator, None)
+    await engine.dispose()
+    await replica_engine.dispose()
+
+
+def test_build_assets(tmp_path: Path):
+    source_dir: Path = tmp_path / "static"
+    output_dir: Path = tmp_path / "dist"
+    (source_dir / "css").mkdir(parents=True)
+    (source_dir / "css" / "base.css").write_text("body { color: red; }" * 50)
+    (source_dir / "logo.png").write_bytes(b"\x89PNG")
+
+    manifest: dict[str, str] = build_assets(source_dir, output_dir)
+    assert json.loads((output_dir / MANIFEST_NAME).read_text()) == manifest
+    old_css: str = manifest["css/base.css"]
+    assert old_css.startswith("css/base.") and old_css.endswith(".css") and old_css != "css/base.css"
+    compressed: bytes = (output_dir / (old_css + ".gz")).read_bytes()
+    assert gzip.decompress(compressed) == (source_dir / "css" / "base.css").read_bytes()
+    # Двоичные файлы не сжимаются
+    assert not (output_dir / (manifest["logo.png"] + ".gz")).exists()
+
+    # Новое содержимое - новое имя, файл предыдущей сборки остается
+    (source_dir / "css" / "base.css").write_text("body { color: blue; }")
+    new_css: str = build_assets(source_dir, output_dir)["css/base.css"]
+    assert new_css != old_css
+    assert (output_dir / old_css).exists()
+
+
+async def test_fingerprinted_static_files(ac: AsyncClient):
+    hashed_path: str = STATIC_FILES.asset_path("js/partnerprogram.js")
+    assert hashed_path != "js/partnerprogram.js"
+
+    page = await ac.get("/partnerprogram/")
+    assert f"/static/{hashed_path}" in page.text
+
+    response = await ac.get(f"/static/{hashed_path}", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-type"].startswith("text/javascript")
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["vary"] == "Accept-Encoding"
+    source: bytes = (STATIC_FILES.source_dir / "js" / "partnerprogram.js").read_bytes()
+    assert response.content == source
+
+    response = await ac.get(f"/static/{hashed_path}", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.content == source
+
+    # По исходному имени файл отдается без долгого кеширования
+    response = await ac.get("/static/js/partnerprogram.js", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.content == source
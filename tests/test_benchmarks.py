@@ -0,0 +1,60 @@
+import random
+
+from collections import Counter
+
+from benchmarks.catalog_generator import (
+    CARDS_CHUNK_SIZE,
+    CatalogSize,
+    generate_cards,
+    generate_categories,
+    generate_companies,
+    make_card_pools
+)
+from benchmarks.http_load import compare_results, percentile
+
+
+def make_results(throughput_rps: float, p99_ms: float, errors: int = 0) -> dict:
+    return {"scenarios": {"get_card_info": {"throughput_rps": throughput_rps, "p99_ms": p99_ms, "errors": errors}}}
+
+
+def test_percentile():
+    values: list[float] = [float(value) for value in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 99) == 0.0
+
+
+def test_compare_results():
+    baseline: dict = make_results(throughput_rps=1000, p99_ms=10)
+
+    assert compare_results(baseline, make_results(950, 10.5), threshold=0.1) == []
+    assert len(compare_results(baseline, make_results(800, 10), threshold=0.1)) == 1
+    assert len(compare_results(baseline, make_results(1000, 12), threshold=0.1)) == 1
+    assert len(compare_results(baseline, make_results(1000, 10, errors=3), threshold=0.1)) == 1
+
+
+def test_catalog_generator_is_deterministic_and_skewed():
+    size = CatalogSize(categories=200, companies=50, cards=CARDS_CHUNK_SIZE + 1000)
+
+    def generate(seed: int) -> list[tuple]:
+        pools = make_card_pools(random.Random(seed), size)
+        return [row for chunk in range(2) for row in generate_cards(seed, chunk, size, pools)]
+
+    cards: list[tuple] = generate(42)
+    assert cards == generate(42)
+    assert cards != generate(43)
+    assert [row[0] for row in cards] == list(range(1, size.cards + 1))
+
+    category_sizes: list[int] = sorted(Counter(row[1] for row in cards).values(), reverse=True)
+    assert category_sizes[0] > 20 * category_sizes[len(category_sizes) // 2]
+    assert all(1 <= row[1] <= size.categories and 1 <= row[2] <= size.companies for row in cards)
+    assert all(60 <= len(row[4]) <= 160 and 200 <= len(row[7]) <= 800 for row in cards)
+
+
+def test_catalog_generator_unique_names():
+    rng = random.Random(1)
+    companies: list[tuple[int, str, str]] = generate_companies(rng, 1000)
+    categories: list[tuple[int, str]] = generate_categories(rng, 1000)
+
+    assert len({company[1] for company in companies}) == len({company[2] for company in companies}) == 1000
+    assert len({category[1] for category in categories}) == 1000
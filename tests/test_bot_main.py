@@ -2,11 +2,13 @@ import asyncio
 import pytest
 import contextlib
 
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from factories import card_factory, my_hypothesis_settings, queue_factory
 from hypothesis import given, settings
-from bot_main import bot, rmq_manager, main
+from bot_main import main
+from core.core_types import RabbitMQManager
+from core.transport import InMemoryBroker, InMemoryTransport
 
 
 @pytest.mark.asyncio
@@ -18,23 +20,54 @@ from bot_main import bot, rmq_manager, main
 async def test_run_listening_queue(
     queue_name: str,
     payload: dict):
-    with patch.object(bot, "send_message", new_callable=AsyncMock) as mock_send, \
-        patch("bot_main.FASTAPI_DATABASE_QUERIES_QUEUE_NAME", queue_name):
+    broker = InMemoryBroker(delivery_latency=0.001)
+    rmq_manager = RabbitMQManager(None, InMemoryTransport(broker, prefetch_count=10))
+    bot = MagicMock(send_message=AsyncMock(), session=MagicMock(close=AsyncMock()))
+    with patch("bot_main.FASTAPI_DATABASE_QUERIES_QUEUE_NAME", queue_name), \
+        patch("bot_main.BOT_METRICS_PORT", 0):
 
         async def limited_run():
+            await rmq_manager.connect()
             await rmq_manager.drop_queue(queue_name, False, False)
-            task = asyncio.create_task(main())
+            task = asyncio.create_task(main(bot, rmq_manager))
             success = await rmq_manager.send_message_to_queue(
                 queue_name, 
                 payload
             )
             assert success is True
-            await asyncio.sleep(5)
+            await asyncio.sleep(0.01)
+            await asyncio.wait_for(broker.queues[queue_name].join(), timeout=5)
             task.cancel()
             with contextlib.suppress(asyncio.CancelledError):
                 await task
 
         await limited_run()
 
-    mock_send.assert_awaited_once()
+    bot.send_message.assert_awaited_once()
+    bot.session.close.assert_awaited_once()
+    assert broker.queues[queue_name].acked == 1
 
+
+async def test_on_message_failure_is_acked_once():
+    broker = InMemoryBroker()
+    transport = InMemoryTransport(broker, prefetch_count=1)
+    rmq_manager = RabbitMQManager(None, transport)
+    bot = MagicMock(
+        send_message=AsyncMock(side_effect=RuntimeError("Telegram недоступен")),
+        session=MagicMock(close=AsyncMock())
+    )
+    with patch("bot_main.FASTAPI_DATABASE_QUERIES_QUEUE_NAME", "bot_failures"), \
+        patch("bot_main.BOT_METRICS_PORT", 0):
+        await rmq_manager.connect()
+        task = asyncio.create_task(main(bot, rmq_manager))
+        for number in range(3):
+            assert await rmq_manager.send_message_to_queue("bot_failures", {"number": number})
+        await asyncio.sleep(0.01)
+        await asyncio.wait_for(broker.queues["bot_failures"].join(), timeout=5)
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+    # Ошибка Telegram не возвращает сообщение в очередь: бот подтверждает его и пишет ошибку в лог
+    assert broker.queues["bot_failures"].acked == 3
+    assert broker.queues["bot_failures"].dead_letters == []
@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from unittest.mock import AsyncMock, MagicMock, patch
+from httpx import ASGITransport, AsyncClient
+from hypothesis import given, settings
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from factories import (
+    card_factory,
+    category_factory,
+    company_factory,
+    engine,
+    my_hypothesis_settings,
+    queue_factory,
+    replica_engine,
+    test_async_replica_session_maker,
+    test_async_session_maker
+)
+
+from core.card_stats import CardStatsAggregator
+from core.database_utils import create_row, get_card_stats_report
+from core.metrics import CARD_STATS_EVENTS_DROPPED
+from core.models import DEFAULT_TENANT_ID, BaseTable, CardsTable, CardStatsTable, CategoriesTable, CompaniesTable
+from web.config import CARD_STATS
+from web.dependencies import async_replica_session_generator, async_session_generator
+from web_main import app as fastapi_app
+
+
+@pytest.fixture(scope="function")
+async def session():
+    async with engine.begin() as conn:
+        await conn.run_sync(BaseTable().metadata.drop_all)
+        await conn.run_sync(BaseTable().metadata.create_all)
+
+    async with test_async_session_maker() as session:
+        yield session
+
+    await engine.dispose()
+    await replica_engine.dispose()
+
+
+@pytest.fixture(scope="function")
+async def replica_session():
+    async with test_async_replica_session_maker() as replica_session:
+        yield replica_session
+
+
+@pytest.fixture(scope="function")
+async def ac(session: AsyncSession, replica_session: AsyncSession):
+    fastapi_app.dependency_overrides[async_session_generator] = lambda: session
+    fastapi_app.dependency_overrides[async_replica_session_generator] = lambda: replica_session
+    transport = ASGITransport(app=fastapi_app)
+    async with AsyncClient(transport=transport, base_url="http://localhost:8000/Ufanet_autum_practice") as ac:
+        yield ac
+
+    fastapi_app.dependency_overrides.pop(async_session_generator, None)
+    fastapi_app.dependency_overrides.pop(async_replica_session_generator, None)
+
+
+async def select_stats(session: AsyncSession) -> list[tuple]:
+    async with session.begin():
+        return [tuple(row) for row in (await session.execute(
+            select(
+                CardStatsTable.bucket, CardStatsTable.tenant_id, CardStatsTable.card_id,
+                CardStatsTable.views, CardStatsTable.clicks
+            ).order_by(CardStatsTable.bucket, CardStatsTable.tenant_id, CardStatsTable.card_id)
+        )).all()]
+
+
+@pytest.mark.asyncio
+async def test_aggregator_upserts_buckets_and_bounds_memory(session: AsyncSession):
+    stats = CardStatsAggregator(test_async_session_maker, bucket_seconds=60, interval=60, max_keys=3)
+    first = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc)
+    second = first + timedelta(minutes=1)
+
+    with patch("core.card_stats.time.time", return_value=first.timestamp() + 59):
+        for _ in range(1000):
+            stats.view(DEFAULT_TENANT_ID, 1)
+        stats.click(DEFAULT_TENANT_ID, 1)
+        stats.view(2, 1)
+    with patch("core.card_stats.time.time", return_value=second.timestamp()):
+        stats.click(DEFAULT_TENANT_ID, 1)
+        # Счетчиков уже max_keys: события новых карточек отбрасываются, известных - учитываются
+        dropped_before: float = CARD_STATS_EVENTS_DROPPED.get("view")
+        stats.view(DEFAULT_TENANT_ID, 2)
+        stats.click(DEFAULT_TENANT_ID, 1)
+    assert len(stats.counts) == 3
+    assert stats.dropped == 1 and CARD_STATS_EVENTS_DROPPED.get("view") == dropped_before + 1
+
+    assert await stats.flush() == 1004
+    assert await stats.flush() == 0
+    with patch("core.card_stats.time.time", return_value=second.timestamp()):
+        stats.view(DEFAULT_TENANT_ID, 1)
+        stats.view(DEFAULT_TENANT_ID, 2)
+    assert await stats.flush() == 2
+    assert await select_stats(session) == [
+        (first, DEFAULT_TENANT_ID, 1, 1000, 1),
+        (first, 2, 1, 1, 0),
+        (second, DEFAULT_TENANT_ID, 1, 1, 2),
+        (second, DEFAULT_TENANT_ID, 2, 1, 0),
+    ]
+
+    # При ошибке записи события возвращаются в счетчики и записываются следующим вызовом
+    failing = CardStatsAggregator(MagicMock(side_effect=RuntimeError("нет соединения")), max_keys=3)
+    failing.view(DEFAULT_TENANT_ID, 3)
+    assert await failing.flush() == 0
+    failing.view(DEFAULT_TENANT_ID, 3)
+    failing.session_maker = test_async_session_maker
+    assert await failing.flush() == 2
+
+    report = await get_card_stats_report(session, first, second + timedelta(minutes=1))
+    assert report[0] == {"tenant_id": DEFAULT_TENANT_ID, "card_id": 1, "views": 1001, "clicks": 3, "ctr": 0.003}
+    assert [(row["tenant_id"], row["card_id"]) for row in report[1:]] == [(DEFAULT_TENANT_ID, 2), (2, 1)]
+    assert [row["card_id"] for row in await get_card_stats_report(session, first, second)] == [1, 1]
+    assert await get_card_stats_report(session, first, second, tenant_id=2, limit=1) == [
+        {"tenant_id": 2, "card_id": 1, "views": 1, "clicks": 0, "ctr": 0.0}
+    ]
+
+
+@pytest.mark.asyncio
+@given(
+    category=category_factory(),
+    company=company_factory(),
+    card=card_factory(),
+    queue_name=queue_factory()
+)
+@settings(**my_hypothesis_settings)
+async def test_card_view_and_click_are_counted(
+    ac: AsyncClient,
+    session: AsyncSession,
+    category: dict,
+    company: dict,
+    card: dict,
+    queue_name: str
+):
+    with patch("core.database_utils.insert_into_outbox", new_callable=AsyncMock):
+        card["category_id"] = await create_row(CategoriesTable, category, session, queue_name)
+        card["company_id"] = await create_row(CompaniesTable, company, session, queue_name)
+        card_id: int = await create_row(CardsTable, dict(card), session, queue_name)
+
+    with patch.object(CARD_STATS, "view") as view, patch.object(CARD_STATS, "click") as click:
+        response = await ac.post("/partnerprogram/cards/get_card_info", json={"card_id": card_id})
+        assert f'href="./cards/{card_id}/go"' in response.text
+        view.assert_called_once_with(DEFAULT_TENANT_ID, card_id)
+
+        # Переход читает только ссылку карточки и не пишет в основную бд
+        with patch("core.database_utils.fast_select.record_select_in_outbox", new_callable=AsyncMock) as record:
+            redirect = await ac.get(f"/partnerprogram/cards/{card_id}/go")
+        assert redirect.status_code == 302
+        assert redirect.headers["location"] == card["call_to_action_link"]
+        click.assert_called_once_with(DEFAULT_TENANT_ID, card_id)
+        record.assert_not_awaited()
+
+        # Несуществующая карточка не учитывается
+        assert (await ac.get(f"/partnerprogram/cards/{card_id + 1000}/go")).status_code == 404
+        await ac.post("/partnerprogram/cards/get_card_info", json={"card_id": card_id + 1000})
+        assert view.call_count == click.call_count == 1
+
+    stats = CardStatsAggregator(test_async_session_maker)
+    stats.view(DEFAULT_TENANT_ID, card_id)
+    stats.click(DEFAULT_TENANT_ID, card_id)
+    assert await stats.flush() == 2
+    response = await ac.get("/admin/card_stats", params={"tenant_id": DEFAULT_TENANT_ID})
+    assert response.status_code == 200
+    assert response.json()["cards"] == [
+        {"tenant_id": DEFAULT_TENANT_ID, "card_id": card_id, "views": 1, "clicks": 1, "ctr": 1.0}
+    ]
@@ -0,0 +1,258 @@
+from pathlib import Path
+
+import pytest
+
+from httpx import ASGITransport, AsyncClient
+from hypothesis import given, settings
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from factories import (
+    card_factory,
+    category_factory,
+    company_factory,
+    engine,
+    my_hypothesis_settings,
+    queue_factory,
+    replica_engine,
+    test_async_replica_session_maker,
+    test_async_session_maker
+)
+from core.cache import FragmentCache, bump_catalog_version
+from core.database_utils import create_row, update_row_by_id
+from core.models import DEFAULT_TENANT_ID, BaseTable, CardsTable, CategoriesTable, CompaniesTable, OutboxTable
+from web.config import CURRENT_DIR, FRAGMENT_CACHE
+from web.dependencies import async_replica_session_generator, async_session_generator
+from web.templating import create_templates
+from web.warmup import compile_templates
+from web_main import app as fastapi_app
+
+
+@pytest.fixture(scope="function")
+async def session():
+    async with engine.begin() as conn:
+        await conn.run_sync(BaseTable().metadata.drop_all)
+        await conn.run_sync(BaseTable().metadata.create_all)
+
+    async with test_async_session_maker() as session:
+        yield session
+
+    await engine.dispose()
+
+
+@pytest.fixture(scope="function")
+async def replica_session():
+    async with test_async_replica_session_maker() as replica_session:
+        yield replica_session
+
+    await replica_engine.dispose()
+
+
+@pytest.fixture(scope="function")
+async def ac(session: AsyncSession, replica_session: AsyncSession):
+    fastapi_app.dependency_overrides[async_session_generator] = lambda: session
+    fastapi_app.dependency_overrides[async_replica_session_generator] = lambda: replica_session
+    transport = ASGITransport(app=fastapi_app)
+    async with AsyncClient(transport=transport, base_url="http://localhost:8000/Ufanet_autum_practice/partnerprogram") as ac:
+        yield ac
+
+    fastapi_app.dependency_overrides.pop(async_session_generator, None)
+    fastapi_app.dependency_overrides.pop(async_replica_session_generator, None)
+
+
+async def count_outbox_rows(session: AsyncSession) -> int:
+    async with session.begin():
+        return await session.scalar(select(func.count()).select_from(OutboxTable))
+
+
+@pytest.mark.asyncio
+@given(
+    category=category_factory(),
+    empty_category=category_factory(),
+    company=company_factory(),
+    card=card_factory(),
+    queue_name=queue_factory()
+)
+@settings(**my_hypothesis_settings)
+async def test_partnerprogram_reads_from_replica(
+    ac: AsyncClient,
+    session: AsyncSession,
+    category: dict,
+    empty_category: dict,
+    company: dict,
+    card: dict,
+    queue_name: str
+):
+    async with session.begin():
+        await session.execute(delete(OutboxTable))
+        await session.execute(delete(CardsTable))
+        await session.execute(delete(CategoriesTable))
+    card["category_id"] = await create_row(CategoriesTable, category, session, queue_name)
+    card["company_id"] = await create_row(CompaniesTable, company, session, queue_name)
+    await create_row(CardsTable, card, session, queue_name)
+    await create_row(CategoriesTable, empty_category, session, queue_name)
+    outbox_rows_before: int = await count_outbox_rows(session)
+
+    response = await ac.get("/")
+
+    successful_code = 200
+    assert response.status_code == successful_code
+    assert category["name"] in response.text
+    # Категории без карточек не показываются
+    assert empty_category["name"] not in response.text
+    # Чтение прошло через реплику только для чтения, а сообщение outbox записано в основную бд
+    assert await count_outbox_rows(session) == outbox_rows_before + 1
+
+
+@pytest.mark.asyncio
+@given(
+    category=category_factory(),
+    company=company_factory(),
+    card=card_factory(),
+    queue_name=queue_factory()
+)
+@settings(**my_hypothesis_settings)
+async def test_cards_and_card_info_read_from_replica(
+    ac: AsyncClient,
+    session: AsyncSession,
+    category: dict,
+    company: dict,
+    card: dict,
+    queue_name: str
+):
+    card["category_id"] = await create_row(CategoriesTable, category, session, queue_name)
+    card["company_id"] = await create_row(CompaniesTable, company, session, queue_name)
+    card_id = await create_row(CardsTable, card, session, queue_name)
+
+    response = await ac.get("/cards", params={"category_id": card["category_id"]})
+
+    successful_code = 200
+    assert response.status_code == successful_code
+    assert card["main_label"] in response.text
+    assert company["name"] in response.text
+
+    response = await ac.post("/cards/get_card_info", json={"card_id": card_id})
+
+    assert response.status_code == successful_code
+    assert card["promocode"] in response.text
+
+
+@pytest.mark.asyncio
+@given(
+    category=category_factory(),
+    company=company_factory(),
+    card=card_factory(),
+    queue_name=queue_factory()
+)
+@settings(**my_hypothesis_settings)
+async def test_search_get_handler(
+    ac: AsyncClient,
+    session: AsyncSession,
+    category: dict,
+    company: dict,
+    card: dict,
+    queue_name: str
+):
+    card["category_id"] = await create_row(CategoriesTable, category, session, queue_name)
+    card["company_id"] = await create_row(CompaniesTable, company, session, queue_name)
+    card["description_under_label"] = "Скидка на абонемент в бассейн"
+    await create_row(CardsTable, card, session, queue_name)
+
+    response = await ac.get("/search", params={"q": "бассейна"})
+
+    successful_code = 200
+    assert response.status_code == successful_code
+    assert card["main_label"] in response.text
+
+
+@pytest.mark.asyncio
+@given(
+    category=category_factory(),
+    company=company_factory(),
+    card=card_factory(),
+    queue_name=queue_factory()
+)
+@settings(**my_hypothesis_settings)
+async def test_card_fragments_cached_and_invalidated(
+    ac: AsyncClient,
+    session: AsyncSession,
+    category: dict,
+    company: dict,
+    card: dict,
+    queue_name: str
+):
+    card["category_id"] = await create_row(CategoriesTable, category, session, queue_name)
+    card["company_id"] = await create_row(CompaniesTable, company, session, queue_name)
+    card_id = await create_row(CardsTable, card, session, queue_name)
+    fragment_cache: FragmentCache = FRAGMENT_CACHE.namespace(DEFAULT_TENANT_ID)
+
+    first = await ac.get("/cards", params={"category_id": card["category_id"]})
+    hits: int = fragment_cache.hits
+    second = await ac.get("/cards", params={"category_id": card["category_id"]})
+    assert second.text == first.text
+    assert fragment_cache.hits == hits + 1
+
+    modal = await ac.post("/cards/get_card_info", json={"card_id": card_id})
+    assert (await ac.post("/cards/get_card_info", json={"card_id": card_id})).text == modal.text
+    assert fragment_cache.hits == hits + 2
+
+    # Изменение карточки через DML-функцию делает фрагменты недействительными
+    new_data: dict = {"main_label": "Новая скидка", "promocode": "NEWCODE"}
+    await update_row_by_id(card_id, CardsTable, new_data, session, queue_name)
+    assert "Новая скидка" in (await ac.get("/cards", params={"category_id": card["category_id"]})).text
+    assert "NEWCODE" in (await ac.post("/cards/get_card_info", json={"card_id": card_id})).text
+
+    # Рядом с HTML кешируется сжатый вариант фрагмента
+    params: dict = {"category_id": card["category_id"]}
+    response = await ac.get("/cards", params=params, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert any(key[-1] == "gzip" for key in fragment_cache.entries)
+    hits = fragment_cache.hits
+    cached = await ac.get("/cards", params=params, headers={"Accept-Encoding": "gzip"})
+    assert cached.text == response.text
+    assert fragment_cache.hits == hits + 1
+
+
+def test_fragment_cache_byte_limit():
+    cache = FragmentCache(max_bytes=10)
+    cache.set("a", b"12345")
+    cache.set("b", b"12345")
+    assert cache.get("a") == b"12345"
+
+    # Вытесняется давно использованный фрагмент, размер не превышает max_bytes
+    cache.set("c", b"123")
+    assert cache.get("b") is None
+    assert cache.size == 8
+
+    cache.set("huge", b"x" * 11)
+    assert cache.get("huge") is None
+
+    bump_catalog_version()
+    assert cache.get("a") is None
+    cache.set("d", b"1")
+    assert cache.size == 1
+
+
+async def test_cold_worker_first_request(ac: AsyncClient, monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    def count_compilations(bytecode_cache_dir: Path | None) -> int:
+        # Новые шаблоны без скомпилированных в памяти шаблонов - как у только что запущенного воркера
+        templates = create_templates(CURRENT_DIR / "templates", bytecode_cache_dir, auto_reload=False)
+        compile_source = templates.env.compile
+        compiled: list[str] = []
+
+        def counting_compile(source, name=None, filename=None, raw=False, defer_init=False):
+            compiled.append(name)
+            return compile_source(source, name, filename, raw, defer_init)
+
+        monkeypatch.setattr(templates.env, "compile", counting_compile)
+        compile_templates(templates)
+        monkeypatch.setattr("web.handlers.client_handlers.TEMPLATES", templates)
+        return len(compiled)
+
+    # Сборка: шаблоны компилируются в кеш байткода
+    compiled_at_build: int = compile_templates(create_templates(CURRENT_DIR / "templates", tmp_path, auto_reload=False))
+
+    # Без кеша байткода воркер компилирует каждый шаблон, с кешем - загружает готовый байткод
+    assert count_compilations(None) == compiled_at_build
+    assert count_compilations(tmp_path) == 0
+    assert (await ac.get("/")).status_code == 200
@@ -0,0 +1,97 @@
+import gzip
+
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from web.compression import accepted_encodings, choose_encoding
+from web.middlewares import CompressionMiddleware
+
+
+BIG_TEXT: str = "Партнерская программа Уфанет. " * 100
+
+
+async def big_text(request) -> Response:
+    return PlainTextResponse(BIG_TEXT)
+
+
+async def small_text(request) -> Response:
+    return PlainTextResponse("ok")
+
+
+async def image(request) -> Response:
+    return Response(BIG_TEXT.encode(), media_type="image/png")
+
+
+async def streamed_text(request) -> Response:
+    async def chunks():
+        for _ in range(3):
+            yield BIG_TEXT
+    return StreamingResponse(chunks(), media_type="text/html")
+
+
+app = CompressionMiddleware(
+    Starlette(routes=[
+        Route("/big", big_text),
+        Route("/small", small_text),
+        Route("/image", image),
+        Route("/stream", streamed_text),
+    ]),
+    minimum_size=500
+)
+
+
+def test_choose_encoding():
+    assert accepted_encodings("gzip, deflate, br") == {"gzip", "deflate", "br"}
+    assert accepted_encodings("br;q=0, gzip;q=0.5") == {"gzip"}
+    assert accepted_encodings("") == set()
+    assert choose_encoding("deflate, gzip") == "gzip"
+    assert choose_encoding("gzip;q=0, identity") is None
+
+
+async def test_compression_middleware():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/big", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert int(response.headers["content-length"]) < len(BIG_TEXT.encode())
+        assert response.text == BIG_TEXT
+
+        response = await ac.get("/stream", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        assert response.text == BIG_TEXT * 3
+
+        # Маленькие, нетекстовые ответы и ответы клиентам без поддержки сжатия не сжимаются
+        for path, accept_encoding in (("/small", "gzip"), ("/image", "gzip"), ("/big", "identity")):
+            response = await ac.get(path, headers={"Accept-Encoding": accept_encoding})
+            assert "content-encoding" not in response.headers
+            assert response.status_code == 200
+
+
+async def test_compressed_body_is_valid_gzip():
+    messages: list[dict] = []
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        messages.append(message)
+
+    scope: dict = {
+        "type": "http",
+        "method": "GET",
+        "path": "/big",
+        "raw_path": b"/big",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"accept-encoding", b"gzip")],
+        "scheme": "http",
+        "server": ("test", 80),
+        "client": ("test", 1),
+        "http_version": "1.1",
+    }
+    await app(scope, receive, send)
+    body: bytes = b"".join(message.get("body", b"") for message in messages[1:])
+    assert gzip.decompress(body).decode() == BIG_TEXT
@@ -25,12 +25,17 @@ from core.database_utils import (
     delete_row,
     get_all_cards_in_category_with_short_description,
     get_all_categories,
+    get_all_cards_in_category_fast,
+    get_all_categories_fast,
     get_all_rows_from_table,
     get_card_info_by_card_id,
+    get_card_info_fast,
     get_full_row_for_admin_by_id,
     insert_into_outbox,
+    search_cards,
     update_row_by_id,
 )
+from core.cache import SEARCH_CACHE, CatalogCache, bump_catalog_version, get_catalog_version
 from core.models import BaseTable, CardsTable, CategoriesTable, CompaniesTable, OutboxTable
 
 
@@ -99,30 +104,42 @@ async def test_insert_into_outbox(
 @pytest.mark.asyncio
 @given(
     queue_name=queue_factory(),
-    category=category_factory()
+    category=category_factory(),
+    company=company_factory(),
+    card=card_factory()
 )
 @settings(**my_hypothesis_settings)
 async def test_get_all_categories(
     session: AsyncSession,
     queue_name: str,
-    category: dict
+    category: dict,
+    company: dict,
+    card: dict
 ):
     with patch("core.database_utils.insert_into_outbox", new_callable=AsyncMock):
         async with session.begin():
+            await session.execute(delete(CardsTable))
             await session.execute(delete(CategoriesTable))
 
-        await create_row(
+        category_id = await create_row(
             CategoriesTable,
             category,
             session,
             queue_name
         )
+        # Категория без карточек не возвращается
+        assert await get_all_categories(session, queue_name) == []
+
+        card["category_id"] = category_id
+        card["company_id"] = await create_row(CompaniesTable, company, session, queue_name)
+        await create_row(CardsTable, card, session, queue_name)
 
         result = await get_all_categories(session, queue_name)
         assert isinstance(result, list)
         assert len(result) >= 1
-        assert {"id", "name"} <= set(result[-1].keys())
+        assert {"id", "name", "cards_count"} <= set(result[-1].keys())
         assert result[-1]["name"] == category["name"]
+        assert result[-1]["cards_count"] == 1
 
 
 @pytest.mark.asyncio
@@ -406,3 +423,99 @@ async def test_delete_row(
 
         assert selected_category == {}
 
+
+
+@pytest.mark.asyncio
+@given(
+    category=category_factory(),
+    company=company_factory(),
+    card=card_factory(),
+    queue_name=queue_factory()
+)
+@settings(**my_hypothesis_settings)
+async def test_search_cards(
+    session: AsyncSession,
+    category: dict,
+    company: dict,
+    card: dict,
+    queue_name: str
+):
+    SEARCH_CACHE.clear()
+    async with session.begin():
+        await session.execute(delete(CardsTable))
+
+    company["name"] = f"Кофейня {company['name']}"
+    card["category_id"] = await create_row(CategoriesTable, category, session, queue_name)
+    card["company_id"] = await create_row(CompaniesTable, company, session, queue_name)
+    card["about_partner"] = "Лучшие пирожные в городе"
+    card_id = await create_row(CardsTable, card, session, queue_name)
+
+    # Совпадение по тексту карточки с учетом морфологии
+    by_card_text = await search_cards("пирожное", session, queue_name)
+    assert [row["id"] for row in by_card_text] == [card_id]
+    assert by_card_text[0]["company_name"] == company["name"]
+
+    # Совпадение по названию компании
+    result = await search_cards("кофейни", session, queue_name)
+    assert [row["id"] for row in result] == [card_id]
+
+    assert await search_cards("   ", session, queue_name) == []
+
+    # Повторный запрос отдается из кеша копией: изменение результата вызывающим не портит кеш
+    cached = await search_cards("пирожное", session, queue_name)
+    assert cached == by_card_text
+    cached[0]["main_label"] = "Изменено"
+    cached.clear()
+    assert await search_cards("пирожное", session, queue_name) == by_card_text
+
+    # Изменение каталога сбрасывает кеш
+    await update_row_by_id(card_id, CardsTable, {"about_partner": "Торты"}, session, queue_name)
+    assert await search_cards("пирожное", session, queue_name) == []
+
+
+def test_catalog_cache_skips_stale_version():
+    cache = CatalogCache(max_entries=10, ttl=30)
+    version: int = get_catalog_version()
+
+    # Каталог изменился, пока выполнялся запрос: результат не сохраняется под новой версией
+    bump_catalog_version()
+    cache.set("key", ("old",), version=version)
+    assert cache.get("key") is None
+
+    cache.set("key", ("new",), version=get_catalog_version())
+    assert cache.get("key") == ("new",)
+
+
+@pytest.mark.asyncio
+@given(
+    category=category_factory(),
+    company=company_factory(),
+    card=card_factory(),
+    queue_name=queue_factory()
+)
+@settings(**my_hypothesis_settings)
+async def test_fast_catalog_selects(
+    session: AsyncSession,
+    category: dict,
+    company: dict,
+    card: dict,
+    queue_name: str
+):
+    category_id = await create_row(CategoriesTable, category, session, queue_name)
+    card["category_id"] = category_id
+    card["company_id"] = await create_row(CompaniesTable, company, session, queue_name)
+    card_id = await create_row(CardsTable, card, session, queue_name)
+
+    categories = await get_all_categories_fast(session, queue_name)
+    assert categories[-1].name == category["name"]
+    assert [dict(row._mapping) for row in categories] == await get_all_categories(session, queue_name)
+
+    cards = await get_all_cards_in_category_fast(category_id, session, queue_name)
+    assert [dict(row._mapping) for row in cards] == await get_all_cards_in_category_with_short_description(
+        category_id, session, queue_name
+    )
+    assert cards[0].company_name == company["name"]
+
+    card_info = await get_card_info_fast(card_id, session, queue_name)
+    assert dict(card_info._mapping) == await get_card_info_by_card_id(card_id, session, queue_name)
+    assert await get_card_info_fast(card_id + 1, session, queue_name) is None
@@ -0,0 +1,134 @@
+import io
+
+from pathlib import Path
+
+import pytest
+
+from unittest.mock import AsyncMock, patch
+from httpx import ASGITransport, AsyncClient
+from hypothesis import given, settings
+from PIL import Image
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from factories import (
+    card_factory,
+    category_factory,
+    company_factory,
+    engine,
+    my_hypothesis_settings,
+    queue_factory,
+    replica_engine,
+    test_async_replica_session_maker,
+    test_async_session_maker
+)
+
+from core.database_utils import create_row
+from core.images import ImageStore, InvalidImageError, image_key, thumbnail_path
+from core.models import BaseTable, CardsTable, CategoriesTable, CompaniesTable
+from web.config import IMAGE_STORE
+from web.dependencies import async_replica_session_generator, async_session_generator
+from web_main import app as fastapi_app
+
+
+@pytest.fixture(scope="function")
+async def session():
+    async with engine.begin() as conn:
+        await conn.run_sync(BaseTable().metadata.drop_all)
+        await conn.run_sync(BaseTable().metadata.create_all)
+
+    async with test_async_session_maker() as session:
+        yield session
+
+    await engine.dispose()
+
+
+@pytest.fixture(scope="function")
+async def ac(session: AsyncSession):
+    replica_session: AsyncSession = test_async_replica_session_maker()
+    fastapi_app.dependency_overrides[async_session_generator] = lambda: session
+    fastapi_app.dependency_overrides[async_replica_session_generator] = lambda: replica_session
+    transport = ASGITransport(app=fastapi_app)
+    async with AsyncClient(transport=transport, base_url="http://localhost:8000/Ufanet_autum_practice") as ac:
+        yield ac
+
+    fastapi_app.dependency_overrides.pop(async_session_generator, None)
+    fastapi_app.dependency_overrides.pop(async_replica_session_generator, None)
+    await replica_session.close()
+    await replica_engine.dispose()
+    IMAGE_STORE.shutdown()
+
+
+def make_image(width: int, height: int, image_format: str = "PNG", color: tuple = (200, 30, 30)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_image_store_saves_original_and_thumbnails(tmp_path: Path):
+    store = ImageStore(tmp_path, max_workers=1, max_bytes=1024 * 1024)
+    content: bytes = make_image(1200, 600)
+    try:
+        key = await store.save(content, ("card", "logo"))
+        assert key == image_key(content) and key.endswith(".png")
+        assert (tmp_path / "originals" / key).read_bytes() == content
+        with Image.open(tmp_path / thumbnail_path(key, "card")) as thumbnail:
+            assert (thumbnail.format, thumbnail.size) == ("WEBP", (480, 240))
+        with Image.open(tmp_path / thumbnail_path(key, "logo", "jpg")) as thumbnail:
+            assert (thumbnail.format, thumbnail.size) == ("JPEG", (128, 64))
+
+        # Тот же файл повторно не обрабатывается, другой файл получает другой ключ
+        with patch("core.images.process_image") as process_image:
+            assert await store.save(content, ("card", "logo")) == key
+        process_image.assert_not_called()
+        assert await store.save(make_image(10, 10, "JPEG"), ("logo",)) != key
+
+        with pytest.raises(InvalidImageError):
+            await store.save(b"not an image", ("card",))
+        with pytest.raises(InvalidImageError):
+            await store.save(b"\x89PNG\r\n\x1a\n" + b"broken", ("card",))
+        with pytest.raises(InvalidImageError):
+            await store.save(b"\xff\xd8\xff" + b"0" * 1024 * 1024, ("card",))
+    finally:
+        store.shutdown()
+
+
+@pytest.mark.asyncio
+@given(
+    category=category_factory(),
+    company=company_factory(),
+    card=card_factory(),
+    queue_name=queue_factory()
+)
+@settings(**my_hypothesis_settings)
+async def test_upload_images_and_render_thumbnails(
+    ac: AsyncClient,
+    session: AsyncSession,
+    category: dict,
+    company: dict,
+    card: dict,
+    queue_name: str
+):
+    with patch("core.database_utils.insert_into_outbox", new_callable=AsyncMock):
+        card["category_id"] = await create_row(CategoriesTable, category, session, queue_name)
+        card["company_id"] = await create_row(CompaniesTable, company, session, queue_name)
+        card_id = await create_row(CardsTable, card, session, queue_name)
+
+    banner = await ac.post(f"/admin/images/cards/{card_id}", content=make_image(1600, 900))
+    assert banner.status_code == 200
+    logo = await ac.post(f"/admin/images/companies/{card['company_id']}", content=make_image(300, 300, "JPEG"))
+    assert logo.status_code == 200
+
+    page = await ac.get("/partnerprogram/cards", params={"category_id": card["category_id"]})
+    assert thumbnail_path(banner.json()["image"], "card") in page.text
+    assert thumbnail_path(logo.json()["image"], "logo") in page.text
+    modal = await ac.post("/partnerprogram/cards/get_card_info", json={"card_id": card_id})
+    assert thumbnail_path(banner.json()["image"], "modal", "jpg") in modal.text
+
+    thumbnail = await ac.get(banner.json()["thumbnails"]["card"]["webp"])
+    assert thumbnail.status_code == 200
+    assert thumbnail.headers["content-type"] == "image/webp"
+    assert "immutable" in thumbnail.headers["cache-control"]
+
+    assert (await ac.post(f"/admin/images/categories/{card['category_id']}", content=b"")).status_code == 404
+    assert (await ac.post(f"/admin/images/cards/{card_id}", content=b"<svg/>")).status_code == 422
@@ -0,0 +1,61 @@
+import subprocess
+import sys
+
+from pathlib import Path
+
+import pytest
+
+from factories import time_budget
+
+
+PROJECT_DIR: Path = Path(__file__).resolve().parent.parent
+"Корень проекта, из которого запускаются процессы"
+
+IMPORT_TIME_BUDGETS: dict[str, float] = {
+    "bot_main": 0.5,
+    "outbox_main": 1.5,
+}
+"Максимально допустимое время импорта точки входа процесса в секундах"
+
+FORBIDDEN_IMPORTS: dict[str, set[str]] = {
+    "bot_main": {"sqlalchemy", "asyncpg", "aio_pika", "aiogram", "fastapi", "jinja2"},
+    "outbox_main": {"aio_pika", "aiogram", "fastapi", "jinja2"},
+}
+"Пакеты, которые точка входа не должна загружать при импорте (загружаются фабриками при старте или не нужны)"
+
+
+def measure_import(module: str) -> tuple[float, set[str]]:
+    """
+    Импортирует модуль в отдельном процессе с `python -X importtime`.
+
+    Returns:
+        tuple[float, set[str]]: Время импорта модуля в секундах и имена всех загруженных модулей.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    cumulative: dict[str, int] = {}
+    "Ключ - модуль, значение - время импорта с зависимостями в микросекундах"
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, microseconds, name = line.removeprefix("import time:").split("|")
+        cumulative[name.strip()] = int(microseconds)
+    return cumulative[module] / 1_000_000, set(cumulative)
+
+
+@pytest.mark.parametrize("module", FORBIDDEN_IMPORTS)
+def test_entry_point_forbidden_imports(module: str):
+    _, imported = measure_import(module)
+    assert not FORBIDDEN_IMPORTS[module] & imported
+
+
+@time_budget
+@pytest.mark.parametrize("module", IMPORT_TIME_BUDGETS)
+def test_entry_point_import_time(module: str):
+    import_time, _ = min(measure_import(module) for _ in range(3))
+    assert import_time < IMPORT_TIME_BUDGETS[module]
@@ -1,20 +1,29 @@
 import pytest
 import asyncio
+import json
 
 from contextlib import asynccontextmanager
-from unittest.mock import ANY, AsyncMock, call, patch
+from typing import Any
+from unittest.mock import ANY, call, patch
 
 from hypothesis import given, settings
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from core.core_types import OutBoxStatuses
+from core.core_types import OutBoxStatuses, RabbitMQManager
 from core.database_utils import (
     insert_into_outbox,
     get_last_pending_messages_from_outbox,
-    set_status_of_outbox_row
+    get_outbox_backlog,
+    get_pending_outbox_queues,
+    set_status_of_outbox_row,
+    set_status_of_outbox_rows
 )
+from core.metrics import start_metrics_server
 from core.models import BaseTable, OutboxTable
+from core.transport import InMemoryBroker, InMemoryTransport
+from outbox.metrics import OUTBOX_MESSAGES_PUBLISHED, OUTBOX_PUBLISH_DURATION, RelayStatsReporter
+from outbox.routes import OutboxRoute, parse_outbox_routes
 from outbox_main import run_outbox_table_polling
 from tests.factories import card_factory, engine, my_hypothesis_settings, queue_factory, test_async_session_maker
 
@@ -58,29 +67,129 @@ async def fake_session_maker():
 )
 @settings(**my_hypothesis_settings)
 async def test_run_outbox_table_polling(
-    monkeypatch: pytest.MonkeyPatch,
     session: AsyncSession,
     queue_name: str,
     payload: dict
 ):
+    await session.execute(OutboxTable.__table__.delete())
     await insert_into_outbox(
         payload=payload,
         queue=queue_name,
         session=session
     )
     await session.commit()
-    monkeypatch.setattr("outbox_main.OUTBOX_ASYNC_SESSIONMAKER", fake_session_maker)
+    broker = InMemoryBroker()
 
-    with patch("outbox_main.set_status_of_outbox_row", new_callable=AsyncMock) as mock_set:
+    with patch("outbox_main.set_status_of_outbox_rows", wraps=set_status_of_outbox_rows) as mock_set:
         await run_outbox_table_polling(
-            queue_name,
+            manager=RabbitMQManager(None, InMemoryTransport(broker)),
+            session_maker=fake_session_maker,
             iterations=1
         )
 
-        sent_calls = [
-            call(1, OutBoxStatuses.SENT, ANY)
-        ]
-        mock_set.assert_has_awaits(sent_calls)
+        mock_set.assert_has_awaits([call([ANY], OutBoxStatuses.SENT, ANY), call([], OutBoxStatuses.FAILED, ANY)])
+
+    statuses = (await session.scalars(select(OutboxTable.status))).all()
+    assert statuses == [OutBoxStatuses.SENT]
+    published_message = broker.queues[queue_name].ready[-1]
+    assert json.loads(json.loads(published_message.body)) == payload
+
+
+@pytest.mark.asyncio
+@given(
+    queue_name=queue_factory(),
+    payload=card_factory()
+)
+@settings(**my_hypothesis_settings)
+async def test_run_outbox_table_polling_publish_failure(
+    session: AsyncSession,
+    queue_name: str,
+    payload: dict
+):
+    await session.execute(OutboxTable.__table__.delete())
+    for _ in range(3):
+        await insert_into_outbox(payload=dict(payload), queue=queue_name, session=session)
+    await session.commit()
+    broker = InMemoryBroker(publish_latency=0.001)
+    broker.fail_next_publishes(2)
+
+    await run_outbox_table_polling(
+        iterations=1,
+        manager=RabbitMQManager(None, InMemoryTransport(broker)),
+        session_maker=fake_session_maker
+    )
+
+    statuses = (await session.scalars(select(OutboxTable.status).order_by(OutboxTable.id))).all()
+    assert statuses == [OutBoxStatuses.FAILED, OutBoxStatuses.FAILED, OutBoxStatuses.SENT]
+    assert broker.failed_publishes == 2
+    assert len(broker.queues[queue_name].ready) == 1
+
+
+class SlowQueueBroker(InMemoryBroker):
+    "Брокер, медленно подтверждающий публикации в одну очередь и запоминающий наибольшее число одновременных"
+    def __init__(self, slow_queue: str, latency: float):
+        super().__init__()
+        self.slow_queue = slow_queue
+        self.latency = latency
+        self.in_flight: dict[str, int] = {}
+        self.max_in_flight: dict[str, int] = {}
+
+    async def publish(self, queue_name: str, body: bytes, headers: dict[str, Any] | None) -> None:
+        self.in_flight[queue_name] = self.in_flight.get(queue_name, 0) + 1
+        self.max_in_flight[queue_name] = max(self.max_in_flight.get(queue_name, 0), self.in_flight[queue_name])
+        try:
+            if queue_name == self.slow_queue:
+                await asyncio.sleep(self.latency)
+            await super().publish(queue_name, body, headers)
+        finally:
+            self.in_flight[queue_name] -= 1
+
+
+@pytest.mark.asyncio
+async def test_run_outbox_table_polling_routes(session: AsyncSession):
+    await session.execute(OutboxTable.__table__.delete())
+    for i in range(40):
+        await insert_into_outbox(payload={"audit": i}, queue="audit", session=session)
+    for i in range(3):
+        await insert_into_outbox(payload={"change": i}, queue="changes", session=session)
+    await session.commit()
+    assert await get_pending_outbox_queues(session) == ["audit", "changes"]
+    await session.commit()
+
+    broker = SlowQueueBroker("audit", latency=0.01)
+    routes = parse_outbox_routes('{"audit": {"batch_size": 8, "concurrency": 4}, "changes": {"batch_size": 2}}')
+    polling = asyncio.create_task(run_outbox_table_polling(
+        manager=RabbitMQManager(None, InMemoryTransport(broker)),
+        session_maker=fake_session_maker,
+        routes=routes,
+        iterations=1
+    ))
+    while len(broker.declare_queue("changes").ready) < 3:
+        await asyncio.sleep(0.001)
+    # Сообщения изменений опубликованы, пока очередь аудита еще публикуется
+    assert len(broker.declare_queue("audit").ready) < 40
+    await polling
+
+    # Очередь с concurrency 1 публикуется в порядке создания
+    assert [json.loads(json.loads(message.body))["change"] for message in broker.declare_queue("changes").ready] == [
+        0, 1, 2
+    ]
+    audit: list[int] = [json.loads(json.loads(message.body))["audit"] for message in broker.declare_queue("audit").ready]
+    assert sorted(audit) == list(range(40))
+    assert broker.max_in_flight == {"audit": 4, "changes": 1}
+    assert await get_pending_outbox_queues(session) == []
+    statuses = (await session.scalars(select(OutboxTable.status).distinct())).all()
+    assert statuses == [OutBoxStatuses.SENT]
+
+
+def test_parse_outbox_routes():
+    assert parse_outbox_routes("{}") == {}
+    assert parse_outbox_routes('{"audit": {"concurrency": 8, "poll_interval": 0.5}}') == {
+        "audit": OutboxRoute(concurrency=8, poll_interval=0.5)
+    }
+    for raw in ("[]", "{", '{"audit": {"size": 1}}', '{"audit": {"batch_size": 0}}'):
+        with pytest.raises(ValueError):
+            parse_outbox_routes(raw)
 
 
 @pytest.mark.asyncio
@@ -115,3 +224,62 @@ async def test_get_last_pending_messages_from_outbox(
     assert isinstance(upd_outbox_row, OutboxTable)
     assert upd_outbox_row.status == OutBoxStatuses.FAILED
 
+
+
+@pytest.mark.asyncio
+@given(
+    queue_name=queue_factory(),
+    payload=card_factory()
+)
+@settings(**my_hypothesis_settings)
+async def test_get_outbox_backlog(
+    session: AsyncSession,
+    queue_name: str,
+    payload: dict
+):
+    await session.execute(OutboxTable.__table__.delete())
+    await session.commit()
+    assert await get_outbox_backlog(session, count_limit=2) == (0, None)
+
+    for _ in range(3):
+        await insert_into_outbox(payload=dict(payload), queue=queue_name, session=session)
+    await session.commit()
+
+    pending_count, oldest_created_at = await get_outbox_backlog(session, count_limit=2)
+    # Подсчет ограничен count_limit
+    assert pending_count == 2
+    assert oldest_created_at is not None
+
+    oldest_row = (await get_last_pending_messages_from_outbox(session))[0]
+    assert oldest_created_at == oldest_row.created_at
+
+
+async def test_relay_stats_reporter():
+    reporter = RelayStatsReporter(interval=0)
+    OUTBOX_MESSAGES_PUBLISHED.inc("stats_queue", "sent", amount=3)
+    OUTBOX_MESSAGES_PUBLISHED.inc("stats_queue", "failed")
+    for _ in range(4):
+        OUTBOX_PUBLISH_DURATION.observe(0.002, "stats_queue")
+
+    stats = reporter.maybe_log()
+
+    assert stats["queues"]["stats_queue"]["failure_rate"] == 0.25
+    assert stats["queues"]["stats_queue"]["publish_p99_seconds"] == 0.0025
+
+    # Следующий интервал учитывает только новые сообщения
+    stats = reporter.maybe_log()
+    assert stats["queues"]["stats_queue"]["messages_per_second"] == 0
+
+
+async def test_metrics_server():
+    server = await start_metrics_server("127.0.0.1", 0)
+    port: int = server.sockets[0].getsockname()[1]
+
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    response: bytes = await reader.read()
+    writer.close()
+    server.close()
+
+    assert response.startswith(b"HTTP/1.1 200 OK")
+    assert b"# TYPE outbox_pending_rows gauge" in response
@@ -0,0 +1,93 @@
+import json
+import time
+
+from pathlib import Path
+
+import pytest
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from factories import engine, replica_engine, test_async_replica_session_maker, test_async_session_maker
+from core.models import BaseTable
+from core.profiling import SamplingProfiler
+from web.dependencies import async_replica_session_generator, async_session_generator
+from web.middlewares import ProfilingMiddleware
+from web_main import app as fastapi_app
+
+
+@pytest.fixture(scope="function")
+async def session():
+    async with engine.begin() as conn:
+        await conn.run_sync(BaseTable().metadata.drop_all)
+        await conn.run_sync(BaseTable().metadata.create_all)
+
+    async with test_async_session_maker() as session:
+        yield session
+
+    await engine.dispose()
+
+
+@pytest.fixture(scope="function")
+async def profiled_client(session: AsyncSession, tmp_path: Path):
+    async with test_async_replica_session_maker() as replica_session:
+        fastapi_app.dependency_overrides[async_session_generator] = lambda: session
+        fastapi_app.dependency_overrides[async_replica_session_generator] = lambda: replica_session
+        app = ProfilingMiddleware(fastapi_app, output_dir=tmp_path, token="secret", interval=0.001)
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://localhost:8000/Ufanet_autum_practice") as ac:
+            yield ac
+
+    fastapi_app.dependency_overrides.pop(async_session_generator, None)
+    fastapi_app.dependency_overrides.pop(async_replica_session_generator, None)
+    await replica_engine.dispose()
+
+
+def busy_wait(seconds: float) -> None:
+    deadline: float = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_sampling_profiler_collects_stacks():
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    busy_wait(0.1)
+    profiler.stop()
+
+    folded: str = profiler.folded()
+    assert "test_profiling.busy_wait" in folded
+    stack, count = folded.splitlines()[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert stack.endswith("test_profiling.busy_wait")
+
+
+async def test_profiling_middleware(profiled_client: AsyncClient, tmp_path: Path):
+    # Без заголовка и с неверным токеном запрос не профилируется
+    response = await profiled_client.get("/partnerprogram/")
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+    response = await profiled_client.get("/partnerprogram/", headers={"X-Profile": "wrong"})
+    assert "x-profile-id" not in response.headers
+    assert list(tmp_path.iterdir()) == []
+
+    response = await profiled_client.get("/partnerprogram/", headers={"X-Profile": "secret"})
+    assert response.status_code == 200
+    profile_id: str = response.headers["x-profile-id"]
+
+    summary_path, = tmp_path.glob(f"*_{profile_id}.json")
+    assert summary_path.name.startswith("partnerprogram_")
+    summary: dict = json.loads(summary_path.read_text(encoding="utf-8"))
+    assert summary["route"] == "/partnerprogram/"
+    assert summary["status"] == 200
+    assert summary["sql"]
+    assert all(query["duration_ms"] >= 0 for query in summary["sql"])
+    assert any(query["helper"] is not None for query in summary["sql"])
+    assert summary_path.with_suffix(".folded").exists()
+
+
+def test_profiling_header_requires_token():
+    scope: dict = {"type": "http", "headers": [(b"x-profile", b"anything")]}
+    assert not ProfilingMiddleware(fastapi_app, output_dir=Path("profiles")).should_profile(scope)
+    assert not ProfilingMiddleware(fastapi_app, output_dir=Path("profiles"), token="").should_profile(scope)
+    assert ProfilingMiddleware(fastapi_app, output_dir=Path("profiles"), token="anything").should_profile(scope)
@@ -0,0 +1,155 @@
+import asyncio
+
+import pytest
+
+from unittest.mock import AsyncMock, patch
+from httpx import ASGITransport, AsyncClient
+from hypothesis import given, settings
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from factories import (
+    card_factory,
+    category_factory,
+    company_factory,
+    engine,
+    my_hypothesis_settings,
+    queue_factory,
+    replica_engine,
+    test_async_session_maker
+)
+
+from core.database_utils import claim_promo_code, count_available_promo_codes, create_row, load_promo_codes
+from core.models import DEFAULT_TENANT_ID, BaseTable, CardsTable, CategoriesTable, CompaniesTable, OutboxTable
+from core.promo_events import PromoIssueEvents
+from web.config import PROMO_ISSUE_EVENTS, VISITOR_COOKIE_NAME
+from web.dependencies import async_session_generator, async_tenant_session_generator
+from web_main import app as fastapi_app
+
+
+@pytest.fixture(scope="function")
+async def session():
+    async with engine.begin() as conn:
+        await conn.run_sync(BaseTable().metadata.drop_all)
+        await conn.run_sync(BaseTable().metadata.create_all)
+
+    async with test_async_session_maker() as session:
+        yield session
+
+    await engine.dispose()
+    await replica_engine.dispose()
+
+
+@pytest.fixture(scope="function")
+async def ac(session: AsyncSession):
+    fastapi_app.dependency_overrides[async_session_generator] = lambda: session
+    fastapi_app.dependency_overrides[async_tenant_session_generator] = lambda: session
+    transport = ASGITransport(app=fastapi_app)
+    async with AsyncClient(transport=transport, base_url="http://localhost:8000/Ufanet_autum_practice") as ac:
+        yield ac
+
+    fastapi_app.dependency_overrides.pop(async_session_generator, None)
+    fastapi_app.dependency_overrides.pop(async_tenant_session_generator, None)
+
+
+async def create_card(session: AsyncSession, category: dict, company: dict, card: dict, queue_name: str) -> int:
+    with patch("core.database_utils.insert_into_outbox", new_callable=AsyncMock):
+        card["category_id"] = await create_row(CategoriesTable, category, session, queue_name)
+        card["company_id"] = await create_row(CompaniesTable, company, session, queue_name)
+        return await create_row(CardsTable, card, session, queue_name)
+
+
+async def claim(card_id: int, visitor_id: str) -> tuple[str, bool] | None:
+    "Выдача в отдельной сессии: как одновременные запросы разных воркеров"
+    async with test_async_session_maker() as session:
+        return await claim_promo_code(card_id, visitor_id, session)
+
+
+@pytest.mark.asyncio
+@given(
+    category=category_factory(),
+    company=company_factory(),
+    card=card_factory(),
+    queue_name=queue_factory()
+)
+@settings(**my_hypothesis_settings)
+async def test_concurrent_claims_issue_unique_codes(
+    session: AsyncSession,
+    category: dict,
+    company: dict,
+    card: dict,
+    queue_name: str
+):
+    card_id = await create_card(session, category, company, card, queue_name)
+    codes: list[str] = [f"{queue_name}-{number}" for number in range(30)]
+    assert await load_promo_codes(card_id, codes, session, queue_name) == 30
+    # Повторная загрузка того же файла не создает дубликатов
+    assert await load_promo_codes(card_id, [*codes[:10], "new"], session, queue_name) == 1
+    assert await load_promo_codes(card_id + 1000, codes, session, queue_name) is None
+
+    claims = await asyncio.gather(*(claim(card_id, f"visitor-{number}") for number in range(40)))
+    issued: list[str] = [claim[0] for claim in claims if claim is not None]
+    assert sorted(issued) == sorted([*codes, "new"])
+    assert claims.count(None) == 9
+    assert await count_available_promo_codes(card_id, session) == 0
+
+    # Посетитель получает тот же промокод, в том числе при одновременных запросах
+    first = next(claim for claim in claims if claim is not None)
+    visitor_id: str = f"visitor-{claims.index(first)}"
+    assert await asyncio.gather(claim(card_id, visitor_id), claim(card_id, visitor_id)) == [(first[0], False)] * 2
+    async with session.begin():
+        payloads = (await session.scalars(
+            select(OutboxTable.payload).where(OutboxTable.queue == queue_name).order_by(OutboxTable.id)
+        )).all()
+    assert [payload["fields"]["count"] for payload in payloads if payload["entity"] == "promo_codes"] == [30, 1]
+
+
+@pytest.mark.asyncio
+@given(
+    category=category_factory(),
+    company=company_factory(),
+    card=card_factory(),
+    queue_name=queue_factory()
+)
+@settings(**my_hypothesis_settings)
+async def test_issue_promocode_endpoint_and_aggregated_events(
+    ac: AsyncClient,
+    session: AsyncSession,
+    category: dict,
+    company: dict,
+    card: dict,
+    queue_name: str
+):
+    card_id = await create_card(session, category, company, card, queue_name)
+    response = await ac.post(f"/admin/promocodes/{card_id}", content="A1\nA2\n\nA2\nA3\n".encode())
+    assert response.json() == {"ok": True, "loaded": 3, "available": 3}
+    assert (await ac.post(f"/admin/promocodes/{card_id}", content=b"\n")).status_code == 422
+
+    with patch.object(PROMO_ISSUE_EVENTS, "add") as add:
+        first = await ac.post("/partnerprogram/cards/issue_promocode", json={"card_id": card_id})
+        visitor_id: str = first.cookies[VISITOR_COOKIE_NAME]
+        again = await ac.post("/partnerprogram/cards/issue_promocode", json={"card_id": card_id})
+        assert again.json() == first.json() == {"ok": True, "promocode": "A1"}
+        assert ac.cookies[VISITOR_COOKIE_NAME] == visitor_id
+        ac.cookies.clear()
+        second = await ac.post("/partnerprogram/cards/issue_promocode", json={"card_id": card_id})
+        assert second.json()["promocode"] == "A2" and second.cookies[VISITOR_COOKIE_NAME] != visitor_id
+    # Повторная выдача тому же посетителю не учитывается в событиях
+    assert add.call_count == 2
+    missing = await ac.post("/partnerprogram/cards/issue_promocode", json={"card_id": card_id + 1000})
+    assert missing.status_code == 404
+
+    events = PromoIssueEvents(test_async_session_maker, queue_name, interval=60)
+    for _ in range(500):
+        events.add(DEFAULT_TENANT_ID, card_id)
+    events.add(DEFAULT_TENANT_ID, card_id + 1)
+    assert await events.flush() == 501
+    assert await events.flush() == 0
+    async with session.begin():
+        payloads = (await session.scalars(
+            select(OutboxTable.payload).where(OutboxTable.queue == queue_name)
+        )).all()
+    assert [payload["counts"] for payload in payloads if payload["action"] == "issue"] == [[
+        {"tenant_id": DEFAULT_TENANT_ID, "card_id": card_id, "count": 500},
+        {"tenant_id": DEFAULT_TENANT_ID, "card_id": card_id + 1, "count": 1},
+    ]]
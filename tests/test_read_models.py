@@ -0,0 +1,191 @@
+import pytest
+
+from unittest.mock import AsyncMock, patch
+from hypothesis import given, settings
+from sqlalchemy import delete, insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from factories import (
+    card_factory,
+    category_factory,
+    company_factory,
+    engine,
+    my_hypothesis_settings,
+    queue_factory,
+    test_async_session_maker
+)
+
+from core.database_utils import create_row, delete_row, update_row_by_id
+from core.models import BaseTable, CardSummariesTable, CardsTable, CategoriesTable, CompaniesTable
+from core.read_models import check_card_summaries, rebuild_card_summaries, recompute_card_counts
+
+
+@pytest.fixture(scope="function")
+async def session():
+    async with engine.begin() as conn:
+        await conn.run_sync(BaseTable().metadata.drop_all)
+        await conn.run_sync(BaseTable().metadata.create_all)
+
+    async with test_async_session_maker() as session:
+        yield session
+
+    await engine.dispose()
+
+
+async def get_summary(session: AsyncSession, card_id: int) -> dict | None:
+    async with session.begin():
+        row = (await session.execute(
+            select(CardSummariesTable).where(CardSummariesTable.card_id == card_id)
+        )).scalar_one_or_none()
+        return None if row is None else {
+            "category_id": row.category_id,
+            "main_label": row.main_label,
+            "company_name": row.company_name,
+        }
+
+
+@pytest.mark.asyncio
+@given(
+    category=category_factory(),
+    company=company_factory(),
+    card=card_factory(),
+    queue_name=queue_factory()
+)
+@settings(**my_hypothesis_settings)
+async def test_card_summaries_follow_dml(
+    session: AsyncSession,
+    category: dict,
+    company: dict,
+    card: dict,
+    queue_name: str
+):
+    with patch("core.database_utils.insert_into_outbox", new_callable=AsyncMock):
+        category_id = await create_row(CategoriesTable, category, session, queue_name)
+        second_category_id = await create_row(CategoriesTable, {"name": "Вторая"}, session, queue_name)
+        company_id = await create_row(CompaniesTable, company, session, queue_name)
+        card_id = await create_row(
+            CardsTable, {**card, "category_id": category_id, "company_id": company_id}, session, queue_name
+        )
+        assert await get_summary(session, card_id) == {
+            "category_id": category_id, "main_label": card["main_label"], "company_name": company["name"]
+        }
+
+        await update_row_by_id(
+            card_id, CardsTable, {"main_label": "Новый заголовок", "category_id": second_category_id},
+            session, queue_name
+        )
+        await update_row_by_id(company_id, CompaniesTable, {"name": "Новая компания"}, session, queue_name)
+        assert await get_summary(session, card_id) == {
+            "category_id": second_category_id, "main_label": "Новый заголовок", "company_name": "Новая компания"
+        }
+
+        await delete_row(card_id, CardsTable, session, queue_name)
+        assert await get_summary(session, card_id) is None
+
+    async with engine.begin() as conn:
+        assert (await check_card_summaries(conn)).consistent
+
+
+@pytest.mark.asyncio
+@given(
+    category=category_factory(),
+    company=company_factory(),
+    card=card_factory(),
+    queue_name=queue_factory()
+)
+@settings(**my_hypothesis_settings)
+async def test_check_card_summaries_repairs_drift(
+    session: AsyncSession,
+    category: dict,
+    company: dict,
+    card: dict,
+    queue_name: str
+):
+    with patch("core.database_utils.insert_into_outbox", new_callable=AsyncMock):
+        category_id = await create_row(CategoriesTable, category, session, queue_name)
+        company_id = await create_row(CompaniesTable, company, session, queue_name)
+        card_ids = [
+            await create_row(
+                CardsTable, {**card, "category_id": category_id, "company_id": company_id}, session, queue_name
+            )
+            for _ in range(3)
+        ]
+
+    async with engine.begin() as conn:
+        await conn.execute(
+            update(CardSummariesTable).values(main_label="устарело").where(CardSummariesTable.card_id == card_ids[0])
+        )
+        await conn.execute(delete(CardSummariesTable).where(CardSummariesTable.card_id == card_ids[1]))
+        # Строка без карточки возможна только в обход внешних ключей
+        await conn.execute(text("SET LOCAL session_replication_role = replica"))
+        await conn.execute(insert(CardSummariesTable).values(
+            card_id=card_ids[-1] + 1, category_id=category_id, company_id=company_id, main_label="",
+            description_under_label="", company_name="", company_short_description=""
+        ))
+
+    async with engine.begin() as conn:
+        report = await check_card_summaries(conn, repair=True)
+    assert (report.missing, report.stale, report.orphaned) == (1, 1, 1)
+    assert report.sample_card_ids == [card_ids[0], card_ids[1], card_ids[-1] + 1]
+    assert report.repaired
+
+    async with engine.begin() as conn:
+        assert (await check_card_summaries(conn)).consistent
+        await conn.execute(delete(CardSummariesTable))
+        assert await rebuild_card_summaries(conn) == 3
+        assert (await check_card_summaries(conn)).consistent
+
+
+async def get_card_counts(session: AsyncSession) -> dict[str, dict[int, int]]:
+    async with session.begin():
+        return {
+            table.__tablename__: dict((await session.execute(select(table.id, table.cards_count))).all())
+            for table in (CategoriesTable, CompaniesTable)
+        }
+
+
+@pytest.mark.asyncio
+@given(
+    category=category_factory(),
+    company=company_factory(),
+    card=card_factory(),
+    queue_name=queue_factory()
+)
+@settings(**my_hypothesis_settings)
+async def test_card_counts_follow_dml(
+    session: AsyncSession,
+    category: dict,
+    company: dict,
+    card: dict,
+    queue_name: str
+):
+    with patch("core.database_utils.insert_into_outbox", new_callable=AsyncMock):
+        first_id = await create_row(CategoriesTable, category, session, queue_name)
+        second_id = await create_row(CategoriesTable, {"name": "Вторая"}, session, queue_name)
+        company_id = await create_row(CompaniesTable, company, session, queue_name)
+        card_ids = [
+            await create_row(
+                CardsTable, {**card, "category_id": first_id, "company_id": company_id}, session, queue_name
+            )
+            for _ in range(3)
+        ]
+        assert await get_card_counts(session) == {
+            "categories": {first_id: 3, second_id: 0}, "companies": {company_id: 3}
+        }
+
+        await update_row_by_id(card_ids[0], CardsTable, {"category_id": second_id}, session, queue_name)
+        await update_row_by_id(card_ids[1], CardsTable, {"main_label": "Без переноса"}, session, queue_name)
+        await delete_row(card_ids[2], CardsTable, session, queue_name)
+        # Перенос в несуществующую категорию откатывается вместе со счетчиками
+        assert await update_row_by_id(
+            card_ids[1], CardsTable, {"category_id": second_id + 100}, session, queue_name
+        ) is not True
+        assert await get_card_counts(session) == {
+            "categories": {first_id: 1, second_id: 1}, "companies": {company_id: 2}
+        }
+
+    async with engine.begin() as conn:
+        assert await recompute_card_counts(conn) == {"categories": 0, "companies": 0}
+        await conn.execute(update(CategoriesTable).values(cards_count=10))
+        assert await recompute_card_counts(conn) == {"categories": 2, "companies": 0}
+    assert (await get_card_counts(session))["categories"] == {first_id: 1, second_id: 1}
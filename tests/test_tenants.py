@@ -0,0 +1,240 @@
+import pytest
+
+from unittest.mock import AsyncMock, patch
+from httpx import ASGITransport, AsyncClient
+from hypothesis import given, settings
+from fastapi import Depends
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from factories import (
+    card_factory,
+    category_factory,
+    company_factory,
+    engine,
+    my_hypothesis_settings,
+    queue_factory,
+    replica_engine,
+    test_async_session_maker
+)
+
+from core.cache import SEARCH_CACHE
+from core.database_utils import (
+    create_row,
+    get_all_cards_in_category_fast,
+    get_all_categories_fast,
+    get_card_info_fast,
+    search_cards,
+)
+from core.models import (
+    DEFAULT_TENANT_ID,
+    BaseTable,
+    CardSummariesTable,
+    CardsTable,
+    CategoriesTable,
+    CompaniesTable,
+    TenantsTable
+)
+from core.tenants import Tenant, TenantRegistry, create_tenant_schema, tenant_engine
+from web.config import FRAGMENT_CACHE, TENANT_REGISTRY
+from web.dependencies import async_replica_session_generator, async_session_generator, resolve_tenant
+from web_main import app as fastapi_app
+
+
+TENANT_SCHEMA: str = "tenant_test"
+
+
+@pytest.fixture(scope="function")
+async def session():
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {TENANT_SCHEMA} CASCADE"))
+        await conn.run_sync(BaseTable().metadata.drop_all)
+        await conn.run_sync(BaseTable().metadata.create_all)
+
+    async with test_async_session_maker() as session:
+        yield session
+
+    # Схема арендатора ссылается на общую таблицу tenants и мешала бы drop_all в других тестах
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {TENANT_SCHEMA} CASCADE"))
+    await engine.dispose()
+    await replica_engine.dispose()
+
+
+async def tenant_replica_session_generator(tenant: Tenant = Depends(resolve_tenant)):
+    "Сессия тестовой реплики на движке арендатора, как в `async_replica_session_generator`"
+    async with async_sessionmaker(tenant_engine(replica_engine, tenant), expire_on_commit=False)() as session:
+        yield session
+
+
+@pytest.fixture(scope="function")
+async def ac(session: AsyncSession):
+    fastapi_app.dependency_overrides[async_session_generator] = lambda: session
+    fastapi_app.dependency_overrides[async_replica_session_generator] = tenant_replica_session_generator
+    transport = ASGITransport(app=fastapi_app)
+    async with AsyncClient(transport=transport, base_url="http://localhost:8000/Ufanet_autum_practice") as ac:
+        yield ac
+
+    fastapi_app.dependency_overrides.pop(async_session_generator, None)
+    fastapi_app.dependency_overrides.pop(async_replica_session_generator, None)
+
+
+async def create_tenant(session: AsyncSession, slug: str, **values) -> int:
+    "Создает арендатора. Примеры hypothesis используют одну бд, поэтому `slug` должен быть уникальным"
+    async with session.begin():
+        return await session.scalar(
+            insert(TenantsTable).values(slug=slug, name=slug, **values).returning(TenantsTable.id)
+        )
+
+
+async def create_catalog(session: AsyncSession, category: dict, company: dict, card: dict, queue_name: str) -> int:
+    "Создает категорию, компанию и карточку арендатора `category['tenant_id']`, возвращает идентификатор карточки"
+    with patch("core.database_utils.insert_into_outbox", new_callable=AsyncMock):
+        # create_row дописывает в данные идентификатор строки
+        category_id = await create_row(CategoriesTable, {**category}, session, queue_name)
+        company_id = await create_row(CompaniesTable, {**company}, session, queue_name)
+        return await create_row(
+            CardsTable,
+            {**card, "category_id": category_id, "company_id": company_id, "tenant_id": category["tenant_id"]},
+            session,
+            queue_name
+        )
+
+
+@pytest.mark.asyncio
+@given(
+    category=category_factory(),
+    company=company_factory(),
+    card=card_factory(),
+    queue_name=queue_factory()
+)
+@settings(**my_hypothesis_settings)
+async def test_catalog_isolated_by_tenant(
+    session: AsyncSession,
+    category: dict,
+    company: dict,
+    card: dict,
+    queue_name: str
+):
+    tenant_id = await create_tenant(session, queue_name)
+    # Имена категорий и компаний уникальны только внутри арендатора
+    card_ids: dict[int, int] = {
+        owner: await create_catalog(
+            session, {**category, "tenant_id": owner}, {**company, "tenant_id": owner}, card, queue_name
+        )
+        for owner in (DEFAULT_TENANT_ID, tenant_id)
+    }
+    SEARCH_CACHE.clear()
+
+    for owner, card_id in card_ids.items():
+        other_card_id: int = card_ids[tenant_id if owner == DEFAULT_TENANT_ID else DEFAULT_TENANT_ID]
+        categories = await get_all_categories_fast(session, queue_name, tenant_id=owner)
+        assert len(categories) == 1
+        cards = await get_all_cards_in_category_fast(categories[0].id, session, queue_name, tenant_id=owner)
+        assert [row.id for row in cards] == [card_id]
+        assert await get_card_info_fast(card_id, session, queue_name, tenant_id=owner) is not None
+        assert await get_card_info_fast(other_card_id, session, queue_name, tenant_id=owner) is None
+        found = await search_cards(company["name"], session, queue_name, tenant_id=owner)
+        assert [row["id"] for row in found] == [card_id]
+
+    # Кеш поиска у каждого арендатора свой
+    assert SEARCH_CACHE.namespace(DEFAULT_TENANT_ID) is not SEARCH_CACHE.namespace(tenant_id)
+    assert len(SEARCH_CACHE.namespace(tenant_id).entries) == 1
+
+
+@pytest.mark.asyncio
+@given(
+    category=category_factory(),
+    company=company_factory(),
+    card=card_factory(),
+    queue_name=queue_factory()
+)
+@settings(**my_hypothesis_settings)
+async def test_client_router_resolves_tenant(
+    ac: AsyncClient,
+    session: AsyncSession,
+    category: dict,
+    company: dict,
+    card: dict,
+    queue_name: str
+):
+    host: str = f"{queue_name.replace('_', '-')}.example.com"
+    tenant_id = await create_tenant(session, queue_name, host=host)
+    await create_catalog(session, category, company, card, queue_name)
+    second_category: dict = {"name": "Только у второго", "tenant_id": tenant_id}
+    await create_catalog(session, second_category, {**company, "tenant_id": tenant_id}, card, queue_name)
+    TENANT_REGISTRY.loaded_at = None
+
+    default_page = await ac.get("/partnerprogram/")
+    by_path = await ac.get(f"/tenants/{queue_name}/partnerprogram/")
+    by_host = await ac.get("/partnerprogram/", headers={"Host": host})
+    assert category["name"] in default_page.text and second_category["name"] not in default_page.text
+    assert second_category["name"] in by_path.text and category["name"] not in by_path.text
+    assert second_category["name"] in by_host.text and category["name"] not in by_host.text
+    assert (await ac.get("/tenants/unknown/partnerprogram/")).status_code == 404
+
+    categories = await get_all_categories_fast(session, queue_name, tenant_id=tenant_id)
+    response = await ac.get(f"/tenants/{queue_name}/partnerprogram/cards", params={"category_id": categories[0].id})
+    assert response.status_code == 200
+    # Фрагмент закеширован в пространстве арендатора и не вытесняет фрагменты других арендаторов
+    assert FRAGMENT_CACHE.namespace(tenant_id).entries
+
+
+def test_registry_resolve_order():
+    registry = TenantRegistry()
+    default, second = Tenant(DEFAULT_TENANT_ID, "default"), Tenant(2, "second", host="second.example.com")
+    registry.by_slug = {"default": default, "second": second}
+    registry.by_host = {"second.example.com": second}
+
+    assert registry.resolve("second.example.com", "default") == default
+    assert registry.resolve("second.example.com", None) == second
+    assert registry.resolve("other.example.com", None) == default
+    assert registry.resolve(None, "unknown") is None
+
+
+@pytest.mark.asyncio
+@given(
+    category=category_factory(),
+    company=company_factory(),
+    card=card_factory(),
+    queue_name=queue_factory()
+)
+@settings(**my_hypothesis_settings)
+async def test_tenant_schema(
+    session: AsyncSession,
+    category: dict,
+    company: dict,
+    card: dict,
+    queue_name: str
+):
+    tenant_id = await create_tenant(session, queue_name, schema_name=TENANT_SCHEMA)
+    async with engine.begin() as conn:
+        await conn.run_sync(create_tenant_schema, TENANT_SCHEMA)
+        await conn.run_sync(create_tenant_schema, TENANT_SCHEMA)
+    tenant = Tenant(tenant_id, queue_name, schema_name=TENANT_SCHEMA)
+
+    async with async_sessionmaker(tenant_engine(engine, tenant), expire_on_commit=False)() as tenant_session:
+        card_id = await create_catalog(
+            tenant_session, {**category, "tenant_id": tenant_id}, {**company, "tenant_id": tenant_id}, card, queue_name
+        )
+        categories = await get_all_categories_fast(tenant_session, queue_name, tenant_id=tenant_id)
+        assert [row.cards_count for row in categories] == [1]
+
+    replica = async_sessionmaker(tenant_engine(replica_engine, tenant), expire_on_commit=False)
+    async with replica() as replica_session:
+        cards = await get_all_cards_in_category_fast(
+            categories[0].id, replica_session, queue_name, outbox_session=session, tenant_id=tenant_id
+        )
+        assert [row.id for row in cards] == [card_id]
+
+    # Строки каталога и read model находятся в схеме арендатора, общая схема не затронута
+    assert await get_all_categories_fast(session, queue_name, tenant_id=tenant_id) == []
+    async with engine.connect() as conn:
+        assert await conn.scalar(select(CardSummariesTable.card_id)) is None
+        assert await conn.scalar(
+            text(f"SELECT count(*) FROM {TENANT_SCHEMA}.card_summaries WHERE card_id = :card_id"), {"card_id": card_id}
+        ) == 1
+
+    with pytest.raises(ValueError):
+        async with engine.begin() as conn:
+            await conn.run_sync(create_tenant_schema, "bad; DROP TABLE cards")
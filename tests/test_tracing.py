@@ -0,0 +1,42 @@
+import contextvars
+import time
+
+from core.tracing import (
+    TRACE_STAGE_DURATION,
+    build_message_headers,
+    observe_stages,
+    read_message_trace,
+    start_trace,
+    stamp_payload
+)
+
+
+def stamp_in_request(trace_id: str, payload: dict) -> None:
+    start_trace(trace_id)
+    stamp_payload(payload)
+
+
+def test_trace_passes_through_outbox_and_rabbitmq():
+    end_to_end_before: int = TRACE_STAGE_DURATION.get_count("end_to_end")
+    payload: dict = {"action": "update", "entity": "cards"}
+    # Трасса запроса живет в отдельном контексте, как в обработчике FastAPI
+    contextvars.copy_context().run(stamp_in_request, "trace-1", payload)
+
+    # Процессор outbox читает payload из бд и передает трассу в заголовках сообщения
+    headers: dict = build_message_headers(payload, time.time())
+    # Заголовки AMQP приходят потребителю в виде байтов
+    trace_id, stages = read_message_trace({key: value.encode() for key, value in headers.items()})
+
+    assert trace_id == "trace-1"
+    assert list(stages) == ["request_started", "outbox_inserted", "published"]
+
+    stages["consumed"] = time.time()
+    assert set(observe_stages(stages, "consumed")) == {"queue"}
+    stages["delivered"] = time.time()
+    assert set(observe_stages(stages, "delivered")) == {"telegram", "end_to_end"}
+    assert TRACE_STAGE_DURATION.get_count("end_to_end") == end_to_end_before + 1
+
+
+def test_untraced_message_has_no_headers():
+    assert build_message_headers({"action": "select"}, time.time()) == {}
+    assert read_message_trace(None) == (None, {})
@@ -0,0 +1,131 @@
+import asyncio
+import json
+
+import pytest
+
+from core.core_types import RabbitMQManager
+from core.transport import InMemoryBroker, InMemoryMessage, InMemoryTransport
+
+
+async def connected_transport(broker: InMemoryBroker, prefetch_count: int = 0) -> InMemoryTransport:
+    transport = InMemoryTransport(broker, prefetch_count=prefetch_count)
+    await transport.connect()
+    return transport
+
+
+async def test_prefetch_limits_in_flight_messages():
+    broker = InMemoryBroker()
+    consumer = await connected_transport(broker, prefetch_count=2)
+    release = asyncio.Event()
+    in_flight: list[int] = []
+    max_in_flight: int = 0
+
+    async def callback(message: InMemoryMessage):
+        nonlocal max_in_flight
+        in_flight.append(message.delivery_tag)
+        max_in_flight = max(max_in_flight, len(in_flight))
+        await release.wait()
+        in_flight.remove(message.delivery_tag)
+        await message.ack()
+
+    await consumer.consume("prefetch", callback)
+    for number in range(5):
+        await consumer.publish("prefetch", str(number).encode())
+    await asyncio.sleep(0)
+
+    assert len(broker.queues["prefetch"].unacked) == 2
+    assert len(broker.queues["prefetch"].ready) == 3
+
+    release.set()
+    await asyncio.wait_for(broker.queues["prefetch"].join(), timeout=1)
+    assert max_in_flight == 2
+    assert broker.queues["prefetch"].acked == 5
+
+
+async def test_nack_requeues_and_process_rejects_on_error():
+    broker = InMemoryBroker()
+    consumer = await connected_transport(broker)
+    deliveries: list[tuple[bytes, bool]] = []
+
+    async def callback(message: InMemoryMessage):
+        deliveries.append((message.body, message.redelivered))
+        if message.body == b"retry" and not message.redelivered:
+            await message.nack(requeue=True)
+            return
+        async with message.process():
+            if message.body == b"broken":
+                raise ValueError("Ошибка обработки")
+
+    await consumer.consume("settle", callback)
+    await consumer.publish("settle", b"retry")
+    await consumer.publish("settle", b"broken")
+    await asyncio.wait_for(broker.queues["settle"].join(), timeout=1)
+
+    queue = broker.queues["settle"]
+    assert (b"retry", True) in deliveries
+    assert queue.acked == 1
+    assert queue.redelivered == 1
+    assert [message.body for message in queue.dead_letters] == [b"broken"]
+
+
+async def test_publisher_confirms_and_injected_faults():
+    broker = InMemoryBroker(publish_failure_rate=0.5, seed=7)
+    manager = RabbitMQManager(None, InMemoryTransport(broker))
+
+    results: list[bool] = [await manager.send_message_to_queue("faults", {"n": n}) for n in range(20)]
+
+    # Сбои воспроизводимы при одинаковом seed
+    replay_broker = InMemoryBroker(publish_failure_rate=0.5, seed=7)
+    replay_manager = RabbitMQManager(None, InMemoryTransport(replay_broker))
+    assert results == [await replay_manager.send_message_to_queue("faults", {"n": n}) for n in range(20)]
+
+    assert 0 < results.count(False) < 20
+    assert broker.failed_publishes == results.count(False)
+    assert len(broker.queues["faults"].ready) == broker.published == results.count(True)
+
+    broker.publish_failure_rate = 0
+    broker.fail_next_publishes(1)
+    assert await manager.send_message_to_queue("faults", {"n": 20}) is False
+    assert await manager.send_message_to_queue("faults", {"n": 21}) is True
+    assert json.loads(broker.queues["faults"].ready[-1].body) == {"n": 21}
+
+
+async def test_disconnect_requeues_unacked_messages():
+    broker = InMemoryBroker(delivery_latency=0.001)
+    first_consumer = await connected_transport(broker, prefetch_count=1)
+    received: list[tuple[bytes, bool]] = []
+
+    async def stuck_callback(message: InMemoryMessage):
+        await asyncio.Event().wait()
+
+    async def callback(message: InMemoryMessage):
+        received.append((message.body, message.redelivered))
+        await message.ack()
+
+    await first_consumer.consume("restart", stuck_callback)
+    await first_consumer.publish("restart", b"first")
+    await first_consumer.publish("restart", b"second")
+    await asyncio.sleep(0.01)
+
+    await broker.disconnect_all()
+    with pytest.raises(RuntimeError):
+        await first_consumer.consume("restart", callback)
+
+    second_consumer = await connected_transport(broker)
+    await second_consumer.consume("restart", callback)
+    await asyncio.wait_for(broker.queues["restart"].join(), timeout=1)
+
+    assert received == [(b"first", True), (b"second", False)]
+
+
+async def test_delete_queue():
+    broker = InMemoryBroker()
+    manager = RabbitMQManager(None, InMemoryTransport(broker))
+    await manager.send_message_to_queue("delete", "message")
+
+    # Непустая очередь не удаляется, ошибка только логируется
+    await manager.drop_queue("delete")
+    assert "delete" in broker.queues
+
+    await manager.drop_queue("delete", if_unused=False, if_empty=False)
+    assert "delete" not in broker.queues
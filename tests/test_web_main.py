@@ -0,0 +1,216 @@
+import asyncio
+import time
+
+import pytest
+
+from typing import Any
+
+from sqlalchemy import Connection, inspect, insert, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from factories import engine, replica_engine, time_budget
+from core.migrations import (
+    BASELINE_SCHEMA_DDL,
+    MIGRATIONS,
+    SCHEMA_VERSION,
+    SCHEMA_VERSION_TABLE_DDL,
+    execute_ddl,
+    get_schema_version,
+    run_migrations
+)
+from core.models import DEFAULT_TENANT_ID, BaseTable, SchemaVersionTable
+from web.config import TEMPLATES
+from web.warmup import get_pool_capacity, warm_up_pool
+from web_main import app as fastapi_app, lifespan
+
+
+STARTUP_TIME_BUDGET: float = 1.0
+"Максимально допустимое время старта воркера с прогревом в секундах"
+
+
+@pytest.fixture(scope="function")
+async def clean_engine():
+    async with engine.begin() as conn:
+        await conn.run_sync(BaseTable().metadata.drop_all)
+
+    yield engine
+
+    await engine.dispose()
+
+
+@pytest.fixture(scope="function")
+async def migrated_engine(clean_engine: AsyncEngine):
+    await run_migrations(clean_engine)
+    yield clean_engine
+
+
+@pytest.mark.asyncio
+async def test_run_migrations(clean_engine: AsyncEngine):
+    assert await get_schema_version(clean_engine) is None
+
+    assert await run_migrations(clean_engine) == SCHEMA_VERSION
+    assert await get_schema_version(clean_engine) == SCHEMA_VERSION
+
+    # Повторный запуск ничего не меняет
+    assert await run_migrations(clean_engine) == SCHEMA_VERSION
+
+
+def schema_snapshot(conn: Connection) -> dict[str, Any]:
+    "Столбцы, ключи, индексы таблиц моделей и функции с триггерами `card_summaries` в сравнимом виде"
+    inspector = inspect(conn)
+    snapshot: dict[str, Any] = {}
+    for table in BaseTable.metadata.sorted_tables:
+        name, schema = table.name, table.schema
+        snapshot[table.fullname] = {
+            "columns": {
+                column["name"]: (
+                    str(column["type"]), column["nullable"], column["default"], column.get("computed")
+                )
+                for column in inspector.get_columns(name, schema=schema)
+            },
+            "primary_key": inspector.get_pk_constraint(name, schema=schema)["constrained_columns"],
+            "foreign_keys": sorted(
+                (fk["name"], fk["constrained_columns"], fk["referred_table"], fk["referred_columns"], fk["options"])
+                for fk in inspector.get_foreign_keys(name, schema=schema)
+            ),
+            "unique_constraints": sorted(
+                unique["column_names"] for unique in inspector.get_unique_constraints(name, schema=schema)
+            ),
+            "indexes": sorted(
+                (index["name"], index["column_names"], index["unique"], index.get("dialect_options", {}))
+                for index in inspector.get_indexes(name, schema=schema)
+            ),
+        }
+    snapshot["functions"] = {
+        row.proname: " ".join(row.prosrc.split()) for row in conn.execute(text(
+            "SELECT proname, prosrc FROM pg_proc WHERE proname IN ('sync_card_summary', 'sync_company_card_summaries')"
+        ))
+    }
+    snapshot["triggers"] = sorted(conn.execute(text(
+        "SELECT tgname, pg_get_triggerdef(oid) FROM pg_trigger WHERE NOT tgisinternal"
+    )).all())
+    return snapshot
+
+
+async def assert_schema_matches_models(engine: AsyncEngine) -> None:
+    "Сравнивает схему после миграций со схемой, которую создает `metadata.create_all` текущих моделей"
+    async with engine.connect() as conn:
+        migrated: dict[str, Any] = await conn.run_sync(schema_snapshot)
+    async with engine.begin() as conn:
+        await conn.run_sync(BaseTable().metadata.drop_all)
+        await conn.run_sync(BaseTable().metadata.create_all)
+    async with engine.connect() as conn:
+        created: dict[str, Any] = await conn.run_sync(schema_snapshot)
+    assert migrated == created
+
+
+@pytest.mark.asyncio
+async def test_run_migrations_from_baseline(clean_engine: AsyncEngine):
+    # База, созданная исходным create_all до появления миграций: таблицы с данными, но без schema_version
+    async with clean_engine.begin() as conn:
+        await conn.run_sync(execute_ddl, BASELINE_SCHEMA_DDL)
+        await conn.execute(text("INSERT INTO categories (name) VALUES ('Еда')"))
+        await conn.execute(text("INSERT INTO companies (name, short_description) VALUES ('Кафе', 'Кофе')"))
+        await conn.execute(text(
+            "INSERT INTO cards (category_id, company_id, main_label, description_under_label) "
+            "VALUES (1, 1, 'Скидка', 'На кофе')"
+        ))
+    assert await get_schema_version(clean_engine) is None
+
+    assert await run_migrations(clean_engine) == SCHEMA_VERSION
+    assert await get_schema_version(clean_engine) == SCHEMA_VERSION
+    async with clean_engine.connect() as conn:
+        summary = (await conn.execute(text("SELECT tenant_id, category_id, company_name FROM card_summaries"))).one()
+        assert tuple(summary) == (DEFAULT_TENANT_ID, 1, "Кафе")
+        assert await conn.scalar(text("SELECT cards_count FROM categories")) == 1
+        assert await conn.scalar(text(f"SELECT slug FROM tenants WHERE id = {DEFAULT_TENANT_ID}")) == "default"
+    await assert_schema_matches_models(clean_engine)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("version", range(1, SCHEMA_VERSION))
+async def test_run_migrations_from_version(clean_engine: AsyncEngine, version: int):
+    # База, обновленная до version кодом той версии
+    async with clean_engine.begin() as conn:
+        for migration in MIGRATIONS[:version]:
+            await conn.run_sync(migration.upgrade)
+        await conn.execute(text(SCHEMA_VERSION_TABLE_DDL))
+        await conn.execute(insert(SchemaVersionTable).values(id=1, version=version))
+
+    assert await run_migrations(clean_engine) == SCHEMA_VERSION
+    await assert_schema_matches_models(clean_engine)
+
+
+@pytest.mark.asyncio
+async def test_lifespan_refuses_uninitialized_schema(
+    monkeypatch: pytest.MonkeyPatch,
+    clean_engine: AsyncEngine
+):
+    monkeypatch.setattr("web_main.ASYNC_ENGINE", clean_engine)
+    monkeypatch.setattr("web_main.REPLICA_ASYNC_ENGINE", replica_engine)
+    monkeypatch.setattr("web_main.MIGRATE_ON_STARTUP", False)
+
+    with pytest.raises(RuntimeError):
+        async with lifespan(fastapi_app):
+            pass
+
+
+@pytest.fixture(scope="function")
+def warmup_app(monkeypatch: pytest.MonkeyPatch, migrated_engine: AsyncEngine) -> AsyncEngine:
+    monkeypatch.setattr("web_main.ASYNC_ENGINE", migrated_engine)
+    monkeypatch.setattr("web_main.REPLICA_ASYNC_ENGINE", replica_engine)
+    monkeypatch.setattr("web_main.MIGRATE_ON_STARTUP", False)
+    monkeypatch.setattr("web_main.WARMUP_ON_STARTUP", True)
+    TEMPLATES.env.cache.clear()
+    return migrated_engine
+
+
+@pytest.mark.asyncio
+async def test_lifespan_warmup(warmup_app: AsyncEngine):
+    async with lifespan(fastapi_app):
+        assert warmup_app.pool.checkedin() >= 1
+        assert replica_engine.pool.checkedin() >= 1
+        assert len(TEMPLATES.env.cache) == len(TEMPLATES.env.list_templates())
+
+
+@time_budget
+@pytest.mark.asyncio
+async def test_lifespan_startup_time(warmup_app: AsyncEngine):
+    started: float = time.perf_counter()
+    async with lifespan(fastapi_app):
+        startup_time: float = time.perf_counter() - started
+    assert startup_time < STARTUP_TIME_BUDGET
+
+
+@pytest.mark.asyncio
+async def test_warm_up_pool_is_limited_by_pool_capacity(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("web.warmup.get_catalog_warmup_statements", lambda: [(text("SELECT 1"), {})])
+    small_engine: AsyncEngine = create_async_engine(engine.url, pool_size=2, max_overflow=1, pool_timeout=1)
+    try:
+        assert get_pool_capacity(small_engine) == 3
+        # Без ограничения четвертое соединение ждало бы pool_timeout и прогрев завершился бы ошибкой
+        await warm_up_pool(small_engine, 10)
+        assert small_engine.pool.checkedout() == 0
+    finally:
+        await small_engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_pool_releases_connections_on_error(monkeypatch: pytest.MonkeyPatch):
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE SEQUENCE IF NOT EXISTS warmup_calls"))
+    # Третье по счету соединение завершается ошибкой деления на ноль
+    monkeypatch.setattr(
+        "web.warmup.get_catalog_warmup_statements",
+        lambda: [(text("SELECT 1 / (nextval('warmup_calls') - 3)"), {})]
+    )
+    failing_engine: AsyncEngine = create_async_engine(engine.url, pool_timeout=1)
+    try:
+        with pytest.raises(ExceptionGroup):
+            await asyncio.wait_for(warm_up_pool(failing_engine, 4), timeout=5)
+        # Соединения, ожидавшие остальных, возвращены в пул
+        assert failing_engine.pool.checkedout() == 0
+    finally:
+        await failing_engine.dispose()
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP SEQUENCE warmup_calls"))
@@ -0,0 +1,206 @@
+"""
+Сборка и раздача статических файлов (css/js).
+
+`build_assets` копирует файлы `web/static` в каталог сборки под именами с хешем содержимого
+(`css/base.3f2a1b9c0d4e.css`) и рядом сохраняет сжатые варианты `.gz` и `.br` (если установлен `brotli`).
+Соответствие исходных имен и имен с хешем записывается в `manifest.json`.
+
+`StaticAssets` раздает каталог сборки: выбирает сжатый вариант по заголовку `Accept-Encoding` и отдает файлы
+с хешем с `Cache-Control: immutable`. Новое содержимое файла получает новое имя, поэтому браузер
+не перепроверяет закешированные файлы. Шаблоны получают имя с хешем через `url_for('static', path=...)`.
+
+`MediaFiles` так же раздает загруженные изображения каталога (`core.images`): их имена - хеш содержимого.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import shutil
+
+from pathlib import Path
+from typing import Any
+
+from jinja2 import pass_context
+from loguru import logger
+from starlette.datastructures import URL, Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from .compression import accepted_encodings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+STATIC_ROUTE_NAME: str = "static"
+"Имя маршрута статических файлов в `web_main.app`"
+
+MANIFEST_NAME: str = "manifest.json"
+"Имя файла соответствия исходных имен и имен с хешем в каталоге сборки"
+
+HASH_LENGTH: int = 12
+"Длина хеша содержимого в имени файла"
+
+COMPRESSIBLE_SUFFIXES: set[str] = {".css", ".js", ".svg", ".html", ".json", ".txt", ".map"}
+"Расширения текстовых файлов, для которых сохраняются сжатые варианты"
+
+ENCODING_SUFFIXES: dict[str, str] = {"br": ".br", "gzip": ".gz"}
+"Сжатые варианты файла в порядке предпочтения. Ключ - значение `Content-Encoding`, значение - расширение файла"
+
+IMMUTABLE_CACHE_CONTROL: str = "public, max-age=31536000, immutable"
+"`Cache-Control` файлов с хешем в имени"
+
+MUTABLE_CACHE_CONTROL: str = "no-cache"
+"`Cache-Control` файлов, запрошенных по исходному имени"
+
+
+def fingerprint(path: str, content: bytes) -> str:
+    """
+    Имя файла с хешем содержимого.
+
+    Args:
+        path (str): Путь файла относительно каталога статики, например `css/base.css`
+        content (bytes): Содержимое файла
+
+    Returns:
+        str: Путь с хешем перед расширением, например `css/base.3f2a1b9c0d4e.css`.
+    """
+    digest: str = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    parent, _, name = path.rpartition("/")
+    stem, dot, suffix = name.partition(".")
+    hashed_name: str = f"{stem}.{digest}{dot}{suffix}"
+    return f"{parent}/{hashed_name}" if parent else hashed_name
+
+
+def build_assets(source_dir: Path, output_dir: Path) -> dict[str, str]:
+    """
+    Собирает статические файлы: копии с хешем в имени, сжатые варианты и `manifest.json`.
+    Файлы предыдущих сборок не удаляются, чтобы страницы, открытые до выкладки, получали свои версии.
+
+    Args:
+        source_dir (Path): Каталог исходных файлов
+        output_dir (Path): Каталог сборки
+
+    Returns:
+        dict[str, str]: Соответствие путей исходных файлов и путей с хешем.
+    """
+    manifest: dict[str, str] = {}
+    "Ключ - путь исходного файла, значение - путь с хешем. Пути относительно каталогов, через `/`"
+    for file in sorted(source_dir.rglob("*")):
+        if not file.is_file():
+            continue
+        path: str = file.relative_to(source_dir).as_posix()
+        content: bytes = file.read_bytes()
+        manifest[path] = fingerprint(path, content)
+        target: Path = output_dir / manifest[path]
+        if target.exists():
+            continue
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(file, target)
+        if file.suffix not in COMPRESSIBLE_SUFFIXES:
+            continue
+        target.with_name(target.name + ENCODING_SUFFIXES["gzip"]).write_bytes(
+            gzip.compress(content, compresslevel=9, mtime=0)
+        )
+        if brotli is not None:
+            target.with_name(target.name + ENCODING_SUFFIXES["br"]).write_bytes(brotli.compress(content, quality=11))
+
+    (output_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+    logger.info(f"Собрано статических файлов: {len(manifest)}, brotli: {brotli is not None}")
+    return manifest
+
+
+class StaticAssets(StaticFiles):
+    """
+    Раздача собранных статических файлов со сжатыми вариантами и долгим кешированием.
+
+    Args:
+        source_dir (Path): Каталог исходных файлов
+        output_dir (Path): Каталог сборки (`build_assets`)
+    """
+    def __init__(self, source_dir: Path, output_dir: Path):
+        super().__init__(directory=output_dir, check_dir=False)
+        self.source_dir = source_dir
+        self.output_dir = output_dir
+        self.manifest: dict[str, str] | None = None
+        "Соответствие исходных путей и путей с хешем. `None` - сборка еще не загружена"
+        self.hashed_paths: set[str] = set()
+
+    def load(self, rebuild: bool = False) -> int:
+        """
+        Загружает `manifest.json` сборки. Если сборки нет или `rebuild`, собирает файлы заново.
+
+        Returns:
+            int: Количество статических файлов.
+        """
+        manifest_path: Path = self.output_dir / MANIFEST_NAME
+        if rebuild or not manifest_path.exists():
+            self.manifest = build_assets(self.source_dir, self.output_dir)
+        else:
+            self.manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        self.hashed_paths = set(self.manifest.values())
+        return len(self.manifest)
+
+    def asset_path(self, path: str) -> str:
+        "Путь файла с хешем. Для файлов, которых нет в сборке, возвращается исходный путь"
+        if self.manifest is None:
+            self.load()
+        return self.manifest.get(path, path)
+
+    @pass_context
+    def url_for(self, context: dict[str, Any], name: str, /, **path_params: Any) -> URL:
+        "`url_for` для шаблонов: ссылки на статические файлы ведут на файлы с хешем"
+        if name == STATIC_ROUTE_NAME and "path" in path_params:
+            path_params["path"] = self.asset_path(path_params["path"])
+        return context["request"].url_for(name, **path_params)
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        path = Path(path).as_posix()
+        hashed_path: str = self.asset_path(path)
+        immutable: bool = path in self.hashed_paths
+
+        encoding: str | None = None
+        served_path: str = hashed_path
+        if Path(hashed_path).suffix in COMPRESSIBLE_SUFFIXES:
+            accepted: set[str] = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+            for candidate, suffix in ENCODING_SUFFIXES.items():
+                if candidate in accepted and (self.output_dir / (hashed_path + suffix)).is_file():
+                    encoding, served_path = candidate, hashed_path + suffix
+                    break
+
+        response: Response = await super().get_response(served_path, scope)
+        if encoding is not None:
+            response.headers["content-encoding"] = encoding
+            media_type: str | None = mimetypes.guess_type(hashed_path)[0]
+            if media_type is not None:
+                response.headers["content-type"] = (
+                    f"{media_type}; charset=utf-8" if media_type.startswith("text/") else media_type
+                )
+        if Path(hashed_path).suffix in COMPRESSIBLE_SUFFIXES:
+            response.headers["vary"] = "Accept-Encoding"
+        response.headers["cache-control"] = IMMUTABLE_CACHE_CONTROL if immutable else MUTABLE_CACHE_CONTROL
+        return response
+
+
+class MediaFiles(StaticFiles):
+    """
+    Раздача изображений каталога. Имя каждого файла - хеш содержимого, поэтому все файлы отдаются
+    с `Cache-Control: immutable`.
+
+    Args:
+        directory (Path): Каталог изображений (`core.images.ImageStore.media_dir`). Создается, если его нет
+    """
+    def __init__(self, directory: Path):
+        directory.mkdir(parents=True, exist_ok=True)
+        super().__init__(directory=directory)
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response: Response = await super().get_response(path, scope)
+        response.headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+        # Файлы загружены пользователями: браузер не должен угадывать тип содержимого
+        response.headers["x-content-type-options"] = "nosniff"
+        return response
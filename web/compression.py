@@ -0,0 +1,119 @@
+"""
+Сжатие HTTP-ответов: выбор кодировки по `Accept-Encoding` и сжатие gzip или brotli.
+
+brotli используется, только если установлен пакет `brotli`, иначе ответы сжимаются gzip.
+Уровни сжатия подобраны для ответов, сжимаемых на каждый запрос: максимальное сжатие
+используется только для статических файлов при сборке (`web.assets.build_assets`).
+"""
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+SUPPORTED_ENCODINGS: tuple[str, ...] = ("br", "gzip") if brotli is not None else ("gzip",)
+"Кодировки ответов в порядке предпочтения"
+
+GZIP_LEVEL: int = 6
+"Уровень сжатия gzip"
+
+BROTLI_QUALITY: int = 5
+"Качество сжатия brotli. Выше 5 сжатие заметно медленнее при небольшом выигрыше в размере"
+
+COMPRESSIBLE_CONTENT_TYPES: tuple[str, ...] = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+"Начала `Content-Type` текстовых ответов, которые имеет смысл сжимать"
+
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """
+    Разбирает заголовок `Accept-Encoding`.
+
+    Args:
+        accept_encoding (str): Значение заголовка, например `gzip, deflate, br;q=0.5`
+
+    Returns:
+        set[str]: Кодировки, которые принимает клиент (без кодировок с `q=0`).
+    """
+    encodings: set[str] = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.partition(";")
+        params = params.replace(" ", "")
+        try:
+            quality: float = float(params.removeprefix("q=")) if params.startswith("q=") else 1.0
+        except ValueError:
+            quality = 1.0
+        if name.strip() and quality > 0:
+            encodings.add(name.strip())
+    return encodings
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """
+    Выбирает кодировку ответа.
+
+    Args:
+        accept_encoding (str): Значение заголовка `Accept-Encoding`
+
+    Returns:
+        str | None: Первая из `SUPPORTED_ENCODINGS`, которую принимает клиент, или `None`.
+    """
+    accepted: set[str] = accepted_encodings(accept_encoding)
+    for encoding in SUPPORTED_ENCODINGS:
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+def is_compressible(content_type: str) -> bool:
+    "Текстовый ли ответ с таким `Content-Type`"
+    return content_type.lower().startswith(COMPRESSIBLE_CONTENT_TYPES)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """
+    Сжимает тело ответа целиком.
+
+    Args:
+        body (bytes): Тело ответа
+        encoding (str): Кодировка из `SUPPORTED_ENCODINGS`
+
+    Returns:
+        bytes: Сжатое тело.
+    """
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class StreamCompressor:
+    """
+    Потоковое сжатие тела ответа, которое отправляется частями.
+
+    Args:
+        encoding (str): Кодировка из `SUPPORTED_ENCODINGS`
+    """
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == "br":
+            return self.compressor.process(chunk)
+        return self.compressor.compress(chunk)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self.compressor.finish()
+        return self.compressor.flush()
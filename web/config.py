@@ -3,11 +3,20 @@ from pathlib import Path
 
 from dotenv import dotenv_values as get_dotenv_values
 from dotenv import load_dotenv
-from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from sqlalchemy import URL
 from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 
+from core.cache import CacheNamespaces, FragmentCache
+from core.card_stats import CardStatsAggregator
+from core.db_metrics import MeteredAsyncAdaptedQueuePool
+from core.images import ImageStore
+from core.promo_events import PromoIssueEvents
+from core.tenants import TenantRegistry
+
+from .assets import MediaFiles, StaticAssets
+from .templating import create_templates
+
 # Загрузка переменных окружения .env
 load_dotenv()
 
@@ -30,15 +39,67 @@ ASYNC_ENGINE: AsyncEngine = create_async_engine(
         port=int(dotenv_values.get("DATABASE_PORT", 5432))
     ),
     pool_pre_ping=True,
+    poolclass=MeteredAsyncAdaptedQueuePool,
+    pool_logging_name="primary",
     json_serializer=lambda obj: json.dumps(obj, ensure_ascii=False)
 )
 "Асинхронный движок для соединения с базой данных"
 
-STATIC_FILES: StaticFiles  = StaticFiles(directory=CURRENT_DIR / "static")
-"Путь к папке, в которой лежат статичные файлы(css/js)"
+REPLICA_ASYNC_ENGINE: AsyncEngine = create_async_engine(
+    URL.create(
+        host=dotenv_values.get("REPLICA_DATABASE_HOST", dotenv_values.get("DATABASE_HOST", "localhost")),
+        drivername="postgresql+asyncpg",
+        username=dotenv_values.get("REPLICA_DATABASE_USERNAME", dotenv_values.get("DATABASE_USERNAME", "postgres")),
+        password=dotenv_values.get("REPLICA_DATABASE_PASSWORD", dotenv_values.get("DATABASE_PASSWORD", "postgres")),
+        database=dotenv_values.get("REPLICA_DATABASE_NAME", dotenv_values.get("DATABASE_NAME")),
+        port=int(dotenv_values.get("REPLICA_DATABASE_PORT", dotenv_values.get("DATABASE_PORT", 5432)))
+    ),
+    pool_pre_ping=True,
+    poolclass=MeteredAsyncAdaptedQueuePool,
+    pool_logging_name="replica",
+    json_serializer=lambda obj: json.dumps(obj, ensure_ascii=False),
+    connect_args={"server_settings": {"default_transaction_read_only": "on"}}
+)
+"""Асинхронный движок для чтения каталога с реплики. Если реплика не задана в .env,
+используется та же база, что и у ASYNC_ENGINE, но через отдельный пул только для чтения"""
+
+ASSETS_DIR: Path = Path(dotenv_values.get("ASSETS_DIR") or CURRENT_DIR / "static_dist")
+"Каталог собранных статических файлов (`python maintenance_main.py build-assets`)"
+
+STATIC_FILES: StaticAssets = StaticAssets(source_dir=CURRENT_DIR / "static", output_dir=ASSETS_DIR)
+"Статичные файлы(css/js): исходники в `web/static`, раздаются из сборки с хешем в имени и сжатыми вариантами"
+
+MEDIA_DIR: Path = Path(dotenv_values.get("MEDIA_DIR") or CURRENT_DIR.parent / "media")
+"Каталог загруженных изображений каталога: оригиналы и уменьшенные копии"
+
+MEDIA_FILES: MediaFiles = MediaFiles(MEDIA_DIR)
+"Раздача изображений каталога по пути `/media`"
+
+IMAGE_WORKERS: int = int(dotenv_values.get("IMAGE_WORKERS", 2))
+"Количество процессов, создающих уменьшенные копии изображений"
+
+IMAGE_MAX_BYTES: int = int(dotenv_values.get("IMAGE_MAX_BYTES", 10 * 1024 * 1024))
+"Максимальный размер загружаемого изображения, байты"
 
-TEMPLATES: Jinja2Templates = Jinja2Templates(directory=CURRENT_DIR / "templates")
-"Путь к папке, в которой лежат шаблоны страниц(html)"
+IMAGE_STORE: ImageStore = ImageStore(MEDIA_DIR, max_workers=IMAGE_WORKERS, max_bytes=IMAGE_MAX_BYTES)
+"Хранилище изображений каталога с пулом процессов (`core.images`)"
+
+TEMPLATES_AUTO_RELOAD: bool = dotenv_values.get("TEMPLATES_AUTO_RELOAD", "false").lower() == "true"
+"Перечитывать измененные шаблоны без перезапуска воркера. Только для разработки"
+
+TEMPLATES_BYTECODE_CACHE_DIR: Path | None = (
+    Path(dotenv_values.get("TEMPLATES_BYTECODE_CACHE_DIR") or CURRENT_DIR.parent / ".jinja_cache")
+    if dotenv_values.get("TEMPLATES_BYTECODE_CACHE_DIR") != "" else None
+)
+"Каталог кеша скомпилированных шаблонов Jinja. Пустая строка - кеш на диске не используется"
+
+TEMPLATES: Jinja2Templates = create_templates(
+    CURRENT_DIR / "templates",
+    bytecode_cache_dir=TEMPLATES_BYTECODE_CACHE_DIR,
+    auto_reload=TEMPLATES_AUTO_RELOAD,
+    static_assets=STATIC_FILES
+)
+"Шаблоны страниц(html) с кешем байткода на диске"
 
 HOST: str = dotenv_values.get("HOST", "localhost")
 "Хост на котором будет запускаться FastAPI, по умолчанию 'localhost'"
@@ -49,6 +110,108 @@ PORT: int = int(dotenv_values.get("PORT", 8000))
 FASTAPI_ASYNC_SESSIONMAKER = async_sessionmaker(ASYNC_ENGINE, expire_on_commit=False)
 "Специализированная для FastAPI асинхронная фабрика сессий БД. При вызове создает сессию"
 
+FASTAPI_REPLICA_ASYNC_SESSIONMAKER = async_sessionmaker(REPLICA_ASYNC_ENGINE, expire_on_commit=False)
+"Асинхронная фабрика сессий реплики. Используется только для запросов на чтение клиентской части"
+
 FASTAPI_DATABASE_QUERIES_QUEUE_NAME = "database_queries"
 "Имя очереди в которую надо публиковать сообщения о совершенных запросах"
 
+
+MIGRATE_ON_STARTUP: bool = dotenv_values.get("MIGRATE_ON_STARTUP", "false").lower() == "true"
+"Применять миграции при старте (для локальной разработки). В продакшене миграции запускаются отдельным шагом"
+
+WARMUP_ON_STARTUP: bool = dotenv_values.get("WARMUP_ON_STARTUP", "false").lower() == "true"
+"Прогревать при старте пул соединений, шаблоны Jinja и запросы каталога"
+
+WARMUP_POOL_CONNECTIONS: int = int(dotenv_values.get("WARMUP_POOL_CONNECTIONS", 5))
+"Количество соединений пула, открываемых при прогреве. Ограничивается емкостью пула (`pool_size + max_overflow`)"
+
+PROFILING_ENABLED: bool = dotenv_values.get("PROFILING_ENABLED", "false").lower() == "true"
+"Подключить `web.middlewares.ProfilingMiddleware`. При `false` профилирование не влияет на запросы"
+
+PROFILING_SAMPLE_RATE: float = float(dotenv_values.get("PROFILING_SAMPLE_RATE", 0))
+"Доля случайно профилируемых запросов (кроме запросов с заголовком `X-Profile`)"
+
+PROFILING_TOKEN: str | None = dotenv_values.get("PROFILING_TOKEN")
+"""Значение заголовка `X-Profile`, разрешающее профилирование запроса. Если не задан - заголовок игнорируется,
+а без `PROFILING_SAMPLE_RATE` сайт с `PROFILING_ENABLED` не запускается"""
+
+PROFILING_DIR: Path = Path(dotenv_values.get("PROFILING_DIR", CURRENT_DIR.parent / "profiles"))
+"Каталог профилей запросов"
+
+PROFILING_INTERVAL: float = float(dotenv_values.get("PROFILING_INTERVAL", 0.005))
+"Интервал между снимками стека при профилировании, секунды"
+
+SLOW_QUERY_THRESHOLD_MS: float = float(dotenv_values.get("SLOW_QUERY_THRESHOLD_MS", 200))
+"Порог медленного SQL-выражения для журнала `core.slow_queries`, миллисекунды. 0 - журнал выключен"
+
+SLOW_QUERY_EXPLAIN: bool = dotenv_values.get("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+"Снимать план `EXPLAIN (ANALYZE, BUFFERS)` медленных запросов"
+
+SLOW_QUERY_LOGS_PER_MINUTE: int = int(dotenv_values.get("SLOW_QUERY_LOGS_PER_MINUTE", 60))
+"Максимум записей о медленных запросах в минуту"
+
+SLOW_QUERY_EXPLAINS_PER_MINUTE: int = int(dotenv_values.get("SLOW_QUERY_EXPLAINS_PER_MINUTE", 6))
+"Максимум снятых планов медленных запросов в минуту"
+
+COMPRESSION_ENABLED: bool = dotenv_values.get("COMPRESSION_ENABLED", "true").lower() == "true"
+"Сжимать текстовые ответы gzip (brotli, если установлен пакет `brotli`)"
+
+COMPRESSION_MINIMUM_SIZE: int = int(dotenv_values.get("COMPRESSION_MINIMUM_SIZE", 500))
+"Минимальный размер ответа для сжатия, байты. Меньшие ответы сжатие почти не уменьшает"
+
+FRAGMENT_CACHE_MAX_BYTES: int = int(dotenv_values.get("FRAGMENT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+"Лимит кеша фрагментов одного арендатора, байты"
+
+FRAGMENT_CACHE: CacheNamespaces[FragmentCache] = CacheNamespaces(
+    lambda: FragmentCache(max_bytes=FRAGMENT_CACHE_MAX_BYTES)
+)
+"""Кеш отрендеренных списков карточек категорий и модальных окон карточек (`web.utils.render_fragment`),
+отдельный для каждого арендатора"""
+
+VALIDITY_SCHEDULER_ENABLED: bool = dotenv_values.get("VALIDITY_SCHEDULER_ENABLED", "true").lower() == "true"
+"Запускать в воркере планировщик границ окон действия карточек (`core.validity.ValidityScheduler`)"
+
+VALIDITY_REFRESH_INTERVAL: float = float(dotenv_values.get("VALIDITY_REFRESH_INTERVAL", 60))
+"""Максимальная пауза между чтениями ближайших границ окон действия, секунды.
+Ограничивает задержку обработки границ, заданных через другой воркер"""
+
+TENANTS_REFRESH_INTERVAL: float = float(dotenv_values.get("TENANTS_REFRESH_INTERVAL", 60))
+"Через сколько секунд воркер перечитывает список арендаторов"
+
+TENANT_REGISTRY: TenantRegistry = TenantRegistry(refresh_interval=TENANTS_REFRESH_INTERVAL)
+"Арендаторы, известные воркеру (`web.dependencies.resolve_tenant`)"
+
+TENANT_PATH_PREFIX: str = "/tenants/{tenant_slug}"
+"Префикс пути клиентской части арендатора: `/tenants/{slug}/partnerprogram/`"
+
+PROMO_ISSUE_EVENTS_INTERVAL: float = float(dotenv_values.get("PROMO_ISSUE_EVENTS_INTERVAL", 5))
+"Пауза между записями агрегированных событий выдачи промокодов в outbox, секунды"
+
+PROMO_ISSUE_EVENTS: PromoIssueEvents = PromoIssueEvents(
+    FASTAPI_ASYNC_SESSIONMAKER, FASTAPI_DATABASE_QUERIES_QUEUE_NAME, interval=PROMO_ISSUE_EVENTS_INTERVAL
+)
+"Выдачи промокодов воркера, записываемые в outbox одним событием за интервал (`core.promo_events`)"
+
+VISITOR_COOKIE_NAME: str = "visitor_id"
+"Cookie с идентификатором посетителя. По нему посетителю выдается не больше одного промокода карточки"
+
+VISITOR_COOKIE_MAX_AGE: int = int(dotenv_values.get("VISITOR_COOKIE_MAX_AGE", 365 * 24 * 60 * 60))
+"Срок жизни cookie посетителя, секунды"
+
+CARD_STATS_BUCKET_SECONDS: int = int(dotenv_values.get("CARD_STATS_BUCKET_SECONDS", 60))
+"Длина интервала, по которому агрегируются просмотры и переходы по карточкам, секунды"
+
+CARD_STATS_FLUSH_INTERVAL: float = float(dotenv_values.get("CARD_STATS_FLUSH_INTERVAL", 5))
+"Пауза между записями просмотров и переходов по карточкам в бд, секунды"
+
+CARD_STATS_MAX_KEYS: int = int(dotenv_values.get("CARD_STATS_MAX_KEYS", 100_000))
+"Предел количества счетчиков карточек в памяти воркера"
+
+CARD_STATS: CardStatsAggregator = CardStatsAggregator(
+    FASTAPI_ASYNC_SESSIONMAKER,
+    bucket_seconds=CARD_STATS_BUCKET_SECONDS,
+    interval=CARD_STATS_FLUSH_INTERVAL,
+    max_keys=CARD_STATS_MAX_KEYS
+)
+"Просмотры и переходы по карточкам, накопленные воркером (`core.card_stats`)"
@@ -1,11 +1,56 @@
 from collections.abc import AsyncGenerator
 from typing import Any
 
-from .config import FASTAPI_ASYNC_SESSIONMAKER
+from fastapi import Depends, Header, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.tenants import Tenant, tenant_engine
+from core.tracing import start_trace
+
+from .config import (
+    ASYNC_ENGINE,
+    FASTAPI_ASYNC_SESSIONMAKER,
+    FASTAPI_REPLICA_ASYNC_SESSIONMAKER,
+    REPLICA_ASYNC_ENGINE,
+    TENANT_REGISTRY,
+)
 
 
 async def async_session_generator() -> AsyncGenerator[Any, Any]:
-    "Генератор сессии с базой данных. Одна сессия на 1 запрос"
+    """Генератор сессии с основной базой данных. Одна сессия на 1 запрос.
+    Все записи и чтения админки идут через нее, чтобы админ сразу видел свои изменения"""
     async with FASTAPI_ASYNC_SESSIONMAKER() as session:
         yield session
 
+
+async def resolve_tenant(request: Request, session: AsyncSession = Depends(async_session_generator)) -> Tenant:
+    """Определяет арендатора клиентского запроса: по короткому имени в пути (`TENANT_PATH_PREFIX`),
+    иначе по хосту, иначе арендатор по умолчанию. Неизвестный арендатор в пути - ответ 404.
+    Список арендаторов перечитывается через сессию основной бд не чаще `TENANTS_REFRESH_INTERVAL`"""
+    if TENANT_REGISTRY.is_stale():
+        await TENANT_REGISTRY.load(session)
+    tenant: Tenant | None = TENANT_REGISTRY.resolve(request.url.hostname, request.path_params.get("tenant_slug"))
+    if tenant is None:
+        raise HTTPException(status_code=404, detail="Арендатор не найден")
+    return tenant
+
+
+async def async_replica_session_generator(tenant: Tenant = Depends(resolve_tenant)) -> AsyncGenerator[Any, Any]:
+    """Генератор сессии с репликой базы данных только для чтения. Одна сессия на 1 запрос.
+    Используется клиентскими обработчиками для чтения каталога. Для арендатора с отдельной схемой
+    сессия открывается на движке, переводящем таблицы каталога в его схему"""
+    async with FASTAPI_REPLICA_ASYNC_SESSIONMAKER(bind=tenant_engine(REPLICA_ASYNC_ENGINE, tenant)) as session:
+        yield session
+
+
+async def async_tenant_session_generator(tenant: Tenant = Depends(resolve_tenant)) -> AsyncGenerator[Any, Any]:
+    """Генератор сессии с основной базой данных на движке арендатора. Одна сессия на 1 запрос.
+    Используется клиентскими обработчиками, которые изменяют каталог арендатора (выдача промокодов)"""
+    async with FASTAPI_ASYNC_SESSIONMAKER(bind=tenant_engine(ASYNC_ENGINE, tenant)) as session:
+        yield session
+
+
+async def start_request_trace(x_trace_id: str | None = Header(None, max_length=64)) -> str:
+    """Начинает трассу изменения для запроса админки (`core.tracing`).
+    Идентификатор берется из заголовка `X-Trace-Id`, если клиент его передал, иначе генерируется"""
+    return start_trace(x_trace_id)["trace_id"]
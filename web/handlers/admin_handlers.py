@@ -1,22 +1,35 @@
+from datetime import datetime, timedelta, timezone
 from typing import Any
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Query, Request
 from fastapi.responses import JSONResponse
 from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.database_utils import (
+    count_available_promo_codes,
     create_row,
     delete_row,
     get_all_rows_from_table,
+    get_card_stats_report,
     get_full_row_for_admin_by_id,
+    load_promo_codes,
     update_row_by_id,
 )
-from core.models import BaseTable, CardsTable, CategoriesTable, CompaniesTable, russian_field_names, tables
+from core.images import THUMBNAIL_FORMATS, InvalidImageError, thumbnail_path
+from core.models import (
+    BaseTable,
+    CardsTable,
+    CategoriesTable,
+    CompaniesTable,
+    get_editable_columns,
+    russian_field_names,
+    tables,
+)
 from web.utils import map_columns_to_table_types
 
-from ..config import FASTAPI_DATABASE_QUERIES_QUEUE_NAME, TEMPLATES
-from ..dependencies import async_session_generator
+from ..config import FASTAPI_DATABASE_QUERIES_QUEUE_NAME, IMAGE_STORE, TEMPLATES
+from ..dependencies import async_session_generator, start_request_trace
 from ..schemas import (
     CreateRowGetModalModel,
     CreateRowModel,
@@ -26,8 +39,16 @@ from ..schemas import (
     SaveRowModel,
 )
 
-admin_rt = APIRouter(prefix="/admin")
-"Роутер отвечающий за обработку запросов для администратора"
+admin_rt = APIRouter(prefix="/admin", dependencies=[Depends(start_request_trace)])
+"""Роутер отвечающий за обработку запросов для администратора.
+Каждый запрос начинает трассу, которая передается через outbox и RabbitMQ до бота"""
+
+IMAGE_COLUMNS: dict[str, tuple[str, tuple[str, ...]]] = {
+    CardsTable.__tablename__: (CardsTable.image.name, ("card", "modal")),
+    CompaniesTable.__tablename__: (CompaniesTable.logo.name, ("logo",)),
+}
+"""Таблицы с изображениями. Ключ - имя таблицы, значение - столбец ключа изображения
+и размеры уменьшенных копий (`core.images.THUMBNAIL_SIZES`)"""
 
 
 @admin_rt.get("/")
@@ -105,7 +126,7 @@ async def get_table_data(
             request, "admin/table.html",
             {
                 "tablename": data.tablename,
-                "columns": [column.name for column in table.__table__.columns],
+                "columns": [column.name for column in get_editable_columns(table)],
                 "descriptions": russian_field_names,
                 "rows": rows
             }
@@ -247,7 +268,7 @@ async def create_row_get_handler(
     table: BaseTable | None = tables.get(data.tablename)
     "Модель таблицы базы данных извлеченная по ее названию"
     if table is not None:
-        columns: list[str] = [column.name for column in table.__table__.columns]
+        columns: list[str] = [column.name for column in get_editable_columns(table)]
         "Список названий столбцов таблицы"
         logger.debug(f"{columns=}")
         return TEMPLATES.TemplateResponse(
@@ -359,3 +380,146 @@ async def delete_row_post_handler(
                 },
                 500
             )
+
+
+@admin_rt.post("/images/{tablename}/{row_id}")
+async def upload_image_post_handler(
+    request: Request,
+    tablename: str,
+    row_id: int,
+    session: AsyncSession = Depends(async_session_generator)
+):
+    """
+    Обрабатывает POST-запрос загрузки изображения: баннера карточки или логотипа компании.
+
+    Функция:
+    - Читает тело запроса (содержимое файла) не больше `IMAGE_MAX_BYTES`;
+    - Сохраняет оригинал и уменьшенные копии через `IMAGE_STORE` (пул процессов);
+    - Записывает ключ изображения в строку таблицы DML-функцией `update_row_by_id`.
+
+    Args:
+        request (Request): Текущий HTTP-запрос (FastAPI), тело - содержимое файла изображения.
+        tablename (str): Имя таблицы (`IMAGE_COLUMNS`).
+        row_id (int): Идентификатор строки.
+        session (AsyncSession): Асинхронная сессия SQLAlchemy для работы с БД.
+
+    Returns:
+        JSONResponse:
+            - `{"ok": True, "image": key, "thumbnails": {...}}` с кодом 200;
+            - `{"ok": False, "error": str}` с кодом 404 для таблицы без изображений, 413 для слишком большого
+              файла, 422 для файла, который не является изображением, и 500 при ошибке обновления строки.
+    """
+    if tablename not in IMAGE_COLUMNS:
+        return JSONResponse({"ok": False, "error": f"У таблицы {tablename} нет изображений"}, status_code=404)
+    column, sizes = IMAGE_COLUMNS[tablename]
+
+    content: bytearray = bytearray()
+    async for chunk in request.stream():
+        content += chunk
+        if len(content) > IMAGE_STORE.max_bytes:
+            return JSONResponse(
+                {"ok": False, "error": f"Изображение больше {IMAGE_STORE.max_bytes} байт"}, status_code=413
+            )
+    try:
+        key: str = await IMAGE_STORE.save(bytes(content), sizes)
+    except InvalidImageError as exc:
+        return JSONResponse({"ok": False, "error": str(exc)}, status_code=422)
+
+    update_res: bool | str = await update_row_by_id(
+        row_id=row_id,
+        table=tables[tablename],
+        data={column: key},
+        session=session,
+        queue_name=FASTAPI_DATABASE_QUERIES_QUEUE_NAME
+    )
+    if update_res is not True:
+        return JSONResponse({"ok": False, "error": update_res}, status_code=500)
+    return JSONResponse(
+        {
+            "ok": True,
+            "image": key,
+            "thumbnails": {
+                size: {extension: str(request.url_for("media", path=thumbnail_path(key, size, extension)))
+                       for extension in THUMBNAIL_FORMATS}
+                for size in sizes
+            }
+        },
+        status_code=200
+    )
+
+
+@admin_rt.post("/promocodes/{card_id}")
+async def load_promocodes_post_handler(
+    request: Request,
+    card_id: int,
+    session: AsyncSession = Depends(async_session_generator)
+):
+    """
+    Обрабатывает POST-запрос загрузки пула одноразовых промокодов карточки.
+
+    Функция:
+    - Читает тело запроса: текст в UTF-8, один промокод в строке, пустые строки пропускаются;
+    - Загружает промокоды через COPY (`load_promo_codes`), уже загруженные промокоды пропускаются.
+
+    Args:
+        request (Request): Текущий HTTP-запрос (FastAPI), тело - список промокодов.
+        card_id (int): Идентификатор карточки.
+        session (AsyncSession): Асинхронная сессия SQLAlchemy для работы с БД.
+
+    Returns:
+        JSONResponse:
+            - `{"ok": True, "loaded": int, "available": int}` с кодом 200;
+            - `{"ok": False, "error": str}` с кодом 422 для пустого списка или не UTF-8 текста
+              и 500 при ошибке загрузки (например, карточки нет).
+    """
+    try:
+        codes: list[str] = [line.strip() for line in (await request.body()).decode().splitlines() if line.strip()]
+    except UnicodeDecodeError:
+        return JSONResponse({"ok": False, "error": "Промокоды должны быть текстом в UTF-8"}, status_code=422)
+    if not codes:
+        return JSONResponse({"ok": False, "error": "Список промокодов пуст"}, status_code=422)
+
+    loaded: int | None = await load_promo_codes(card_id, codes, session, FASTAPI_DATABASE_QUERIES_QUEUE_NAME)
+    if loaded is None:
+        return JSONResponse({"ok": False, "error": "Не удалось загрузить промокоды"}, status_code=500)
+    return JSONResponse(
+        {"ok": True, "loaded": loaded, "available": await count_available_promo_codes(card_id, session)},
+        status_code=200
+    )
+
+
+@admin_rt.get("/card_stats")
+async def card_stats_get_handler(
+    since: datetime | None = Query(None),
+    until: datetime | None = Query(None),
+    tenant_id: int | None = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    session: AsyncSession = Depends(async_session_generator)
+):
+    """
+    Обрабатывает GET-запрос отчета по просмотрам и переходам по карточкам.
+
+    Функция:
+    - Суммирует счетчики `card_stats` за период по карточкам (`get_card_stats_report`);
+    - Возвращает карточки по убыванию просмотров с долей переходов (`ctr`).
+
+    Счетчики воркеров записываются раз в `CARD_STATS_FLUSH_INTERVAL` секунд, поэтому последние
+    несколько секунд в отчет еще не попали.
+
+    Args:
+        since (datetime | None): Начало периода. По умолчанию - неделя до конца периода.
+        until (datetime | None): Конец периода. По умолчанию - текущий момент.
+        tenant_id (int | None): Идентификатор арендатора. По умолчанию - все арендаторы.
+        limit (int): Максимальное количество карточек в отчете.
+        session (AsyncSession): Асинхронная сессия SQLAlchemy для работы с БД.
+
+    Returns:
+        JSONResponse: `{"ok": True, "since": str, "until": str, "cards": list[dict]}` с кодом 200.
+    """
+    until = until or datetime.now(timezone.utc)
+    since = since or until - timedelta(days=7)
+    cards: list[dict[str, Any]] = await get_card_stats_report(session, since, until, tenant_id=tenant_id, limit=limit)
+    return JSONResponse(
+        {"ok": True, "since": since.isoformat(), "until": until.isoformat(), "cards": cards},
+        status_code=200
+    )
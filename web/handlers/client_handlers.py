@@ -1,27 +1,52 @@
+import uuid
+
 from typing import Any
 
 from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import JSONResponse, RedirectResponse
 from loguru import logger
+from sqlalchemy import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.database_utils import (
-    get_all_cards_in_category_with_short_description,
-    get_all_categories,
-    get_card_info_by_card_id,
+    claim_promo_code,
+    get_all_cards_in_category_fast,
+    get_all_categories_fast,
+    get_card_info_fast,
+    get_card_link_fast,
+    search_cards,
 )
+from core.tenants import Tenant
 
-from ..config import FASTAPI_DATABASE_QUERIES_QUEUE_NAME, TEMPLATES
-from ..dependencies import async_session_generator
+from ..config import (
+    CARD_STATS,
+    FASTAPI_DATABASE_QUERIES_QUEUE_NAME,
+    PROMO_ISSUE_EVENTS,
+    TEMPLATES,
+    VISITOR_COOKIE_MAX_AGE,
+    VISITOR_COOKIE_NAME,
+)
+from ..dependencies import (
+    async_replica_session_generator,
+    async_session_generator,
+    async_tenant_session_generator,
+    resolve_tenant,
+)
 from ..schemas import CardPydanticModel
+from ..utils import render_fragment
 
 client_rt = APIRouter(prefix="/partnerprogram")
-"Роутер отвечающий за обработку запросов для обычного посетителя сайта(Клиента)"
+"""Роутер отвечающий за обработку запросов для обычного посетителя сайта(Клиента).
+Каталог читается с реплики, в основную бд пишутся только сообщения outbox.
+Подключается дважды: без префикса (арендатор по хосту) и с префиксом `TENANT_PATH_PREFIX`"""
 
 
 @client_rt.get("/")
 async def partnerprogram_get_handler(
     request: Request,
-    session: AsyncSession = Depends(async_session_generator)
+    session: AsyncSession = Depends(async_replica_session_generator),
+    primary_session: AsyncSession = Depends(async_session_generator),
+    tenant: Tenant = Depends(resolve_tenant)
 ):
     """
     Обрабатывает GET-запрос для отображения страницы с партнерской программой и списком категорий.
@@ -33,14 +58,21 @@ async def partnerprogram_get_handler(
 
     Args:
         request (Request): Текущий HTTP-запрос (FastAPI).
-        session (AsyncSession): Асинхронная сессия SQLAlchemy для работы с БД.
+        session (AsyncSession): Асинхронная сессия SQLAlchemy с репликой БД (только чтение).
+        primary_session (AsyncSession): Асинхронная сессия SQLAlchemy с основной БД для записи в outbox.
+        tenant (Tenant): Арендатор запроса.
 
     Returns:
         TemplateResponse: HTML-страница с партнерской программой, включающая:
-            - список категорий (`categories`) в формате list[dict].
+            - список категорий (`categories`) в формате list[Row].
     """
-    categories: list[dict[str, Any]] = await get_all_categories(session, FASTAPI_DATABASE_QUERIES_QUEUE_NAME)
-    "Список словарей отражающих запись в бд о категории по принципу ключ:столбец значение:значение"
+    categories: list[Row] = await get_all_categories_fast(
+        session,
+        FASTAPI_DATABASE_QUERIES_QUEUE_NAME,
+        outbox_session=primary_session,
+        tenant_id=tenant.id
+    )
+    "Список строк отражающих запись в бд о категории с доступом к столбцам через атрибуты"
     logger.debug(f"{categories=}")
     return TEMPLATES.TemplateResponse(request, "client/partnerprogram.html", {"categories": categories})
 
@@ -49,7 +81,9 @@ async def partnerprogram_get_handler(
 async def partnerprogram_cards_post_handler(
     request: Request,
     category_id: int | None = Query(None),
-    session: AsyncSession = Depends(async_session_generator)
+    session: AsyncSession = Depends(async_replica_session_generator),
+    primary_session: AsyncSession = Depends(async_session_generator),
+    tenant: Tenant = Depends(resolve_tenant)
 ):
     """
     Обрабатывает GET-запрос для отображения страницы с карточками в определённой категории.
@@ -63,30 +97,76 @@ async def partnerprogram_cards_post_handler(
     Args:
         request (Request): Текущий HTTP-запрос (FastAPI).
         category_id (int | None): Идентификатор категории карточек (опционально, через query-параметр).
-        session (AsyncSession): Асинхронная сессия SQLAlchemy для работы с БД.
+        session (AsyncSession): Асинхронная сессия SQLAlchemy с репликой БД (только чтение).
+        primary_session (AsyncSession): Асинхронная сессия SQLAlchemy с основной БД для записи в outbox.
+        tenant (Tenant): Арендатор запроса.
 
     Returns:
-        TemplateResponse: HTML-страница со списком карточек, включающая:
-            - список карточек (`cards`) в формате list[dict].
+        HTMLResponse: HTML-страница со списком карточек (`cards`) в формате list[Row].
+            Страница категории берется из кеша фрагментов, если карточки категории не менялись.
     """
     if isinstance(category_id, int):
-        cards: list[dict] = await get_all_cards_in_category_with_short_description(
+        cards: list[Row] = await get_all_cards_in_category_fast(
             category_id=category_id,
             session=session,
-            queue_name=FASTAPI_DATABASE_QUERIES_QUEUE_NAME)
-        "Список словарей отражающих запись в бд о карточке по принципу ключ:столбец значение:значение"
+            queue_name=FASTAPI_DATABASE_QUERIES_QUEUE_NAME,
+            outbox_session=primary_session,
+            tenant_id=tenant.id
+        )
+        "Список строк отражающих запись в бд о карточке с доступом к столбцам через атрибуты"
     else:
         cards = []
         "Пустой список если category_id не число"
     logger.debug(f"{cards=}")
-    return TEMPLATES.TemplateResponse(request, "client/cards.html", {"cards": cards})
+    return render_fragment(
+        request, "client/cards.html", {"cards": cards}, (category_id, hash(tuple(cards))), tenant.id
+    )
+
+
+@client_rt.get("/search")
+async def partnerprogram_search_get_handler(
+    request: Request,
+    q: str = Query("", max_length=200),
+    session: AsyncSession = Depends(async_replica_session_generator),
+    primary_session: AsyncSession = Depends(async_session_generator),
+    tenant: Tenant = Depends(resolve_tenant)
+):
+    """
+    Обрабатывает GET-запрос полнотекстового поиска карточек и отображает найденные карточки.
+
+    Функция:
+    - Ищет карточки по заголовку, описанию, тексту о партнере и названию компании;
+    - Передаёт найденные карточки в тот же Jinja-шаблон, что и страница категории.
+
+    Args:
+        request (Request): Текущий HTTP-запрос (FastAPI).
+        q (str): Поисковый запрос (query-параметр).
+        session (AsyncSession): Асинхронная сессия SQLAlchemy с репликой БД (только чтение).
+        primary_session (AsyncSession): Асинхронная сессия SQLAlchemy с основной БД для записи в outbox.
+        tenant (Tenant): Арендатор запроса.
+
+    Returns:
+        TemplateResponse: HTML-страница со списком найденных карточек (`cards`) в порядке релевантности.
+    """
+    cards: list[dict[str, Any]] = await search_cards(
+        query=q,
+        session=session,
+        queue_name=FASTAPI_DATABASE_QUERIES_QUEUE_NAME,
+        outbox_session=primary_session,
+        tenant_id=tenant.id
+    )
+    "Список словарей с найденными карточками в порядке убывания релевантности"
+    logger.debug(f"{q=} {len(cards)=}")
+    return TEMPLATES.TemplateResponse(request, "client/cards.html", {"cards": cards, "query": q})
 
 
 @client_rt.post("/cards/get_card_info")
 async def get_card_info_post_handler(
     request: Request,
     data: CardPydanticModel,
-    session: AsyncSession = Depends(async_session_generator)
+    session: AsyncSession = Depends(async_replica_session_generator),
+    primary_session: AsyncSession = Depends(async_session_generator),
+    tenant: Tenant = Depends(resolve_tenant)
 ):
     """
     Обрабатывает POST-запрос на получение детальной информации
@@ -95,22 +175,115 @@ async def get_card_info_post_handler(
     Функция:
     - Извлекает данные о карточке из базы по `card_id`;
     - Логирует полученную информацию для отладки;
+    - Учитывает просмотр карточки в счетчиках воркера (`CARD_STATS`), без записи в бд;
     - Передаёт данные в Jinja-шаблон для формирования содержимого модального окна.
 
     Args:
         request (Request): Текущий HTTP-запрос (FastAPI).
         data (CardPydanticModel): Pydantic-модель с идентификатором карточки (`card_id`).
-        session (AsyncSession): Асинхронная сессия SQLAlchemy для работы с БД.
+        session (AsyncSession): Асинхронная сессия SQLAlchemy с репликой БД (только чтение).
+        primary_session (AsyncSession): Асинхронная сессия SQLAlchemy с основной БД для записи в outbox.
+        tenant (Tenant): Арендатор запроса.
 
     Returns:
-        TemplateResponse: HTML-фрагмент модального окна с детальной информацией о карточке (`card`).
+        HTMLResponse: HTML-фрагмент модального окна с детальной информацией о карточке (`card`).
+            Берется из кеша фрагментов, если карточка не менялась.
     """
-    card_info: dict[str, Any] = await get_card_info_by_card_id(
+    card_info: Row | None = await get_card_info_fast(
         card_id=data.card_id,
         session=session,
-        queue_name=FASTAPI_DATABASE_QUERIES_QUEUE_NAME
+        queue_name=FASTAPI_DATABASE_QUERIES_QUEUE_NAME,
+        outbox_session=primary_session,
+        tenant_id=tenant.id
     )
-    "Словарь с информацией о конкретной карточке извлеченной по ее id в бд"
+    "Строка с информацией о конкретной карточке извлеченной по ее id в бд или None"
     logger.debug(f"{card_info=}")
-    return TEMPLATES.TemplateResponse(request, "client/modal.html", {"card": card_info})
+    if card_info is not None:
+        CARD_STATS.view(tenant.id, data.card_id)
+    return render_fragment(
+        request,
+        "client/modal.html",
+        {"card": card_info, "card_id": data.card_id},
+        (data.card_id, hash(card_info)),
+        tenant.id
+    )
+
+
+@client_rt.get("/cards/{card_id}/go")
+async def card_link_get_handler(
+    card_id: int,
+    session: AsyncSession = Depends(async_replica_session_generator),
+    tenant: Tenant = Depends(resolve_tenant)
+):
+    """
+    Обрабатывает переход по кнопке карточки: учитывает переход и перенаправляет на ссылку карточки.
+
+    Функция:
+    - Извлекает только ссылку кнопки (`call_to_action_link`) действующей карточки, без записи в outbox;
+    - Учитывает переход в счетчиках воркера (`CARD_STATS`), без записи в бд;
+    - Перенаправляет посетителя по ссылке.
+
+    Args:
+        card_id (int): Идентификатор карточки.
+        session (AsyncSession): Асинхронная сессия SQLAlchemy с репликой БД (только чтение).
+        tenant (Tenant): Арендатор запроса.
+
+    Returns:
+        RedirectResponse | JSONResponse: Перенаправление с кодом 302
+            или `{"ok": False, "error": str}` с кодом 404, если у карточки нет ссылки или она не действует.
+    """
+    link: str | None = await get_card_link_fast(card_id=card_id, session=session, tenant_id=tenant.id)
+    if not link:
+        return JSONResponse({"ok": False, "error": "У карточки нет ссылки"}, status_code=404)
+    CARD_STATS.click(tenant.id, card_id)
+    return RedirectResponse(link, status_code=302)
+
+
+@client_rt.post("/cards/issue_promocode")
+async def issue_promocode_post_handler(
+    request: Request,
+    data: CardPydanticModel,
+    session: AsyncSession = Depends(async_tenant_session_generator),
+    tenant: Tenant = Depends(resolve_tenant)
+):
+    """
+    Обрабатывает POST-запрос на выдачу посетителю одноразового промокода карточки.
+
+    Функция:
+    - Определяет посетителя по cookie `VISITOR_COOKIE_NAME` и создает идентификатор, если cookie нет;
+    - Забирает из пула карточки свободный промокод (`claim_promo_code`) или возвращает уже выданный посетителю;
+    - Учитывает новую выдачу в агрегированном событии outbox (`PROMO_ISSUE_EVENTS`), а не отдельной записью.
+
+    Args:
+        request (Request): Текущий HTTP-запрос (FastAPI).
+        data (CardPydanticModel): Pydantic-модель с идентификатором карточки (`card_id`).
+        session (AsyncSession): Асинхронная сессия SQLAlchemy с основной БД на движке арендатора.
+        tenant (Tenant): Арендатор запроса.
+
+    Returns:
+        JSONResponse:
+            - `{"ok": True, "promocode": str}` с кодом 200;
+            - `{"ok": False, "error": str}` с кодом 404, если карточка не действует или промокоды закончились.
+    """
+    visitor_id: str | None = request.cookies.get(VISITOR_COOKIE_NAME)
+    try:
+        visitor_id = str(uuid.UUID(visitor_id))
+        new_visitor: bool = False
+    except (TypeError, ValueError):
+        visitor_id, new_visitor = str(uuid.uuid4()), True
 
+    claim: tuple[str, bool] | None = await claim_promo_code(data.card_id, visitor_id, session, tenant_id=tenant.id)
+    "Промокод и признак того, что он выдан этим запросом"
+    logger.debug(f"{data.card_id=} {claim=}")
+    if claim is None:
+        response = JSONResponse({"ok": False, "error": "Промокоды для карточки закончились"}, status_code=404)
+    else:
+        promocode, issued = claim
+        if issued:
+            PROMO_ISSUE_EVENTS.add(tenant.id, data.card_id)
+        response = JSONResponse({"ok": True, "promocode": promocode}, status_code=200)
+    if new_visitor:
+        response.set_cookie(
+            VISITOR_COOKIE_NAME, visitor_id, max_age=VISITOR_COOKIE_MAX_AGE, httponly=True, samesite="lax"
+        )
+    return response
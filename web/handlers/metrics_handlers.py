@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from core.metrics import REGISTRY
+
+metrics_rt = APIRouter()
+"Роутер, отдающий метрики процесса в формате Prometheus"
+
+
+@metrics_rt.get("/metrics")
+async def metrics_get_handler():
+    """
+    Обрабатывает GET-запрос сборщика метрик Prometheus.
+
+    Returns:
+        PlainTextResponse: Все метрики процесса в текстовом формате Prometheus.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,257 @@
+import asyncio
+import hmac
+import itertools
+import json
+import random
+import re
+import time
+
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from fastapi import APIRouter
+from loguru import logger
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.metrics import HTTP_REQUEST_DURATION
+from core.profiling import RequestProfile, SamplingProfiler, current_profile, install_sql_timing
+
+from .compression import StreamCompressor, choose_encoding, compress, is_compressible
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware, записывающее длительность запросов к маршрутам роутеров в `HTTP_REQUEST_DURATION`.
+
+    Меткой `route` служит шаблон пути маршрута (`/partnerprogram/cards`), а не фактический URL,
+    поэтому количество рядов метрики не зависит от параметров запросов.
+    Запросы к маршрутам вне переданных роутеров (статика, 404) не записываются.
+
+    Args:
+        app (ASGIApp): Следующее ASGI-приложение
+        routers (dict[str, APIRouter]): Роутеры для метки `router`. Ключ - имя роутера (`client_rt`)
+        prefixes (dict[str, tuple[str, ...]] | None): Дополнительные префиксы, с которыми подключен роутер
+            (`/tenants/{tenant_slug}`). Ключ - имя роутера
+    """
+    def __init__(
+        self,
+        app: ASGIApp,
+        routers: dict[str, APIRouter],
+        prefixes: dict[str, tuple[str, ...]] | None = None
+    ):
+        self.app = app
+        prefixes = prefixes or {}
+        self.route_routers: dict[str, str] = {
+            prefix + route.path: name
+            for name, router in routers.items()
+            for prefix in ("", *prefixes.get(name, ()))
+            for route in router.routes
+        }
+        "Ключ - шаблон пути маршрута, значение - имя роутера"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status: int = 500
+        "Код ответа. Остается 500, если приложение упало до отправки ответа"
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started: float = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            router_name: str | None = self.route_routers.get(getattr(route, "path", None))
+            if router_name is not None:
+                HTTP_REQUEST_DURATION.observe(
+                    time.perf_counter() - started,
+                    router_name,
+                    scope["method"],
+                    route.path,
+                    str(status)
+                )
+
+
+class ProfilingMiddleware:
+    """
+    ASGI-middleware, профилирующее отдельные запросы (`core.profiling`).
+
+    Запрос профилируется, если значение его заголовка `X-Profile` совпадает с `token`,
+    или случайно с вероятностью `sample_rate`. Без токена заголовок игнорируется.
+    Одновременно профилируется не больше одного запроса.
+    Для каждого профиля в `output_dir` пишутся два файла с именем `<маршрут>_<время>`:
+    `.folded` - стеки для flamegraph и `.json` - запрос, длительность и SQL-выражения с их длительностью.
+    Имя профиля возвращается в заголовке ответа `X-Profile-Id`.
+
+    Middleware подключается только при `PROFILING_ENABLED`, поэтому выключенное профилирование ничего не стоит.
+
+    Args:
+        app (ASGIApp): Следующее ASGI-приложение
+        output_dir (Path): Каталог профилей
+        sample_rate (float): Доля случайно профилируемых запросов
+        token (str | None): Значение заголовка `X-Profile`, разрешающее профилирование.
+            `None` - профилирование по заголовку выключено
+        interval (float): Интервал между снимками стека, секунды
+    """
+    def __init__(
+        self,
+        app: ASGIApp,
+        output_dir: Path,
+        sample_rate: float = 0.0,
+        token: str | None = None,
+        interval: float = 0.005
+    ):
+        self.app = app
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.token = token or None
+        self.interval = interval
+        self.active: bool = False
+        "Идет профилирование запроса"
+        self.sequence = itertools.count(1)
+        install_sql_timing()
+
+    def should_profile(self, scope: Scope) -> bool:
+        if self.active:
+            return False
+        header: str | None = Headers(scope=scope).get("x-profile")
+        if header is not None:
+            return self.token is not None and hmac.compare_digest(header, self.token)
+        return bool(self.sample_rate) and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        self.active = True
+        profile_id: str = f"{datetime.now():%Y%m%dT%H%M%S_%f}_{next(self.sequence)}"
+        status: int = 500
+
+        async def send_with_profile_id(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        profiler = SamplingProfiler(self.interval)
+        started: float = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.stop()
+            duration: float = time.perf_counter() - started
+            current_profile.reset(token)
+            self.active = False
+            route_path: str = getattr(scope.get("route"), "path", scope["path"])
+            summary: dict[str, Any] = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route_path,
+                "status": status,
+                "duration_ms": round(duration * 1000, 3),
+                "samples": sum(profiler.stacks.values()),
+                "interval_ms": self.interval * 1000,
+                "sql": profile.sql,
+            }
+            name: str = f"{re.sub(r'[^A-Za-z0-9]+', '_', route_path).strip('_') or 'root'}_{profile_id}"
+            await asyncio.to_thread(self.write_profile, name, profiler.folded(), summary)
+
+    def write_profile(self, name: str, folded: str, summary: dict[str, Any]) -> None:
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            (self.output_dir / f"{name}.folded").write_text(folded, encoding="utf-8")
+            (self.output_dir / f"{name}.json").write_text(
+                json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8"
+            )
+            logger.info(f"Профиль запроса {summary['method']} {summary['path']} записан: {self.output_dir / name}")
+        except OSError as e:
+            logger.error(f"Не удалось записать профиль {name}: {e}")
+
+
+class CompressionMiddleware:
+    """
+    ASGI-middleware, сжимающее текстовые ответы gzip или brotli (`web.compression`).
+
+    Не сжимаются ответы меньше `minimum_size` байт, нетекстовые ответы и ответы, у которых уже есть
+    `Content-Encoding`: статические файлы со сжатыми вариантами из сборки и фрагменты,
+    сжатые и закешированные `web.utils.render_fragment`. Ответы, отправляемые частями, сжимаются потоково.
+
+    Args:
+        app (ASGIApp): Следующее ASGI-приложение
+        minimum_size (int): Минимальный размер тела ответа для сжатия, байты
+    """
+    def __init__(self, app: ASGIApp, minimum_size: int = 500):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        encoding: str | None = None
+        if scope["type"] == "http":
+            encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Message | None = None
+        "Начало ответа. Отправляется вместе с первой частью тела, когда известно, сжимается ли ответ"
+        passthrough: bool = False
+        compressor: StreamCompressor | None = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, passthrough, compressor
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message.get("headers", []))
+                if "content-encoding" in headers or not is_compressible(headers.get("content-type", "")):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body: bytes = message.get("body", b"")
+            more_body: bool = message.get("more_body", False)
+            if start_message is not None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                start_message["headers"] = list(start_message.get("headers", []))
+                headers = MutableHeaders(raw=start_message["headers"])
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                    compressor = StreamCompressor(encoding)
+                else:
+                    body = compress(body, encoding)
+                    headers["Content-Length"] = str(len(body))
+                await send(start_message)
+                start_message = None
+                if compressor is None:
+                    await send({"type": "http.response.body", "body": body})
+                    return
+
+            chunk: bytes = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -16,7 +16,7 @@ document.querySelectorAll(".trigger").forEach(trigger => {
         modalBackground.style.display = "block";
         // позиционируем наше окно по середине, где 175 - половина ширины модального окна
         modalActive.style.left = "calc(50% - " + (175 - scrollbarWidth / 2) + "px)";
-        const response = await fetch(window.location.pathname + "/get_card_info", {
+        const response = await fetch("./cards/get_card_info", {
             method: "POST",
             headers: {
                 "Content-Type": "application/json",
@@ -0,0 +1,54 @@
+"""
+Окружение Jinja для шаблонов страниц.
+
+Скомпилированные шаблоны сохраняются в `FileSystemBytecodeCache`: новый воркер загружает готовый байткод
+с диска вместо разбора и компиляции исходников. Ключ кеша включает имя шаблона и контрольную сумму исходника,
+поэтому измененный шаблон компилируется заново и без `auto_reload`, но только при первой загрузке в процессе.
+С выключенным `auto_reload` Jinja не проверяет время изменения файла при каждом рендере.
+"""
+from pathlib import Path
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+
+from core.images import thumbnail_path
+
+from .assets import StaticAssets
+
+
+def create_templates(
+    directory: Path,
+    bytecode_cache_dir: Path | None,
+    auto_reload: bool,
+    static_assets: StaticAssets | None = None
+) -> Jinja2Templates:
+    """
+    Создает шаблоны FastAPI с кешем байткода на диске.
+
+    Args:
+        directory (Path): Каталог шаблонов
+        bytecode_cache_dir (Path | None): Каталог кеша байткода. `None` - кеш не используется
+        auto_reload (bool): Перечитывать измененные шаблоны без перезапуска (для разработки)
+        static_assets (StaticAssets | None): Собранные статические файлы. Если заданы, `url_for('static', ...)`
+            в шаблонах возвращает ссылки на файлы с хешем в имени
+
+    Returns:
+        Jinja2Templates: Шаблоны FastAPI.
+    """
+    bytecode_cache: FileSystemBytecodeCache | None = None
+    if bytecode_cache_dir is not None:
+        bytecode_cache_dir.mkdir(parents=True, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(str(bytecode_cache_dir))
+
+    env = Environment(
+        loader=FileSystemLoader(directory),
+        autoescape=select_autoescape(),
+        auto_reload=auto_reload,
+        bytecode_cache=bytecode_cache,
+        cache_size=-1
+    )
+    # Ссылка на уменьшенную копию изображения: url_for('media', path=thumbnail_path(card.image, 'card'))
+    env.globals["thumbnail_path"] = thumbnail_path
+    if static_assets is not None:
+        env.globals["url_for"] = static_assets.url_for
+    return Jinja2Templates(env=env)
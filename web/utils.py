@@ -1,9 +1,68 @@
+from collections.abc import Hashable
+from datetime import datetime
 from typing import Any
 
+from fastapi import Request
+from fastapi.responses import HTMLResponse
 from loguru import logger
-from sqlalchemy import BigInteger, String
+from sqlalchemy import BigInteger, DateTime, String
 
-from core.models import BaseTable, reverse_russian_field_names
+from core.cache import FragmentCache
+from core.models import DEFAULT_TENANT_ID, BaseTable, get_editable_columns, reverse_russian_field_names
+
+from .compression import choose_encoding, compress
+from .config import COMPRESSION_ENABLED, COMPRESSION_MINIMUM_SIZE, FRAGMENT_CACHE, TEMPLATES
+
+
+def render_fragment(
+    request: Request,
+    template_name: str,
+    context: dict[str, Any],
+    entity_key: Hashable,
+    tenant_id: int = DEFAULT_TENANT_ID
+) -> HTMLResponse:
+    """
+    Рендерит шаблон клиентской части или берет готовый HTML из кеша арендатора `FRAGMENT_CACHE`.
+
+    Ключ фрагмента - шаблон, `entity_key` и базовый адрес запроса (ссылки на статику в шаблонах абсолютные).
+    Версия каталога проверяется самим кешем. Обработчики добавляют в `entity_key` хеш строк из бд:
+    версия каталога локальна для воркера, а хеш не дает отдать фрагмент, устаревший после изменения
+    каталога через другой воркер.
+
+    Рядом с HTML в кеше хранятся сжатые варианты фрагмента (ключ дополняется кодировкой), поэтому горячие
+    фрагменты не сжимаются на каждый запрос. Сжатый ответ уже содержит `Content-Encoding`,
+    и `CompressionMiddleware` его не трогает.
+
+    Args:
+        request (Request): Текущий HTTP-запрос
+        template_name (str): Имя шаблона
+        context (dict[str, Any]): Контекст шаблона без `request`
+        entity_key (Hashable): Идентификатор сущности фрагмента (например, `(category_id, hash(cards))`)
+        tenant_id (int): Идентификатор арендатора - пространство имен кеша
+
+    Returns:
+        HTMLResponse: Ответ с HTML фрагмента, сжатым, если клиент принимает сжатие.
+    """
+    cache: FragmentCache = FRAGMENT_CACHE.namespace(tenant_id)
+    key: tuple = (template_name, entity_key, str(request.base_url))
+    encoding: str | None = None
+    if COMPRESSION_ENABLED:
+        encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+    if encoding is not None:
+        compressed: bytes | None = cache.get((*key, encoding))
+        if compressed is not None:
+            return HTMLResponse(compressed, headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+
+    body: bytes | None = cache.get(key)
+    if body is None:
+        body = TEMPLATES.get_template(template_name).render({"request": request, **context}).encode()
+        cache.set(key, body)
+    if encoding is None or len(body) < COMPRESSION_MINIMUM_SIZE:
+        return HTMLResponse(body)
+
+    compressed = compress(body, encoding)
+    cache.set((*key, encoding), compressed)
+    return HTMLResponse(compressed, headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
 
 
 def map_columns_to_table_types(table: BaseTable, data: dict[str, str]) -> dict[str, Any]:
@@ -12,7 +71,8 @@ def map_columns_to_table_types(table: BaseTable, data: dict[str, str]) -> dict[s
 
     Функция:
     - Заменяет русские ключи в словаре на оригинальные имена столбцов;
-    - Приводит значения к типам столбцов таблицы (например, `String` -> str, `BigInteger` -> int);
+    - Приводит значения к типам столбцов таблицы (например, `String` -> str, `BigInteger` -> int,
+      `DateTime` -> datetime из строки ISO 8601);
     - Присваивает None для пустых или отсутствующих значений;
     - Логирует ошибки при некорректных данных.
 
@@ -29,7 +89,7 @@ def map_columns_to_table_types(table: BaseTable, data: dict[str, str]) -> dict[s
         data = { reverse_russian_field_names.get(key, key) : data[key] for key in data}
         "Словарь отражающий запись в таблице, но уже с оригинальным названием столбца на английском"
 
-        for column in table.__table__.columns:
+        for column in get_editable_columns(table):
             if data.get(column.name):
                 if data[column.name] in ("", None):
                     clear_result[column.name] = None
@@ -37,10 +97,12 @@ def map_columns_to_table_types(table: BaseTable, data: dict[str, str]) -> dict[s
                     clear_result[column.name] = str(data[column.name])
                 elif isinstance(column.type, BigInteger):
                     clear_result[column.name] = int(data[column.name])
+                elif isinstance(column.type, DateTime):
+                    clear_result[column.name] = datetime.fromisoformat(str(data[column.name]))
                 else:
                     clear_result[column.name] = data[column.name]
                 # можно добавить и остальные проверки на тип столбца и соответственное приведение к типу
-                # Используются только BigInteger и String т.к. только они представлены в текущих таблицах бд
+                # Используются только BigInteger, String и DateTime т.к. только они представлены в текущих таблицах бд
         return clear_result
     except Exception as exc:
         logger.error(exc)
@@ -0,0 +1,131 @@
+import asyncio
+import time
+
+from fastapi.templating import Jinja2Templates
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql import Executable
+
+from core.database_utils import (
+    CARD_INFO_SELECT,
+    CARD_LINK_SELECT,
+    CARDS_IN_CATEGORY_SELECT,
+    CATEGORIES_SELECT,
+)
+from core.models import DEFAULT_TENANT_ID
+
+
+def get_catalog_warmup_statements() -> list[tuple[Executable, dict[str, int]]]:
+    """
+    Возвращает запросы каталога, которые выполняются при прогреве.
+
+    Параметры запросов заведомо не совпадают с реальными записями: важно только,
+    чтобы SQLAlchemy закешировал компиляцию, а asyncpg подготовил выражения на соединении.
+
+    Returns:
+        list[tuple[Executable, dict[str, int]]]: Запросы каталога клиентской части (те же, что выполняют
+            клиентские обработчики) и их параметры.
+    """
+    return [
+        (CATEGORIES_SELECT, {"tenant_id": DEFAULT_TENANT_ID}),
+        (CARDS_IN_CATEGORY_SELECT, {"category_id": 0, "tenant_id": DEFAULT_TENANT_ID}),
+        (CARD_INFO_SELECT, {"card_id": 0, "tenant_id": DEFAULT_TENANT_ID}),
+        (CARD_LINK_SELECT, {"card_id": 0, "tenant_id": DEFAULT_TENANT_ID}),
+    ]
+
+
+def get_pool_capacity(engine: AsyncEngine) -> int | None:
+    """
+    Возвращает максимальное количество одновременно открытых соединений пула движка.
+
+    Args:
+        engine (AsyncEngine): Асинхронный движок базы данных
+
+    Returns:
+        int | None: `pool_size + max_overflow` для `QueuePool`. `None`, если пул не ограничен.
+    """
+    pool = engine.pool
+    if not isinstance(pool, QueuePool) or pool._max_overflow < 0:
+        return None
+    return pool.size() + pool._max_overflow
+
+
+async def warm_up_pool(engine: AsyncEngine, connections: int) -> None:
+    """
+    Открывает одновременно `connections` соединений пула и выполняет на каждом запросы каталога.
+
+    Количество соединений ограничивается емкостью пула: иначе лишние соединения ждали бы
+    освобождения занятых до истечения `pool_timeout`. Если прогрев одного соединения завершился
+    ошибкой, `TaskGroup` отменяет остальные, и они возвращают свои соединения в пул.
+
+    Args:
+        engine (AsyncEngine): Асинхронный движок базы данных
+        connections (int): Количество соединений, которое нужно открыть
+    """
+    capacity: int | None = get_pool_capacity(engine)
+    if capacity is not None and connections > capacity:
+        logger.warning(f"Прогрев пула: {connections} соединений больше емкости пула {capacity}, открывается {capacity}")
+        connections = capacity
+    statements: list[tuple[Executable, dict[str, int]]] = get_catalog_warmup_statements()
+    checked_out = asyncio.Event()
+    "Событие, удерживающее соединения занятыми, пока не будут открыты все"
+    ready: int = 0
+
+    async def warm_connection() -> None:
+        nonlocal ready
+        async with engine.connect() as conn:
+            for stmt, params in statements:
+                await conn.execute(stmt, params)
+            ready += 1
+            if ready >= connections:
+                checked_out.set()
+            # Соединение не возвращается в пул до открытия остальных, иначе пул переиспользует одно и то же
+            await checked_out.wait()
+
+    async with asyncio.TaskGroup() as group:
+        for _ in range(connections):
+            group.create_task(warm_connection())
+
+
+def compile_templates(templates: Jinja2Templates) -> int:
+    """
+    Компилирует все шаблоны Jinja заранее, чтобы первый запрос не платил за компиляцию.
+
+    Args:
+        templates (Jinja2Templates): Шаблоны FastAPI
+
+    Returns:
+        int: Количество скомпилированных шаблонов.
+    """
+    names: list[str] = templates.env.list_templates()
+    for name in names:
+        templates.get_template(name)
+    return len(names)
+
+
+async def warm_up(engines: list[AsyncEngine], templates: Jinja2Templates, connections: int) -> dict[str, float]:
+    """
+    Прогревает воркер перед приемом запросов: пулы соединений, шаблоны и запросы каталога.
+
+    Args:
+        engines (list[AsyncEngine]): Асинхронные движки базы данных (основной и реплика)
+        templates (Jinja2Templates): Шаблоны FastAPI
+        connections (int): Количество соединений каждого пула, которое нужно открыть
+
+    Returns:
+        dict[str, float]: Длительность каждого этапа прогрева в секундах.
+    """
+    timings: dict[str, float] = {}
+    "Длительность этапов прогрева. Ключ - этап, значение - секунды"
+
+    started: float = time.perf_counter()
+    compiled: int = compile_templates(templates)
+    timings["templates"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await asyncio.gather(*(warm_up_pool(engine, connections) for engine in engines))
+    timings["pool"] = time.perf_counter() - started
+
+    logger.info(f"Прогрев завершен: шаблонов {compiled}, соединений {connections}, {timings=}")
+    return timings
@@ -4,27 +4,104 @@ from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI
-from sqlalchemy.ext.asyncio import close_all_sessions
+from sqlalchemy.ext.asyncio import async_sessionmaker, close_all_sessions
 
-from core.models import BaseTable
-from web.config import ASYNC_ENGINE, HOST, PORT, PROJECT_NAME, STATIC_FILES
+from core.db_metrics import watch_engine_pool
+from core.migrations import check_schema_version, run_migrations
+from core.slow_queries import watch_slow_queries
+from core.tenants import tenant_engine
+from core.validity import ValidityScheduler
+from web.config import (
+    ASYNC_ENGINE,
+    CARD_STATS,
+    COMPRESSION_ENABLED,
+    COMPRESSION_MINIMUM_SIZE,
+    FASTAPI_DATABASE_QUERIES_QUEUE_NAME,
+    HOST,
+    IMAGE_STORE,
+    MEDIA_FILES,
+    MIGRATE_ON_STARTUP,
+    PORT,
+    PROFILING_DIR,
+    PROFILING_ENABLED,
+    PROFILING_INTERVAL,
+    PROFILING_SAMPLE_RATE,
+    PROFILING_TOKEN,
+    PROJECT_NAME,
+    PROMO_ISSUE_EVENTS,
+    REPLICA_ASYNC_ENGINE,
+    SLOW_QUERY_EXPLAIN,
+    SLOW_QUERY_EXPLAINS_PER_MINUTE,
+    SLOW_QUERY_LOGS_PER_MINUTE,
+    SLOW_QUERY_THRESHOLD_MS,
+    STATIC_FILES,
+    TEMPLATES,
+    TEMPLATES_AUTO_RELOAD,
+    TENANT_PATH_PREFIX,
+    TENANT_REGISTRY,
+    VALIDITY_REFRESH_INTERVAL,
+    VALIDITY_SCHEDULER_ENABLED,
+    WARMUP_ON_STARTUP,
+    WARMUP_POOL_CONNECTIONS,
+)
 from web.handlers.admin_handlers import admin_rt
 from web.handlers.client_handlers import client_rt
+from web.handlers.metrics_handlers import metrics_rt
+from web.middlewares import CompressionMiddleware, MetricsMiddleware, ProfilingMiddleware
+from web.warmup import compile_templates, warm_up
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Запускается при старте FastAPI.
-    Создает таблицы в бд и закрывает соединение с ней когда приложение завершает работу
+    Проверяет версию схемы бд, загружает сборку статических файлов, компилирует шаблоны,
+    при необходимости прогревает воркер, запускает планировщик окон действия карточек, запись событий выдачи
+    промокодов и счетчиков карточек, а когда приложение завершает работу - записывает накопленные выдачи
+    промокодов и счетчики, останавливает пул обработки изображений и закрывает соединение с бд
     """
-    async with ASYNC_ENGINE.begin() as conn:
-        await conn.run_sync(BaseTable.metadata.create_all)
+    if MIGRATE_ON_STARTUP:
+        await run_migrations(ASYNC_ENGINE)
+
+    if not await check_schema_version(ASYNC_ENGINE):
+        raise RuntimeError("Схема бд не соответствует коду. Выполните `python maintenance_main.py migrate`")
+
+    # При разработке статические файлы пересобираются при каждом старте, в продакшене собираются при сборке
+    STATIC_FILES.load(rebuild=TEMPLATES_AUTO_RELOAD)
+
+    if WARMUP_ON_STARTUP:
+        await warm_up([ASYNC_ENGINE, REPLICA_ASYNC_ENGINE], TEMPLATES, WARMUP_POOL_CONNECTIONS)
+    else:
+        # Шаблоны загружаются из кеша байткода до первого запроса даже без прогрева
+        compile_templates(TEMPLATES)
+
+    validity_schedulers: list[ValidityScheduler] = []
+    if VALIDITY_SCHEDULER_ENABLED:
+        async with async_sessionmaker(ASYNC_ENGINE)() as session:
+            await TENANT_REGISTRY.load(session)
+        # Один планировщик на общую схему и по одному на каждую отдельную схему арендатора
+        engines = {tenant_engine(ASYNC_ENGINE, tenant) for tenant in TENANT_REGISTRY.by_slug.values()}
+        for scheduler_engine in {ASYNC_ENGINE, *engines}:
+            validity_scheduler = ValidityScheduler(
+                async_sessionmaker(scheduler_engine, expire_on_commit=False),
+                FASTAPI_DATABASE_QUERIES_QUEUE_NAME,
+                refresh_interval=VALIDITY_REFRESH_INTERVAL
+            )
+            validity_scheduler.start()
+            validity_schedulers.append(validity_scheduler)
+    PROMO_ISSUE_EVENTS.start()
+    CARD_STATS.start()
 
     yield
 
+    await PROMO_ISSUE_EVENTS.stop()
+    await CARD_STATS.stop()
+    for validity_scheduler in validity_schedulers:
+        await validity_scheduler.stop()
+    IMAGE_STORE.shutdown()
     await close_all_sessions()
     await ASYNC_ENGINE.dispose()
+    await REPLICA_ASYNC_ENGINE.dispose()
 
 
 app: FastAPI = FastAPI(
@@ -37,8 +114,39 @@ app: FastAPI = FastAPI(
 "Главное приложений FastAPI"
 
 app.mount("/static", STATIC_FILES, "static")
+app.mount("/media", MEDIA_FILES, "media")
 app.include_router(client_rt)
+app.include_router(client_rt, prefix=TENANT_PATH_PREFIX)
 app.include_router(admin_rt)
+app.include_router(metrics_rt)
+app.add_middleware(
+    MetricsMiddleware,
+    routers={"client_rt": client_rt, "admin_rt": admin_rt},
+    prefixes={"client_rt": (TENANT_PATH_PREFIX,)}
+)
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE)
+if PROFILING_ENABLED:
+    if not PROFILING_TOKEN and not PROFILING_SAMPLE_RATE:
+        raise RuntimeError("Профилирование по заголовку X-Profile требует PROFILING_TOKEN")
+    app.add_middleware(
+        ProfilingMiddleware,
+        output_dir=PROFILING_DIR,
+        sample_rate=PROFILING_SAMPLE_RATE,
+        token=PROFILING_TOKEN,
+        interval=PROFILING_INTERVAL
+    )
+
+watch_engine_pool(ASYNC_ENGINE, "primary")
+watch_engine_pool(REPLICA_ASYNC_ENGINE, "replica")
+for engine in (ASYNC_ENGINE, REPLICA_ASYNC_ENGINE):
+    watch_slow_queries(
+        engine,
+        SLOW_QUERY_THRESHOLD_MS,
+        explain=SLOW_QUERY_EXPLAIN,
+        logs_per_minute=SLOW_QUERY_LOGS_PER_MINUTE,
+        explains_per_minute=SLOW_QUERY_EXPLAINS_PER_MINUTE
+    )
 #app.include_router(test_rt)
 
 